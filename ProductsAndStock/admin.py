@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ProductsAndStock, StockMovement, Category, SubCategory, PriceHistory, SalesStatistics, StockAlert, StockRecommendation
+from .models import ProductsAndStock, StockMovement, Category, SubCategory, PriceHistory, SalesStatistics, StockAlert, StockRecommendation, ProductImportJob, evict_product_reports
 from leads.models import UserProfile
 
 
@@ -22,6 +22,12 @@ class OrganisorListFilter(admin.SimpleListFilter):
 		return queryset
 
 
+def _evict_reports_for(queryset):
+	"""queryset.update() sends no signals: drop the dashboards of the affected organisations."""
+	for organisation_id in set(queryset.values_list('product__organisation_id', flat=True)):
+		evict_product_reports(organisation_id)
+
+
 class StockMovementInline(admin.TabularInline):
 	model = StockMovement
 	extra = 0
@@ -168,6 +174,7 @@ class StockAlertAdmin(admin.ModelAdmin):
 	def mark_as_resolved(self, request, queryset):
 		from django.utils import timezone
 		queryset.update(is_resolved=True, resolved_at=timezone.now())
+		_evict_reports_for(queryset)
 	mark_as_resolved.short_description = "Mark selected alerts as resolved"
 	
 	actions = [mark_as_read, mark_as_resolved]
@@ -183,6 +190,14 @@ class StockRecommendationAdmin(admin.ModelAdmin):
 	def apply_recommendation(self, request, queryset):
 		from django.utils import timezone
 		queryset.update(is_applied=True, applied_at=timezone.now())
+		_evict_reports_for(queryset)
 	apply_recommendation.short_description = "Apply selected recommendations"
 	
 	actions = [apply_recommendation]
+
+@admin.register(ProductImportJob)
+class ProductImportJobAdmin(admin.ModelAdmin):
+	list_display = ('pk', 'organisation', 'created_by', 'status', 'created_count', 'updated_count', 'rejected_count', 'created_at', 'finished_at')
+	list_filter = ('status', 'created_at')
+	readonly_fields = ('created_at', 'started_at', 'finished_at')
+	ordering = ['-created_at']
@@ -0,0 +1,92 @@
+"""
+Chart data for ProductChartsView, computed in SQL and cached per organisation.
+
+Stock status buckets and totals come from one aggregate, the per-category series from one
+GROUP BY, and the top-10 charts from ORDER BY ... LIMIT 10 queries (units sold via
+ProductQuerySet.with_sales()). The result is cached under chart_data_cache_key() until a
+product, order or order line of the organisation changes (see evict_product_reports).
+"""
+from django.core.cache import cache
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from djcrm.replica import replica_reads
+
+from .models import CHART_DATA_CACHE_SECONDS, ProductsAndStock, chart_data_cache_key
+
+STOCK_LABELS = ['Out of Stock', 'Low Stock', 'In Stock', 'Overstock']
+STOCK_COLORS = ['#ef4444', '#f97316', '#22c55e', '#eab308']
+
+OUT_OF_STOCK = Q(product_quantity__lte=0)
+LOW_STOCK = Q(product_quantity__lte=F('minimum_stock_level'), product_quantity__gt=0)
+OVERSTOCK = ~Q(minimum_stock_level=0) & Q(product_quantity__gt=F('minimum_stock_level') * 10)
+IN_STOCK = Q(product_quantity__gt=F('minimum_stock_level')) & (
+    Q(minimum_stock_level=0) | Q(product_quantity__lte=F('minimum_stock_level') * 10)
+)
+STOCK_VALUE = F('product_price') * F('product_quantity')
+
+
+def _label(name):
+    return name[:18] + ('..' if len(name) > 18 else '')
+
+
+def compute_chart_data(products):
+    """Chart series for the given ProductsAndStock queryset, as template context."""
+    totals = products.aggregate(
+        out_of_stock=Count('pk', filter=OUT_OF_STOCK),
+        low_stock=Count('pk', filter=LOW_STOCK),
+        in_stock=Count('pk', filter=IN_STOCK),
+        overstock=Count('pk', filter=OVERSTOCK),
+        total_products=Count('pk'),
+        total_value=Coalesce(Sum(STOCK_VALUE, output_field=FloatField()), Value(0.0)),
+        total_profit=Coalesce(Sum(
+            (F('product_price') - F('cost_price')) * F('product_quantity'),
+            filter=Q(cost_price__gt=0),
+            output_field=FloatField(),
+        ), Value(0.0)),
+    )
+    by_category = list(
+        products.order_by().values('category__name').annotate(
+            count=Count('pk'),
+            value=Sum(STOCK_VALUE, output_field=FloatField()),
+        ).order_by('category__name')
+    )
+    top_value = list(
+        products.annotate(stock_value=STOCK_VALUE).order_by('-stock_value', 'pk').values_list('product_name', 'stock_value')[:10]
+    )
+    top_sales = list(
+        products.with_sales().order_by('-units_sold', 'pk').values_list('product_name', 'units_sold', 'sales_revenue')[:10]
+    )
+
+    return {
+        'chart_stock_labels': STOCK_LABELS,
+        'chart_stock_data': [totals['out_of_stock'], totals['low_stock'], totals['in_stock'], totals['overstock']],
+        'chart_stock_colors': STOCK_COLORS,
+        'chart_category_labels': [row['category__name'] for row in by_category],
+        'chart_category_counts': [row['count'] for row in by_category],
+        'chart_category_values': [round(row['value'] or 0, 2) for row in by_category],
+        'chart_top_labels': [_label(name) for name, _ in top_value],
+        'chart_top_data': [round(value, 2) for _, value in top_value],
+        'chart_sales_labels': [_label(name) for name, _, _ in top_sales],
+        'chart_sales_data': [units for _, units, _ in top_sales],
+        'chart_sales_revenue_data': [round(revenue, 2) for _, _, revenue in top_sales],
+        'chart_has_sales': bool(top_sales) and top_sales[0][1] > 0,
+        'total_products': totals['total_products'],
+        'total_value': round(totals['total_value'], 2),
+        'total_profit': round(totals['total_profit'], 2),
+    }
+
+
+def chart_data(organisation_id=None):
+    """Cached chart data for one organisation, or for all products when organisation_id is None."""
+    key = chart_data_cache_key(organisation_id)
+    data = cache.get(key)
+    if data is None:
+        products = ProductsAndStock.objects.all()
+        if organisation_id is not None:
+            products = products.filter(organisation_id=organisation_id)
+        # Cached for everyone, including a browser pinned to the primary: never from the replica
+        with replica_reads(False):
+            data = compute_chart_data(products)
+        cache.set(key, data, CHART_DATA_CACHE_SECONDS)
+    return data
@@ -0,0 +1,171 @@
+"""
+Sales dashboard snapshot: everything SalesDashboardView shows, built with a handful of SQL
+queries and cached per organisation as plain data.
+
+The snapshot is evicted when a product, order, order line, stock alert or recommendation of
+the organisation changes (see evict_product_reports) and otherwise expires after
+DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS, so a dashboard visit is a single cache read.
+refresh_dashboard_snapshots rebuilds them ahead of time.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, F, FloatField, IntegerField, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from djcrm.replica import replica_reads
+
+from .charts import STOCK_VALUE
+from .models import ProductsAndStock, StockAlert, StockRecommendation, dashboard_snapshot_cache_key
+
+SEVERITIES = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']
+
+
+def severity_rank(field='severity'):
+    """0 for CRITICAL down to 3 for LOW (4 for anything else), for ordering alerts by severity."""
+    return Case(
+        *[When(**{field: severity}, then=Value(rank)) for rank, severity in enumerate(SEVERITIES)],
+        default=Value(len(SEVERITIES)),
+        output_field=IntegerField(),
+    )
+
+
+# A product is still critical while it is out of stock or at half its minimum level or below
+STILL_CRITICAL = Q(product__product_quantity__lte=0) | (
+    ~Q(product__minimum_stock_level=0) & Q(product__minimum_stock_level__gte=F('product__product_quantity') * 2)
+)
+# A recommendation is still relevant while the condition that raised it holds
+STILL_RELEVANT = (
+    Q(recommendation_type='RESTOCK', product__product_quantity__lte=F('product__minimum_stock_level'), product__product_quantity__gt=0)
+    | Q(recommendation_type='DISCOUNT', product__product_quantity__gt=F('product__minimum_stock_level') * 5)
+    | Q(recommendation_type='REDUCE_STOCK', product__product_quantity__gt=F('product__minimum_stock_level') * 10)
+)
+IN_ALERT_STATE = (
+    Q(product_quantity__lte=0)
+    | Q(product_quantity__lte=F('minimum_stock_level'))
+    | (~Q(minimum_stock_level=0) & Q(product_quantity__gt=F('minimum_stock_level') * 10))
+)
+
+
+def _first_per_product(rows):
+    seen = set()
+    for row in rows:
+        if row['product_id'] not in seen:
+            seen.add(row['product_id'])
+            yield row
+
+
+def build_snapshot(products):
+    """Dashboard context for the given ProductsAndStock queryset, as picklable dicts and lists."""
+    totals = products.aggregate(
+        total_products=Count('pk'),
+        total_value=Coalesce(Sum(STOCK_VALUE, output_field=FloatField()), Value(0.0)),
+        total_profit=Coalesce(Sum(
+            (F('product_price') - F('cost_price')) * F('product_quantity'),
+            filter=Q(cost_price__gt=0),
+            output_field=FloatField(),
+        ), Value(0.0)),
+        low_stock_products=Count('pk', filter=Q(product_quantity__lte=F('minimum_stock_level')) & ~Q(product_quantity=0)),
+        out_of_stock_products=Count('pk', filter=Q(product_quantity=0)),
+        overstock_products=Count('pk', filter=Q(product_quantity__gt=F('minimum_stock_level') * 10)),
+        in_stock_products=Count('pk', filter=Q(
+            product_quantity__gt=F('minimum_stock_level'),
+            product_quantity__lte=F('minimum_stock_level') * 10,
+        )),
+    )
+
+    top_selling_products = [
+        {
+            'pk': product.pk,
+            'product_name': product.product_name,
+            'product_description': product.product_description,
+            'category_name': product.category.name,
+            'subcategory_name': product.subcategory.name,
+            'product_price': product.product_price,
+            'product_quantity': product.product_quantity,
+            'stock_status': product.stock_status,
+            'total_sales_count': product.units_sold,
+            'total_revenue_from_sales': product.sales_revenue,
+        }
+        for product in products.with_sales().filter(units_sold__gt=0).select_related(
+            'category', 'subcategory',
+        ).order_by('-units_sold', 'pk')[:5]
+    ]
+
+    severity_labels = dict(StockAlert.SEVERITY_LEVELS)
+    alerts = StockAlert.objects.filter(product__in=products, is_resolved=False)
+    recent_alerts = [
+        dict(row, severity_display=severity_labels.get(row['severity'], row['severity']))
+        for row in alerts.annotate(severity_order=severity_rank()).order_by('severity_order', '-created_at').values(
+            'severity', 'message', 'created_at', product_name=F('product__product_name'),
+        )[:20]
+    ]
+    # One per product (latest alert), only while the product is still in a critical state
+    critical_alerts_list = list(_first_per_product(
+        alerts.filter(STILL_CRITICAL, severity='CRITICAL').order_by('-created_at').values(
+            'product_id', 'message', product_name=F('product__product_name'),
+        )
+    ))
+
+    type_labels = dict(StockRecommendation.RECOMMENDATION_TYPES)
+    # One per product (highest confidence), only while the issue is still there
+    stock_recommendations = [
+        dict(row, type_display=type_labels.get(row['recommendation_type'], row['recommendation_type']))
+        for row in _first_per_product(
+            StockRecommendation.objects.filter(STILL_RELEVANT, product__in=products, is_applied=False).order_by(
+                '-confidence_score', '-created_at',
+            ).values(
+                'product_id', 'recommendation_type', 'reason', 'suggested_quantity', 'suggested_discount', 'created_at',
+                product_name=F('product__product_name'),
+            )
+        )
+    ]
+
+    products_with_alerts = [
+        {
+            'pk': product.pk,
+            'product_name': product.product_name,
+            'product_quantity': product.product_quantity,
+            'minimum_stock_level': product.minimum_stock_level,
+            'stock_status': product.stock_status,
+            'worst_severity': SEVERITIES[product.worst_rank] if product.worst_rank < len(SEVERITIES) else None,
+        }
+        for product in products.filter(IN_ALERT_STATE).annotate(
+            worst_rank=Min(severity_rank('stock_alerts__severity'), filter=Q(stock_alerts__is_resolved=False)),
+        ).filter(worst_rank__isnull=False).only(
+            'product_name', 'product_quantity', 'minimum_stock_level',
+        ).order_by('pk')
+    ]
+
+    return {
+        **totals,
+        'total_value': round(totals['total_value'], 2),
+        'total_profit': round(totals['total_profit'], 2),
+        'top_selling_products': top_selling_products,
+        'recent_alerts': recent_alerts,
+        'critical_alerts_list': critical_alerts_list,
+        'critical_alerts_count': len(critical_alerts_list),
+        'stock_recommendations': stock_recommendations,
+        'products_with_alerts': products_with_alerts,
+        'snapshot_computed_at': timezone.now(),
+    }
+
+
+def refresh_snapshot(organisation_id=None):
+    """Rebuild and store the snapshot of one organisation (None: all products)."""
+    products = ProductsAndStock.objects.all()
+    if organisation_id is not None:
+        products = products.filter(organisation_id=organisation_id)
+    # Served to every browser until it expires, including one that just wrote: read the primary
+    with replica_reads(False):
+        snapshot = build_snapshot(products)
+    cache.set(dashboard_snapshot_cache_key(organisation_id), snapshot, settings.DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS)
+    return snapshot
+
+
+def dashboard_snapshot(organisation_id=None):
+    """Cached dashboard snapshot of one organisation, or of all products when organisation_id is None."""
+    snapshot = cache.get(dashboard_snapshot_cache_key(organisation_id))
+    if snapshot is None:
+        snapshot = refresh_snapshot(organisation_id)
+    return snapshot
@@ -192,3 +192,29 @@ class AdminProductAndStockModelForm(forms.ModelForm):
                 )
         
         return cleaned_data
+
+
+class ProductImportForm(forms.Form):
+    """CSV/XLSX upload for ProductsAndStock.importer; admins also choose the organisation."""
+    file = forms.FileField(
+        label='CSV or XLSX file',
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv,.xlsx'}),
+    )
+    organisation = forms.ModelChoiceField(queryset=UserProfile.objects.none())
+
+    def __init__(self, *args, **kwargs):
+        request = kwargs.pop('request')
+        super().__init__(*args, **kwargs)
+        if request.user.is_superuser:
+            self.fields['organisation'].queryset = UserProfile.objects.filter(
+                user__is_organisor=True,
+                user__is_superuser=False
+            ).select_related('user').order_by('user__username')
+        else:
+            del self.fields['organisation']
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if not upload.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('Upload a .csv or .xlsx file.')
+        return upload
@@ -0,0 +1,354 @@
+"""
+Bulk product import and export (CSV, or XLSX for import).
+
+Imports upsert on (product_name, organisation), the model's unique_together: rows are
+validated in Python chunk_size at a time, the chunk's existing products are read with one
+query and written with a single bulk_create(update_conflicts=True). Columns missing from
+the file, and blank cells in optional columns, are left unchanged on existing products. Category and SubCategory are resolved by
+name from the cached category_name_maps(). Stock and price changes are recorded with one
+bulk_create each of StockMovement and PriceHistory per chunk; the per-save signals (stock
+alerts, recommendations) are not run. Rejected rows go to a CSV report in default storage.
+
+Files larger than PRODUCT_IMPORT_SYNC_MAX_BYTES are stored as a ProductImportJob and
+imported by the process_product_imports command instead of during the request.
+"""
+import csv
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from leads.importer import ImportFileError, ImportReport, read_rows
+from .models import (
+    PriceHistory, ProductImportJob, ProductsAndStock, StockMovement, category_name_maps, evict_product_reports,
+)
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+PRODUCT_COLUMNS = [
+    'product_name', 'product_description', 'product_price', 'cost_price', 'product_quantity',
+    'minimum_stock_level', 'category', 'subcategory', 'discount_percentage', 'discount_amount',
+]
+REQUIRED_COLUMNS = ['product_name', 'product_price', 'product_quantity', 'category', 'subcategory']
+OPTIONAL_COLUMNS = [column for column in PRODUCT_COLUMNS if column not in REQUIRED_COLUMNS]
+FLOAT_COLUMNS = ['product_price', 'cost_price', 'discount_percentage', 'discount_amount']
+INTEGER_COLUMNS = ['product_quantity', 'minimum_stock_level']
+REPORT_PREFIX = 'product_imports/reports'
+# A job left running this long (its worker died) is claimed again
+JOB_STALE_SECONDS = 60 * 60
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    """Yield the products of queryset as CSV lines in the import's column order."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(PRODUCT_COLUMNS)
+    rows = queryset.order_by('pk').values_list(
+        'product_name', 'product_description', 'product_price', 'cost_price', 'product_quantity',
+        'minimum_stock_level', 'category__name', 'subcategory__name', 'discount_percentage', 'discount_amount',
+    )
+    for row in rows.iterator(chunk_size=2000):
+        yield writer.writerow(row)
+
+
+class ProductImporter:
+    """Upserts rows into one organisation's products; run() returns the importer with its counters filled in."""
+
+    def __init__(self, organisation, user, chunk_size=IMPORT_CHUNK_SIZE):
+        self.organisation = organisation
+        self.user = user
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.updated = 0
+        self.report = ImportReport(PRODUCT_COLUMNS, REPORT_PREFIX)
+        self._seen_names = set()
+        self._update_fields = None
+        self._name_max_length = ProductsAndStock._meta.get_field('product_name').max_length
+        self._categories, self._subcategories = category_name_maps()
+
+    @property
+    def rejected(self):
+        return self.report.rejected
+
+    @property
+    def sample_errors(self):
+        return self.report.sample_errors
+
+    @property
+    def report_name(self):
+        return self.report.name
+
+    def run(self, rows):
+        chunk = []
+        try:
+            for number, row in enumerate(rows, start=2):
+                if self._update_fields is None:
+                    self._update_fields = self._fields_for(row)
+                chunk.append((number, row))
+                if len(chunk) >= self.chunk_size:
+                    self._import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self._import_chunk(chunk)
+        except UnicodeDecodeError:
+            raise ImportFileError("CSV files must be UTF-8 encoded.")
+        finally:
+            self._finish()
+        return self
+
+    def _fields_for(self, row):
+        """Model fields an upsert overwrites: the ones whose column is in the file."""
+        fields = []
+        for column in PRODUCT_COLUMNS:
+            if column == 'product_name' or column not in row:
+                continue
+            fields.append(column)
+        return fields
+
+    def _clean(self, row):
+        """Return (product, errors) for one row."""
+        errors = []
+        for column in REQUIRED_COLUMNS:
+            if not row.get(column):
+                errors.append(f"{column} is required.")
+        name = row.get('product_name', '')
+        if len(name) > self._name_max_length:
+            errors.append(f"product_name is longer than {self._name_max_length} characters.")
+        if name and name in self._seen_names:
+            errors.append("Product appears more than once in the file.")
+
+        values = {}
+        for column in FLOAT_COLUMNS:
+            if row.get(column):
+                try:
+                    values[column] = float(row[column])
+                    if values[column] < 0:
+                        raise ValueError
+                except ValueError:
+                    errors.append(f"{column} must be a positive number.")
+        for column in INTEGER_COLUMNS:
+            if row.get(column):
+                try:
+                    values[column] = int(row[column])
+                    if values[column] < 0:
+                        raise ValueError
+                except ValueError:
+                    errors.append(f"{column} must be a whole number.")
+        if values.get('discount_percentage', 0) > 100:
+            errors.append("discount_percentage must be between 0 and 100.")
+
+        category_id = subcategory_id = None
+        if row.get('category'):
+            category_id = self._categories.get(row['category'].lower())
+            if category_id is None:
+                errors.append(f"Unknown category: {row['category']}.")
+        if category_id is not None and row.get('subcategory'):
+            subcategory_id = self._subcategories.get((category_id, row['subcategory'].lower()))
+            if subcategory_id is None:
+                errors.append(f"Unknown subcategory for {row['category']}: {row['subcategory']}.")
+
+        if errors:
+            return None, errors
+        self._seen_names.add(name)
+        product = ProductsAndStock(
+            product_name=name,
+            product_description=row.get('product_description', ''),
+            product_price=values.get('product_price', 0.0),
+            cost_price=values.get('cost_price', 0.0),
+            product_quantity=values.get('product_quantity', 0),
+            minimum_stock_level=values.get('minimum_stock_level', 0),
+            category_id=category_id,
+            subcategory_id=subcategory_id,
+            discount_percentage=values.get('discount_percentage', 0.0),
+            discount_amount=values.get('discount_amount', 0.0),
+            organisation=self.organisation,
+        )
+        return product, []
+
+    def _import_chunk(self, chunk):
+        accepted = []
+        for number, row in chunk:
+            product, errors = self._clean(row)
+            if errors:
+                self.report.add(number, row, errors)
+            else:
+                accepted.append((number, row, product))
+        if not accepted:
+            return
+
+        names = [product.product_name for _, _, product in accepted]
+        optional = [column for column in OPTIONAL_COLUMNS if column in self._update_fields]
+        try:
+            with transaction.atomic():
+                existing = {
+                    values['product_name']: values
+                    for values in ProductsAndStock.objects.select_for_update().filter(
+                        organisation=self.organisation, product_name__in=names,
+                    ).values('product_name', 'product_quantity', 'product_price', *optional)
+                }
+                for _, row, product in accepted:
+                    if product.product_name in existing:
+                        # A blank optional cell keeps the product's value instead of clearing it
+                        for column in optional:
+                            if not row.get(column):
+                                setattr(product, column, existing[product.product_name][column])
+                products = [product for _, _, product in accepted]
+                ProductsAndStock.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['product_name', 'organisation'],
+                    update_fields=self._update_fields,
+                )
+                if any(product.pk is None for product in products):
+                    # Backends that cannot return ids from an upsert
+                    ids = dict(ProductsAndStock.objects.filter(
+                        organisation=self.organisation, product_name__in=names,
+                    ).values_list('product_name', 'pk'))
+                    for product in products:
+                        product.pk = ids[product.product_name]
+                self._record_changes(products, existing)
+                ProductsAndStock.objects.filter(pk__in=[product.pk for product in products]).refresh_effective_prices()
+        except IntegrityError:
+            logger.warning("Product import chunk failed; rejecting %d rows", len(accepted), exc_info=True)
+            for number, row, _ in accepted:
+                self.report.add(number, row, ["Could not be saved; import this row again."])
+            return
+        self.updated += len(existing)
+        self.created += len(accepted) - len(existing)
+
+    def _record_changes(self, products, existing):
+        movements = []
+        price_changes = []
+        for product in products:
+            if product.product_name not in existing:
+                movements.append(StockMovement(
+                    product_id=product.pk,
+                    movement_type='IN',
+                    quantity_before=0,
+                    quantity_after=product.product_quantity,
+                    quantity_change=product.product_quantity,
+                    reason='Initial stock (import)',
+                    created_by=self.user,
+                ))
+                continue
+            old_quantity = existing[product.product_name]['product_quantity']
+            old_price = existing[product.product_name]['product_price']
+            if 'product_quantity' in self._update_fields and product.product_quantity != old_quantity:
+                change = product.product_quantity - old_quantity
+                movements.append(StockMovement(
+                    product_id=product.pk,
+                    movement_type='IN' if change > 0 else 'OUT',
+                    quantity_before=old_quantity,
+                    quantity_after=product.product_quantity,
+                    quantity_change=change,
+                    reason='Stock import',
+                    created_by=self.user,
+                ))
+            if 'product_price' in self._update_fields and product.product_price != old_price:
+                change = product.product_price - old_price
+                price_changes.append(PriceHistory(
+                    product_id=product.pk,
+                    old_price=old_price,
+                    new_price=product.product_price,
+                    price_change=change,
+                    change_type='INCREASE' if change > 0 else 'DECREASE',
+                    change_reason=f'Price imported: {old_price:.2f} to {product.product_price:.2f}',
+                    updated_by=self.user,
+                ))
+        StockMovement.objects.bulk_create(movements)
+        PriceHistory.objects.bulk_create(price_changes)
+
+    def _finish(self):
+        from activity_log.models import ACTION_PRODUCTS_IMPORTED, log_activity
+
+        self.report.save()
+        if not (self.created or self.updated):
+            return
+        # bulk_create skips the post_save receivers that normally do this
+        evict_product_reports(self.organisation.pk)
+        log_activity(
+            self.user,
+            ACTION_PRODUCTS_IMPORTED,
+            object_type='product',
+            object_repr=f"Imported {self.created + self.updated} product(s)",
+            details={'created': self.created, 'updated': self.updated, 'rejected': self.rejected},
+            organisation=self.organisation,
+        )
+
+
+def import_products(file, name, organisation, user, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import the uploaded file into organisation; raises ImportFileError for unreadable files."""
+    return ProductImporter(organisation, user, chunk_size).run(read_rows(file, name, REQUIRED_COLUMNS))
+
+
+def queue_import(upload, organisation, user):
+    """Store an upload as a pending ProductImportJob for process_product_imports."""
+    return ProductImportJob.objects.create(organisation=organisation, created_by=user, file=upload)
+
+
+def claim_job(now=None):
+    """Lease the oldest pending (or abandoned running) job to this worker, or return None."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        job = (
+            ProductImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[ProductImportJob.STATUS_PENDING, ProductImportJob.STATUS_RUNNING])
+            .exclude(status=ProductImportJob.STATUS_RUNNING, started_at__gt=now - timedelta(seconds=JOB_STALE_SECONDS))
+            .order_by('created_at', 'pk')
+            .first()
+        )
+        if job is not None:
+            job.status = ProductImportJob.STATUS_RUNNING
+            job.started_at = now
+            job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def run_job(job):
+    """Import a claimed job's file, record the outcome and notify the user who uploaded it."""
+    from tasks.notifier import Event, notify
+
+    try:
+        with job.file.open('rb') as file:
+            result = import_products(file, job.file.name, job.organisation, job.created_by)
+    except Exception as exc:
+        if not isinstance(exc, ImportFileError):
+            logger.exception("Product import job %s failed", job.pk)
+        job.status = ProductImportJob.STATUS_FAILED
+        job.error = str(exc) if isinstance(exc, ImportFileError) else "The import failed unexpectedly."
+    else:
+        job.status = ProductImportJob.STATUS_DONE
+        job.created_count = result.created
+        job.updated_count = result.updated
+        job.rejected_count = result.rejected
+        job.report_name = result.report_name or ''
+    job.finished_at = timezone.now()
+    job.file.delete(save=False)
+    job.save()
+
+    if job.created_by_id is None:
+        return job
+    if job.status == ProductImportJob.STATUS_DONE:
+        message = f"{job.created_count} product(s) created, {job.updated_count} updated, {job.rejected_count} row(s) rejected."
+    else:
+        message = job.error
+    if job.report_name:
+        action_url = f"{reverse('ProductsAndStock:product-import-report')}?job={job.pk}"
+        action_label = "Download Report"
+    else:
+        action_url = reverse('ProductsAndStock:ProductAndStock-list')
+        action_label = "View Products"
+    notify([(job.created_by_id, Event(
+        title="Product import finished" if job.status == ProductImportJob.STATUS_DONE else "Product import failed",
+        message=message,
+        action_url=action_url,
+        action_label=action_label,
+    ))])
+    return job
@@ -0,0 +1,63 @@
+"""
+Run product imports queued from the web (files over PRODUCT_IMPORT_SYNC_MAX_BYTES).
+Run every minute via cron: python manage.py process_product_imports
+or as a background worker: python manage.py process_product_imports --loop
+Each job is claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can run;
+the uploader gets a notification with the counts and a link to the error report.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from ProductsAndStock.importer import claim_job, run_job
+from ProductsAndStock.models import ProductImportJob
+
+
+class Command(BaseCommand):
+    help = 'Import queued product CSV/XLSX files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new jobs',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls with --loop (default: 5)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print how many jobs are pending',
+        )
+
+    def handle(self, *args, **options):
+        if options['interval'] <= 0:
+            raise CommandError('--interval must be positive')
+
+        if options['dry_run']:
+            pending = ProductImportJob.objects.filter(status=ProductImportJob.STATUS_PENDING).count()
+            self.stdout.write(f'{pending} product imports pending')
+            return
+
+        while True:
+            processed = 0
+            job = claim_job()
+            while job is not None:
+                run_job(job)
+                processed += 1
+                self.stdout.write(
+                    f'Job {job.pk}: {job.get_status_display()} ({job.created_count} created, '
+                    f'{job.updated_count} updated, {job.rejected_count} rejected)'
+                )
+                job = claim_job()
+            if processed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Processed {processed} product imports'))
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -9,7 +9,7 @@ Usage:
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from leads.models import UserProfile
-from ProductsAndStock.models import ProductsAndStock
+from ProductsAndStock.models import ProductsAndStock, evict_product_reports
 
 User = get_user_model()
 
@@ -75,6 +75,9 @@ class Command(BaseCommand):
             return
 
         products.update(organisation=to_profile)
+        # update() sends no signals: refresh both organisations' reports and product lists
+        evict_product_reports(from_profile.pk)
+        evict_product_reports(to_profile.pk)
         self.stdout.write(
             self.style.SUCCESS(
                 f'{count} product(s) moved from "{from_username}" to {to_email} ({to_user.username}) organisation.'
@@ -0,0 +1,33 @@
+"""
+Rebuild the cached sales dashboard snapshot of every organisation with products, so the
+first visit after a change or expiry does not pay for the queries.
+Run via cron more often than DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS: python manage.py refresh_dashboard_snapshots
+Product, order and alert changes evict a snapshot immediately; this command only warms it.
+"""
+from django.core.management.base import BaseCommand
+
+from ProductsAndStock.dashboard import refresh_snapshot
+from ProductsAndStock.models import ProductsAndStock
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached sales dashboard snapshot of each organisation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print how many organisations would be refreshed',
+        )
+
+    def handle(self, *args, **options):
+        organisation_ids = list(
+            ProductsAndStock.objects.order_by().values_list('organisation_id', flat=True).distinct()
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{len(organisation_ids)} organisations have a dashboard to refresh')
+            return
+        for organisation_id in organisation_ids:
+            refresh_snapshot(organisation_id)
+        refresh_snapshot()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the dashboard snapshot of {len(organisation_ids)} organisations'))
@@ -0,0 +1,33 @@
+"""
+Refresh ProductsAndStock.cached_effective_price for products whose discount window has
+opened or closed since they were last saved.
+Run every few minutes via cron: python manage.py refresh_effective_prices
+Saving a product keeps its cached price current; this command only catches up with time.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+
+from ProductsAndStock.models import ProductsAndStock, effective_price_expression
+
+
+class Command(BaseCommand):
+    help = 'Update cached effective prices after discount windows open or close'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print how many products have a stale cached price',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['dry_run']:
+            stale = ProductsAndStock.objects.alias(current_price=effective_price_expression(now)).exclude(
+                cached_effective_price=F('current_price'),
+            ).count()
+            self.stdout.write(f'{stale} products have a stale effective price')
+            return
+        updated = ProductsAndStock.objects.refresh_effective_prices(now)
+        self.stdout.write(self.style.SUCCESS(f'Updated the effective price of {updated} products'))
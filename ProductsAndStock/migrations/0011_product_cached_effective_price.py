@@ -0,0 +1,43 @@
+# Generated by Django 5.0.7 on 2026-10-19 01:48
+
+from django.db import migrations, models
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+def backfill_cached_effective_price(apps, schema_editor):
+    # The price after the discount active now, as ProductsAndStock.discounted_price computes it
+    ProductsAndStock = apps.get_model('ProductsAndStock', 'ProductsAndStock')
+    now = timezone.now()
+    in_window = (
+        Q(discount_start_date__isnull=True) | Q(discount_end_date__isnull=True)
+        | Q(discount_start_date__lte=now, discount_end_date__gte=now)
+    )
+    discount_active = (Q(discount_percentage__gt=0) | Q(discount_amount__gt=0)) & in_window
+    discounted = F('product_price') - F('product_price') * (F('discount_percentage') / Value(100.0)) - F('discount_amount')
+    ProductsAndStock.objects.update(cached_effective_price=Case(
+        When(discount_active, then=Greatest(discounted, Value(0.0))),
+        default=F('product_price'),
+        output_field=FloatField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ProductsAndStock', '0010_productimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productsandstock',
+            name='cached_effective_price',
+            field=models.FloatField(default=0.0, editable=False, help_text='Price after the active discount as of the last save or refresh_effective_prices run; for sorting by price'),
+        ),
+        migrations.AddIndex(
+            model_name='productsandstock',
+            index=models.Index(fields=['organisation', 'cached_effective_price'], name='product_org_eff_price_idx'),
+        ),
+        migrations.RunPython(backfill_cached_effective_price, migrations.RunPython.noop),
+    ]
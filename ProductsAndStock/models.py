@@ -1,8 +1,12 @@
-from django.db import models
-from django.db.models.signals import post_save, pre_save
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.core.exceptions import ObjectDoesNotExist
 from leads.models import User, UserProfile  # Import User and UserProfile from leads app
+from djcrm.versions import CATALOG, PRODUCTS, bump_version
 
 class Category(models.Model):
 	name = models.CharField(max_length=50, unique=True)
@@ -34,6 +38,126 @@ class SubCategory(models.Model):
 		return f"{self.category.name} - {self.name}"
 
 
+CATEGORY_MAPS_CACHE_KEY = 'product-category-maps'
+CATEGORY_MAPS_CACHE_SECONDS = 3600
+
+
+def category_name_maps():
+	"""
+	Cached lookups for resolving categories by name (names lower-cased):
+	({category name: id}, {(category id, subcategory name): id}).
+	Evicted whenever a Category or SubCategory is saved or deleted.
+	"""
+	maps = cache.get(CATEGORY_MAPS_CACHE_KEY)
+	if maps is None:
+		categories = {name.lower(): pk for pk, name in Category.objects.values_list('pk', 'name')}
+		subcategories = {
+			(category_id, name.lower()): pk
+			for pk, category_id, name in SubCategory.objects.values_list('pk', 'category_id', 'name')
+		}
+		maps = (categories, subcategories)
+		cache.set(CATEGORY_MAPS_CACHE_KEY, maps, CATEGORY_MAPS_CACHE_SECONDS)
+	return maps
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=SubCategory)
+def evict_category_name_maps(sender, **kwargs):
+	cache.delete(CATEGORY_MAPS_CACHE_KEY)
+	# Categories are shared by all organisations: one version for everyone
+	bump_version(CATALOG)
+
+
+def discount_active_q(now):
+	"""SQL version of ProductsAndStock.is_discount_active at the given time."""
+	in_window = (
+		Q(discount_start_date__isnull=True) | Q(discount_end_date__isnull=True)
+		| Q(discount_start_date__lte=now, discount_end_date__gte=now)
+	)
+	return (Q(discount_percentage__gt=0) | Q(discount_amount__gt=0)) & in_window
+
+
+def effective_price_expression(now):
+	"""SQL version of ProductsAndStock.discounted_price at the given time."""
+	discounted = F('product_price') - F('product_price') * (F('discount_percentage') / Value(100.0)) - F('discount_amount')
+	return Case(
+		When(discount_active_q(now), then=Greatest(discounted, Value(0.0))),
+		default=F('product_price'),
+		output_field=FloatField(),
+	)
+
+
+class ProductQuerySet(models.QuerySet):
+	def with_effective_price(self, now=None):
+		"""Annotate discount_active and effective_price, so they can be filtered, sorted and aggregated."""
+		from django.utils import timezone
+
+		now = now or timezone.now()
+		return self.annotate(
+			discount_active=Case(
+				When(discount_active_q(now), then=Value(True)),
+				default=Value(False),
+				output_field=BooleanField(),
+			),
+			effective_price=effective_price_expression(now),
+		)
+
+	def with_sales(self):
+		"""Annotate units_sold and sales_revenue from non-cancelled orders (one correlated subquery each)."""
+		from orders.models import OrderProduct
+
+		sold = OrderProduct.objects.filter(product=OuterRef('pk'), order__is_cancelled=False).order_by().values('product')
+		return self.annotate(
+			units_sold=Coalesce(
+				Subquery(sold.annotate(total=Sum('product_quantity')).values('total'), output_field=IntegerField()),
+				Value(0),
+			),
+			sales_revenue=Coalesce(
+				Subquery(sold.annotate(total=Sum('total_price')).values('total'), output_field=FloatField()),
+				Value(0.0),
+			),
+		)
+
+	def refresh_effective_prices(self, now=None):
+		"""Bring cached_effective_price up to date (e.g. after a discount window opened or closed); returns rows changed."""
+		from django.utils import timezone
+
+		now = now or timezone.now()
+		stale = self.alias(current_price=effective_price_expression(now)).exclude(
+			cached_effective_price=F('current_price'),
+		)
+		# update() sends no signals: bump the product lists of the organisations it touches
+		for organisation_id in set(stale.values_list('organisation_id', flat=True)):
+			bump_version(PRODUCTS, organisation_id)
+		return stale.update(cached_effective_price=effective_price_expression(now))
+
+
+CHART_DATA_CACHE_SECONDS = 600
+
+
+def chart_data_cache_key(organisation_id=None):
+	return f"product-charts:{organisation_id or 'all'}"
+
+
+def dashboard_snapshot_cache_key(organisation_id=None):
+	return f"product-dashboard:{organisation_id or 'all'}"
+
+
+def evict_product_reports(organisation_id):
+	"""
+	Drop the cached chart data and dashboard snapshot of an organisation (and the admin's
+	all-organisations view), and bump its products data version so product list ETags change.
+	Both happen once the transaction commits: evicted earlier, a concurrent request could
+	rebuild the reports from the data as it was before the change.
+	"""
+	keys = [
+		chart_data_cache_key(organisation_id), chart_data_cache_key(),
+		dashboard_snapshot_cache_key(organisation_id), dashboard_snapshot_cache_key(),
+	]
+	transaction.on_commit(lambda: cache.delete_many(keys))
+	bump_version(PRODUCTS, organisation_id)
+
+
 class ProductsAndStock(models.Model):
 	product_name = models.CharField(max_length=20)
 	product_description = models.TextField()
@@ -50,9 +174,18 @@ class ProductsAndStock(models.Model):
 	discount_amount = models.FloatField(default=0.0, help_text="Fixed discount amount")
 	discount_start_date = models.DateTimeField(null=True, blank=True)
 	discount_end_date = models.DateTimeField(null=True, blank=True)
+	cached_effective_price = models.FloatField(
+		default=0.0, editable=False,
+		help_text="Price after the active discount as of the last save or refresh_effective_prices run; for sorting by price",
+	)
+
+	objects = ProductQuerySet.as_manager()
 
 	class Meta:
 		unique_together = ('product_name', 'organisation')
+		indexes = [
+			models.Index(fields=['organisation', 'cached_effective_price'], name='product_org_eff_price_idx'),
+		]
 
 	def __str__(self):
 		return self.product_name
@@ -103,12 +236,19 @@ class ProductsAndStock(models.Model):
 	@property
 	def discounted_price(self):
 		"""Calculate final price after discount"""
+		if 'effective_price' in self.__dict__:
+			# Annotated by ProductQuerySet.with_effective_price()
+			return self.__dict__['effective_price']
+		return self.price_at()
+
+	def price_at(self, now=None):
+		"""Final price after the discount active at now (default: current time)"""
 		from django.utils import timezone
 		
 		# Check if discount is active
 		is_discount_active = True
 		if self.discount_start_date and self.discount_end_date:
-			now = timezone.now()
+			now = now or timezone.now()
 			is_discount_active = self.discount_start_date <= now <= self.discount_end_date
 		
 		if not is_discount_active:
@@ -132,6 +272,9 @@ class ProductsAndStock(models.Model):
 		"""Check if discount is currently active"""
 		from django.utils import timezone
 		
+		if 'discount_active' in self.__dict__:
+			return self.__dict__['discount_active']
+
 		if not (self.discount_percentage > 0 or self.discount_amount > 0):
 			return False
 		
@@ -206,6 +349,9 @@ class ProductsAndStock(models.Model):
 	def total_sales_count(self):
 		"""Get total number of sales (from orders)"""
 		from orders.models import OrderProduct
+		if 'units_sold' in self.__dict__:
+			# Annotated by ProductQuerySet.with_sales()
+			return self.__dict__['units_sold']
 		try:
 			total_sold = OrderProduct.objects.filter(
 				product=self,
@@ -221,6 +367,8 @@ class ProductsAndStock(models.Model):
 	def total_revenue_from_sales(self):
 		"""Get total revenue from actual sales"""
 		from orders.models import OrderProduct
+		if 'sales_revenue' in self.__dict__:
+			return self.__dict__['sales_revenue']
 		try:
 			total_revenue = OrderProduct.objects.filter(
 				product=self,
@@ -278,6 +426,10 @@ def store_previous_data(sender, instance, **kwargs):
 		except ProductsAndStock.DoesNotExist:
 			pass
 
+def set_cached_effective_price(sender, instance, **kwargs):
+	"""Keep cached_effective_price in step with the price and discount being saved"""
+	instance.cached_effective_price = instance.price_at()
+
 def create_stock_movement(sender, instance, created, **kwargs):
 	"""Create stock movement record after save. Skip when order already created one (avoid duplicate)."""
 	if not created:
@@ -428,12 +580,19 @@ def create_stock_recommendations(sender, instance, created, **kwargs):
 			confidence_score=80.0
 		)
 
+def evict_product_reports_for_product(sender, instance, **kwargs):
+	"""Stock, price or category changed: charts and dashboard of the organisation are stale"""
+	evict_product_reports(instance.organisation_id)
+
 # Connect the signals
 pre_save.connect(store_previous_data, sender=ProductsAndStock)
+pre_save.connect(set_cached_effective_price, sender=ProductsAndStock)
 post_save.connect(create_stock_movement, sender=ProductsAndStock)
 post_save.connect(create_price_history, sender=ProductsAndStock)
 post_save.connect(create_stock_alerts, sender=ProductsAndStock)
 post_save.connect(create_stock_recommendations, sender=ProductsAndStock)
+post_save.connect(evict_product_reports_for_product, sender=ProductsAndStock)
+post_delete.connect(evict_product_reports_for_product, sender=ProductsAndStock)
 
 class StockMovement(models.Model):
 	MOVEMENT_TYPES = [
@@ -562,18 +721,21 @@ def notify_organisor_on_stock_alert(sender, instance, created, **kwargs):
 		return
 	try:
 		from django.urls import reverse
-		from tasks.models import Notification
+		from tasks.notifier import Digest, Event, notify
 		product = instance.product
 		organisor_user = product.organisation.user
 		product_url = reverse('ProductsAndStock:ProductAndStock-detail', kwargs={'pk': product.pk})
-		Notification.objects.create(
-			user=organisor_user,
-			task=None,
+		# Alerts the organisor hasn't read yet collapse into one "N new stock alerts" notification
+		notify([(organisor_user, Event(
 			title="A stock alert was created",
 			message=f'Product "{product.product_name}": {instance.get_alert_type_display()} ({instance.get_severity_display()}) - {instance.message}',
 			action_url=product_url,
 			action_label='View Product',
-		)
+			digest=Digest(
+				'stock-alerts', '{count} new stock alerts',
+				reverse('ProductsAndStock:ProductAndStock-list'), 'View Products',
+			),
+		))])
 	except Exception:
 		pass  # Avoid breaking product/stock save if notification fails
 
@@ -605,3 +767,46 @@ class StockRecommendation(models.Model):
 		return f"{self.product.product_name} - {self.get_recommendation_type_display()}"
 
 
+@receiver(post_save, sender=StockAlert)
+@receiver(post_save, sender=StockRecommendation)
+def evict_product_reports_for_alert(sender, instance, **kwargs):
+	"""Alerts and recommendations are listed on the dashboard snapshot (deleting the product evicts it too)"""
+	evict_product_reports(instance.product.organisation_id)
+
+
+class ProductImportJob(models.Model):
+	"""A product import file too large to process during the request; run by process_product_imports."""
+	STATUS_PENDING = 'pending'
+	STATUS_RUNNING = 'running'
+	STATUS_DONE = 'done'
+	STATUS_FAILED = 'failed'
+	STATUS_CHOICES = [
+		(STATUS_PENDING, 'Pending'),
+		(STATUS_RUNNING, 'Running'),
+		(STATUS_DONE, 'Done'),
+		(STATUS_FAILED, 'Failed'),
+	]
+
+	organisation = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='product_import_jobs')
+	created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+	file = models.FileField(upload_to='product_imports/uploads/')
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+	created_count = models.PositiveIntegerField(default=0)
+	updated_count = models.PositiveIntegerField(default=0)
+	rejected_count = models.PositiveIntegerField(default=0)
+	report_name = models.CharField(max_length=255, blank=True, help_text="Storage name of the rejected rows report")
+	error = models.TextField(blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		verbose_name = "Product Import Job"
+		verbose_name_plural = "Product Import Jobs"
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['status', 'created_at'], name='productimportjob_status_idx'),
+		]
+
+	def __str__(self):
+		return f"Product import {self.pk} ({self.get_status_display()})"
@@ -0,0 +1,109 @@
+"""
+Tests for the SQL chart data service behind ProductChartsView.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ProductsAndStock.charts import chart_data
+from ProductsAndStock.models import Category, SubCategory, ProductsAndStock
+from leads.models import UserProfile
+from orders.models import orders, OrderProduct
+
+User = get_user_model()
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+@override_settings(**SIMPLE_STATIC)
+class ChartDataTests(TestCase):
+    """Tests for ProductsAndStock.charts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisor_user = User.objects.create_user(
+            username='chart_data_organisor',
+            email='chart_data_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+        )
+        cls.organisation = UserProfile.objects.get(user=cls.organisor_user)
+        cls.hardware = Category.objects.create(name='Chart Hardware')
+        cls.laptops = SubCategory.objects.create(name='Laptops', category=cls.hardware)
+        cls.services = Category.objects.create(name='Chart Services')
+        cls.support = SubCategory.objects.create(name='Support', category=cls.services)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_product(self, name, quantity, minimum, price=10.0, cost=0.0, category=None):
+        category = category or self.hardware
+        return ProductsAndStock.objects.create(
+            product_name=name, product_description='-', product_price=price, cost_price=cost,
+            product_quantity=quantity, minimum_stock_level=minimum, category=category,
+            subcategory=self.laptops if category == self.hardware else self.support,
+            organisation=self.organisation,
+        )
+
+    def sell(self, product, quantity):
+        order = orders.objects.create(
+            order_day=timezone.now(), order_name='Chart order', order_description='-', organisation=self.organisation,
+        )
+        OrderProduct.objects.create(order=order, product=product, product_quantity=quantity)
+        return order
+
+    def test_series_match_product_properties(self):
+        self.create_product('empty', 0, 5)
+        self.create_product('low', 3, 5, cost=4)
+        self.create_product('fine', 20, 5, category=self.services)
+        self.create_product('over', 80, 5, price=50, cost=20)
+        self.create_product('no minimum', 7, 0)
+        sold = self.create_product('sold', 30, 5, price=20)
+        self.sell(sold, 4)
+
+        data = chart_data(self.organisation.pk)
+        products = list(ProductsAndStock.objects.filter(organisation=self.organisation))
+        statuses = [p.stock_status for p in products]
+        self.assertEqual(
+            data['chart_stock_data'],
+            [statuses.count('Out of Stock'), statuses.count('Low Stock'), statuses.count('In Stock'), statuses.count('Overstock')],
+        )
+        self.assertEqual(data['chart_category_labels'], ['Chart Hardware', 'Chart Services'])
+        self.assertEqual(data['chart_category_counts'], [5, 1])
+        self.assertEqual(data['chart_top_labels'][0], 'over')
+        self.assertEqual(data['total_products'], 6)
+        self.assertAlmostEqual(data['total_value'], round(sum(p.total_value for p in products), 2))
+        self.assertAlmostEqual(data['total_profit'], round(sum(p.total_profit for p in products if p.cost_price > 0), 2))
+        self.assertTrue(data['chart_has_sales'])
+        self.assertEqual((data['chart_sales_labels'][0], data['chart_sales_data'][0]), ('sold', 4))
+        self.assertAlmostEqual(data['chart_sales_revenue_data'][0], 80.0)
+
+    def test_cached_and_evicted_on_changes(self):
+        product = self.create_product('cached', 20, 5)
+        chart_data(self.organisation.pk)
+        with self.assertNumQueries(0):
+            chart_data(self.organisation.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            product.product_quantity = 0
+            product.save()
+        # Evicted on commit, so a concurrent rebuild cannot cache the data from before the change
+        self.assertEqual(chart_data(self.organisation.pk)['chart_stock_data'][0], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(chart_data(self.organisation.pk)['chart_stock_data'][0], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_product('restocked', 20, 5)
+            self.sell(ProductsAndStock.objects.get(product_name='restocked'), 2)
+        self.assertEqual(chart_data(self.organisation.pk)['chart_sales_data'][0], 2)
+
+    def test_view_uses_service(self):
+        self.create_product('viewed', 20, 5)
+        self.client.force_login(self.organisor_user)
+        response = self.client.get(reverse('ProductsAndStock:product-charts'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_products'], 1)
+        self.assertFalse(response.context['chart_has_sales'])
@@ -0,0 +1,171 @@
+"""
+Tests for the cached sales dashboard snapshot behind SalesDashboardView.
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ProductsAndStock.dashboard import dashboard_snapshot
+from ProductsAndStock.models import Category, SubCategory, ProductsAndStock, StockAlert, StockRecommendation
+from leads.models import UserProfile
+from orders.models import orders, OrderProduct
+
+User = get_user_model()
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+@override_settings(**SIMPLE_STATIC)
+class DashboardSnapshotTests(TestCase):
+    """Tests for ProductsAndStock.dashboard."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisor_user = User.objects.create_user(
+            username='dashboard_organisor',
+            email='dashboard_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+        )
+        cls.organisation = UserProfile.objects.get(user=cls.organisor_user)
+        cls.category = Category.objects.create(name='Dashboard')
+        cls.subcategory = SubCategory.objects.create(name='Stock', category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_product(self, name, quantity, minimum, price=10.0, cost=0.0):
+        return ProductsAndStock.objects.create(
+            product_name=name, product_description='-', product_price=price, cost_price=cost,
+            product_quantity=quantity, minimum_stock_level=minimum,
+            category=self.category, subcategory=self.subcategory, organisation=self.organisation,
+        )
+
+    def sell(self, product, quantity):
+        order = orders.objects.create(
+            order_day=timezone.now(), order_name='Dashboard order', order_description='-', organisation=self.organisation,
+        )
+        OrderProduct.objects.create(order=order, product=product, product_quantity=quantity)
+
+    def create_catalogue(self, count, start=0):
+        for n in range(start, start + count):
+            self.create_product(f'empty {n}', 0, 10)
+            self.create_product(f'low {n}', 3, 10, cost=2)
+            self.create_product(f'fine {n}', 50, 10)
+            self.sell(self.create_product(f'over {n}', 500, 10, price=5, cost=1), 2)
+
+    def test_snapshot_contents(self):
+        self.create_catalogue(1)
+        snapshot = dashboard_snapshot(self.organisation.pk)
+        products = list(ProductsAndStock.objects.filter(organisation=self.organisation))
+
+        self.assertEqual(snapshot['total_products'], 4)
+        self.assertAlmostEqual(snapshot['total_value'], round(sum(p.total_value for p in products), 2))
+        self.assertAlmostEqual(snapshot['total_profit'], round(sum(p.total_profit for p in products if p.cost_price > 0), 2))
+        self.assertEqual(
+            [snapshot[key] for key in ('out_of_stock_products', 'low_stock_products', 'in_stock_products', 'overstock_products')],
+            [1, 1, 1, 1],
+        )
+        self.assertEqual(
+            [(p['product_name'], p['total_sales_count'], p['category_name']) for p in snapshot['top_selling_products']],
+            [('over 0', 2, 'Dashboard')],
+        )
+
+        # low 0 is at or below half its minimum level, so it is still critical too
+        self.assertEqual([a['product_name'] for a in snapshot['critical_alerts_list']], ['low 0', 'empty 0'])
+        self.assertEqual(snapshot['critical_alerts_count'], 2)
+        self.assertEqual(snapshot['recent_alerts'][0]['severity_display'], 'Critical')
+        by_name = {p.product_name: p for p in products}
+        self.assertEqual(
+            {p['product_name']: p['worst_severity'] for p in snapshot['products_with_alerts']},
+            {
+                p.product_name: p.worst_active_alert_severity
+                for p in products if p.worst_active_alert_severity and p.stock_status != 'In Stock'
+            },
+        )
+        recommendations = {r['product_name']: r['recommendation_type'] for r in snapshot['stock_recommendations']}
+        self.assertEqual(len(recommendations), len(snapshot['stock_recommendations']))
+        self.assertEqual(recommendations.get('low 0'), 'RESTOCK')
+        self.assertNotIn('fine 0', recommendations)
+        self.assertGreater(by_name['over 0'].stock_recommendations.count(), 0)
+        self.assertIn('over 0', recommendations)
+
+    def test_fixed_problems_drop_out(self):
+        product = self.create_product('restocked', 0, 10)
+        self.assertEqual(dashboard_snapshot(self.organisation.pk)['critical_alerts_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.product_quantity = 40
+            product.save()
+        snapshot = dashboard_snapshot(self.organisation.pk)
+        self.assertEqual(snapshot['critical_alerts_count'], 0)
+        self.assertEqual(snapshot['products_with_alerts'], [])
+
+    def test_cached_and_evicted_on_events(self):
+        product = self.create_product('watched', 50, 10)
+        dashboard_snapshot(self.organisation.pk)
+        with self.assertNumQueries(0):
+            dashboard_snapshot(self.organisation.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sell(product, 3)
+        self.assertEqual(dashboard_snapshot(self.organisation.pk)['top_selling_products'][0]['total_sales_count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alert = StockAlert.objects.create(product=product, alert_type='NO_SALES', severity='LOW', message='Quiet')
+        self.assertEqual(dashboard_snapshot(self.organisation.pk)['recent_alerts'][0]['message'], 'Quiet')
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.is_resolved = True
+            alert.save()
+        self.assertEqual(dashboard_snapshot(self.organisation.pk)['recent_alerts'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StockRecommendation.objects.create(product=product, recommendation_type='DISCONTINUE', reason='-')
+        self.assertIsNone(cache.get(f'product-dashboard:{self.organisation.pk}'))
+
+    def test_view_renders_from_snapshot(self):
+        self.create_catalogue(2)
+        self.client.force_login(self.organisor_user)
+        response = self.client.get(reverse('ProductsAndStock:sales-dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_products'], 8)
+        self.assertContains(response, 'empty 1')
+
+    def test_constant_queries_as_catalogue_and_alerts_grow(self):
+        url = reverse('ProductsAndStock:sales-dashboard')
+        self.client.force_login(self.organisor_user)
+        self.create_catalogue(1)
+        self.client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as cold_small:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as warm_small:
+            self.client.get(url)
+
+        self.create_catalogue(15, start=1)
+        cache.clear()
+        with CaptureQueriesContext(connection) as cold_large:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as warm_large:
+            self.client.get(url)
+
+        self.assertEqual(len(cold_small), len(cold_large))
+        self.assertEqual(len(warm_small), len(warm_large))
+        self.assertLess(len(warm_large), len(cold_large))
+
+    def test_refresh_command(self):
+        self.create_product('warmed', 50, 10)
+        out = StringIO()
+        call_command('refresh_dashboard_snapshots', '--dry-run', stdout=out)
+        self.assertIn('1 organisations', out.getvalue())
+        self.assertIsNone(cache.get(f'product-dashboard:{self.organisation.pk}'))
+        call_command('refresh_dashboard_snapshots', stdout=out)
+        self.assertIn('Refreshed the dashboard snapshot of 1 organisations', out.getvalue())
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard_snapshot(self.organisation.pk)['total_products'], 1)
@@ -0,0 +1,94 @@
+"""
+Tests for the SQL effective price / discount state annotations and the
+cached effective price column.
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ProductsAndStock.models import Category, SubCategory, ProductsAndStock
+from leads.models import UserProfile
+
+User = get_user_model()
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+@override_settings(**SIMPLE_STATIC)
+class EffectivePriceTests(TestCase):
+    """Tests for ProductQuerySet.with_effective_price and cached_effective_price."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisor_user = User.objects.create_user(
+            username='effective_price_organisor',
+            email='effective_price_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+        )
+        cls.organisation = UserProfile.objects.get(user=cls.organisor_user)
+        cls.category = Category.objects.create(name='Effective')
+        cls.subcategory = SubCategory.objects.create(name='Price', category=cls.category)
+
+    def create_product(self, name, price=100.0, **discount):
+        return ProductsAndStock.objects.create(
+            product_name=name, product_description='-', product_price=price, product_quantity=10,
+            category=self.category, subcategory=self.subcategory, organisation=self.organisation, **discount,
+        )
+
+    def test_annotation_matches_python(self):
+        now = timezone.now()
+        day = timedelta(days=1)
+        self.create_product('none')
+        self.create_product('percent', discount_percentage=15)
+        self.create_product('amount', discount_amount=30)
+        self.create_product('both', discount_percentage=10, discount_amount=5)
+        self.create_product('clamped', price=10, discount_amount=50)
+        self.create_product('current', discount_percentage=20, discount_start_date=now - day, discount_end_date=now + day)
+        self.create_product('expired', discount_percentage=20, discount_start_date=now - 2 * day, discount_end_date=now - day)
+        self.create_product('upcoming', discount_percentage=20, discount_start_date=now + day, discount_end_date=now + 2 * day)
+        self.create_product('open ended', discount_percentage=20, discount_start_date=now + day)
+
+        for product in ProductsAndStock.objects.with_effective_price(now):
+            plain = ProductsAndStock.objects.get(pk=product.pk)
+            self.assertAlmostEqual(product.effective_price, plain.price_at(now), msg=product.product_name)
+            self.assertEqual(product.discount_active, plain.is_discount_active, msg=product.product_name)
+            self.assertAlmostEqual(product.cached_effective_price, plain.price_at(now), msg=product.product_name)
+
+    def test_filter_and_aggregate_in_sql(self):
+        self.create_product('cheap', price=50)
+        self.create_product('sale', price=200, discount_percentage=80)
+        self.create_product('dear', price=150)
+        products = ProductsAndStock.objects.with_effective_price()
+        self.assertEqual(
+            list(products.filter(effective_price__lt=100).order_by('effective_price').values_list('product_name', flat=True)),
+            ['sale', 'cheap'],
+        )
+        self.assertEqual(products.filter(discount_active=True).count(), 1)
+
+    def test_refresh_after_discount_window_closes(self):
+        now = timezone.now()
+        product = self.create_product('window', discount_percentage=50, discount_start_date=now - timedelta(days=2), discount_end_date=now + timedelta(minutes=1))
+        self.assertEqual(product.cached_effective_price, 50.0)
+
+        out = StringIO()
+        call_command('refresh_effective_prices', '--dry-run', stdout=out)
+        self.assertIn('0 products', out.getvalue())
+        ProductsAndStock.objects.filter(pk=product.pk).update(discount_end_date=now - timedelta(days=1))
+        call_command('refresh_effective_prices', stdout=out)
+        self.assertIn('Updated the effective price of 1 products', out.getvalue())
+        product.refresh_from_db()
+        self.assertEqual(product.cached_effective_price, 100.0)
+
+    def test_list_sorted_by_price(self):
+        self.create_product('b', price=30)
+        self.create_product('a', price=80, discount_percentage=75)
+        self.create_product('c', price=10)
+        self.client.force_login(self.organisor_user)
+        response = self.client.get(reverse('ProductsAndStock:ProductAndStock-list'), {'sort': 'price'})
+        self.assertEqual([p.product_name for p in response.context['object_list']], ['c', 'a', 'b'])
@@ -0,0 +1,201 @@
+"""
+Tests for the bulk product CSV import/export: upserts, stock and price
+history diffs, the cached category maps, background import jobs and the
+import/export views.
+"""
+import csv
+import io
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from activity_log.models import ACTION_PRODUCTS_IMPORTED, ActivityLog
+from ProductsAndStock.importer import import_products
+from ProductsAndStock.models import (
+    Category, SubCategory, ProductsAndStock, StockMovement, PriceHistory, ProductImportJob,
+    category_name_maps,
+)
+from leads.models import UserProfile
+from tasks.models import Notification
+
+User = get_user_model()
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+HEADER = ['product_name', 'product_price', 'product_quantity', 'category', 'subcategory']
+
+
+def make_csv(rows, header=HEADER):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return out.getvalue().encode('utf-8')
+
+
+@override_settings(**SIMPLE_STATIC)
+class ProductImportTests(TestCase):
+    """Tests for ProductsAndStock.importer and its views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisor_user = User.objects.create_user(
+            username='product_import_organisor',
+            email='product_import_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+        )
+        cls.organisation = UserProfile.objects.get(user=cls.organisor_user)
+        cls.category = Category.objects.create(name='Hardware')
+        cls.subcategory = SubCategory.objects.create(name='Laptops', category=cls.category)
+        cls.other_category = Category.objects.create(name='Services')
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def run_import(self, rows, header=HEADER):
+        return import_products(io.BytesIO(make_csv(rows, header)), 'products.csv', self.organisation, self.organisor_user)
+
+    def create_product(self, name='Laptop', price=1000.0, quantity=10):
+        return ProductsAndStock.objects.create(
+            product_name=name, product_description='-', product_price=price, product_quantity=quantity,
+            category=self.category, subcategory=self.subcategory, organisation=self.organisation,
+        )
+
+    def test_creates_products_with_initial_stock(self):
+        result = self.run_import([['Laptop', '1000', '5', 'hardware', 'LAPTOPS'], ['Tablet', '400', '7', 'Hardware', 'Laptops']])
+        self.assertEqual((result.created, result.updated, result.rejected), (2, 0, 0))
+        product = ProductsAndStock.objects.get(product_name='Laptop', organisation=self.organisation)
+        self.assertEqual(product.subcategory, self.subcategory)
+        movement = StockMovement.objects.get(product=product)
+        self.assertEqual((movement.movement_type, movement.quantity_change), ('IN', 5))
+        self.assertEqual(ActivityLog.objects.get(action=ACTION_PRODUCTS_IMPORTED).details['created'], 2)
+
+    def test_upsert_updates_existing_and_records_diffs(self):
+        product = self.create_product()
+        StockMovement.objects.all().delete()
+        result = self.run_import([['Laptop', '1200', '4', 'Hardware', 'Laptops']])
+        self.assertEqual((result.created, result.updated), (0, 1))
+        product.refresh_from_db()
+        self.assertEqual((product.product_price, product.product_quantity), (1200.0, 4))
+        self.assertEqual(product.product_description, '-')  # not in the file, so unchanged
+        movement = StockMovement.objects.get(product=product)
+        self.assertEqual((movement.movement_type, movement.quantity_change), ('OUT', -6))
+        history = PriceHistory.objects.get(product=product)
+        self.assertEqual((history.old_price, history.new_price, history.change_type), (1000.0, 1200.0, 'INCREASE'))
+
+    def test_blank_optional_cells_keep_existing_values(self):
+        product = self.create_product()
+        ProductsAndStock.objects.filter(pk=product.pk).update(cost_price=700.0, minimum_stock_level=3, discount_amount=50.0)
+        header = HEADER + ['product_description', 'cost_price', 'minimum_stock_level', 'discount_amount']
+        result = self.run_import([
+            ['Laptop', '1100', '8', 'Hardware', 'Laptops', '', '', '', ''],
+            ['Tablet', '400', '7', 'Hardware', 'Laptops', '', '', '', ''],
+        ], header)
+        self.assertEqual((result.created, result.updated, result.rejected), (1, 1, 0))
+        product.refresh_from_db()
+        self.assertEqual((product.product_price, product.product_quantity), (1100.0, 8))
+        self.assertEqual(
+            (product.product_description, product.cost_price, product.minimum_stock_level, product.discount_amount),
+            ('-', 700.0, 3, 50.0),
+        )
+        self.assertEqual(product.cached_effective_price, 1050.0)
+        tablet = ProductsAndStock.objects.get(product_name='Tablet', organisation=self.organisation)
+        self.assertEqual((tablet.cost_price, tablet.minimum_stock_level, tablet.discount_amount), (0.0, 0, 0.0))
+
+        self.run_import([['Laptop', '1100', '8', 'Hardware', 'Laptops', 'New model', '650', '0', '0']], header)
+        product.refresh_from_db()
+        self.assertEqual(
+            (product.product_description, product.cost_price, product.minimum_stock_level, product.discount_amount),
+            ('New model', 650.0, 0, 0.0),
+        )
+
+    def test_unchanged_rows_record_nothing(self):
+        self.create_product()
+        StockMovement.objects.all().delete()
+        self.run_import([['Laptop', '1000', '10', 'Hardware', 'Laptops']])
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertFalse(PriceHistory.objects.exists())
+
+    def test_invalid_rows_are_rejected(self):
+        result = self.run_import([
+            ['Phone', '10', '1', 'Toys', 'Laptops'],
+            ['Phone', '10', '1', 'Services', 'Laptops'],
+            ['Phone', 'cheap', '1', 'Hardware', 'Laptops'],
+            ['A product name that is too long', '10', '1', 'Hardware', 'Laptops'],
+            ['Mouse', '10', '1', 'Hardware', 'Laptops'],
+            ['Mouse', '12', '1', 'Hardware', 'Laptops'],
+        ])
+        self.assertEqual((result.created, result.rejected), (1, 5))
+        self.assertIn('Unknown category: Toys.', result.sample_errors[0][1])
+        self.assertIn('Unknown subcategory', result.sample_errors[1][1][0])
+        self.assertIsNotNone(result.report_name)
+
+    def test_category_maps_are_cached_and_evicted(self):
+        category_name_maps()
+        with self.assertNumQueries(0):
+            categories, _ = category_name_maps()
+        self.assertIn('hardware', categories)
+        Category.objects.create(name='Furniture')
+        self.assertIn('furniture', category_name_maps()[0])
+
+    def test_export_round_trips(self):
+        self.create_product()
+        self.client.force_login(self.organisor_user)
+        response = self.client.get(reverse('ProductsAndStock:product-export'))
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8'))))
+        self.assertEqual(rows[1][0], 'Laptop')
+        self.assertEqual(rows[1][6:8], ['Hardware', 'Laptops'])
+        result = import_products(io.BytesIO(content), 'products.csv', self.organisation, self.organisor_user)
+        self.assertEqual((result.created, result.updated, result.rejected), (0, 1, 0))
+
+    def test_import_view(self):
+        self.client.force_login(self.organisor_user)
+        upload = SimpleUploadedFile('products.csv', make_csv([['Laptop', '1000', '5', 'Hardware', 'Laptops']]))
+        response = self.client.post(reverse('ProductsAndStock:product-import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 1)
+
+    @override_settings(PRODUCT_IMPORT_SYNC_MAX_BYTES=10)
+    def test_large_upload_is_imported_in_background(self):
+        self.client.force_login(self.organisor_user)
+        upload = SimpleUploadedFile(
+            'products.csv', make_csv([['Laptop', '1000', '5', 'Hardware', 'Laptops'], ['Bad', 'x', '1', 'Hardware', 'Laptops']]),
+        )
+        response = self.client.post(reverse('ProductsAndStock:product-import'), {'file': upload})
+        self.assertRedirects(response, reverse('ProductsAndStock:ProductAndStock-list'), fetch_redirect_response=False)
+        self.assertFalse(ProductsAndStock.objects.filter(product_name='Laptop').exists())
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_product_imports', stdout=out)
+        self.assertIn('Processed 1 product imports', out.getvalue())
+        job = ProductImportJob.objects.get()
+        self.assertEqual((job.status, job.created_count, job.rejected_count), (ProductImportJob.STATUS_DONE, 1, 1))
+        self.assertFalse(job.file)
+        notification = Notification.objects.get(user=self.organisor_user, title='Product import finished')
+        response = self.client.get(notification.action_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'x', b''.join(response.streaming_content))
+
+    def test_job_report_is_private(self):
+        job = ProductImportJob.objects.create(
+            organisation=self.organisation, created_by=self.organisor_user, report_name='missing.csv',
+        )
+        other = User.objects.create_user(username='other_importer', email='other_importer@example.com', password='x')
+        self.client.force_login(other)
+        response = self.client.get(reverse('ProductsAndStock:product-import-report'), {'job': job.pk})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,93 @@
+"""
+Tests for the paginated, SQL-aggregated ProductAndStockListView.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ProductsAndStock.models import Category, SubCategory, ProductsAndStock
+from leads.models import UserProfile
+from orders.models import orders, OrderProduct
+
+User = get_user_model()
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+@override_settings(**SIMPLE_STATIC)
+class ProductListViewTests(TestCase):
+    """Tests for pagination, sorting and totals of the product list."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisor_user = User.objects.create_user(
+            username='product_list_organisor',
+            email='product_list_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+        )
+        cls.organisation = UserProfile.objects.get(user=cls.organisor_user)
+        cls.category = Category.objects.create(name='Listing')
+        cls.subcategory = SubCategory.objects.create(name='Items', category=cls.category)
+
+    def create_products(self, count, start=0):
+        products = [
+            ProductsAndStock.objects.create(
+                product_name=f'Item {n:03d}', product_description='-', product_price=10.0 + n,
+                product_quantity=100 - n, minimum_stock_level=50,
+                category=self.category, subcategory=self.subcategory, organisation=self.organisation,
+            )
+            for n in range(start, start + count)
+        ]
+        order = orders.objects.create(
+            order_day=timezone.now(), order_name='List order', order_description='-', organisation=self.organisation,
+        )
+        for n, product in enumerate(products):
+            OrderProduct.objects.create(order=order, product=product, product_quantity=n + 1)
+        return products
+
+    def get_list(self, **params):
+        self.client.force_login(self.organisor_user)
+        return self.client.get(reverse('ProductsAndStock:ProductAndStock-list'), params)
+
+    def test_paginated_with_sql_totals(self):
+        self.create_products(30)
+        response = self.get_list()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['object_list']), 24)
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(response.context['total_products'], 30)
+        products = list(ProductsAndStock.objects.all())
+        self.assertEqual(response.context['total_quantity'], sum(p.product_quantity for p in products))
+        self.assertAlmostEqual(response.context['total_value'], sum(p.total_value for p in products))
+        self.assertEqual(len(self.get_list(page=2).context['object_list']), 6)
+
+    def test_sorting(self):
+        self.create_products(5)
+        names = lambda response: [p.product_name for p in response.context['object_list']]
+        self.assertEqual(names(self.get_list(sort='-name'))[0], 'Item 004')
+        self.assertEqual(names(self.get_list(sort='stock'))[0], 'Item 004')
+        self.assertEqual(names(self.get_list(sort='-sales'))[0], 'Item 004')
+        self.assertEqual(names(self.get_list(sort='-value'))[0], 'Item 004')
+        self.assertEqual(names(self.get_list(sort='bogus'))[0], 'Item 000')
+
+    def test_sales_come_from_annotations(self):
+        self.create_products(3)
+        product = self.get_list(sort='-sales').context['object_list'][0]
+        with self.assertNumQueries(0):
+            self.assertEqual(product.total_sales_count, 3)
+            self.assertAlmostEqual(product.total_revenue_from_sales, 3 * 12.0)
+            self.assertEqual(product.discounted_price, 12.0)
+
+    def test_constant_queries(self):
+        self.create_products(3)
+        self.get_list()
+        with CaptureQueriesContext(connection) as few:
+            self.get_list()
+        self.create_products(40, start=3)
+        with CaptureQueriesContext(connection) as many:
+            self.get_list()
+        self.assertEqual(len(few), len(many))
@@ -4,6 +4,7 @@ Tests for ProductsAndStock signal handlers:
 """
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 
 from ProductsAndStock.models import (
     ProductsAndStock, Category, SubCategory, StockAlert,
@@ -43,35 +44,38 @@ class NotifyOrganisorOnStockAlertTests(TestCase):
     def test_notification_created_on_new_stock_alert(self):
         """Creating a StockAlert should create a Notification for the organisor."""
         initial_count = Notification.objects.filter(user=self.user).count()
-        StockAlert.objects.create(
-            product=self.product,
-            alert_type='LOW_STOCK',
-            severity='HIGH',
-            message='Stock is below minimum level',
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            StockAlert.objects.create(
+                product=self.product,
+                alert_type='LOW_STOCK',
+                severity='HIGH',
+                message='Stock is below minimum level',
+            )
         new_count = Notification.objects.filter(user=self.user).count()
         self.assertEqual(new_count, initial_count + 1)
 
     def test_notification_content_includes_product_name(self):
         """The notification message should reference the product name."""
-        StockAlert.objects.create(
-            product=self.product,
-            alert_type='OUT_OF_STOCK',
-            severity='CRITICAL',
-            message='Out of stock',
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            StockAlert.objects.create(
+                product=self.product,
+                alert_type='OUT_OF_STOCK',
+                severity='CRITICAL',
+                message='Out of stock',
+            )
         notification = Notification.objects.filter(user=self.user).order_by('-created_at').first()
         self.assertIsNotNone(notification)
         self.assertIn('AlertProduct', notification.message)
 
     def test_notification_has_action_url(self):
         """The notification should link to the product detail page."""
-        StockAlert.objects.create(
-            product=self.product,
-            alert_type='LOW_STOCK',
-            severity='MEDIUM',
-            message='Low stock',
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            StockAlert.objects.create(
+                product=self.product,
+                alert_type='LOW_STOCK',
+                severity='MEDIUM',
+                message='Low stock',
+            )
         notification = Notification.objects.filter(user=self.user).order_by('-created_at').first()
         self.assertIsNotNone(notification)
         self.assertIsNotNone(notification.action_url)
@@ -79,16 +83,47 @@ class NotifyOrganisorOnStockAlertTests(TestCase):
 
     def test_no_notification_on_alert_update(self):
         """Updating an existing StockAlert should NOT create a new notification."""
-        alert = StockAlert.objects.create(
-            product=self.product,
-            alert_type='LOW_STOCK',
-            severity='LOW',
-            message='Low',
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            alert = StockAlert.objects.create(
+                product=self.product,
+                alert_type='LOW_STOCK',
+                severity='LOW',
+                message='Low',
+            )
         count_after_create = Notification.objects.filter(user=self.user).count()
 
-        alert.is_resolved = True
-        alert.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.is_resolved = True
+            alert.save()
 
         count_after_update = Notification.objects.filter(user=self.user).count()
         self.assertEqual(count_after_create, count_after_update)
+
+    def test_unread_alerts_collapse_into_one_digest(self):
+        """Further alerts replace the unread alert notification with one counting them all."""
+        for severity in ('LOW', 'HIGH', 'CRITICAL'):
+            with self.captureOnCommitCallbacks(execute=True):
+                StockAlert.objects.create(
+                    product=self.product,
+                    alert_type='LOW_STOCK',
+                    severity=severity,
+                    message='Low',
+                )
+        notification = Notification.objects.get(user=self.user, digest='stock-alerts')
+        self.assertEqual(notification.title, '3 new stock alerts')
+        self.assertEqual(notification.digest_count, 3)
+        self.assertIn('AlertProduct', notification.message)
+        self.assertEqual(notification.action_url, reverse('ProductsAndStock:ProductAndStock-list'))
+
+        notification.is_read = True
+        notification.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            StockAlert.objects.create(
+                product=self.product,
+                alert_type='LOW_STOCK',
+                severity='LOW',
+                message='Low again',
+            )
+        latest = Notification.objects.filter(user=self.user).first()
+        self.assertEqual(latest.title, 'A stock alert was created')
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
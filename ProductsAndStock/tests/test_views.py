@@ -3,7 +3,10 @@ ProductsAndStock Views Test File
 This file tests all views in the ProductsAndStock module.
 """
 
-from django.test import TestCase, Client, override_settings
+import json
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase, Client, AsyncRequestFactory, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -14,6 +17,7 @@ from ProductsAndStock.models import (
     ProductsAndStock, Category, SubCategory, StockMovement, 
     PriceHistory, SalesStatistics, StockAlert, StockRecommendation
 )
+from ProductsAndStock.views import aget_subcategories
 from leads.models import UserProfile
 # from agents.models import Agent  # Agent model not available
 
@@ -685,6 +689,26 @@ class TestGetSubcategoriesView(TestCase):
         self.assertIn('subcategories', data)
         self.assertEqual(len(data['subcategories']), 0)
 
+    async def call_async_view(self, user, params):
+        request = AsyncRequestFactory().get('/ProductsAndStock/get-subcategories/', params)
+
+        async def auser():
+            return user
+        request.auser = auser
+        return await aget_subcategories(request)
+
+    async def test_async_view(self):
+        """ASGI-mode view returns the same responses as get_subcategories"""
+        response = await self.call_async_view(self.user, {'category_id': self.category.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(sub['name'] for sub in json.loads(response.content)['subcategories']),
+            ['Laptops', 'Smartphones'],
+        )
+        self.assertEqual((await self.call_async_view(self.user, {'category_id': 'invalid'})).status_code, 400)
+        self.assertEqual(json.loads((await self.call_async_view(self.user, {})).content), {'subcategories': []})
+        self.assertEqual((await self.call_async_view(AnonymousUser(), {'category_id': self.category.id})).status_code, 302)
+
 
 @override_settings(**SIMPLE_STATIC)
 class TestBulkPriceUpdateView(TestCase):
@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.urls import path
-from .views import ProductAndStockListView, ProductAndStockDetailView, ProductAndStockCreateView, ProductAndStockUpdateView, ProductAndStockDeleteView, get_subcategories, BulkPriceUpdateView, SalesDashboardView, ProductChartsView
+from .views import ProductAndStockListView, ProductAndStockDetailView, ProductAndStockCreateView, ProductAndStockUpdateView, ProductAndStockDeleteView, get_subcategories, aget_subcategories, BulkPriceUpdateView, SalesDashboardView, ProductChartsView, ProductImportView, ProductExportView, product_import_report
 
 app_name = 'ProductsAndStock'  # Define the app name here
 
@@ -12,7 +13,10 @@ urlpatterns = [
     path('<int:pk>/update/', ProductAndStockUpdateView.as_view(), name="ProductAndStock-update"),
     path('<int:pk>/delete/', ProductAndStockDeleteView.as_view(), name="ProductAndStock-delete"),
     path('bulk-price-update/', BulkPriceUpdateView.as_view(), name="bulk-price-update"),
+    path('import/', ProductImportView.as_view(), name="product-import"),
+    path('import/report/', product_import_report, name="product-import-report"),
+    path('export/', ProductExportView.as_view(), name="product-export"),
     path('charts/', ProductChartsView.as_view(), name="product-charts"),
-    path('get-subcategories/', get_subcategories, name="get-subcategories"),
+    path('get-subcategories/', aget_subcategories if settings.ASYNC_VIEWS else get_subcategories, name="get-subcategories"),
 
 ]
\ No newline at end of file
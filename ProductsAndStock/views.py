@@ -2,12 +2,16 @@ import logging
 from django.shortcuts import render, redirect, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.views import generic
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.db import transaction, models
-from django.db.models import F, Case, When, Value, IntegerField
-from .models import ProductsAndStock, Category, SubCategory, PriceHistory, SalesStatistics, StockAlert, StockRecommendation
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from .models import ProductsAndStock, Category, SubCategory, PriceHistory, SalesStatistics, ProductImportJob
 from leads.models import UserProfile
 from activity_log.models import (
     log_activity,
@@ -18,31 +22,44 @@ from activity_log.models import (
     ACTION_PRICE_DECREASED,
     ACTION_PRICE_BULK_UPDATE,
 )
+from django.utils.decorators import method_decorator
+from djcrm.replica import ReplicaReadsMixin
+from djcrm.versions import CATALOG, PRODUCTS, versioned_etag
 from agents.mixins import OrganisorAndLoginRequiredMixin, AgentAndOrganisorLoginRequiredMixin, ProductsAndStockAccessMixin
-from .forms import ProductAndStockModelForm, AdminProductAndStockModelForm
+from .forms import ProductAndStockModelForm, AdminProductAndStockModelForm, ProductImportForm
+from .importer import export_rows, import_products, queue_import
+from .charts import chart_data, compute_chart_data
+from .dashboard import build_snapshot, dashboard_snapshot
+from leads.importer import ImportFileError
 from .bulk_price_form import BulkPriceUpdateForm
 
 logger = logging.getLogger(__name__)
 
 
+@method_decorator(versioned_etag(PRODUCTS, CATALOG), name='get')
 class ProductAndStockListView(ProductsAndStockAccessMixin, generic.ListView):
 	template_name = "ProductsAndStock/ProductAndStock_list.html"
+	paginate_by = 24
+	# ?sort= value -> ordering; "-" prefix sorts descending. Price uses the indexed cached column.
+	SORT_OPTIONS = {
+		'name': ('product_name', 'Name'),
+		'stock': ('product_quantity', 'Stock'),
+		'value': ('stock_value', 'Stock value'),
+		'sales': ('units_sold', 'Units sold'),
+		'price': ('cached_effective_price', 'Price'),
+	}
 
-	def get_queryset(self):
+	def get_filtered_queryset(self):
+		"""The user's products with the request's filters applied, without annotations or ordering."""
 		# Admin can see all products
-		if self.request.user.is_superuser:
+		if self.tenant.is_admin:
 			queryset = ProductsAndStock.objects.all()
 		# Organisors and Agents can see products from their organisation
-		elif self.request.user.is_organisor:
-			organisation = self.request.user.userprofile
-			queryset = ProductsAndStock.objects.filter(organisation=organisation)
-		elif self.request.user.is_agent:
-			try:
-				# Agent sees products from their organisation (via Agent.organisation)
-				agent_organisation = self.request.user.agent.organisation
-				queryset = ProductsAndStock.objects.filter(organisation=agent_organisation)
-			except Exception:
-				queryset = ProductsAndStock.objects.none()
+		elif self.tenant.is_organisor:
+			queryset = ProductsAndStock.objects.filter(organisation=self.request.user.userprofile)
+		elif self.tenant.is_agent and self.tenant.agent:
+			# Agent sees products from their organisation (via Agent.organisation)
+			queryset = ProductsAndStock.objects.filter(organisation_id=self.tenant.agent.organisation_id)
 		else:
 			queryset = ProductsAndStock.objects.none()
 		
@@ -66,17 +83,37 @@ class ProductAndStockListView(ProductsAndStockAccessMixin, generic.ListView):
 			organisation_id = self.request.GET.get('organisation')
 			if organisation_id:
 				queryset = queryset.filter(organisation_id=organisation_id)
-		
 		return queryset
+
+	def get_sort(self):
+		sort = self.request.GET.get('sort') or ''
+		if sort.lstrip('-') in self.SORT_OPTIONS:
+			return sort
+		return ''
+
+	def get_queryset(self):
+		self.filtered_products = self.get_filtered_queryset()
+		queryset = self.filtered_products.select_related(
+			'category', 'subcategory', 'organisation__user',
+		).annotate(
+			stock_value=F('product_price') * F('product_quantity'),
+		).with_sales().with_effective_price()
+		
+		sort = self.get_sort()
+		if sort:
+			field = self.SORT_OPTIONS[sort.lstrip('-')][0]
+			return queryset.order_by(f"-{field}" if sort.startswith('-') else field, 'pk')
+		return queryset.order_by('pk')
 	
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
-		products = self.get_queryset()
 		
-		# Calculate statistics
-		total_products = products.count()
-		total_quantity = sum(product.product_quantity for product in products)
-		total_value = sum(product.product_price * product.product_quantity for product in products)
+		# Calculate statistics in one query over the filtered (not just the current page's) products
+		totals = self.filtered_products.aggregate(
+			total_products=models.Count('pk'),
+			total_quantity=Coalesce(models.Sum('product_quantity'), Value(0)),
+			total_value=Coalesce(models.Sum(F('product_price') * F('product_quantity'), output_field=models.FloatField()), Value(0.0)),
+		)
 		
 		# Get categories for filter
 		categories = Category.objects.all()
@@ -99,11 +136,15 @@ class ProductAndStockListView(ProductsAndStockAccessMixin, generic.ListView):
 				user__is_superuser=False,
 			).select_related('user').order_by('user__username')
 		
+		# Query string without the page number, for pagination links
+		params = self.request.GET.copy()
+		params.pop('page', None)
+		
 		search_query = (self.request.GET.get('search') or self.request.GET.get('name') or '').strip()
 		context.update({
-			'total_products': total_products,
-			'total_quantity': total_quantity,
-			'total_value': total_value,
+			'total_products': totals['total_products'],
+			'total_quantity': totals['total_quantity'],
+			'total_value': totals['total_value'],
 			'categories': categories,
 			'subcategories': subcategories,
 			'selected_category_id': selected_category_id,
@@ -111,6 +152,11 @@ class ProductAndStockListView(ProductsAndStockAccessMixin, generic.ListView):
 			'organisations': organisations,
 			'selected_organisation_id': selected_organisation_id,
 			'search_query': search_query,
+			'sort': self.get_sort(),
+			'sort_options': [
+				(key, label) for key, (_, label) in self.SORT_OPTIONS.items()
+			],
+			'page_params': params.urlencode(),
 		})
 		
 		return context
@@ -121,30 +167,18 @@ class ProductAndStockDetailView(ProductsAndStockAccessMixin, generic.DetailView)
     
     def get_queryset(self):
         # Admin can see all products
-        if self.request.user.is_superuser:
+        if self.tenant.is_admin:
             return ProductsAndStock.objects.all()
         # Organisors and Agents can see products from their organisation
-        elif self.request.user.is_organisor:
-            organisation = self.request.user.userprofile
-            return ProductsAndStock.objects.filter(organisation=organisation)
-        elif self.request.user.is_agent:
-            try:
-                # Agent sees products from their organisation
-                agent_organisation = self.request.user.agent.organisation
-                return ProductsAndStock.objects.filter(organisation=agent_organisation)
-            except Exception:
-                logger.exception(
-                    "ProductAndStockDetailView agent access error for user=%s is_agent=%s",
-                    self.request.user.username,
-                    self.request.user.is_agent,
-                )
-                return ProductsAndStock.objects.none()
-        else:
-            return ProductsAndStock.objects.none()
+        if self.tenant.is_organisor:
+            return ProductsAndStock.objects.filter(organisation=self.request.user.userprofile)
+        if self.tenant.is_agent and self.tenant.agent:
+            return ProductsAndStock.objects.filter(organisation_id=self.tenant.agent.organisation_id)
+        return ProductsAndStock.objects.none()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
+        product = self.object
         
         # Get stock movements for this product (last 10 movements)
         stock_movements = product.stock_movements.all()[:10]
@@ -290,6 +324,7 @@ class ProductAndStockDeleteView(OrganisorAndLoginRequiredMixin, generic.DeleteVi
             return ProductsAndStock.objects.none()
 
 @login_required
+@versioned_etag(CATALOG, scope=lambda request: None, page=False)
 def get_subcategories(request):
     """AJAX endpoint to get subcategories for a given category. category_id is validated as integer."""
     category_id = request.GET.get('category_id')
@@ -302,6 +337,22 @@ def get_subcategories(request):
     subcategories = SubCategory.objects.filter(category_id=category_id).values('id', 'name')
     return JsonResponse({'subcategories': list(subcategories)})
 
+@versioned_etag(CATALOG, scope=lambda request: None, page=False)
+async def aget_subcategories(request):
+    """get_subcategories for ASGI mode: the same lookup through the async ORM."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    category_id = request.GET.get('category_id')
+    if not category_id:
+        return JsonResponse({'subcategories': []})
+    try:
+        category_id = int(category_id)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid category ID'}, status=400)
+    subcategories = SubCategory.objects.filter(category_id=category_id).values('id', 'name')
+    return JsonResponse({'subcategories': [row async for row in subcategories]})
+
 class BulkPriceUpdateView(OrganisorAndLoginRequiredMixin, generic.FormView):
     template_name = "ProductsAndStock/bulk_price_update.html"
     form_class = BulkPriceUpdateForm
@@ -436,7 +487,69 @@ class BulkPriceUpdateView(OrganisorAndLoginRequiredMixin, generic.FormView):
         return context
 
 
-class ProductChartsView(OrganisorAndLoginRequiredMixin, generic.TemplateView):
+class ProductImportView(OrganisorAndLoginRequiredMixin, generic.FormView):
+    """Upsert products from CSV/XLSX; large files are queued for process_product_imports."""
+    template_name = "ProductsAndStock/product_import.html"
+    form_class = ProductImportForm
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['request'] = self.request
+        return kwargs
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        organisation = form.cleaned_data.get('organisation') or self.tenant.organisation
+        if upload.size > settings.PRODUCT_IMPORT_SYNC_MAX_BYTES:
+            queue_import(upload, organisation, self.request.user)
+            messages.info(self.request, "The file is being imported in the background; you will get a notification when it is done.")
+            return redirect("ProductsAndStock:ProductAndStock-list")
+
+        upload.seek(0)
+        try:
+            result = import_products(upload.file, upload.name, organisation, self.request.user)
+        except ImportFileError as exc:
+            form.add_error('file', str(exc))
+            return self.form_invalid(form)
+        if result.report_name:
+            self.request.session['product_import_report'] = result.report_name
+        else:
+            self.request.session.pop('product_import_report', None)
+        if result.created or result.updated:
+            messages.success(self.request, f"Imported {result.created} new and {result.updated} existing product(s).")
+        return self.render_to_response(self.get_context_data(form=self.get_form_class()(request=self.request), result=result))
+
+
+@login_required
+def product_import_report(request):
+    """Download the rejected rows of the user's last product import, or of a background job (?job=<pk>)."""
+    name = request.session.get('product_import_report')
+    job_id = request.GET.get('job')
+    if job_id:
+        jobs = ProductImportJob.objects.all() if request.user.is_superuser else ProductImportJob.objects.filter(created_by=request.user)
+        name = jobs.filter(pk=job_id).values_list('report_name', flat=True).first() if job_id.isdigit() else None
+    if not name or not default_storage.exists(name):
+        raise Http404("No import report available.")
+    return FileResponse(default_storage.open(name, 'rb'), as_attachment=True, filename='product-import-errors.csv', content_type='text/csv')
+
+
+class ProductExportView(OrganisorAndLoginRequiredMixin, generic.View):
+    """Stream the user's products as CSV in the import format (admins: all, or ?organisation=<id>)."""
+
+    def get(self, request, *args, **kwargs):
+        if self.tenant.is_admin:
+            products = ProductsAndStock.objects.all()
+            organisation_id = request.GET.get('organisation')
+            if organisation_id and organisation_id.isdigit():
+                products = products.filter(organisation_id=organisation_id)
+        else:
+            products = ProductsAndStock.objects.filter(organisation_id=self.tenant.organisation_id)
+        response = StreamingHttpResponse(export_rows(products), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="products.csv"'
+        return response
+
+
+class ProductChartsView(ReplicaReadsMixin, OrganisorAndLoginRequiredMixin, generic.TemplateView):
     template_name = "ProductsAndStock/product_charts.html"
 
     def get_queryset(self):
@@ -449,57 +562,19 @@ class ProductChartsView(OrganisorAndLoginRequiredMixin, generic.TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        products = list(self.get_queryset())
-        # Stock status counts (same logic as dashboard)
-        out_of_stock = sum(1 for p in products if p.product_quantity <= 0)
-        low_stock = sum(1 for p in products if p.is_low_stock and p.product_quantity > 0)
-        overstock = sum(1 for p in products if p.minimum_stock_level and p.product_quantity > p.minimum_stock_level * 10)
-        in_stock = sum(1 for p in products if p.product_quantity > p.minimum_stock_level and (not p.minimum_stock_level or p.product_quantity <= p.minimum_stock_level * 10))
-        context['chart_stock_labels'] = ['Out of Stock', 'Low Stock', 'In Stock', 'Overstock']
-        context['chart_stock_data'] = [out_of_stock, low_stock, in_stock, overstock]
-        context['chart_stock_colors'] = ['#ef4444', '#f97316', '#22c55e', '#eab308']
-        import json
-        from collections import defaultdict
-        context['chart_stock_labels_json'] = json.dumps(context['chart_stock_labels'])
-        context['chart_stock_data_json'] = json.dumps(context['chart_stock_data'])
-        context['chart_stock_colors_json'] = json.dumps(context['chart_stock_colors'])
-        # By category
-        by_cat = defaultdict(lambda: {'count': 0, 'value': 0})
-        for p in products:
-            name = p.category.name
-            by_cat[name]['count'] += 1
-            by_cat[name]['value'] += p.total_value
-        context['chart_category_labels'] = list(by_cat.keys())
-        context['chart_category_counts'] = [by_cat[k]['count'] for k in by_cat]
-        context['chart_category_values'] = [round(by_cat[k]['value'], 2) for k in by_cat]
-        context['chart_category_labels_json'] = json.dumps(context['chart_category_labels'])
-        context['chart_category_counts_json'] = json.dumps(context['chart_category_counts'])
-        context['chart_category_values_json'] = json.dumps(context['chart_category_values'])
-        # Top products by total value (max 10)
-        by_value = sorted(products, key=lambda x: x.total_value, reverse=True)[:10]
-        context['chart_top_labels'] = [p.product_name[:18] + ('..' if len(p.product_name) > 18 else '') for p in by_value]
-        context['chart_top_data'] = [round(p.total_value, 2) for p in by_value]
-        context['chart_top_labels_json'] = json.dumps(context['chart_top_labels'])
-        context['chart_top_data_json'] = json.dumps(context['chart_top_data'])
-        # Top selling products (by units sold) - max 10
-        by_sales = sorted(products, key=lambda x: x.total_sales_count, reverse=True)[:10]
-        context['chart_sales_labels'] = [p.product_name[:18] + ('..' if len(p.product_name) > 18 else '') for p in by_sales]
-        context['chart_sales_data'] = [p.total_sales_count for p in by_sales]
-        context['chart_sales_revenue_data'] = [round(p.total_revenue_from_sales, 2) for p in by_sales]
-        context['chart_has_sales'] = any(p.total_sales_count > 0 for p in products)
-        context['chart_sales_labels_json'] = json.dumps(context['chart_sales_labels'])
-        context['chart_sales_data_json'] = json.dumps(context['chart_sales_data'])
-        context['chart_sales_revenue_data_json'] = json.dumps(context['chart_sales_revenue_data'])
-        # Summary
-        context['total_products'] = len(products)
-        context['total_value'] = round(sum(p.total_value for p in products), 2)
-        context['total_profit'] = round(sum(p.total_profit for p in products if p.cost_price > 0), 2)
+        user = self.request.user
+        if user.is_superuser:
+            context.update(chart_data())
+        elif user.is_organisor:
+            context.update(chart_data(user.userprofile.pk))
+        else:
+            context.update(compute_chart_data(ProductsAndStock.objects.none()))
         return context
 
 
-class SalesDashboardView(OrganisorAndLoginRequiredMixin, generic.TemplateView):
+class SalesDashboardView(ReplicaReadsMixin, OrganisorAndLoginRequiredMixin, generic.TemplateView):
     template_name = "ProductsAndStock/sales_dashboard.html"
-    
+
     def get_queryset(self):
         """Get products that can be viewed by current user"""
         user = self.request.user
@@ -510,99 +585,15 @@ class SalesDashboardView(OrganisorAndLoginRequiredMixin, generic.TemplateView):
             return ProductsAndStock.objects.filter(organisation=organisation)
         else:
             return ProductsAndStock.objects.none()
-    
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        products = self.get_queryset()
-        
-        # Sales Statistics
-        context['total_products'] = products.count()
-        context['total_value'] = sum(p.total_value for p in products)
-        context['total_profit'] = sum(p.total_profit for p in products if p.cost_price > 0)
-        context['low_stock_products'] = products.filter(product_quantity__lte=F('minimum_stock_level')).exclude(product_quantity=0).count()
-        context['out_of_stock_products'] = products.filter(product_quantity=0).count()
-        context['overstock_products'] = products.filter(product_quantity__gt=F('minimum_stock_level') * 10).count()
-        # In Stock = quantity > min and not overstock (min < qty <= min*10)
-        context['in_stock_products'] = products.filter(
-            product_quantity__gt=F('minimum_stock_level'),
-            product_quantity__lte=F('minimum_stock_level') * 10
-        ).count()
-        
-        # Top Selling Products (only products with at least 1 sale, sorted by sales count)
-        products_with_sales = [p for p in products if p.total_sales_count > 0]
-        context['top_selling_products'] = sorted(
-            products_with_sales,
-            key=lambda x: x.total_sales_count,
-            reverse=True
-        )[:5]
-        
-        # Recent Alerts: by severity high to low (CRITICAL -> HIGH -> MEDIUM -> LOW), then by newest date
-        severity_order = Case(
-            When(severity='CRITICAL', then=Value(0)),
-            When(severity='HIGH', then=Value(1)),
-            When(severity='MEDIUM', then=Value(2)),
-            When(severity='LOW', then=Value(3)),
-            default=Value(4),
-            output_field=IntegerField(),
-        )
-        context['recent_alerts'] = StockAlert.objects.filter(
-            product__in=products,
-            is_resolved=False
-        ).annotate(severity_order=severity_order).order_by('severity_order', '-created_at')[:20]
-        
-        # Stock Recommendations: show only if issue still valid, one recommendation per product (most important)
-        # Do not show both DISCOUNT and REDUCE_STOCK for same product; ordered by confidence_score, first per product
-        recs_qs = StockRecommendation.objects.filter(
-            product__in=products,
-            is_applied=False
-        ).select_related('product').order_by('-confidence_score', '-created_at')
-        seen_product_ids = set()
-        relevant_recs = []
-        for rec in recs_qs:
-            if not (
-                (rec.recommendation_type == 'RESTOCK' and rec.product.is_low_stock and rec.product.product_quantity > 0) or
-                (rec.recommendation_type == 'DISCOUNT' and rec.product.product_quantity > rec.product.minimum_stock_level * 5) or
-                (rec.recommendation_type == 'REDUCE_STOCK' and rec.product.product_quantity > rec.product.minimum_stock_level * 10)
-            ):
-                continue
-            if rec.product_id in seen_product_ids:
-                continue
-            seen_product_ids.add(rec.product_id)
-            relevant_recs.append(rec)
-        context['stock_recommendations'] = relevant_recs
-        
-        # Critical Alerts: only count/list product if still in critical state (drop when fixed)
-        # Same product should not repeat with multiple alert records: one per product (latest alert)
-        critical_alerts_qs = StockAlert.objects.filter(
-            product__in=products,
-            is_resolved=False,
-            severity='CRITICAL'
-        ).select_related('product').order_by('-created_at')
-        still_critical = [
-            a for a in critical_alerts_qs
-            if a.product.product_quantity <= 0
-            or (a.product.minimum_stock_level and a.product.product_quantity <= a.product.minimum_stock_level / 2)
-        ]
-        seen_product_ids = set()
-        critical_alerts_list = []
-        for a in still_critical:
-            if a.product_id not in seen_product_ids:
-                seen_product_ids.add(a.product_id)
-                critical_alerts_list.append(a)
-        context['critical_alerts_count'] = len(critical_alerts_list)
-        context['critical_alerts_list'] = critical_alerts_list
-        
-        # Products with Active Alerts: no limit, only those still in alert state (issue ongoing)
-        products_with_unresolved = products.filter(
-            stock_alerts__is_resolved=False
-        ).distinct()
-        products_with_alerts = [
-            p for p in products_with_unresolved
-            if p.product_quantity <= 0
-            or p.is_low_stock
-            or (p.minimum_stock_level and p.product_quantity > p.minimum_stock_level * 10)
-        ]
-        context['products_with_alerts'] = products_with_alerts
-        
+        user = self.request.user
+        if user.is_superuser:
+            context.update(dashboard_snapshot())
+        elif user.is_organisor:
+            context.update(dashboard_snapshot(user.userprofile.pk))
+        else:
+            context.update(build_snapshot(ProductsAndStock.objects.none()))
         return context
     
\ No newline at end of file
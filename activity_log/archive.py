@@ -0,0 +1,195 @@
+"""
+Retention and archival for ActivityLog.
+
+Rows older than ACTIVITY_LOG_RETENTION_DAYS are moved, in batches, into gzipped JSON Lines
+files in the ACTIVITY_LOG_ARCHIVE_STORAGE storage, partitioned by the day they were created:
+
+    <ACTIVITY_LOG_ARCHIVE_PREFIX>/<YYYY>/<MM>/<DD>/<first id>-<last id>.jsonl.gz
+
+Each batch is written before its rows are deleted, so an interrupted run can at worst leave
+rows that are both archived and still in the table; restoring skips ids that already exist.
+Used by the archive_activity_logs and restore_activity_logs management commands.
+"""
+import gzip
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 5000
+
+ARCHIVED_FIELDS = (
+    'id', 'user_id', 'action', 'object_type', 'object_id', 'object_repr',
+    'details', 'organisation_id', 'affected_agent_id', 'created_at',
+)
+
+
+def archive_storage():
+    return storages[getattr(settings, 'ACTIVITY_LOG_ARCHIVE_STORAGE', 'default')]
+
+
+def archive_prefix():
+    return getattr(settings, 'ACTIVITY_LOG_ARCHIVE_PREFIX', 'activity_log_archive')
+
+
+def retention_cutoff(now=None, days=None):
+    """Rows created before this datetime are outside the hot window."""
+    if days is None:
+        days = settings.ACTIVITY_LOG_RETENTION_DAYS
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archive_name(day, first_id, last_id):
+    return f"{archive_prefix()}/{day:%Y/%m/%d}/{first_id}-{last_id}.jsonl.gz"
+
+
+def serialize(row):
+    """JSON-safe dict of an ActivityLog values() row."""
+    record = dict(row)
+    record['created_at'] = row['created_at'].isoformat()
+    return record
+
+
+def write_archive(day, records):
+    """Write one gzipped JSONL file for records created on day; returns the stored name."""
+    lines = ''.join(json.dumps(record, sort_keys=True, default=str) + '\n' for record in records)
+    content = ContentFile(gzip.compress(lines.encode('utf-8')))
+    return archive_storage().save(archive_name(day, records[0]['id'], records[-1]['id']), content)
+
+
+def archive_before(cutoff, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    """
+    Move rows created before cutoff into archive files, oldest first, batch_size rows at a time.
+    Returns (rows archived, list of files written). With dry_run only counts the rows.
+    """
+    old_rows = ActivityLog.objects.filter(created_at__lt=cutoff)
+    if dry_run:
+        return old_rows.count(), []
+    archived = 0
+    files = []
+    while True:
+        rows = list(old_rows.order_by('created_at', 'id').values(*ARCHIVED_FIELDS)[:batch_size])
+        if not rows:
+            break
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(timezone.localdate(row['created_at']), []).append(serialize(row))
+        for day, records in by_day.items():
+            files.append(write_archive(day, records))
+        with transaction.atomic():
+            ActivityLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+        logger.info("Archived %d activity log rows (ids %s-%s)", len(rows), rows[0]['id'], rows[-1]['id'])
+        if len(rows) < batch_size:
+            break
+    return archived, files
+
+
+def _archive_days(storage, start=None, end=None):
+    """Yield (day, directory) for the archived days between start and end (inclusive)."""
+    prefix = archive_prefix()
+    if not storage.exists(prefix):
+        return
+    years, _ = storage.listdir(prefix)
+    for year in sorted(years):
+        if not year.isdigit() or (start and int(year) < start.year) or (end and int(year) > end.year):
+            continue
+        months, _ = storage.listdir(f"{prefix}/{year}")
+        for month in sorted(months):
+            if not month.isdigit():
+                continue
+            days, _ = storage.listdir(f"{prefix}/{year}/{month}")
+            for day_name in sorted(days):
+                try:
+                    day = date(int(year), int(month), int(day_name))
+                except ValueError:
+                    continue
+                if (start and day < start) or (end and day > end):
+                    continue
+                yield day, f"{prefix}/{year}/{month}/{day_name}"
+
+
+def iter_archived(start=None, end=None, user_id=None, organisation_id=None, action=None):
+    """Yield archived records (dicts) created between the start and end dates, optionally filtered."""
+    storage = archive_storage()
+    for _, directory in _archive_days(storage, start, end):
+        _, names = storage.listdir(directory)
+        for name in sorted(names):
+            if not name.endswith('.jsonl.gz'):
+                continue
+            with storage.open(f"{directory}/{name}", 'rb') as archive_file:
+                lines = gzip.decompress(archive_file.read()).decode('utf-8').splitlines()
+            for line in lines:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if user_id is not None and record.get('user_id') != user_id:
+                    continue
+                if organisation_id is not None and record.get('organisation_id') != organisation_id:
+                    continue
+                if action and record.get('action') != action:
+                    continue
+                yield record
+
+
+def restore(records, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Insert archived records back into ActivityLog, keeping their ids. Records whose id is
+    already present are skipped; references to deleted users/organisations/agents are cleared.
+    Returns the number of rows restored.
+    """
+    from leads.models import Agent, User, UserProfile
+
+    restored = 0
+    batch = []
+
+    def flush():
+        nonlocal restored
+        existing = set(ActivityLog.objects.filter(pk__in=[r['id'] for r in batch]).values_list('pk', flat=True))
+        pending = [r for r in batch if r['id'] not in existing]
+        live = {
+            'user_id': _existing_ids(User, pending, 'user_id'),
+            'organisation_id': _existing_ids(UserProfile, pending, 'organisation_id'),
+            'affected_agent_id': _existing_ids(Agent, pending, 'affected_agent_id'),
+        }
+        logs = []
+        timestamps = []
+        for record in pending:
+            fields = {field: record.get(field) for field in ARCHIVED_FIELDS}
+            for field, ids in live.items():
+                if fields[field] not in ids:
+                    fields[field] = None
+            timestamps.append(datetime.fromisoformat(fields.pop('created_at')))
+            logs.append(ActivityLog(**fields))
+        if logs:
+            with transaction.atomic():
+                ActivityLog.objects.bulk_create(logs)
+                # bulk_create applies auto_now_add; put the original timestamps back
+                for log, created_at in zip(logs, timestamps):
+                    log.created_at = created_at
+                ActivityLog.objects.bulk_update(logs, ['created_at'])
+        restored += len(logs)
+        batch.clear()
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return restored
+
+
+def _existing_ids(model, records, field):
+    ids = {r[field] for r in records if r.get(field) is not None}
+    return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+
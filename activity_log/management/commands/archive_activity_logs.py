@@ -0,0 +1,53 @@
+"""
+Move activity log entries older than the retention window into compressed archive files.
+Run daily via cron: python manage.py archive_activity_logs
+The hot window is ACTIVITY_LOG_RETENTION_DAYS (override with --days); archived entries can be
+listed or restored with restore_activity_logs.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from activity_log import archive, partitioning
+
+
+class Command(BaseCommand):
+    help = 'Archive activity log entries older than the retention window to gzipped JSONL files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Keep this many days in the table (default: ACTIVITY_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=archive.ARCHIVE_BATCH_SIZE,
+            help=f'Rows archived and deleted per batch (default: {archive.ARCHIVE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print how many entries would be archived',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        cutoff = archive.retention_cutoff(days=options['days'])
+
+        count, files = archive.archive_before(cutoff, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'Would archive {count} entries created before {cutoff:%Y-%m-%d %H:%M}')
+            return
+        for name in files:
+            self.stdout.write(f'  wrote {name}')
+
+        if partitioning.is_partitioned():
+            partitioning.ensure_partitions(cutoff.date())
+            for name in partitioning.drop_empty_partitions(cutoff.date()):
+                self.stdout.write(f'  dropped partition {name}')
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {count} entries into {len(files)} file(s).'))
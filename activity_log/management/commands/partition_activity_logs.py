@@ -0,0 +1,45 @@
+"""
+PostgreSQL only: convert the activity log table to monthly range partitions on created_at,
+or create upcoming monthly partitions for an already partitioned table.
+    python manage.py partition_activity_logs --convert   (once; locks the table while copying)
+    python manage.py partition_activity_logs             (monthly, or let archive_activity_logs do it)
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from activity_log import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Convert the activity log table to monthly partitions (PostgreSQL) or add upcoming partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Rebuild the existing table as a partitioned table',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Create partitions for this many future months (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            raise CommandError('Partitioning is only available on PostgreSQL.')
+        if options['months_ahead'] < 0:
+            raise CommandError('--months-ahead must not be negative')
+
+        if options['convert']:
+            if partitioning.is_partitioned():
+                raise CommandError(f'{partitioning.TABLE} is already partitioned.')
+            partitioning.convert_to_partitioned(options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS(f'{partitioning.TABLE} is now partitioned by month.'))
+            return
+
+        if not partitioning.is_partitioned():
+            raise CommandError(f'{partitioning.TABLE} is not partitioned; run with --convert first.')
+        created = partitioning.ensure_partitions(timezone.localdate(), options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS(f'Ensured {len(created)} monthly partition(s).'))
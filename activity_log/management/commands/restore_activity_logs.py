@@ -0,0 +1,64 @@
+"""
+Query or restore archived activity log entries written by archive_activity_logs.
+List matching entries as JSON lines:
+    python manage.py restore_activity_logs --from 2025-01-01 --to 2025-01-31 --user 12 --list
+Put them back into the activity log table:
+    python manage.py restore_activity_logs --from 2025-01-01 --to 2025-01-31 --user 12
+"""
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from activity_log import archive
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'List or restore archived activity log entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day (YYYY-MM-DD) to read')
+        parser.add_argument('--to', dest='end', help='Last day (YYYY-MM-DD) to read')
+        parser.add_argument('--user', type=int, help='Only entries by this user id')
+        parser.add_argument('--organisation', type=int, help='Only entries of this organisation (UserProfile id)')
+        parser.add_argument('--action', help='Only entries with this action (e.g. lead_created)')
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Print matching entries as JSON lines instead of restoring them',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print how many entries would be restored',
+        )
+
+    def handle(self, *args, **options):
+        start = _parse_date(options['start']) if options['start'] else None
+        end = _parse_date(options['end']) if options['end'] else None
+        if start and end and start > end:
+            raise CommandError('--from must not be after --to')
+        records = archive.iter_archived(
+            start, end,
+            user_id=options['user'],
+            organisation_id=options['organisation'],
+            action=options['action'],
+        )
+
+        if options['list']:
+            for record in records:
+                self.stdout.write(json.dumps(record, sort_keys=True))
+            return
+        if options['dry_run']:
+            self.stdout.write(f'Would restore up to {sum(1 for _ in records)} entries')
+            return
+
+        restored = archive.restore(records)
+        self.stdout.write(self.style.SUCCESS(f'Restored {restored} entries.'))
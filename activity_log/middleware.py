@@ -0,0 +1,31 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import writer
+
+
+class ActivityLogBufferMiddleware:
+    """
+    Buffer the activity log entries of a request and write them in one batch when the
+    view returns (ACTIVITY_LOG_WRITE_MODE "buffered" or "async"; no-op in "sync").
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if writer.write_mode() == writer.WRITE_MODE_SYNC:
+            return self.get_response(request)
+        with writer.activity_buffer():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if writer.write_mode() == writer.WRITE_MODE_SYNC:
+            return await self.get_response(request)
+        async with writer.aactivity_buffer():
+            return await self.get_response(request)
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-19 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity_log', '0002_add_affected_agent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['-created_at', '-id'], name='actlog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='actlog_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['organisation', '-created_at', '-id'], name='actlog_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['affected_agent', '-created_at', '-id'], name='actlog_agent_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-19 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity_log', '0004_alter_activitylog_action'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitylog',
+            name='action',
+            field=models.CharField(choices=[('organisor_created', 'Organisor created'), ('organisor_updated', 'Organisor updated'), ('organisor_deleted', 'Organisor deleted'), ('agent_created', 'Agent created'), ('agent_updated', 'Agent updated'), ('agent_deleted', 'Agent deleted'), ('product_created', 'Product created'), ('product_updated', 'Product updated'), ('product_deleted', 'Product deleted'), ('price_increased', 'Price increased'), ('price_decreased', 'Price decreased'), ('price_bulk_update', 'Bulk price update'), ('products_imported', 'Products imported'), ('order_created', 'Order created'), ('order_updated', 'Order updated'), ('order_cancelled', 'Order cancelled'), ('lead_created', 'Lead created'), ('lead_updated', 'Lead updated'), ('lead_deleted', 'Lead deleted'), ('leads_imported', 'Leads imported'), ('task_created', 'Task created'), ('task_updated', 'Task updated'), ('task_deleted', 'Task deleted')], max_length=32, verbose_name='Action'),
+        ),
+    ]
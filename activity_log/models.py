@@ -3,6 +3,8 @@ from django.db import models
 from django.conf import settings
 from django.urls import reverse
 
+from . import writer
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,12 +21,14 @@ ACTION_PRODUCT_DELETED = 'product_deleted'
 ACTION_PRICE_INCREASED = 'price_increased'
 ACTION_PRICE_DECREASED = 'price_decreased'
 ACTION_PRICE_BULK_UPDATE = 'price_bulk_update'
+ACTION_PRODUCTS_IMPORTED = 'products_imported'
 ACTION_ORDER_CREATED = 'order_created'
 ACTION_ORDER_UPDATED = 'order_updated'
 ACTION_ORDER_CANCELLED = 'order_cancelled'
 ACTION_LEAD_CREATED = 'lead_created'
 ACTION_LEAD_UPDATED = 'lead_updated'
 ACTION_LEAD_DELETED = 'lead_deleted'
+ACTION_LEADS_IMPORTED = 'leads_imported'
 ACTION_TASK_CREATED = 'task_created'
 ACTION_TASK_UPDATED = 'task_updated'
 ACTION_TASK_DELETED = 'task_deleted'
@@ -42,12 +46,14 @@ ACTION_CHOICES = [
     (ACTION_PRICE_INCREASED, 'Price increased'),
     (ACTION_PRICE_DECREASED, 'Price decreased'),
     (ACTION_PRICE_BULK_UPDATE, 'Bulk price update'),
+    (ACTION_PRODUCTS_IMPORTED, 'Products imported'),
     (ACTION_ORDER_CREATED, 'Order created'),
     (ACTION_ORDER_UPDATED, 'Order updated'),
     (ACTION_ORDER_CANCELLED, 'Order cancelled'),
     (ACTION_LEAD_CREATED, 'Lead created'),
     (ACTION_LEAD_UPDATED, 'Lead updated'),
     (ACTION_LEAD_DELETED, 'Lead deleted'),
+    (ACTION_LEADS_IMPORTED, 'Leads imported'),
     (ACTION_TASK_CREATED, 'Task created'),
     (ACTION_TASK_UPDATED, 'Task updated'),
     (ACTION_TASK_DELETED, 'Task deleted'),
@@ -123,6 +129,13 @@ class ActivityLog(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Activity log entry'
         verbose_name_plural = 'Activity logs'
+        # One index per activity feed branch, matching its (created_at, id) keyset ordering
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='actlog_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='actlog_user_created_idx'),
+            models.Index(fields=['organisation', '-created_at', '-id'], name='actlog_org_created_idx'),
+            models.Index(fields=['affected_agent', '-created_at', '-id'], name='actlog_agent_created_idx'),
+        ]
 
     def __str__(self):
         user_str = self.user.get_full_name() or self.user.username if self.user else 'Unknown'
@@ -151,7 +164,7 @@ class ActivityLog(models.Model):
 
 def log_activity(user, action, object_type=None, object_id=None, object_repr='', details=None, organisation=None, affected_agent=None):
     """
-    Create an activity log entry.
+    Create an activity log entry (immediately, or batched per ACTIVITY_LOG_WRITE_MODE).
     - user: User who performed the action (request.user)
     - action: One of the ACTION_* constants
     - object_type: 'organisor', 'agent', 'product', 'order', 'lead', 'task'
@@ -163,17 +176,23 @@ def log_activity(user, action, object_type=None, object_id=None, object_repr='',
     """
     if not user or not user.is_authenticated:
         return None
+    entry = ActivityLog(
+        user=user,
+        action=action,
+        object_type=object_type or '',
+        object_id=object_id,
+        object_repr=(object_repr or '')[:255],
+        details=details or {},
+        organisation=organisation,
+        affected_agent=affected_agent,
+    )
+    if writer.write_mode() != writer.WRITE_MODE_SYNC:
+        # Written in a batch by activity_log.writer once the transaction commits
+        writer.enqueue(entry)
+        return entry
     try:
-        return ActivityLog.objects.create(
-            user=user,
-            action=action,
-            object_type=object_type or '',
-            object_id=object_id,
-            object_repr=(object_repr or '')[:255],
-            details=details or {},
-            organisation=organisation,
-            affected_agent=affected_agent,
-        )
+        entry.save()
+        return entry
     except Exception:
         logger.exception(
             "Failed to create activity log: action=%s object_type=%s object_id=%s",
@@ -0,0 +1,180 @@
+"""
+Optional PostgreSQL monthly range partitioning of the ActivityLog table on created_at.
+
+convert_to_partitioned() rebuilds the table as a partitioned table (primary key
+(id, created_at), one partition per month plus a DEFAULT partition) and copies the rows
+across. ensure_partitions() creates upcoming months and drop_empty_partitions() removes
+months that archival has emptied; archive_activity_logs calls both when the table is
+partitioned. Every other database keeps the plain table.
+"""
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import ActivityLog
+
+TABLE = ActivityLog._meta.db_table
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_{month:%Y%m}"
+
+
+def _partitions(cursor):
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s ORDER BY c.relname",
+        [TABLE],
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def ensure_partitions(start, months_ahead=3, today=None):
+    """
+    Create the monthly partitions from start's month up to months_ahead after today.
+
+    PostgreSQL refuses to create a partition while the DEFAULT partition holds rows for
+    its range, so for such a month the default partition is detached, the rows are moved
+    into the new partition and the default partition is attached again.
+    """
+    quote = connection.ops.quote_name
+    default = f"{TABLE}_default"
+    month = date(start.year, start.month, 1)
+    today = today or date.today()
+    last = _add_months(date(today.year, today.month, 1), months_ahead)
+    ensured = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing = set(_partitions(cursor))
+        while month <= last:
+            upper = _add_months(month, 1)
+            name = partition_name(month)
+            ensured.append(name)
+            if name in existing:
+                month = upper
+                continue
+            bounds = [month.isoformat(), upper.isoformat()]
+            stranded = False
+            if default in existing:
+                cursor.execute(
+                    f"SELECT EXISTS (SELECT 1 FROM {quote(default)} WHERE created_at >= %s AND created_at < %s)",
+                    bounds,
+                )
+                stranded = cursor.fetchone()[0]
+            if stranded:
+                cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(default)}")
+            cursor.execute(
+                f"CREATE TABLE {quote(name)} PARTITION OF {quote(TABLE)} "
+                f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')"
+            )
+            if stranded:
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {quote(default)} WHERE created_at >= %s AND created_at < %s "
+                    f"RETURNING *) INSERT INTO {quote(TABLE)} SELECT * FROM moved",
+                    bounds,
+                )
+                cursor.execute(f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(default)} DEFAULT")
+            month = upper
+    return ensured
+
+
+def drop_empty_partitions(before):
+    """Drop monthly partitions that end on or before the date before and hold no rows."""
+    quote = connection.ops.quote_name
+    dropped = []
+    with connection.cursor() as cursor:
+        for name in _partitions(cursor):
+            suffix = name[len(TABLE) + 1:]
+            if not (suffix.isdigit() and len(suffix) == 6):
+                continue
+            month = date(int(suffix[:4]), int(suffix[4:]), 1)
+            if _add_months(month, 1) > before:
+                continue
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {quote(name)})")
+            if cursor.fetchone()[0]:
+                continue
+            cursor.execute(f"DROP TABLE {quote(name)}")
+            dropped.append(name)
+    return dropped
+
+
+def convert_to_partitioned(months_ahead=3):
+    """
+    Rebuild the ActivityLog table as a monthly partitioned table in one transaction.
+    Takes an exclusive lock on the table while rows are copied.
+
+    The id sequence, foreign keys and indexes are created explicitly once the old table
+    is gone, from the definitions PostgreSQL reports for the old table and under the same
+    names: LIKE ... INCLUDING IDENTITY only works on a partitioned table from PostgreSQL
+    17, and LIKE copies neither foreign keys nor index names.
+    """
+    quote = connection.ops.quote_name
+    old = f"{TABLE}_unpartitioned"
+    sequence = f"{TABLE}_id_seq"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f' ORDER BY conname",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        # Indexes backing the primary key or a constraint are recreated with it
+        cursor.execute(
+            "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = %s::regclass AND NOT EXISTS "
+            "(SELECT 1 FROM pg_constraint con WHERE con.conindid = i.indexrelid) ORDER BY c.relname",
+            [TABLE],
+        )
+        indexes = [definition for (definition,) in cursor.fetchall()]
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(old)}")
+        # An identity (or a serial's nextval default) must not be copied to the new table
+        cursor.execute(f"ALTER TABLE {quote(old)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {quote(old)} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(
+            f"CREATE TABLE {quote(TABLE)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"SELECT MIN(created_at) FROM {quote(old)}")
+        oldest = cursor.fetchone()[0]
+        ensure_partitions(oldest.date() if oldest else date.today(), months_ahead)
+        # Rows beyond the last monthly partition land here instead of failing the insert
+        cursor.execute(f"CREATE TABLE {quote(TABLE + '_default')} PARTITION OF {quote(TABLE)} DEFAULT")
+        cursor.execute(f"INSERT INTO {quote(TABLE)} SELECT * FROM {quote(old)}")
+        cursor.execute(f"DROP TABLE {quote(old)}")
+
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} AS bigint OWNED BY {quote(TABLE)}.id")
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [sequence])
+        cursor.execute(
+            f"SELECT setval(%s::regclass, COALESCE((SELECT MAX(id) FROM {quote(TABLE)}), 0) + 1, false)",
+            [sequence],
+        )
+        # Unique constraints on a partitioned table must include the partition key
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + '_pkey')} PRIMARY KEY (id, created_at)"
+        )
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}")
+        for definition in indexes:
+            cursor.execute(definition)
@@ -0,0 +1,176 @@
+"""
+Tests for activity_log.archive and the archive/restore management commands.
+"""
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from activity_log import archive
+from activity_log.models import ActivityLog, ACTION_LEAD_CREATED, ACTION_TASK_CREATED
+from leads.models import UserProfile
+
+User = get_user_model()
+
+
+class ArchiveTestBase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='archiveuser', email='archiveuser@test.com', password='testpass123',
+            is_organisor=True,
+        )
+        cls.organisation = UserProfile.objects.get(user=cls.user)
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, ACTIVITY_LOG_RETENTION_DAYS=30)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def create_log(self, days_ago, action=ACTION_LEAD_CREATED, **kwargs):
+        log = ActivityLog.objects.create(
+            user=self.user, action=action, organisation=self.organisation,
+            object_type='lead', object_id=1, object_repr='Lead: Test', **kwargs,
+        )
+        created_at = timezone.now() - timedelta(days=days_ago)
+        ActivityLog.objects.filter(pk=log.pk).update(created_at=created_at)
+        log.created_at = created_at
+        return log
+
+
+class TestArchiveBefore(ArchiveTestBase):
+
+    def test_old_rows_are_moved_to_daily_files(self):
+        old = self.create_log(40, details={'old_price': 10})
+        older = self.create_log(45)
+        recent = self.create_log(5)
+
+        count, files = archive.archive_before(archive.retention_cutoff())
+
+        self.assertEqual(count, 2)
+        self.assertEqual(len(files), 2)
+        self.assertEqual(list(ActivityLog.objects.values_list('pk', flat=True)), [recent.pk])
+        day = timezone.localdate(old.created_at)
+        name = archive.archive_name(day, old.pk, old.pk)
+        self.assertIn(name, files)
+        with default_storage.open(name, 'rb') as archive_file:
+            records = [json.loads(line) for line in gzip.decompress(archive_file.read()).splitlines()]
+        self.assertEqual(records[0]['id'], old.pk)
+        self.assertEqual(records[0]['details'], {'old_price': 10})
+        self.assertEqual(records[0]['organisation_id'], self.organisation.pk)
+        self.assertNotEqual(archive.archive_name(timezone.localdate(older.created_at), older.pk, older.pk), name)
+
+    def test_batches(self):
+        for i in range(5):
+            self.create_log(40)
+        count, files = archive.archive_before(archive.retention_cutoff(), batch_size=2)
+        self.assertEqual(count, 5)
+        self.assertEqual(len(files), 3)
+        self.assertFalse(ActivityLog.objects.exists())
+
+    def test_dry_run_keeps_rows(self):
+        self.create_log(40)
+        count, files = archive.archive_before(archive.retention_cutoff(), dry_run=True)
+        self.assertEqual((count, files), (1, []))
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+
+class TestRestore(ArchiveTestBase):
+
+    def test_round_trip_keeps_ids_and_timestamps(self):
+        log = self.create_log(40)
+        archive.archive_before(archive.retention_cutoff())
+        self.assertFalse(ActivityLog.objects.exists())
+
+        restored = archive.restore(archive.iter_archived())
+
+        self.assertEqual(restored, 1)
+        back = ActivityLog.objects.get()
+        self.assertEqual(back.pk, log.pk)
+        self.assertEqual(back.created_at, log.created_at)
+        self.assertEqual(back.user, self.user)
+        self.assertEqual(back.object_repr, 'Lead: Test')
+
+    def test_existing_ids_are_skipped(self):
+        self.create_log(40)
+        archive.archive_before(archive.retention_cutoff())
+        archive.restore(archive.iter_archived())
+        self.assertEqual(archive.restore(archive.iter_archived()), 0)
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_deleted_user_reference_is_cleared(self):
+        other = User.objects.create_user(username='gone', email='gone@test.com', password='testpass123')
+        log = ActivityLog.objects.create(user=other, action=ACTION_LEAD_CREATED)
+        ActivityLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timedelta(days=40))
+        archive.archive_before(archive.retention_cutoff())
+        other.delete()
+        archive.restore(archive.iter_archived())
+        self.assertIsNone(ActivityLog.objects.get(pk=log.pk).user)
+
+    def test_iter_archived_filters(self):
+        self.create_log(40)
+        self.create_log(60, action=ACTION_TASK_CREATED)
+        archive.archive_before(archive.retention_cutoff())
+        self.assertEqual([r['action'] for r in archive.iter_archived(action=ACTION_TASK_CREATED)], [ACTION_TASK_CREATED])
+        start = timezone.localdate() - timedelta(days=45)
+        self.assertEqual(len(list(archive.iter_archived(start=start))), 1)
+        self.assertEqual(list(archive.iter_archived(user_id=self.user.pk + 1000)), [])
+
+    def test_iter_archived_without_archive(self):
+        self.assertEqual(list(archive.iter_archived()), [])
+
+
+class TestArchiveCommands(ArchiveTestBase):
+
+    def test_archive_command(self):
+        self.create_log(40)
+        self.create_log(5)
+        out = StringIO()
+        call_command('archive_activity_logs', stdout=out)
+        self.assertIn('Archived 1 entries into 1 file(s).', out.getvalue())
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_archive_command_days_and_dry_run(self):
+        self.create_log(10)
+        out = StringIO()
+        call_command('archive_activity_logs', '--days', '7', '--dry-run', stdout=out)
+        self.assertIn('Would archive 1 entries', out.getvalue())
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_archive_command_rejects_invalid_days(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_activity_logs', '--days', '0', stdout=StringIO())
+
+    def test_restore_command_list_and_restore(self):
+        log = self.create_log(40)
+        call_command('archive_activity_logs', stdout=StringIO())
+
+        out = StringIO()
+        call_command('restore_activity_logs', '--list', '--user', str(self.user.pk), stdout=out)
+        self.assertEqual(json.loads(out.getvalue().strip())['id'], log.pk)
+        self.assertFalse(ActivityLog.objects.exists())
+
+        out = StringIO()
+        call_command('restore_activity_logs', stdout=out)
+        self.assertIn('Restored 1 entries.', out.getvalue())
+        self.assertTrue(ActivityLog.objects.filter(pk=log.pk).exists())
+
+    def test_restore_command_rejects_bad_dates(self):
+        with self.assertRaises(CommandError):
+            call_command('restore_activity_logs', '--from', '2025-13-01', stdout=StringIO())
+
+    def test_partition_command_requires_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_activity_logs', stdout=StringIO())
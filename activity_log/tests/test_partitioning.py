@@ -0,0 +1,67 @@
+"""
+Tests for activity_log.partitioning. The conversion is PostgreSQL only, so these are
+skipped on the SQLite test database.
+"""
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from activity_log import partitioning
+from activity_log.models import ActivityLog, ACTION_LEAD_CREATED
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL')
+class ConvertToPartitionedTests(TransactionTestCase):
+
+    def constraints(self):
+        with connection.cursor() as cursor:
+            return connection.introspection.get_constraints(cursor, partitioning.TABLE)
+
+    def test_conversion_keeps_rows_ids_keys_and_indexes(self):
+        user = User.objects.create_user(username='partuser', email='partuser@test.com', password='pass')
+        old = ActivityLog.objects.create(user=user, action=ACTION_LEAD_CREATED, object_id=1)
+        ActivityLog.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=90))
+        latest = ActivityLog.objects.create(user=user, action=ACTION_LEAD_CREATED, object_id=2)
+        before = self.constraints()
+
+        partitioning.convert_to_partitioned()
+
+        self.assertTrue(partitioning.is_partitioned())
+        self.assertEqual(sorted(ActivityLog.objects.values_list('pk', flat=True)), [old.pk, latest.pk])
+        self.assertGreater(ActivityLog.objects.create(user=user, action=ACTION_LEAD_CREATED).pk, latest.pk)
+        after = self.constraints()
+        # Only the primary key changes: it has to include the partition key
+        self.assertEqual(after.pop(f'{partitioning.TABLE}_pkey')['columns'], ['id', 'created_at'])
+        before.pop(f'{partitioning.TABLE}_pkey')
+        self.assertEqual(
+            {name: (c['columns'], c['index'], c['foreign_key'], c['check']) for name, c in after.items()},
+            {name: (c['columns'], c['index'], c['foreign_key'], c['check']) for name, c in before.items()},
+        )
+
+    def test_new_month_takes_its_rows_from_the_default_partition(self):
+        user = User.objects.create_user(username='partuser', email='partuser@test.com', password='pass')
+        if not partitioning.is_partitioned():
+            partitioning.convert_to_partitioned()
+        today = timezone.localdate()
+        ahead = partitioning._add_months(today.replace(day=1), 12)
+        stranded = ActivityLog.objects.create(user=user, action=ACTION_LEAD_CREATED, object_id=1)
+        ActivityLog.objects.filter(pk=stranded.pk).update(
+            created_at=timezone.make_aware(timezone.datetime(ahead.year, ahead.month, 15)),
+        )
+
+        partitioning.ensure_partitions(today, months_ahead=12, today=today)
+
+        name = partitioning.partition_name(ahead)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {connection.ops.quote_name(name)}')
+            self.assertEqual(cursor.fetchall(), [(stranded.pk,)])
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(partitioning.TABLE + "_default")}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+            self.assertIn(partitioning.TABLE + '_default', partitioning._partitions(cursor))
+        self.assertTrue(ActivityLog.objects.filter(pk=stranded.pk).exists())
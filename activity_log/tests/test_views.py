@@ -1,7 +1,9 @@
 """
 Tests for activity_log.views – ActivityLogListView.
 """
+from django.db import connection
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
@@ -155,7 +157,7 @@ class TestActivityLogListView(TestCase):
         self.assertNotIn('filter_users', response.context)
 
     def test_pagination(self):
-        """View should paginate at 30 items."""
+        """View should paginate at 30 items with an older-entries cursor."""
         for i in range(35):
             ActivityLog.objects.create(
                 user=self.admin, action=ACTION_LEAD_CREATED,
@@ -163,6 +165,66 @@ class TestActivityLogListView(TestCase):
         self.client.login(username='aladmin', password='testpass123')
         response = self.client.get(reverse('activity_log:activity-log-list'))
         self.assertEqual(len(response.context['activity_logs']), 30)
-        # Page 2
-        response2 = self.client.get(reverse('activity_log:activity-log-list'), {'page': 2})
+        self.assertIsNone(response.context['newer_url'])
+        # Older page
+        response2 = self.client.get(reverse('activity_log:activity-log-list') + response.context['older_url'])
         self.assertEqual(len(response2.context['activity_logs']), 5)
+        self.assertIsNone(response2.context['older_url'])
+        first_ids = {log.pk for log in response.context['activity_logs']}
+        self.assertFalse(first_ids & {log.pk for log in response2.context['activity_logs']})
+
+    def test_newer_cursor_returns_previous_page(self):
+        for i in range(65):
+            ActivityLog.objects.create(user=self.admin, action=ACTION_LEAD_CREATED)
+        self.client.login(username='aladmin', password='testpass123')
+        url = reverse('activity_log:activity-log-list')
+        page1 = self.client.get(url)
+        page2 = self.client.get(url + page1.context['older_url'])
+        page3 = self.client.get(url + page2.context['older_url'])
+        self.assertEqual(len(page3.context['activity_logs']), 5)
+        back = self.client.get(url + page3.context['newer_url'])
+        self.assertEqual(
+            [log.pk for log in back.context['activity_logs']],
+            [log.pk for log in page2.context['activity_logs']],
+        )
+        # Going newer from page 2 lands on the regular first page
+        top = self.client.get(url + page2.context['newer_url'])
+        self.assertEqual(
+            [log.pk for log in top.context['activity_logs']],
+            [log.pk for log in page1.context['activity_logs']],
+        )
+        self.assertIsNone(top.context['newer_url'])
+
+    def test_feed_does_not_count_rows(self):
+        for i in range(5):
+            ActivityLog.objects.create(
+                user=self.organisor_user, action=ACTION_LEAD_CREATED, organisation=self.organisation,
+            )
+        self.client.login(username='alorg', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('activity_log:activity-log-list'))
+        feed_queries = [q['sql'] for q in queries.captured_queries if 'activity_log_activitylog' in q['sql']]
+        self.assertFalse(any('COUNT(' in sql for sql in feed_queries))
+        self.assertTrue(any('UNION' in sql for sql in feed_queries))
+
+    def test_organisor_entry_matching_both_branches_listed_once(self):
+        log = ActivityLog.objects.create(
+            user=self.organisor_user, action=ACTION_LEAD_CREATED, organisation=self.organisation,
+        )
+        self.client.login(username='alorg', password='testpass123')
+        response = self.client.get(reverse('activity_log:activity-log-list'))
+        self.assertEqual([entry.pk for entry in response.context['activity_logs']], [log.pk])
+
+    def test_invalid_cursor_shows_first_page(self):
+        ActivityLog.objects.create(user=self.admin, action=ACTION_LEAD_CREATED)
+        self.client.login(username='aladmin', password='testpass123')
+        response = self.client.get(reverse('activity_log:activity-log-list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['activity_logs']), 1)
+
+    def test_superuser_filters_kept_in_cursor_links(self):
+        for i in range(31):
+            ActivityLog.objects.create(user=self.organisor_user, action=ACTION_LEAD_CREATED)
+        self.client.login(username='aladmin', password='testpass123')
+        response = self.client.get(reverse('activity_log:activity-log-list'), {'user': self.organisor_user.pk})
+        self.assertIn(f'user={self.organisor_user.pk}', response.context['older_url'])
@@ -0,0 +1,172 @@
+"""
+Tests for activity_log.writer – buffered and async activity log writes.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from activity_log import writer
+from activity_log.middleware import ActivityLogBufferMiddleware
+from activity_log.models import (
+    ActivityLog, log_activity, ACTION_AGENT_DELETED, ACTION_LEAD_CREATED, ACTION_LEAD_UPDATED,
+    ACTION_ORGANISOR_DELETED,
+)
+from leads.models import Agent, UserProfile
+from organisors.models import Organisor
+
+User = get_user_model()
+
+
+@override_settings(ACTIVITY_LOG_WRITE_MODE='buffered')
+class TestBufferedWrites(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='bufferuser', email='bufferuser@test.com', password='testpass123',
+            is_organisor=True,
+        )
+
+    def test_entries_are_written_in_one_query_when_buffer_closes(self):
+        with writer.activity_buffer():
+            with self.captureOnCommitCallbacks(execute=True):
+                first = log_activity(self.user, ACTION_LEAD_CREATED, object_type='lead', object_id=1)
+                second = log_activity(self.user, ACTION_LEAD_UPDATED, object_type='lead', object_id=1)
+            self.assertIsNone(first.pk)
+            self.assertEqual(ActivityLog.objects.count(), 0)
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('action', flat=True)),
+            [ACTION_LEAD_CREATED, ACTION_LEAD_UPDATED],
+        )
+        self.assertIsNotNone(second.pk)
+
+    def test_flush_uses_single_insert(self):
+        entries = [
+            ActivityLog(user=self.user, action=ACTION_LEAD_CREATED, object_type='lead', object_id=i)
+            for i in range(5)
+        ]
+        with self.assertNumQueries(1):
+            writer.flush(entries)
+        self.assertEqual(ActivityLog.objects.count(), 5)
+
+    def test_entries_from_rolled_back_transaction_are_dropped(self):
+        with writer.activity_buffer():
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        log_activity(self.user, ACTION_LEAD_CREATED, object_type='lead', object_id=1)
+                        raise ValueError('rollback')
+                except ValueError:
+                    pass
+        self.assertFalse(ActivityLog.objects.exists())
+
+    def test_entry_outside_buffer_is_written_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            log_activity(self.user, ACTION_LEAD_CREATED, object_type='lead', object_id=3)
+        self.assertTrue(ActivityLog.objects.filter(object_id=3).exists())
+
+    def test_anonymous_user_is_not_logged(self):
+        self.assertIsNone(log_activity(None, ACTION_LEAD_CREATED))
+
+    def test_middleware_flushes_request_entries_together(self):
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                log_activity(self.user, ACTION_LEAD_CREATED, object_type='lead', object_id=7)
+                log_activity(self.user, ACTION_LEAD_UPDATED, object_type='lead', object_id=7)
+            self.assertFalse(ActivityLog.objects.exists())
+            return HttpResponse('ok')
+
+        middleware = ActivityLogBufferMiddleware(view)
+        with mock.patch.object(writer, 'write', wraps=writer.write) as write:
+            response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+        write.assert_called_once()
+        self.assertEqual(ActivityLog.objects.filter(object_id=7).count(), 2)
+
+
+@override_settings(ACTIVITY_LOG_WRITE_MODE='async')
+class TestAsyncWrites(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='asyncuser', email='asyncuser@test.com', password='testpass123',
+            is_organisor=True,
+        )
+
+    def test_flush_hands_batch_to_background_writer(self):
+        with mock.patch.object(writer.background_writer, 'submit') as submit:
+            with writer.activity_buffer():
+                with self.captureOnCommitCallbacks(execute=True):
+                    log_activity(self.user, ACTION_LEAD_CREATED, object_type='lead', object_id=1)
+                    log_activity(self.user, ACTION_LEAD_UPDATED, object_type='lead', object_id=1)
+        submit.assert_called_once()
+        self.assertEqual(len(submit.call_args.args[0]), 2)
+        self.assertFalse(ActivityLog.objects.exists())
+
+    def test_background_writer_writes_submitted_batches(self):
+        background = writer.BackgroundWriter()
+        with mock.patch.object(writer, 'write') as write, \
+                mock.patch.object(writer, 'close_old_connections'):
+            background.submit([ActivityLog(user=self.user, action=ACTION_LEAD_CREATED)])
+            background.submit([ActivityLog(user=self.user, action=ACTION_LEAD_UPDATED)])
+            background.drain()
+        written = [entry.action for call in write.call_args_list for entry in call.args[0]]
+        self.assertEqual(written, [ACTION_LEAD_CREATED, ACTION_LEAD_UPDATED])
+
+
+@override_settings(
+    ACTIVITY_LOG_WRITE_MODE='buffered',
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class TestBufferedDeleteViews(TransactionTestCase):
+    """The request commits for real, so the batch is written after the logged objects are gone."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='bufferadmin', email='bufferadmin@test.com', password='testpass123',
+        )
+        self.organisor = User.objects.create_user(
+            username='bufferorg', email='bufferorg@test.com', password='testpass123',
+            is_organisor=True, email_verified=True,
+        )
+        self.organisation = UserProfile.objects.get(user=self.organisor)
+
+    def test_organisor_delete_is_logged_without_the_deleted_organisation(self):
+        organisor = Organisor.objects.create(user=self.organisor, organisation=self.organisation)
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('organisors:organisor-delete', args=[organisor.pk]))
+        self.assertEqual(response.status_code, 302)
+        entry = ActivityLog.objects.get(action=ACTION_ORGANISOR_DELETED)
+        self.assertIsNone(entry.organisation_id)
+        self.assertEqual(entry.user, self.admin)
+
+    def test_agent_delete_is_logged(self):
+        agent_user = User.objects.create_user(
+            username='bufferagent', email='bufferagent@test.com', password='testpass123',
+            is_agent=True, email_verified=True,
+        )
+        agent = Agent.objects.create(user=agent_user, organisation=self.organisation)
+        self.client.force_login(self.organisor)
+        response = self.client.post(reverse('agents:agent-delete', args=[agent.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Agent.objects.filter(pk=agent.pk).exists())
+        entry = ActivityLog.objects.get(action=ACTION_AGENT_DELETED)
+        self.assertEqual(entry.organisation, self.organisation)
+
+    def test_one_bad_entry_does_not_lose_the_batch(self):
+        other = User.objects.create_user(username='buffergone', email='buffergone@test.com', password='testpass123')
+        entries = [
+            ActivityLog(user=self.admin, action=ACTION_LEAD_CREATED),
+            ActivityLog(user=other, action=ACTION_LEAD_UPDATED),
+        ]
+        other.delete()
+        writer.write(entries)
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('action', 'user_id')),
+            sorted([(ACTION_LEAD_CREATED, self.admin.pk), (ACTION_LEAD_UPDATED, None)]),
+        )
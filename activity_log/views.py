@@ -1,25 +1,93 @@
+import base64
+import binascii
+from datetime import datetime
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views import generic
+from django.db import connection
 from django.db.models import Q
+from django.utils.http import urlencode
+from django.views import generic
+
+from djcrm.replica import ReplicaReadsMixin
 
 from .models import ActivityLog
 from leads.models import UserProfile, Agent
 
 User = get_user_model()
 
+ACTIVITY_LOG_PAGE_SIZE = 30
+
 
-class ActivityLogListView(LoginRequiredMixin, generic.ListView):
-    """List of actions performed by the user. Admin can see all records."""
+def encode_cursor(log):
+    """Opaque cursor for the (created_at, id) position of log."""
+    raw = f"{log.created_at.isoformat()}|{log.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """Return (created_at, id) from a cursor, or None when it is missing or malformed."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        created_at, pk = raw.split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(querysets, cursor=None, newer=False, size=ACTIVITY_LOG_PAGE_SIZE):
+    """
+    Fetch one page of activity logs ordered newest first by (created_at, id).
+    querysets are the branches of the feed (e.g. own actions and organisation actions);
+    several branches are combined with UNION so each one uses its own index instead of
+    an OR. cursor is the (created_at, id) to continue after: older entries by default,
+    newer ones when newer=True. No COUNT is run; returns (logs, has_more).
+    """
+    ordering = ("created_at", "id") if newer else ("-created_at", "-id")
+    position = Q()
+    if cursor is not None:
+        created_at, pk = cursor
+        if newer:
+            position = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        else:
+            position = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+    branches = [qs.filter(position).values_list("created_at", "id") for qs in querysets]
+    if len(branches) > 1:
+        if connection.features.supports_slicing_ordering_in_compound:
+            # Let every branch stop after one page of index entries
+            branches = [branch.order_by(*ordering)[:size + 1] for branch in branches]
+        else:
+            branches = [branch.order_by() for branch in branches]
+        combined = branches[0].union(*branches[1:])
+    else:
+        combined = branches[0]
+    rows = list(combined.order_by(*ordering)[:size + 1])
+    has_more = len(rows) > size
+    ids = [pk for _, pk in rows[:size]]
+    logs = ActivityLog.objects.select_related(
+        "user", "organisation", "organisation__user", "affected_agent", "affected_agent__user"
+    ).in_bulk(ids)
+    page = [logs[pk] for pk in ids if pk in logs]
+    if newer:
+        page.reverse()
+    return page, has_more
+
+
+class ActivityLogListView(ReplicaReadsMixin, LoginRequiredMixin, generic.ListView):
+    """
+    List of actions performed by the user. Admin can see all records.
+    Paginated with ?after= / ?before= cursors on (created_at, id) instead of page numbers.
+    """
     model = ActivityLog
     template_name = "activity_log/activity_log_list.html"
     context_object_name = "activity_logs"
-    paginate_by = 30
+    page_size = ACTIVITY_LOG_PAGE_SIZE
 
-    def get_queryset(self):
-        qs = ActivityLog.objects.select_related(
-            "user", "organisation", "organisation__user", "affected_agent", "affected_agent__user"
-        ).order_by("-created_at")
+    def get_feed_querysets(self):
+        """Querysets whose union is the user's activity feed."""
+        qs = ActivityLog.objects.all()
         if self.request.user.is_superuser:
             # Admin: optional user or organisation filter
             user_id = self.request.GET.get("user")
@@ -28,25 +96,48 @@ class ActivityLogListView(LoginRequiredMixin, generic.ListView):
                 qs = qs.filter(user_id=user_id)
             if org_id:
                 qs = qs.filter(organisation_id=org_id)
-            return qs
+            return [qs]
         if self.request.user.is_organisor:
             # Organisor: own actions + all activities in their organisation
             org = getattr(self.request.user, "userprofile", None)
             if org:
-                qs = qs.filter(Q(user=self.request.user) | Q(organisation=org))
-            else:
-                qs = qs.filter(user=self.request.user)
-            return qs
+                return [qs.filter(user=self.request.user), qs.filter(organisation=org)]
+            return [qs.filter(user=self.request.user)]
         # Agent: own actions + activities that affect them (lead/task assigned to them, order for their lead)
         agent_obj = Agent.objects.filter(user=self.request.user).first()
         if agent_obj:
-            qs = qs.filter(Q(user=self.request.user) | Q(affected_agent=agent_obj))
-        else:
-            qs = qs.filter(user=self.request.user)
-        return qs
+            return [qs.filter(user=self.request.user), qs.filter(affected_agent=agent_obj)]
+        return [qs.filter(user=self.request.user)]
+
+    def get_queryset(self):
+        querysets = self.get_feed_querysets()
+        before = decode_cursor(self.request.GET.get("before"))
+        after = decode_cursor(self.request.GET.get("after"))
+        if before is not None:
+            logs, has_more = keyset_page(querysets, before, newer=True, size=self.page_size)
+            if has_more:
+                self.has_newer, self.has_older = True, True
+                return logs
+            # Reached the newest entries: show the regular first page
+            after = None
+        logs, has_more = keyset_page(querysets, after, size=self.page_size)
+        self.has_newer, self.has_older = after is not None, has_more
+        return logs
+
+    def _page_url(self, direction, log):
+        params = {}
+        if self.request.user.is_superuser:
+            for key in ("user", "organisation"):
+                if self.request.GET.get(key):
+                    params[key] = self.request.GET[key]
+        params[direction] = encode_cursor(log)
+        return f"?{urlencode(params)}"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        logs = context["activity_logs"]
+        context["newer_url"] = self._page_url("before", logs[0]) if logs and self.has_newer else None
+        context["older_url"] = self._page_url("after", logs[-1]) if logs and self.has_older else None
         if self.request.user.is_superuser:
             context["filter_users"] = User.objects.filter(is_active=True).order_by("username")[:100]
             context["filter_organisations"] = UserProfile.objects.filter(
@@ -0,0 +1,181 @@
+"""
+Activity log writer: how log_activity entries reach the database.
+
+ACTIVITY_LOG_WRITE_MODE selects the strategy:
+- "sync": every log_activity call INSERTs its row immediately.
+- "buffered": entries are collected for the current request (ActivityLogBufferMiddleware)
+  or activity_buffer() block and written with a single bulk_create when it ends.
+- "async": as buffered, but the batch is handed to a background thread that does the
+  bulk_create, so audit logging adds no write round-trip to the request.
+
+In the buffered modes an entry only joins the buffer once the transaction it was logged
+in commits (transaction.on_commit), so rolled back work leaves no audit rows.
+"""
+import atexit
+import contextvars
+import logging
+import queue
+import threading
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+WRITE_MODE_SYNC = 'sync'
+WRITE_MODE_BUFFERED = 'buffered'
+WRITE_MODE_ASYNC = 'async'
+
+# Rows per INSERT statement when writing a batch
+BULK_CREATE_BATCH_SIZE = 500
+
+_buffer = contextvars.ContextVar('activity_log_buffer', default=None)
+
+
+def write_mode():
+    return getattr(settings, 'ACTIVITY_LOG_WRITE_MODE', WRITE_MODE_SYNC)
+
+
+def enqueue(entry):
+    """Queue an unsaved ActivityLog to be written once the current transaction commits."""
+    transaction.on_commit(lambda: _add(entry), robust=True)
+
+
+def _add(entry):
+    entries = _buffer.get()
+    if entries is None:
+        # Logged outside a request/activity_buffer() (e.g. a management command)
+        flush([entry])
+    else:
+        entries.append(entry)
+
+
+@contextmanager
+def activity_buffer():
+    """Collect the entries logged inside the block and flush them together on exit."""
+    token = _buffer.set([])
+    try:
+        yield
+    finally:
+        entries = _buffer.get()
+        _buffer.reset(token)
+        flush(entries)
+
+
+@asynccontextmanager
+async def aactivity_buffer():
+    """activity_buffer() for async code: the batch is flushed on a worker thread."""
+    token = _buffer.set([])
+    try:
+        yield
+    finally:
+        entries = _buffer.get()
+        _buffer.reset(token)
+        if entries:
+            await sync_to_async(flush)(entries)
+
+
+def flush(entries):
+    """Write entries now, or hand them to the background writer in async mode."""
+    if not entries:
+        return
+    if write_mode() == WRITE_MODE_ASYNC:
+        background_writer.submit(entries)
+    else:
+        write(entries)
+
+
+def write(entries):
+    """Insert entries with one bulk_create; failures are logged, never raised."""
+    from .models import ActivityLog
+
+    # One INSERT is atomic on its own; several must not leave part of a batch behind for the retry
+    atomic = transaction.atomic() if len(entries) > BULK_CREATE_BATCH_SIZE else nullcontext()
+    try:
+        with atomic:
+            ActivityLog.objects.bulk_create(entries, batch_size=BULK_CREATE_BATCH_SIZE)
+        return
+    except (IntegrityError, ValueError):
+        # Usually a user/organisation/agent deleted after the entry was logged (e.g. "organisor
+        # deleted"); retry below without it rather than losing the whole batch
+        pass
+    except Exception:
+        logger.exception(
+            "Failed to write %d activity log entries: actions=%s",
+            len(entries), sorted({entry.action for entry in entries}),
+        )
+        return
+    _clear_deleted_references(entries)
+    for entry in entries:
+        entry.pk = None
+        try:
+            ActivityLog.objects.bulk_create([entry])
+        except Exception:
+            logger.exception(
+                "Failed to write activity log entry: action=%s object_type=%s object_id=%s",
+                entry.action, entry.object_type, entry.object_id,
+            )
+
+
+def _clear_deleted_references(entries):
+    """Set the foreign keys of entries whose target no longer exists to NULL, as on_delete=SET_NULL would have."""
+    from .models import ActivityLog
+
+    for field in ActivityLog._meta.concrete_fields:
+        if not field.is_relation:
+            continue
+        ids = {getattr(entry, field.attname) for entry in entries} - {None}
+        existing = set(field.related_model._base_manager.filter(pk__in=ids).values_list('pk', flat=True))
+        for entry in entries:
+            related = field.get_cached_value(entry, None)
+            if getattr(entry, field.attname) not in existing or (related is not None and related.pk is None):
+                # Assigning the field (not attname) also drops the cached, deleted instance
+                setattr(entry, field.name, None)
+
+
+class BackgroundWriter:
+    """Daemon thread that writes queued batches, merging batches that arrive together."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, entries):
+        self._start()
+        self._queue.put(list(entries))
+
+    def drain(self):
+        """Block until every submitted batch has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            taken = 1
+            try:
+                while len(batch) < BULK_CREATE_BATCH_SIZE:
+                    batch.extend(self._queue.get_nowait())
+                    taken += 1
+            except queue.Empty:
+                pass
+            try:
+                # The thread keeps its own connection; drop it if it went stale
+                close_old_connections()
+                write(batch)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+
+
+background_writer = BackgroundWriter()
+atexit.register(background_writer.drain)
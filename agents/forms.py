@@ -6,6 +6,7 @@ from django.core.files.uploadedfile import UploadedFile
 from leads.models import UserProfile
 from phonenumber_field.formfields import PhoneNumberField
 from leads.forms import PhoneNumberWidget, validate_image_upload
+from leads.images import compress_image_upload
 
 User = get_user_model()
 
@@ -123,6 +124,7 @@ class AgentModelForm(forms.ModelForm):
 		upload = self.cleaned_data.get('profile_image')
 		if upload and isinstance(upload, UploadedFile):
 			validate_image_upload(upload)
+			upload = compress_image_upload(upload)
 		return upload
 
 	def save(self, commit=True):
@@ -205,6 +207,7 @@ class AdminAgentModelForm(forms.ModelForm):
 		upload = self.cleaned_data.get('profile_image')
 		if upload and isinstance(upload, UploadedFile):
 			validate_image_upload(upload)
+			upload = compress_image_upload(upload)
 		return upload
 
 	def save(self, commit=True):
@@ -312,6 +315,7 @@ class OrganisorAgentModelForm(forms.ModelForm):
 		upload = self.cleaned_data.get('profile_image')
 		if upload and isinstance(upload, UploadedFile):
 			validate_image_upload(upload)
+			upload = compress_image_upload(upload)
 		return upload
 
 	def save(self, commit=True):
@@ -498,6 +502,7 @@ class OrganisorAgentCreateForm(forms.ModelForm):
 		upload = self.cleaned_data.get('profile_image')
 		if upload and isinstance(upload, UploadedFile):
 			validate_image_upload(upload)
+			upload = compress_image_upload(upload)
 		return upload
 
 	def clean_email(self):
@@ -578,6 +583,7 @@ class AdminAgentCreateForm(forms.ModelForm):
 		upload = self.cleaned_data.get('profile_image')
 		if upload and isinstance(upload, UploadedFile):
 			validate_image_upload(upload)
+			upload = compress_image_upload(upload)
 		return upload
 	password1 = forms.CharField(
 		label='Password',
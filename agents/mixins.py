@@ -2,48 +2,44 @@ from django.contrib.auth.mixins import AccessMixin
 from django.shortcuts import redirect
 from django.http import Http404
 from leads.models import Agent
+from leads.tenant import TenantMixin, get_tenant
 
 
-class OrganisorAndLoginRequiredMixin(AccessMixin):
+class OrganisorAndLoginRequiredMixin(TenantMixin, AccessMixin):
     """Verify that the current user is authenticated and is an organisor or admin."""
     def dispatch(self, request, *args, **kwargs):
+        tenant = get_tenant(request)
         if not request.user.is_authenticated:
             return redirect("leads:lead-list")
         
         # Admin can access everything
-        if request.user.is_superuser or self.is_admin_user(request.user):
+        if tenant.is_admin:
             return super().dispatch(request, *args, **kwargs)
             
         # Organisors can access
-        if request.user.is_organisor:
+        if tenant.is_organisor:
             return super().dispatch(request, *args, **kwargs)
             
         return redirect("leads:lead-list")
-    
-    def is_admin_user(self, user):
-        """
-        Check if user is admin/superuser.
-        Uses Django's is_superuser flag for proper admin detection.
-        """
-        return user.is_superuser
 
 
-class AgentAndOrganisorLoginRequiredMixin(AccessMixin):
+class AgentAndOrganisorLoginRequiredMixin(TenantMixin, AccessMixin):
     """Allow both agents and organisors, but restrict agent access to their own data."""
     def dispatch(self, request, *args, **kwargs):
+        tenant = get_tenant(request)
         if not request.user.is_authenticated:
             return redirect("leads:lead-list")
         
         # Admin can access everything
-        if request.user.is_superuser or self.is_admin_user(request.user):
+        if tenant.is_admin:
             return super().dispatch(request, *args, **kwargs)
         
         # Organisors can see everything
-        if request.user.is_organisor:
+        if tenant.is_organisor:
             return super().dispatch(request, *args, **kwargs)
         
         # Agents can only see their own profiles
-        if request.user.is_agent:
+        if tenant.is_agent:
             # pk check for Detail and Update views
             if 'pk' in kwargs:
                 try:
@@ -56,35 +52,22 @@ class AgentAndOrganisorLoginRequiredMixin(AccessMixin):
         
         # If neither organisor nor agent, redirect
         return redirect("leads:lead-list")
-    
-    def is_admin_user(self, user):
-        """
-        Check if user is admin/superuser.
-        Uses Django's is_superuser flag for proper admin detection.
-        """
-        return user.is_superuser
 
 
-class ProductsAndStockAccessMixin(AccessMixin):
+class ProductsAndStockAccessMixin(TenantMixin, AccessMixin):
     """Allow agents and organisors to access products from their organization."""
     def dispatch(self, request, *args, **kwargs):
+        tenant = get_tenant(request)
         if not request.user.is_authenticated:
             return redirect("leads:lead-list")
         
         # Admin can access everything
-        if request.user.is_superuser or self.is_admin_user(request.user):
+        if tenant.is_admin:
             return super().dispatch(request, *args, **kwargs)
         
         # Organisors and agents can access
-        if request.user.is_organisor or request.user.is_agent:
+        if tenant.is_organisor or tenant.is_agent:
             return super().dispatch(request, *args, **kwargs)
         
         # Neither organisor nor agent - redirect
         return redirect("leads:lead-list")
-    
-    def is_admin_user(self, user):
-        """
-        Check if user is admin/superuser.
-        Uses Django's is_superuser flag for proper admin detection.
-        """
-        return user.is_superuser
\ No newline at end of file
@@ -3,8 +3,10 @@ Agent Forms Test File
 This file tests all forms related to Agent.
 """
 
+import tempfile
+
 import django
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core import mail
@@ -457,6 +459,7 @@ class TestAgentCreateForm(TestCase):
         self.assertIn('placeholder="Last Name"', str(form['last_name'].as_widget()))
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class TestAdminAgentCreateForm(TestCase):
     """AdminAgentCreateForm tests"""
     
@@ -587,6 +590,7 @@ class TestAdminAgentCreateForm(TestCase):
         self.assertIn('class="form-control"', str(form['organisation'].as_widget()))
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class TestAgentFormIntegration(TestCase):
     """Agent form integration tests"""
     
@@ -3,6 +3,8 @@ Agent View Test File - Simple Version
 This file contains simple view tests for the Agent module.
 """
 
+import tempfile
+
 from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -21,7 +23,7 @@ VALID_JPEG_BYTES = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x0
 SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestAgentViewsSimple(TestCase):
     """Simple Agent View tests"""
     
@@ -124,7 +126,7 @@ class TestAgentViewsSimple(TestCase):
         
         self.assertEqual(response.status_code, 200)
     
-    @patch('agents.views.send_mail')
+    @patch('agents.views.queue_mail')
     def test_agent_create_view_valid_data_organisor(self, mock_send_mail):
         """Create agent with valid data as organisor test (profile_image required)"""
         self.client.login(username='organisor_simple', password='testpass123')
@@ -1,11 +1,11 @@
 import logging
 import random
-from django.core.mail import send_mail
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import reverse
 from django.conf import settings
 from leads.models import Agent, UserProfile, User, EmailVerificationToken
+from leads.outbox import queue_mail
 from activity_log.models import log_activity, ACTION_AGENT_CREATED, ACTION_AGENT_UPDATED, ACTION_AGENT_DELETED
 from .forms import AgentModelForm, AgentCreateForm, AdminAgentCreateForm, AdminAgentModelForm, OrganisorAgentCreateForm, OrganisorAgentModelForm
 from .mixins import OrganisorAndLoginRequiredMixin, AgentAndOrganisorLoginRequiredMixin
@@ -161,13 +161,7 @@ class AgentCreateView(OrganisorAndLoginRequiredMixin, generic.CreateView):
         Darkenyas CRM Team
         """
         
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
+        queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
 
 
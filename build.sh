@@ -8,6 +8,9 @@ set -o errexit  # exit on error
 pip install --upgrade pip
 pip install -r requirements.txt
 
+# Compile the Tailwind stylesheet from the classes used in templates (before collectstatic hashes it)
+python manage.py build_css
+
 # Collect static files
 python manage.py collectstatic --no-input
 
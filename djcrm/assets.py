@@ -0,0 +1,141 @@
+"""
+Compiled Tailwind stylesheet.
+
+Pages used to load the Tailwind Play CDN script, which compiles the CSS in every visitor's
+browser. build_stylesheet() runs the Tailwind standalone CLI (a single binary, no Node) over
+every template and source file that can contain class names and writes only the utilities
+actually used, minified, to static/<TAILWIND_CSS>. build.sh runs it (manage.py build_css)
+before collectstatic, whose manifest storage gives the file a content-hashed name that
+WhiteNoise serves compressed with a far-future, immutable Cache-Control.
+"""
+import hashlib
+import os
+import platform
+import shutil
+import stat
+import subprocess
+import urllib.request
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+
+DOWNLOAD_URL = 'https://github.com/tailwindlabs/tailwindcss/releases/download/v{version}/{asset}'
+# SHA-256 of each standalone CLI release asset, by TAILWIND_VERSION. v3 releases publish
+# no checksum file, so they are pinned here; TAILWIND_CLI_SHA256 overrides the entry.
+CLI_SHA256 = {
+    '3.4.16': {
+        'tailwindcss-linux-x64': '33f254b54c8754f16efbe2be1de38ca25192630dc36f164595a770d4bbf4d893',
+        'tailwindcss-linux-arm64': '1e6746bba6f3d34d7550889a1a009ab90ee3794a5ebce60ed10688ad10680a87',
+        'tailwindcss-macos-x64': '220962a6f371fc31605f89569ad647309cbd83471cd8c29b83f235a501c39dce',
+        'tailwindcss-macos-arm64': '01751c6019c1b4bf787d2e0b1f221bef1bcc010cef55313fc0691f3b6a3b676f',
+        'tailwindcss-windows-x64.exe': 'ec5ca0d0c1d55d163afcb42a4fff730d240430afd433be00c005473dd87589c8',
+        'tailwindcss-windows-arm64.exe': 'a3c30434d9e72bfecd4b7d69ae70f8077c61b1d36b141ddaefb595550985bb68',
+    },
+}
+
+
+class AssetBuildError(Exception):
+    """The Tailwind CLI is unavailable or failed."""
+
+
+def source_path():
+    return Path(settings.BASE_DIR) / 'assets' / 'tailwind.css'
+
+
+def output_path():
+    return Path(settings.STATICFILES_DIRS[0]) / settings.TAILWIND_CSS
+
+
+def content_globs():
+    """
+    Files scanned for class names: the project and app templates (including the
+    crispy-tailwind form templates), app Python modules (widget attrs, template tags)
+    and the static JavaScript.
+    """
+    base_dir = Path(settings.BASE_DIR)
+    globs = [
+        str(base_dir / 'templates' / '**' / '*.html'),
+        str(base_dir / '*' / 'templates' / '**' / '*.html'),
+        str(base_dir / '*' / '*.py'),
+        str(base_dir / '*' / 'templatetags' / '*.py'),
+        str(base_dir / 'static' / '**' / '*.js'),
+    ]
+    for config in apps.get_app_configs():
+        templates = Path(config.path) / 'templates'
+        if config.name.startswith('crispy_') and templates.is_dir():
+            globs.append(str(templates / '**' / '*.html'))
+    return globs
+
+
+def _release_asset():
+    system = {'Linux': 'linux', 'Darwin': 'macos', 'Windows': 'windows'}.get(platform.system())
+    machine = {'x86_64': 'x64', 'amd64': 'x64', 'arm64': 'arm64', 'aarch64': 'arm64'}.get(platform.machine().lower())
+    if not system or not machine:
+        raise AssetBuildError(f'No Tailwind CLI build for {platform.system()} {platform.machine()}; set TAILWIND_CLI')
+    return f"tailwindcss-{system}-{machine}{'.exe' if system == 'windows' else ''}"
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tailwind_cli():
+    """
+    Path of the Tailwind CLI: TAILWIND_CLI, a tailwindcss on PATH, or the pinned
+    TAILWIND_VERSION release downloaded into .tailwind/ in the project. A downloaded
+    binary is only run if it matches the pinned CLI_SHA256 checksum of this platform's
+    release asset (or TAILWIND_CLI_SHA256), so a tampered download or cache never executes.
+    """
+    configured = os.getenv('TAILWIND_CLI') or shutil.which('tailwindcss')
+    if configured:
+        return configured
+    asset = _release_asset()
+    expected = settings.TAILWIND_CLI_SHA256 or CLI_SHA256.get(settings.TAILWIND_VERSION, {}).get(asset, '')
+    expected = expected.strip().lower()
+    if not expected:
+        raise AssetBuildError(
+            f'No checksum is pinned for the {asset} v{settings.TAILWIND_VERSION} release asset; set '
+            'TAILWIND_CLI_SHA256 to its SHA-256 to download it, or TAILWIND_CLI to an installed binary'
+        )
+    cached = Path(settings.BASE_DIR) / '.tailwind' / settings.TAILWIND_VERSION / asset
+    if cached.exists() and _sha256(cached) == expected:
+        return str(cached)
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    url = DOWNLOAD_URL.format(version=settings.TAILWIND_VERSION, asset=asset)
+    partial = cached.with_suffix('.part')
+    try:
+        urllib.request.urlretrieve(url, partial)
+    except OSError as exc:
+        raise AssetBuildError(f'Could not download the Tailwind CLI from {url}: {exc}')
+    actual = _sha256(partial)
+    if actual != expected:
+        partial.unlink()
+        raise AssetBuildError(f'The Tailwind CLI from {url} has SHA-256 {actual}, expected {expected}')
+    partial.chmod(partial.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    partial.replace(cached)
+    return str(cached)
+
+
+def build_command(cli, minify=True):
+    command = [
+        cli, '--input', str(source_path()), '--output', str(output_path()),
+        '--content', ','.join(content_globs()),
+    ]
+    if minify:
+        command.append('--minify')
+    return command
+
+
+def build_stylesheet(cli=None, minify=True):
+    """Compile the stylesheet and return its path."""
+    output = output_path()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    result = subprocess.run(build_command(cli or tailwind_cli(), minify), capture_output=True, text=True)
+    if result.returncode != 0 or not output.exists():
+        raise AssetBuildError(result.stderr.strip() or f'tailwindcss exited with status {result.returncode}')
+    return output
@@ -0,0 +1,16 @@
+"""
+Database helpers shared by the apps' maintenance commands (prune_notifications,
+clear_expired_sessions, send_queued_emails).
+"""
+
+
+def delete_in_chunks(queryset, chunk_size):
+    """Delete the rows of queryset chunk_size primary keys at a time; returns the number deleted."""
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by().values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=pks).delete()[1].get(queryset.model._meta.label, 0)
+        if len(pks) < chunk_size:
+            return deleted
@@ -0,0 +1,119 @@
+"""
+Small on-disk cache of hot media objects for the media proxy.
+Objects fetched from remote storage (R2) are kept under MEDIA_PROXY_CACHE_DIR so repeated
+requests for the same lead/profile photo skip the R2 round-trip. Entries expire after
+MEDIA_PROXY_CACHE_TTL seconds and the least recently used files are dropped once the
+directory exceeds MEDIA_PROXY_CACHE_MAX_BYTES.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedMedia:
+    """A cached object: local file path plus the validators served to clients."""
+    file_path: Path
+    size: int
+    etag: str
+    last_modified: float
+
+
+def _cache_dir():
+    directory = getattr(settings, "MEDIA_PROXY_CACHE_DIR", None)
+    return Path(directory) if directory else None
+
+
+def _entry_paths(name):
+    digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+    directory = _cache_dir()
+    return directory / f"{digest}.bin", directory / f"{digest}.json"
+
+
+def is_enabled():
+    return _cache_dir() is not None and getattr(settings, "MEDIA_PROXY_CACHE_MAX_BYTES", 0) > 0
+
+
+def get(name, now):
+    """Return the CachedMedia for name, or None when missing or older than the TTL."""
+    if not is_enabled():
+        return None
+    data_path, meta_path = _entry_paths(name)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        if now - meta["cached_at"] > getattr(settings, "MEDIA_PROXY_CACHE_TTL", 3600):
+            evict(name)
+            return None
+        # Touch the data file so trimming drops the least recently used entries first
+        os.utime(data_path)
+        return CachedMedia(data_path, meta["size"], meta["etag"], meta["last_modified"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def put(name, content, etag, last_modified, now):
+    """Store content for name and return its CachedMedia (None if it cannot be cached)."""
+    if not is_enabled() or len(content) > getattr(settings, "MEDIA_PROXY_CACHE_MAX_OBJECT_BYTES", 0):
+        return None
+    directory = _cache_dir()
+    data_path, meta_path = _entry_paths(name)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        # Write to temp files and rename so concurrent workers never read a partial entry
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            tmp.write(content)
+        os.replace(tmp.name, data_path)
+        meta = {"size": len(content), "etag": etag, "last_modified": last_modified, "cached_at": now}
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, encoding="utf-8") as tmp:
+            json.dump(meta, tmp)
+        os.replace(tmp.name, meta_path)
+        _trim(directory)
+    except OSError:
+        logger.warning("Media cache write failed for %s", name, exc_info=True)
+        return None
+    return CachedMedia(data_path, len(content), etag, last_modified)
+
+
+def evict(name):
+    """Drop the cached copy of name (e.g. after the file was replaced)."""
+    if _cache_dir() is None:
+        return
+    for entry in _entry_paths(name):
+        try:
+            entry.unlink()
+        except OSError:
+            pass
+
+
+def _trim(directory):
+    """Remove least recently used entries until the cache fits MEDIA_PROXY_CACHE_MAX_BYTES."""
+    max_bytes = getattr(settings, "MEDIA_PROXY_CACHE_MAX_BYTES", 0)
+    entries = []
+    total = 0
+    for data_path in directory.glob("*.bin"):
+        try:
+            stat = data_path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, data_path))
+        total += stat.st_size
+    if total <= max_bytes:
+        return
+    for _, size, data_path in sorted(entries):
+        for entry in (data_path, data_path.with_suffix(".json")):
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+        total -= size
+        if total <= max_bytes:
+            break
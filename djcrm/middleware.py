@@ -0,0 +1,35 @@
+"""
+Project-wide middleware.
+
+WhiteNoise's middleware is sync-only, and one sync middleware makes Django run the whole
+chain below it in a thread under ASGI, so the async views would block a thread for each
+request like a WSGI worker does.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that also runs in an async chain; only static file hits use a thread."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # Opens the file and stats it
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,133 @@
+"""
+Read-replica routing for reporting pages.
+
+With DATABASE_REPLICA_URL set, settings defines a second database alias (REPLICA_DATABASE_ALIAS)
+and ReplicaRouter sends reads made inside replica_reads() to it; everything else, and every
+write, stays on "default". Reporting views opt in with ReplicaReadsMixin (class-based) or
+@use_replica (function views).
+
+Read-your-writes: a replica lags the primary by a moment, so ReplicaPinMiddleware sets a short
+lived cookie after any POST/PUT/PATCH/DELETE, and while it is present that browser's reporting
+reads go to the primary (REPLICA_PIN_SECONDS). Without a replica alias all of this is a no-op.
+"""
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def replica_alias():
+    """The configured replica alias, or None when reads cannot be offloaded."""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route the reads made inside the block to the replica (when one is configured)."""
+    token = _use_replica.set(enabled and replica_alias() is not None)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def is_pinned(request):
+    """True while the request's browser recently wrote and must read from the primary."""
+    try:
+        return float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _dispatch_on_replica(request, view, *args, **kwargs):
+    with replica_reads(not is_pinned(request)):
+        response = view(request, *args, **kwargs)
+        # Template responses run their queries while rendering: do it while still routed
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+    request.replica_reads = True
+    return response
+
+
+class ReplicaRouter:
+    """Database router: reads inside replica_reads() go to the replica, all else to default."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of default: objects read from either can be related
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    Serve the view's reads from the replica. Only replica_methods are routed (report filters
+    posted as forms can add 'POST'); a browser that just wrote is served from the primary.
+    """
+    replica_methods = ('GET', 'HEAD')
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in self.replica_methods:
+            return super().dispatch(request, *args, **kwargs)
+        return _dispatch_on_replica(request, super().dispatch, *args, **kwargs)
+
+
+def use_replica(view):
+    """Function-view counterpart of ReplicaReadsMixin (GET and HEAD only)."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        return _dispatch_on_replica(request, view, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """After a write request, pin the browser's reporting reads to the primary for a few seconds."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if (
+            request.method not in SAFE_METHODS
+            and not getattr(request, 'replica_reads', False)
+            and replica_alias() is not None
+        ):
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, str(time.time() + seconds), max_age=seconds,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 import os
 import sys
+import tempfile
 from dotenv import load_dotenv
 import dj_database_url
 
@@ -88,15 +89,45 @@ INSTALLED_APPS = [
     'activity_log',
 ]
 
+# Activity log writes: 'sync' (one INSERT per entry), 'buffered' (one bulk INSERT per
+# request after commit) or 'async' (bulk INSERT on a background thread)
+ACTIVITY_LOG_WRITE_MODE = os.getenv('ACTIVITY_LOG_WRITE_MODE', 'buffered')
+
+# Activity log retention: entries older than this many days are moved to gzipped JSONL files
+# (<prefix>/YYYY/MM/DD/...) in the given storage by `manage.py archive_activity_logs`
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', '365'))
+ACTIVITY_LOG_ARCHIVE_STORAGE = os.getenv('ACTIVITY_LOG_ARCHIVE_STORAGE', 'default')
+ACTIVITY_LOG_ARCHIVE_PREFIX = 'activity_log_archive'
+
+# Notification retention (`manage.py prune_notifications`): read notifications are deleted after
+# this many days, unread ones after NOTIFICATION_UNREAD_RETENTION_DAYS (0 = never). Dedupe keys
+# of sent reminders are kept longer so cron commands never resend them.
+NOTIFICATION_READ_RETENTION_DAYS = int(os.getenv('NOTIFICATION_READ_RETENTION_DAYS', '30'))
+NOTIFICATION_UNREAD_RETENTION_DAYS = int(os.getenv('NOTIFICATION_UNREAD_RETENTION_DAYS', '0'))
+NOTIFICATION_KEY_RETENTION_DAYS = int(os.getenv('NOTIFICATION_KEY_RETENTION_DAYS', '400'))
+
+# Live navbar notifications (tasks/live.py). Writes in the same worker are pushed at once; those
+# from other workers and cron commands show up within NOTIFICATION_CHECK_SECONDS (SSE, ASGI mode)
+# or NOTIFICATION_POLL_SECONDS (polling, WSGI mode). A sync worker is held while a long poll
+# waits, so NOTIFICATION_LONG_POLL_SECONDS stays 0 unless the workers are threaded.
+NOTIFICATION_STREAM_SECONDS = int(os.getenv('NOTIFICATION_STREAM_SECONDS', '300'))
+NOTIFICATION_CHECK_SECONDS = int(os.getenv('NOTIFICATION_CHECK_SECONDS', '15'))
+NOTIFICATION_POLL_SECONDS = int(os.getenv('NOTIFICATION_POLL_SECONDS', '30'))
+NOTIFICATION_LONG_POLL_SECONDS = int(os.getenv('NOTIFICATION_LONG_POLL_SECONDS', '0'))
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'djcrm.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'leads.tenant.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'activity_log.middleware.ActivityLogBufferMiddleware',
+    'tasks.middleware.NotificationBatchMiddleware',
+    'djcrm.replica.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'djcrm.urls'
@@ -119,6 +150,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'djcrm.wsgi.application'
+ASGI_APPLICATION = 'djcrm.asgi.application'
+
+# Serving mode picked by start.sh: "wsgi" (sync gunicorn workers) or "asgi" (uvicorn workers).
+# In ASGI mode the media proxy and the JSON lookups are routed to their async views, and
+# persistent DB connections are off: Django opens them per request thread under ASGI, so
+# they would never be reused (use the provider's pooler, e.g. Neon's, instead).
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
+_conn_max_age = 0 if ASYNC_VIEWS else 600
 
 
 # Database
@@ -139,7 +179,7 @@ if _database_url:
     # DATABASE_URL: Render, Neon, or other PaaS providers
     _db_config = dj_database_url.config(
         default=_database_url,
-        conn_max_age=600,
+        conn_max_age=_conn_max_age,
         conn_health_checks=True,
     )
     # Neon serverless compatibility
@@ -171,15 +211,44 @@ else:
         }
     }
 
+# Optional read replica for reporting pages (djcrm/replica.py). Views using ReplicaReadsMixin
+# read from it unless the browser wrote in the last REPLICA_PIN_SECONDS (replication lag budget).
+# Locally a copy of the SQLite file works: DATABASE_REPLICA_URL=sqlite:////abs/path/replica.sqlite3
+_replica_url = os.getenv('DATABASE_REPLICA_URL')
+if _replica_url:
+    _replica_is_postgres = _replica_url.startswith(('postgres:', 'postgresql:'))
+    if _replica_is_postgres and 'options=' not in _replica_url.lower():
+        # Same search_path fix as the primary (Neon pooled connections)
+        _sep = '&' if '?' in _replica_url else '?'
+        _replica_url = f"{_replica_url}{_sep}options=-c%20search_path%3Dpublic"
+    DATABASES['replica'] = dj_database_url.parse(
+        _replica_url,
+        conn_max_age=_conn_max_age,
+        conn_health_checks=True,
+        disable_server_side_cursors=_replica_is_postgres,
+    )
+REPLICA_DATABASE_ALIAS = 'replica' if _replica_url else None
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '10'))
+DATABASE_ROUTERS = ['djcrm.replica.ReplicaRouter']
+
 # Test sırasında SQLite kullan (PostgreSQL kullanıcısında CREATEDB yoksa)
 if 'test' in sys.argv:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': ':memory:',
-        }
+        },
+        # Replica routing tests enable it with override_settings(REPLICA_DATABASE_ALIAS='replica')
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+            'TEST': {'MIRROR': 'default'},
+        },
     }
+    REPLICA_DATABASE_ALIAS = None
     RATELIMIT_ENABLE = False
+    # Tests run inside a transaction that never commits, so write activity logs immediately
+    ACTIVITY_LOG_WRITE_MODE = 'sync'
 
 
 # Password validation
@@ -223,6 +292,14 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'static_root'
 
+# Compiled Tailwind stylesheet (static path), built by `manage.py build_css` in build.sh with the
+# pinned standalone CLI; TAILWIND_CLI points at an already installed binary instead. The
+# download must match the checksum pinned for it in djcrm.assets.CLI_SHA256; TAILWIND_CLI_SHA256
+# overrides it, e.g. for a TAILWIND_VERSION that has no pinned checksums.
+TAILWIND_CSS = 'css/app.css'
+TAILWIND_VERSION = os.getenv('TAILWIND_VERSION', '3.4.16')
+TAILWIND_CLI_SHA256 = os.getenv('TAILWIND_CLI_SHA256', '')
+
 # Media files: use Cloudflare R2 in production when configured; else local filesystem
 USE_R2 = (
     os.getenv('USE_R2', '').lower() in ('true', '1', 'yes')
@@ -295,6 +372,14 @@ else:
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media proxy (/media-proxy/): short-lived cache of access decisions and a small local
+# disk cache of hot R2 objects (skipped when media is on the local filesystem).
+MEDIA_PROXY_ACCESS_CACHE_SECONDS = int(os.getenv('MEDIA_PROXY_ACCESS_CACHE_SECONDS', '60'))
+MEDIA_PROXY_CACHE_DIR = os.getenv('MEDIA_PROXY_CACHE_DIR') or str(Path(tempfile.gettempdir()) / 'djcrm-media-cache')
+MEDIA_PROXY_CACHE_MAX_BYTES = int(os.getenv('MEDIA_PROXY_CACHE_MAX_MB', '100')) * 1024 * 1024
+MEDIA_PROXY_CACHE_MAX_OBJECT_BYTES = 5 * 1024 * 1024
+MEDIA_PROXY_CACHE_TTL = int(os.getenv('MEDIA_PROXY_CACHE_TTL', '3600'))
+
 AUTH_USER_MODEL = 'leads.User'
 
 # Authentication backends
@@ -302,6 +387,46 @@ AUTHENTICATION_BACKENDS = [
     'leads.authentication.EmailOrUsernameModelBackend',
 ]
 
+# Cache: Redis when REDIS_URL is set (shared by all workers), otherwise per-process memory
+_redis_url = os.getenv('REDIS_URL', '')
+if _redis_url:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _redis_url,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+# Authenticated requests load request.user from the cache for this many seconds (0 disables).
+# Saving or deleting a user evicts its entry once committed, but only from the worker that
+# saved it when the cache is per-process: other workers would keep a deactivated user or an
+# old password's session hash until the TTL runs out, so it is off unless Redis is configured.
+AUTH_USER_CACHE_SECONDS = int(os.getenv('AUTH_USER_CACHE_SECONDS', '30' if _redis_url else '0'))
+
+# Conditional GET (djcrm/versions.py): per-organisation data versions live in the cache.
+# Without Redis each worker has its own copy, so a 304 can be this many seconds stale.
+DATA_VERSION_MAX_AGE_SECONDS = int(os.getenv('DATA_VERSION_MAX_AGE_SECONDS', '3600' if _redis_url else '60'))
+# Part of every ETag so a deploy (new templates) never answers from an old page
+DATA_VERSION_SALT = os.getenv('RENDER_GIT_COMMIT', '')
+
+# Sessions: SESSION_BACKEND = db | cached_db | signed_cookies.
+# db reads django_session on every authenticated request. cached_db serves reads from the
+# cache and needs REDIS_URL (a per-process cache would keep logged-out sessions alive in
+# other workers), so it is the default only when Redis is configured. signed_cookies keeps
+# the session in the (signed, not encrypted) cookie: no session queries and no shared cache,
+# but a logout cannot revoke copies of the cookie. Expired db rows are removed by
+# clear_expired_sessions.
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cached_db' if _redis_url else 'db')
+if SESSION_BACKEND not in ('db', 'cached_db', 'signed_cookies'):
+    raise ValueError(f"SESSION_BACKEND must be db, cached_db or signed_cookies, not {SESSION_BACKEND!r}")
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+
 # Email: Gmail API (Render blocks SMTP ports) or SMTP for local dev
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'your-email@gmail.com')
 _use_gmail_api = os.getenv('USE_GMAIL_API', '').lower() in ('true', '1', 'yes')
@@ -318,6 +443,25 @@ else:
     EMAIL_USE_TLS = True
     EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', 'your-email@gmail.com')
     EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', 'your-app-password-here')
+
+# Email outbox: when enabled, transactional emails are stored with the change that triggers
+# them and delivered by `python manage.py send_queued_emails` (cron every minute or --loop
+# worker). Leave off unless that command is running, or emails are never sent. Tests assert
+# on mail.outbox, so they always send immediately.
+EMAIL_OUTBOX = os.getenv('EMAIL_OUTBOX', '').lower() in ('true', '1', 'yes') and 'test' not in sys.argv
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+EMAIL_OUTBOX_SENT_RETENTION_DAYS = int(os.getenv('EMAIL_OUTBOX_SENT_RETENTION_DAYS', '7'))
+
+# Product CSV/XLSX uploads larger than this are imported in the background by
+# `python manage.py process_product_imports` (cron every minute or --loop worker)
+PRODUCT_IMPORT_SYNC_MAX_BYTES = int(os.getenv('PRODUCT_IMPORT_SYNC_MAX_KB', '1024')) * 1024
+
+# Sales dashboard snapshots are rebuilt after product, order and alert changes; this is the
+# staleness budget for changes that send no signal (queryset.update(), raw SQL).
+# `python manage.py refresh_dashboard_snapshots` rebuilds them ahead of the first visit.
+DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv('DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS', '300'))
+
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/login'
 LOGOUT_REDIRECT_URL = '/'
@@ -0,0 +1,139 @@
+"""
+Cold-start profiling.
+
+A new worker pays for every module imported while Django starts (settings, app registry,
+middleware, URLconf) and for whatever its first request pulls in. profile_startup() runs
+that in a fresh interpreter with -X importtime, so modules already loaded in the calling
+process don't hide anything, and returns the phase timings, the import time grouped by
+project app (an app is charged for the third-party modules it imports) and the heavy
+optional dependencies that got loaded.
+
+Those (HEAVY_MODULES) must stay behind their boundaries: the R2 storage backend, the Gmail
+email backend, the spreadsheet importer and the image code import them on first use.
+Used by the profile_startup command and the startup budget test.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+
+HEAVY_MODULES = (
+    'boto3', 'botocore', 'storages.backends.s3',  # R2 media storage
+    'googleapiclient', 'gmailapi_backend.mail',  # Gmail API email backend
+    'openpyxl',  # XLSX imports
+    'PIL',  # upload recompression and thumbnails
+)
+
+# Runs in the child interpreter: start Django the way a WSGI worker does, then serve one GET
+_CHILD = r'''
+import json, sys, time
+from io import BytesIO
+started = time.perf_counter()
+import django
+from django.conf import settings
+django.setup(set_prefix=False)
+setup_done = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()
+application_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+path, heavy = sys.argv[1], sys.argv[2:]
+host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+    'SERVER_NAME': host, 'SERVER_PORT': '443', 'HTTP_HOST': host, 'wsgi.url_scheme': 'https',
+    'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.multithread': False,
+    'wsgi.multiprocess': True, 'wsgi.run_once': False, 'wsgi.version': (1, 0),
+}
+status = []
+response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+b''.join(response)
+response.close()
+done = time.perf_counter()
+print(json.dumps({
+    'setup_seconds': setup_done - started,
+    'application_seconds': application_done - setup_done,
+    'urls_seconds': urls_done - application_done,
+    'first_response_seconds': done - urls_done,
+    'total_seconds': done - started,
+    'status': int(status[0].split()[0]) if status else None,
+    'heavy_modules': [name for name in heavy if name in sys.modules],
+}))
+'''
+
+
+class StartupProfileError(Exception):
+    """The child interpreter failed to start Django or to serve the request."""
+
+
+def project_packages():
+    """Top-level packages of this project's apps, plus the settings package."""
+    base_dir = str(settings.BASE_DIR)
+    packages = {
+        config.name.split('.')[0] for config in apps.get_app_configs() if str(config.path).startswith(base_dir)
+    }
+    packages.add(os.environ.get('DJANGO_SETTINGS_MODULE', 'djcrm.settings').split('.')[0])
+    return packages
+
+
+def parse_importtime(lines, packages):
+    """
+    Parse -X importtime output into (modules, groups). modules is a list of
+    (name, cumulative seconds) in import order; groups maps a package to
+    [self seconds, module count]. A module is charged to the nearest project app above it
+    in the import stack, or else to the package that started that chain of imports, so
+    phonenumbers shows up under the app whose models import it.
+    """
+    modules = []
+    groups = defaultdict(lambda: [0.0, 0])
+    entries = []
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((depth, name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    # importtime prints a module after its children, so walk backwards to see parents first
+    stack = []
+    for depth, name, self_seconds, cumulative_seconds in reversed(entries):
+        del stack[depth:]
+        top = name.split('.')[0]
+        owner = top if top in packages else (stack[-1] if stack else top)
+        stack.append(owner)
+        group = groups[owner]
+        group[0] += self_seconds
+        group[1] += 1
+        modules.append((name, cumulative_seconds))
+    modules.reverse()
+    return modules, dict(groups)
+
+
+def profile_startup(path='/', env=None, top=15):
+    """Start Django in a fresh interpreter, serve GET path and return the timings as a dict."""
+    child_env = dict(os.environ, **(env or {}))
+    child_env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), child_env.get('PYTHONPATH')]))
+    child_env.setdefault('DJANGO_SETTINGS_MODULE', 'djcrm.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _CHILD, path, *HEAVY_MODULES],
+        capture_output=True, text=True, cwd=str(settings.BASE_DIR), env=child_env,
+    )
+    stdout_lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not stdout_lines:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise StartupProfileError('\n'.join(errors[-20:]) or f'exit status {result.returncode}')
+    profile = json.loads(stdout_lines[-1])
+    modules, groups = parse_importtime(result.stderr.splitlines(), project_packages())
+    profile.update(
+        path=path,
+        module_count=len(modules),
+        import_seconds=sum(group[0] for group in groups.values()),
+        groups=sorted(((name, seconds, count) for name, (seconds, count) in groups.items()), key=lambda g: -g[1]),
+        slowest=sorted(modules, key=lambda m: -m[1])[:top],
+    )
+    return profile
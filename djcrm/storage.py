@@ -2,15 +2,74 @@
 R2 storage backend that saves to Cloudflare R2 but returns URLs via our app (media-proxy).
 Use when pub-xxx.r2.dev is unreachable (e.g. ERR_CONNECTION_RESET) in your region.
 Set USE_R2_MEDIA_PROXY=true to enable.
+
+Pages mostly just render media URLs, which need no S3 client, so the S3Storage behind this
+backend (django-storages + boto3, most of a second to import) is only created on the first
+read or write instead of on a worker's first page with an image.
 """
 from django.conf import settings
-from storages.backends.s3 import S3Storage
+from django.core.files.storage import Storage
+from django.utils.functional import cached_property
+
+
+class R2ProxyStorage(Storage):
+    """S3Storage for R2, created on first use; url() returns SITE_URL + /media-proxy/ + path."""
 
+    def __init__(self, **options):
+        self.options = options
 
-class R2ProxyStorage(S3Storage):
-    """Same as S3Storage for R2, but url() returns SITE_URL + /media-proxy/ + path."""
+    @cached_property
+    def backend(self):
+        from storages.backends.s3 import S3Storage
+        return S3Storage(**self.options)
 
     def url(self, name):
         base = (getattr(settings, "SITE_URL", "") or "").rstrip("/")
         path = name.lstrip("/") if name else ""
         return f"{base}/media-proxy/{path}" if base and path else ""
+
+    # Everything else is S3Storage's (including file_overwrite naming)
+    def open(self, name, mode="rb"):
+        return self.backend.open(name, mode)
+
+    def save(self, name, content, max_length=None):
+        return self.backend.save(name, content, max_length=max_length)
+
+    def get_valid_name(self, name):
+        return self.backend.get_valid_name(name)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def delete(self, name):
+        return self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+    def __getattr__(self, name):
+        # S3-specific attributes (bucket, connection, location, ...)
+        if name in ("options", "backend"):
+            raise AttributeError(name)
+        return getattr(self.backend, name)
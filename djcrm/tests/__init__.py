@@ -0,0 +1 @@
+# djcrm tests package
@@ -0,0 +1,152 @@
+"""
+Stylesheet Build Test File
+This file tests djcrm.assets, the build_css command and the tailwind_stylesheet
+tag that replaced the in-browser Tailwind CDN compiler.
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from djcrm.assets import CLI_SHA256 as PINNED_SHA256, AssetBuildError, content_globs, tailwind_cli
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+# Stands in for the Tailwind CLI: writes the --content globs it was given to --output
+FAKE_CLI = '''#!{python}
+import sys
+args = sys.argv[1:]
+if '--fail' in open(args[args.index('--input') + 1]).read():
+    sys.exit('bad input')
+with open(args[args.index('--output') + 1], 'w') as f:
+    f.write(args[args.index('--content') + 1] + ('\\n--minify' if '--minify' in args else ''))
+'''
+
+
+class BuildCssTests(SimpleTestCase):
+    def setUp(self):
+        self.static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_dir, ignore_errors=True)
+        self.cli = Path(self.static_dir) / 'tailwindcss'
+        self.cli.write_text(FAKE_CLI.format(python=sys.executable))
+        self.cli.chmod(0o755)
+
+    def test_content_covers_project_app_and_form_templates(self):
+        globs = content_globs()
+        self.assertTrue(any(g.endswith('/templates/**/*.html') and '*' not in g.split('/templates/')[0] for g in globs))
+        self.assertTrue(any('/*/templates/' in g for g in globs))
+        self.assertTrue(any('crispy_tailwind' in g for g in globs))
+
+    def test_build_writes_minified_stylesheet(self):
+        with override_settings(STATICFILES_DIRS=[self.static_dir]):
+            out = StringIO()
+            call_command('build_css', '--cli', str(self.cli), stdout=out)
+        css = (Path(self.static_dir) / 'css' / 'app.css').read_text()
+        self.assertIn('templates/**/*.html', css)
+        self.assertIn('--minify', css)
+        self.assertIn('Wrote', out.getvalue())
+
+    def test_cli_failure_is_reported(self):
+        source = Path(self.static_dir) / 'tailwind.css'
+        source.write_text('--fail')
+        with override_settings(STATICFILES_DIRS=[self.static_dir]), \
+                patch('djcrm.assets.source_path', return_value=source), \
+                self.assertRaisesMessage(CommandError, 'bad input'):
+            call_command('build_css', '--cli', str(self.cli), stdout=StringIO())
+
+
+CLI_BYTES = b'#!/bin/sh\n'
+CLI_SHA256 = hashlib.sha256(CLI_BYTES).hexdigest()
+
+
+class TailwindCliDownloadTests(SimpleTestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, ignore_errors=True)
+        for patcher in (
+            patch.dict(os.environ, {'TAILWIND_CLI': ''}),
+            patch('djcrm.assets.shutil.which', return_value=None),
+            patch('djcrm.assets.urllib.request.urlretrieve', side_effect=self.download),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.downloads = 0
+
+    def download(self, url, filename, body=CLI_BYTES):
+        self.downloads += 1
+        Path(filename).write_bytes(body)
+
+    def test_pinned_checksums_cover_every_release_asset(self):
+        assets = {
+            f'tailwindcss-{system}-{machine}{suffix}'
+            for system, suffix in (('linux', ''), ('macos', ''), ('windows', '.exe'))
+            for machine in ('x64', 'arm64')
+        }
+        self.assertEqual(set(PINNED_SHA256[settings.TAILWIND_VERSION]), assets)
+
+    def test_download_is_checked_against_the_pinned_checksum(self):
+        pinned = {'9.9.9': {'tailwindcss-linux-x64': CLI_SHA256}}
+        with patch.dict(PINNED_SHA256, pinned), patch('djcrm.assets._release_asset', return_value='tailwindcss-linux-x64'), \
+                override_settings(BASE_DIR=self.base_dir, TAILWIND_VERSION='9.9.9', TAILWIND_CLI_SHA256=''):
+            cli = tailwind_cli()
+            self.assertTrue(os.access(cli, os.X_OK))
+            self.assertEqual(tailwind_cli(), cli)
+        self.assertEqual(self.downloads, 1)
+
+    def test_setting_overrides_the_pinned_checksum(self):
+        with override_settings(BASE_DIR=self.base_dir, TAILWIND_CLI_SHA256=CLI_SHA256.upper()):
+            self.assertTrue(os.access(tailwind_cli(), os.X_OK))
+
+    def test_checksum_mismatch_is_not_installed(self):
+        with override_settings(BASE_DIR=self.base_dir, TAILWIND_CLI_SHA256='0' * 64), \
+                self.assertRaisesMessage(AssetBuildError, f'has SHA-256 {CLI_SHA256}'):
+            tailwind_cli()
+        self.assertEqual([p for p in Path(self.base_dir).rglob('*') if p.is_file()], [])
+
+    def test_tampered_cache_is_downloaded_again(self):
+        with override_settings(BASE_DIR=self.base_dir, TAILWIND_CLI_SHA256=CLI_SHA256):
+            cli = Path(tailwind_cli())
+            cli.write_bytes(b'tampered')
+            self.assertEqual(tailwind_cli(), str(cli))
+        self.assertEqual(cli.read_bytes(), CLI_BYTES)
+        self.assertEqual(self.downloads, 2)
+
+    def test_download_needs_a_pinned_checksum(self):
+        with override_settings(BASE_DIR=self.base_dir, TAILWIND_VERSION='9.9.9', TAILWIND_CLI_SHA256=''), \
+                self.assertRaisesMessage(AssetBuildError, 'TAILWIND_CLI_SHA256'):
+            tailwind_cli()
+        self.assertEqual(self.downloads, 0)
+
+
+@override_settings(**SIMPLE_STATIC)
+class TailwindStylesheetTagTests(SimpleTestCase):
+    def render(self):
+        return Template('{% load asset_tags %}{% tailwind_stylesheet %}').render(Context())
+
+    def test_links_compiled_stylesheet(self):
+        self.assertEqual(self.render(), '<link href="/static/css/app.css" rel="stylesheet">')
+
+    def test_development_fallback_only_without_a_build(self):
+        static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_dir, ignore_errors=True)
+        with override_settings(DEBUG=True, STATICFILES_DIRS=[static_dir]):
+            self.assertIn('cdn.tailwindcss.com', self.render())
+            (Path(static_dir) / 'css').mkdir()
+            (Path(static_dir) / 'css' / 'app.css').write_text('')
+            self.assertIn('/static/css/app.css', self.render())
+
+    def test_pages_do_not_load_the_cdn_compiler(self):
+        response = self.client.get(reverse('landing-page'))
+        self.assertContains(response, '/static/css/app.css')
+        self.assertNotContains(response, 'cdn.tailwindcss.com')
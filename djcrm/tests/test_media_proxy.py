@@ -0,0 +1,274 @@
+"""
+Media Proxy Test File
+This file tests djcrm.views.media_proxy: access control, conditional
+requests, byte ranges and the local disk cache, and its ASGI variant amedia_proxy.
+"""
+
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.http import Http404
+from django.urls import reverse
+
+from djcrm import views as media_views
+from leads.models import User, UserProfile, Lead, Agent
+
+PHOTO_BYTES = b'0123456789abcdefghij'
+
+
+class MediaProxyTestBase(TestCase):
+    """Shared setup: an organisor with an agent and a lead photo on a temporary MEDIA_ROOT"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, MEDIA_PROXY_CACHE_DIR=self.cache_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+
+        self.organisor_user = User.objects.create_user(
+            username='media_organisor',
+            email='media_organisor@example.com',
+            password='testpass123',
+            phone_number='+905551234567',
+            is_organisor=True,
+            email_verified=True
+        )
+        self.organisor_profile, created = UserProfile.objects.get_or_create(user=self.organisor_user)
+        self.agent_user = User.objects.create_user(
+            username='media_agent',
+            email='media_agent@example.com',
+            password='testpass123',
+            phone_number='+905559876543',
+            is_organisor=False,
+            is_agent=True,
+            email_verified=True
+        )
+        self.agent = Agent.objects.create(user=self.agent_user, organisation=self.organisor_profile)
+        self.other_user = User.objects.create_user(
+            username='media_other',
+            email='media_other@example.com',
+            password='testpass123',
+            phone_number='+905551112233',
+            is_organisor=True,
+            email_verified=True
+        )
+        self.lead = Lead.objects.create(
+            first_name='Media',
+            last_name='Lead',
+            organisation=self.organisor_profile,
+            agent=self.agent,
+            description='Lead with photo',
+            phone_number='+905550001111',
+            email='media_lead@example.com',
+            address='Address',
+        )
+        self.lead.profile_image.save('photo.jpg', ContentFile(PHOTO_BYTES))
+        self.url = reverse('media-proxy', kwargs={'path': self.lead.profile_image.name})
+
+
+class TestMediaProxyAccess(MediaProxyTestBase):
+    """Access control for lead_photos/ and profile_images/"""
+
+    def test_requires_login(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_organisor_and_agent_can_read_lead_photo(self):
+        for user in (self.organisor_user, self.agent_user):
+            self.client.force_login(user)
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), PHOTO_BYTES)
+
+    def test_other_organisation_gets_404(self):
+        self.client.force_login(self.other_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_organisor_can_read_agent_profile_image(self):
+        self.agent_user.profile_image.save('agent.png', ContentFile(PHOTO_BYTES))
+        url = reverse('media-proxy', kwargs={'path': self.agent_user.profile_image.name})
+        self.client.force_login(self.organisor_user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_login(self.other_user)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_access_decision_is_cached(self):
+        self.client.force_login(self.organisor_user)
+        with patch.object(media_views, '_user_can_access_media_path', wraps=media_views._user_can_access_media_path) as check:
+            self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertEqual(check.call_count, 1)
+
+    def test_invalid_path(self):
+        self.client.force_login(self.organisor_user)
+        response = self.client.get(reverse('media-proxy', kwargs={'path': 'lead_photos/../secret.txt'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class TestMediaProxyConditionalAndRange(MediaProxyTestBase):
+    """ETag / Last-Modified revalidation and byte ranges"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.organisor_user)
+
+    def test_validators_present(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, PHOTO_BYTES[2:6])
+        self.assertEqual(response['Content-Range'], f'bytes 2-5/{len(PHOTO_BYTES)}')
+
+    def test_suffix_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, PHOTO_BYTES[-4:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=500-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(PHOTO_BYTES)}')
+
+    def test_stale_if_range_returns_full_body(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_parse_range(self):
+        self.assertEqual(media_views._parse_range('bytes=0-', 10), (0, 9))
+        self.assertEqual(media_views._parse_range('bytes=5-100', 10), (5, 9))
+        self.assertIsNone(media_views._parse_range('bytes=0-1,4-5', 10))
+        self.assertIsNone(media_views._parse_range('items=0-1', 10))
+        with self.assertRaises(ValueError):
+            media_views._parse_range('bytes=-0', 10)
+
+
+class TestMediaProxyDiskCache(MediaProxyTestBase):
+    """Remote storage objects are served from the local disk cache after the first fetch"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.organisor_user)
+        local = patch.object(media_views, '_storage_is_local', return_value=False)
+        local.start()
+        self.addCleanup(local.stop)
+
+    def test_second_request_skips_storage(self):
+        first = self.client.get(self.url)
+        self.assertEqual(b''.join(first.streaming_content), PHOTO_BYTES)
+        with patch.object(media_views.default_storage, 'open', side_effect=AssertionError('storage hit')):
+            second = self.client.get(self.url)
+            self.assertEqual(second.status_code, 200)
+            self.assertEqual(b''.join(second.streaming_content), PHOTO_BYTES)
+            self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_saving_lead_evicts_cached_copy(self):
+        self.client.get(self.url)
+        self.lead.save()
+        with patch.object(media_views, '_open_media', wraps=media_views._open_media) as opened:
+            self.client.get(self.url)
+        self.assertEqual(opened.call_count, 1)
+
+
+class TestMediaThumbnail(MediaProxyTestBase):
+    """Thumbnails are generated lazily from the original and served with the same access rules"""
+
+    def setUp(self):
+        super().setUp()
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 300), (200, 30, 30)).save(buffer, 'PNG')
+        self.lead.profile_image.save('real.png', ContentFile(buffer.getvalue()))
+        self.thumb_url = reverse('media-thumbnail', kwargs={'size': 64, 'path': self.lead.profile_image.name})
+
+    def test_thumbnail_generated_on_first_request(self):
+        from PIL import Image
+        from leads.images import thumbnail_name
+        self.client.force_login(self.organisor_user)
+        response = self.client.get(self.thumb_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (64, 64))
+        self.lead.refresh_from_db()
+        self.assertTrue(default_storage.exists(thumbnail_name(self.lead.profile_image_hash, 256)))
+
+    def test_thumbnail_access_denied_for_other_organisation(self):
+        self.client.force_login(self.other_user)
+        self.assertEqual(self.client.get(self.thumb_url).status_code, 404)
+
+    def test_unknown_size_404(self):
+        self.client.force_login(self.organisor_user)
+        url = reverse('media-thumbnail', kwargs={'size': 100, 'path': self.lead.profile_image.name})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_thumbnails_not_reachable_through_media_proxy(self):
+        from leads.images import thumbnail_name
+        self.client.force_login(self.organisor_user)
+        self.client.get(self.thumb_url)
+        self.lead.refresh_from_db()
+        url = reverse('media-proxy', kwargs={'path': thumbnail_name(self.lead.profile_image_hash, 64)})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class TestAsyncMediaProxy(MediaProxyTestBase):
+    """amedia_proxy (ASGI mode): same access rules, body streamed asynchronously"""
+
+    async def get(self, user, path=None, **headers):
+        path = path or self.lead.profile_image.name
+        request = AsyncRequestFactory().get(f'/media-proxy/{path}', headers=headers)
+
+        async def auser():
+            return user
+        request.auser = auser
+        return await media_views.amedia_proxy(request, path)
+
+    async def test_streams_file_to_owner(self):
+        for user in (self.organisor_user, self.agent_user):
+            response = await self.get(user)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            self.assertEqual(b''.join([chunk async for chunk in response]), PHOTO_BYTES)
+            self.assertEqual(response['Content-Length'], str(len(PHOTO_BYTES)))
+            self.assertIn('ETag', response)
+
+    async def test_access_control(self):
+        self.assertEqual((await self.get(AnonymousUser())).status_code, 302)
+        with self.assertRaises(Http404):
+            await self.get(self.other_user)
+        with self.assertRaises(Http404):
+            await self.get(self.organisor_user, 'lead_photos/../secret.txt')
+
+    async def test_conditional_and_range(self):
+        etag = (await self.get(self.organisor_user))['ETag']
+        self.assertEqual((await self.get(self.organisor_user, if_none_match=etag)).status_code, 304)
+        response = await self.get(self.organisor_user, range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, PHOTO_BYTES[2:6])
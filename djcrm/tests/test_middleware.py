@@ -0,0 +1,65 @@
+"""
+Middleware Test File
+This file tests that the project's middleware chain runs natively in both handlers:
+an ASGI request must not be pushed through a thread by a sync-only middleware.
+"""
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+
+from activity_log import writer
+from activity_log.models import ACTION_LEAD_CREATED, ActivityLog
+from leads.models import User
+from tasks import notifier
+from tasks.models import Notification
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+class MiddlewareChainTests(TestCase):
+
+    def test_asgi_chain_is_async_end_to_end(self):
+        # BaseHandler logs "Asynchronous handler adapted for middleware ..." for each sync-only one
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            handler = ASGIHandler()
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    def test_wsgi_chain_is_sync_end_to_end(self):
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            handler = WSGIHandler()
+        self.assertFalse(iscoroutinefunction(handler._middleware_chain))
+
+    @override_settings(WHITENOISE_AUTOREFRESH=True, WHITENOISE_USE_FINDERS=True)
+    async def test_async_chain_serves_static_and_views(self):
+        client = AsyncClient()
+        response = await client.get('/static/main.js')
+        self.assertEqual(response.status_code, 200)
+        with self.settings(**SIMPLE_STATIC):
+            response = await client.get(reverse('login'))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ACTIVITY_LOG_WRITE_MODE='buffered')
+class AsyncBatchTests(TestCase):
+    """The request batches also work when the middleware runs on the event loop"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='asyncbatch', email='asyncbatch@example.com', password='x')
+
+    async def test_notification_batch(self):
+        event = notifier.Event(title='Async hello')
+        async with notifier.anotification_batch():
+            await sync_to_async(notifier._add)([(self.user.pk, event), (self.user.pk, event)])
+            self.assertEqual(await Notification.objects.acount(), 0)
+        self.assertEqual(await Notification.objects.filter(title='Async hello').acount(), 2)
+
+    async def test_activity_buffer(self):
+        entry = ActivityLog(user=self.user, action=ACTION_LEAD_CREATED, object_type='lead', object_id=5)
+        async with writer.aactivity_buffer():
+            await sync_to_async(writer._add)(entry)
+            self.assertFalse(await ActivityLog.objects.aexists())
+        self.assertTrue(await ActivityLog.objects.filter(object_id=5).aexists())
@@ -0,0 +1,102 @@
+"""
+Replica Routing Test File
+This file tests djcrm.replica: the router, the reporting view mixin and the
+read-your-writes pin set after a write request. The test "replica" alias is a
+mirror of default on its own connection, so these tests commit their data
+(TransactionTestCase) for the replica connection to see it.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from djcrm.replica import (
+    REPLICA_PIN_COOKIE, ReplicaPinMiddleware, ReplicaRouter, replica_reads, use_replica,
+)
+from leads.models import User, UserProfile
+from ProductsAndStock.charts import chart_data
+from ProductsAndStock.dashboard import dashboard_snapshot
+from ProductsAndStock.models import Category, SubCategory, ProductsAndStock
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+@override_settings(REPLICA_DATABASE_ALIAS='replica', **SIMPLE_STATIC)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Reporting reads go to the replica unless the browser just wrote"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.organisor_user = User.objects.create_user(
+            username='replica_organisor',
+            email='replica_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+        )
+        category = Category.objects.create(name='Replica')
+        ProductsAndStock.objects.create(
+            product_name='Replicated', product_description='-', product_price=5.0, product_quantity=10,
+            category=category, subcategory=SubCategory.objects.create(name='Copy', category=category),
+            organisation=UserProfile.objects.get(user=self.organisor_user),
+        )
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(ProductsAndStock), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(ProductsAndStock), 'replica')
+            self.assertEqual(router.db_for_write(ProductsAndStock), 'default')
+            self.assertEqual(ProductsAndStock.objects.get(product_name='Replicated')._state.db, 'replica')
+        with replica_reads(enabled=False):
+            self.assertEqual(router.db_for_read(ProductsAndStock), 'default')
+        with override_settings(REPLICA_DATABASE_ALIAS=None), replica_reads():
+            self.assertEqual(router.db_for_read(ProductsAndStock), 'default')
+
+    def get_dashboard(self):
+        self.client.force_login(self.organisor_user)
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self.client.get(reverse('ProductsAndStock:sales-dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_products'], 1)
+        return replica_queries
+
+    def test_reporting_view_reads_from_replica(self):
+        self.assertGreater(len(self.get_dashboard()), 0)
+
+    def test_pinned_browser_reads_from_primary(self):
+        self.client.cookies[REPLICA_PIN_COOKIE] = str(time.time() + 60)
+        self.assertEqual(len(self.get_dashboard()), 0)
+        self.client.cookies[REPLICA_PIN_COOKIE] = str(time.time() - 1)
+        self.assertGreater(len(self.get_dashboard()), 0)
+
+    def test_cached_reports_are_built_from_primary(self):
+        """Snapshots outlive the request and are served to pinned browsers too: never from the replica"""
+        cache.clear()
+        organisation_id = self.organisor_user.userprofile.pk
+        with CaptureQueriesContext(connections['replica']) as replica_queries, replica_reads():
+            self.assertEqual(dashboard_snapshot(organisation_id)['total_products'], 1)
+            self.assertEqual(chart_data(organisation_id)['total_products'], 1)
+        self.assertEqual(len(replica_queries), 0)
+
+    def test_write_requests_pin_the_browser(self):
+        middleware = ReplicaPinMiddleware(lambda request: HttpResponse())
+        response = middleware(RequestFactory().post('/anything/'))
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[REPLICA_PIN_COOKIE]['max-age'], 10)
+        self.assertNotIn(REPLICA_PIN_COOKIE, middleware(RequestFactory().get('/anything/')).cookies)
+        with override_settings(REPLICA_DATABASE_ALIAS=None):
+            self.assertNotIn(REPLICA_PIN_COOKIE, middleware(RequestFactory().post('/anything/')).cookies)
+
+    def test_function_view_decorator(self):
+        @use_replica
+        def view(request):
+            return HttpResponse(ProductsAndStock.objects.get(product_name='Replicated')._state.db)
+
+        self.assertEqual(view(RequestFactory().get('/report/')).content, b'replica')
+        self.assertEqual(view(RequestFactory().post('/report/')).content, b'default')
@@ -0,0 +1,93 @@
+"""
+Startup Budget Test File
+This file tests djcrm.startup and the profile_startup command: a cold start,
+even with R2 media and the Gmail API configured, must not import the heavy
+optional dependencies and must stay within STARTUP_BUDGET_SECONDS.
+"""
+
+import sys
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from djcrm.startup import HEAVY_MODULES, parse_importtime, profile_startup
+from djcrm.storage import R2ProxyStorage
+
+# A cold start here takes about 1.3s; the budget leaves room for slow CI machines
+STARTUP_BUDGET_SECONDS = 6.0
+
+PRODUCTION_ENV = {
+    'USE_R2': 'true',
+    'USE_R2_MEDIA_PROXY': 'true',
+    'R2_ACCOUNT_ID': 'account',
+    'R2_BUCKET_NAME': 'bucket',
+    'R2_ACCESS_KEY_ID': 'key',
+    'R2_SECRET_ACCESS_KEY': 'secret',
+    'SITE_URL': 'https://crm.example.com',
+    'USE_GMAIL_API': 'true',
+}
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """Cold start of a worker configured like production"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.profile = profile_startup('/', env=PRODUCTION_ENV)
+
+    def test_heavy_dependencies_not_imported(self):
+        self.assertEqual(self.profile['heavy_modules'], [])
+
+    def test_within_budget(self):
+        self.assertEqual(self.profile['status'], 200)
+        self.assertLess(self.profile['total_seconds'], STARTUP_BUDGET_SECONDS)
+
+    def test_import_time_charged_to_apps(self):
+        groups = {name for name, seconds, count in self.profile['groups']}
+        self.assertIn('django', groups)
+        self.assertIn('leads', groups)
+        self.assertEqual(self.profile['module_count'], sum(count for name, seconds, count in self.profile['groups']))
+
+
+class ParseImporttimeTests(SimpleTestCase):
+    def test_modules_charged_to_nearest_project_app(self):
+        lines = [
+            'import time: self [us] | cumulative | imported package',
+            'import time:       100 |        100 |     phonenumbers.data',
+            'import time:       200 |        300 |   phonenumbers',
+            'import time:        50 |        350 | leads.models',
+            'import time:        10 |         10 |   json.decoder',
+            'import time:        20 |         30 | json',
+        ]
+        modules, groups = parse_importtime(lines, {'leads'})
+        self.assertEqual(modules[0], ('phonenumbers.data', 0.0001))
+        self.assertEqual({name: (round(seconds * 1e6), count) for name, (seconds, count) in groups.items()}, {
+            'leads': (350, 3),
+            'json': (30, 2),
+        })
+
+
+class R2ProxyStorageTests(SimpleTestCase):
+    """The proxy storage builds media URLs without importing boto3"""
+
+    def test_url_does_not_load_s3_backend(self):
+        storage = R2ProxyStorage(bucket_name='bucket')
+        # A None entry makes any import of the module fail
+        with patch.dict(sys.modules, {name: None for name in HEAVY_MODULES if 'storages' in name or 'boto' in name}):
+            with self.settings(SITE_URL='https://crm.example.com'):
+                self.assertEqual(storage.url('lead_photos/a.jpg'), 'https://crm.example.com/media-proxy/lead_photos/a.jpg')
+            with self.assertRaises(ImportError):
+                storage.exists('lead_photos/a.jpg')
+
+
+class ProfileStartupCommandTests(SimpleTestCase):
+    def test_report_and_budget(self):
+        out = StringIO()
+        call_command('profile_startup', '--top', '3', stdout=out)
+        self.assertIn('first response', out.getvalue())
+        self.assertIn('Slowest imports', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'over the 0.00s budget'):
+            call_command('profile_startup', '--budget', '0', stdout=StringIO())
@@ -0,0 +1,154 @@
+"""
+Data Versions Test File
+This file tests djcrm.versions: per-organisation data versions bumped on commit
+and the conditional GET (ETag / 304 Not Modified) of the list pages and JSON endpoints.
+"""
+
+from datetime import date
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from djcrm.versions import CATALOG, PRODUCTS, bump_version, get_versions, request_etag
+from leads.models import Agent, User, UserProfile
+from ProductsAndStock.models import Category, ProductsAndStock, SubCategory
+from tasks.models import Notification, Task
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+class BumpVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_applies_on_commit_to_organisation_and_all(self):
+        before = get_versions([PRODUCTS], 1) + get_versions([PRODUCTS], 2) + get_versions([PRODUCTS])
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_version(PRODUCTS, 1)
+        self.assertEqual(get_versions([PRODUCTS], 1) + get_versions([PRODUCTS], 2) + get_versions([PRODUCTS]), before)
+        callbacks[0]()
+        after = get_versions([PRODUCTS], 1) + get_versions([PRODUCTS], 2) + get_versions([PRODUCTS])
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+        self.assertNotEqual(after[2], before[2])
+
+    def test_shared_family_has_one_version(self):
+        self.assertEqual(get_versions([CATALOG], 1), get_versions([CATALOG], 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(CATALOG)
+        self.assertEqual(get_versions([CATALOG], 1), get_versions([CATALOG]))
+
+    def test_expired_version_is_not_reused(self):
+        first = get_versions([PRODUCTS], 1)
+        cache.clear()
+        self.assertNotEqual(get_versions([PRODUCTS], 1), first)
+
+
+@override_settings(**SIMPLE_STATIC)
+class ConditionalGetTests(TestCase):
+    """A repeated GET answers 304 until a write in the organisation bumps its version"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisor = User.objects.create_user(
+            username='etag_organisor', email='etag_organisor@example.com', password='testpass123',
+            is_organisor=True, email_verified=True,
+        )
+        cls.profile = UserProfile.objects.get(user=cls.organisor)
+        cls.other_organisor = User.objects.create_user(
+            username='etag_other', email='etag_other@example.com', password='testpass123',
+            is_organisor=True, email_verified=True,
+        )
+        cls.other_profile = UserProfile.objects.get(user=cls.other_organisor)
+        cls.agent_user = User.objects.create_user(
+            username='etag_agent', email='etag_agent@example.com', password='testpass123',
+            is_agent=True, email_verified=True,
+        )
+        cls.agent = Agent.objects.create(user=cls.agent_user, organisation=cls.profile)
+        cls.category = Category.objects.create(name='Etag Electronics')
+        cls.subcategory = SubCategory.objects.create(name='Etag Phones', category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.organisor)
+
+    def create_product(self, organisation, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductsAndStock.objects.create(
+                product_name=name, product_description='Phone', product_price=10.0, product_quantity=5,
+                category=self.category, subcategory=self.subcategory, organisation=organisation,
+            )
+
+    def assertNotModified(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        return first['ETag']
+
+    def test_product_list(self):
+        url = reverse('ProductsAndStock:ProductAndStock-list')
+        etag = self.assertNotModified(url)
+        self.create_product(self.other_profile, 'Other phone')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.create_product(self.profile, 'Own phone')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Own phone')
+
+    def test_query_string_and_user_are_part_of_etag(self):
+        url = reverse('ProductsAndStock:ProductAndStock-list')
+        etag = self.assertNotModified(url)
+        self.assertEqual(self.client.get(url, {'sort': 'name'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.client.force_login(self.agent_user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_new_notification_changes_page_etag(self):
+        url = reverse('ProductsAndStock:ProductAndStock-list')
+        etag = self.assertNotModified(url)
+        Notification.objects.create(user=self.organisor, title='Low stock', message='Restock')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_no_etag_with_pending_flash_message(self):
+        request = RequestFactory().get(reverse('ProductsAndStock:ProductAndStock-list'))
+        request.user = self.organisor
+        self.assertIsNotNone(request_etag(request, [PRODUCTS]))
+        request._messages = ['Product saved']
+        self.assertIsNone(request_etag(request, [PRODUCTS]))
+
+    def test_task_list(self):
+        url = reverse('tasks:task-list')
+        etag = self.assertNotModified(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(
+                title='Call back', content='Call the customer', start_date=date.today(), end_date=date.today(),
+                assigned_to=self.agent_user, assigned_by=self.organisor, organisation=self.profile,
+            )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_agents_by_org_json(self):
+        url = reverse('leads:get-agents-by-org', args=[self.profile.pk])
+        etag = self.assertNotModified(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.agent_user.first_name = 'Renamed'
+            self.agent_user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+
+    def test_forbidden_organisation_is_not_tagged(self):
+        response = self.client.get(reverse('leads:get-agents-by-org', args=[self.other_profile.pk]))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_subcategories_json(self):
+        url = reverse('ProductsAndStock:get-subcategories') + f'?category_id={self.category.pk}'
+        etag = self.assertNotModified(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            SubCategory.objects.create(name='Etag Tablets', category=self.category)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Etag Tablets')
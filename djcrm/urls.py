@@ -4,11 +4,12 @@ from django.contrib import admin
 from django.contrib.auth.views import LogoutView, PasswordResetView, PasswordResetDoneView, PasswordResetConfirmView, PasswordResetCompleteView
 from django.urls import path, include
 from leads.views import landing_page, LandingPageView, SignupView, CustomLoginView, CustomPasswordResetView, CustomPasswordResetConfirmView, CustomPasswordResetDoneView, EmailVerificationSentView, EmailVerificationView, EmailVerificationSuccessView, EmailVerificationFailedView
-from djcrm.views import media_proxy
+from djcrm.views import amedia_proxy, media_proxy, media_thumbnail
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('media-proxy/<path:path>', media_proxy, name='media-proxy'),
+    path('media-proxy/<path:path>', amedia_proxy if settings.ASYNC_VIEWS else media_proxy, name='media-proxy'),
+    path('media-thumbnail/<int:size>/<path:path>', media_thumbnail, name='media-thumbnail'),
     path('', LandingPageView.as_view(), name='landing-page'),
     path('leads/', include('leads.urls', namespace='leads')),
     path('agents/', include('agents.urls', namespace='agents')),
@@ -0,0 +1,149 @@
+"""
+Data versions and conditional GET for tenant data.
+
+Each organisation has a version number per data family (products, tasks, agents, ...) kept
+in the cache. Signal receivers call bump_version() when a row of the family is written, on
+commit, for the row's organisation and for the admin's all-organisations scope.
+@versioned_etag(...) builds an ETag from those versions, the user and the query string.
+When the browser's If-None-Match still matches it answers 304 Not Modified without running
+the view, so back/forward navigation and polling cost a few cache reads.
+
+A missing or expired version is recreated from the clock, never reset to an old value.
+With a per-process cache (LocMem, no REDIS_URL) a worker that did not see a write keeps
+its older version until DATA_VERSION_MAX_AGE_SECONDS runs out, so that setting bounds how
+stale a 304 can be. With Redis every worker sees each bump immediately.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+PRODUCTS = 'products'
+CATALOG = 'catalog'  # product categories and subcategories
+TASKS = 'tasks'
+AGENTS = 'agents'
+LEAD_CATEGORIES = 'lead-categories'
+
+# Families whose rows are shared by all organisations have a single version
+SHARED_FAMILIES = {CATALOG}
+
+
+def version_cache_key(family, organisation_id=None):
+    if family in SHARED_FAMILIES:
+        organisation_id = None
+    return f"data-version:{family}:{organisation_id or 'all'}"
+
+
+def _max_age():
+    return settings.DATA_VERSION_MAX_AGE_SECONDS
+
+
+def _bump_now(family, organisation_id):
+    for key in {version_cache_key(family, organisation_id), version_cache_key(family)}:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), _max_age())
+
+
+def bump_version(family, organisation_id=None):
+    """Mark the family's data of the organisation (and of all organisations) as changed once the transaction commits."""
+    transaction.on_commit(lambda: _bump_now(family, organisation_id))
+
+
+def get_versions(families, organisation_id=None):
+    """Current version of each family for the organisation (None: the all-organisations scope)."""
+    keys = [version_cache_key(family, organisation_id) for family in families]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            now = time.time_ns()
+            found[key] = now if cache.add(key, now, _max_age()) else cache.get(key, now)
+        versions.append(found[key])
+    return versions
+
+
+def _tenant_scope(request, *args, **kwargs):
+    from leads.tenant import get_tenant
+
+    return get_tenant(request).organisation_id
+
+
+def request_etag(request, families, scope=_tenant_scope, page=True, args=(), kwargs=None, user=None):
+    """
+    ETag of the view's response for this request, or None when it must not be answered
+    from the browser's copy: unsafe method, anonymous user, or flash messages waiting
+    to be shown. page=True adds what base.html shows besides the view's data: the
+    unread notification count and the CSRF secret embedded in forms. user defaults to
+    request.user (async views pass the result of request.auser()).
+    """
+    user = user or request.user
+    if request.method not in ('GET', 'HEAD') or not user.is_authenticated:
+        return None
+    kwargs = kwargs or {}
+    parts = [
+        settings.DATA_VERSION_SALT, request.path, user.pk, user.is_superuser,
+        getattr(user, 'is_organisor', False), getattr(user, 'is_agent', False),
+        sorted(request.GET.lists()), scope(request, *args, **kwargs),
+    ]
+    parts += get_versions(families, parts[-1])
+    if page:
+        messages = getattr(request, '_messages', None)
+        if messages is not None and len(messages):
+            return None
+        from tasks.models import Notification
+
+        # get_token() creates the secret on a first visit, so the first ETag already matches the cookie
+        get_token(request)
+        parts += [
+            Notification.objects.filter(user=user, is_read=False).count(),
+            request.META['CSRF_COOKIE'],
+        ]
+    return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _not_modified(request, etag):
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag)
+
+
+def _finish(response, etag):
+    if etag is not None and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        # The browser may keep the page but must ask again before every use
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def versioned_etag(*families, scope=_tenant_scope, page=True):
+    """
+    Conditional GET for a view whose output depends only on the given data families of one
+    organisation, the user and the query string. scope(request, *args, **kwargs) gives the
+    organisation (default: the user's; None for admins, who see all organisations).
+    JSON endpoints pass page=False. On class-based views decorate get() with
+    method_decorator so the access checks in dispatch() still run first.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                user = await request.auser()
+                etag = await sync_to_async(request_etag)(request, families, scope, page, args, kwargs, user)
+                response = _not_modified(request, etag) or await view(request, *args, **kwargs)
+                return _finish(response, etag)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag = request_etag(request, families, scope, page, args, kwargs)
+            return _finish(_not_modified(request, etag) or view(request, *args, **kwargs), etag)
+        return wrapper
+    return decorator
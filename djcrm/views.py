@@ -3,63 +3,245 @@ Media proxy view: serve R2 (or default storage) files through the app.
 Used when USE_R2_MEDIA_PROXY=true to avoid ERR_CONNECTION_RESET to pub-xxx.r2.dev.
 Access is restricted by path: lead_photos/ and profile_images/ require the user
 to have permission to the owning lead or user (IDOR prevention).
+Responses carry ETag/Last-Modified (304 on revalidation) and honour single byte
+Range requests; hot remote objects are kept in a small local disk cache.
+media_thumbnail serves the small derivatives used by list and detail pages.
+amedia_proxy is the async variant routed in ASGI mode (SERVER_MODE=asgi).
 """
+import hashlib
+import io
 import logging
 import mimetypes
-from django.http import FileResponse, Http404
+import os
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
 from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_GET
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.core.files.storage import default_storage
 
+from djcrm import media_cache
+
 logger = logging.getLogger(__name__)
 
 
-def _user_can_access_media_path(user, path):
+def _media_access_check(user, path):
     """
-    Return True if the user is allowed to access the file at path.
-    lead_photos/ and profile_images/ are restricted by organisation/agent ownership.
+    Decide whether the user may access the file at path: True/False, or a queryset that
+    must match at least one row. lead_photos/ and profile_images/ are restricted by
+    organisation/agent ownership; each check is a single query on the indexed
+    profile_image column.
     """
+    from django.db.models import Q
     from leads.models import Lead, User, Agent
 
     if path.startswith("lead_photos/"):
-        leads = Lead.objects.filter(profile_image=path)
-        for lead in leads:
-            if user.is_superuser:
-                return True
-            if getattr(user, "is_organisor", False) and getattr(user, "userprofile", None):
-                if lead.organisation_id == user.userprofile.id:
-                    return True
-            if getattr(user, "is_agent", False):
-                try:
-                    agent_obj = Agent.objects.get(user=user)
-                    if lead.agent_id == agent_obj.id:
-                        return True
-                except Agent.DoesNotExist:
-                    pass
-        return False
+        if user.is_superuser:
+            return Lead.objects.filter(profile_image=path)
+        owner = Q()
+        if getattr(user, "is_organisor", False):
+            owner |= Q(organisation__user_id=user.pk)
+        if getattr(user, "is_agent", False):
+            owner |= Q(agent__user_id=user.pk)
+        if not owner:
+            return False
+        return Lead.objects.filter(owner, profile_image=path)
 
     if path.startswith("profile_images/"):
-        users_with_path = User.objects.filter(profile_image=path)
-        for profile_user in users_with_path:
-            if profile_user.id == user.id:
-                return True
-            if user.is_superuser:
-                return True
-            if getattr(user, "is_organisor", False) and getattr(user, "userprofile", None):
-                # Organisor can see agents in their org (agent.user.profile_image)
-                try:
-                    agent_obj = Agent.objects.get(user=profile_user)
-                    if agent_obj.organisation_id == user.userprofile.id:
-                        return True
-                except Agent.DoesNotExist:
-                    pass
+        if user.profile_image and user.profile_image.name == path:
+            return True
+        if user.is_superuser:
+            return User.objects.filter(profile_image=path)
+        if getattr(user, "is_organisor", False):
+            # Organisor can see agents in their org (agent.user.profile_image)
+            return Agent.objects.filter(user__profile_image=path, organisation__user_id=user.pk)
         return False
 
     # Unknown path prefix: deny by default (only allow known media types)
     return False
 
 
+def _user_can_access_media_path(user, path):
+    """Return True if the user is allowed to access the file at path."""
+    check = _media_access_check(user, path)
+    return check if isinstance(check, bool) else check.exists()
+
+
+async def _auser_can_access_media_path(user, path):
+    """_user_can_access_media_path with the async ORM."""
+    check = _media_access_check(user, path)
+    return check if isinstance(check, bool) else await check.aexists()
+
+
+def _media_access_cache_key(user, path):
+    return f"media-access:{user.pk}:{hashlib.sha1(path.encode('utf-8')).hexdigest()}"
+
+
+def _user_can_access_media_path_cached(user, path):
+    """_user_can_access_media_path with a short-lived per-user cache of the decision."""
+    timeout = getattr(settings, "MEDIA_PROXY_ACCESS_CACHE_SECONDS", 0)
+    if timeout <= 0:
+        return _user_can_access_media_path(user, path)
+    key = _media_access_cache_key(user, path)
+    allowed = cache.get(key)
+    if allowed is None:
+        allowed = _user_can_access_media_path(user, path)
+        cache.set(key, allowed, timeout)
+    return allowed
+
+
+async def _auser_can_access_media_path_cached(user, path):
+    """_user_can_access_media_path_cached with the async ORM and cache APIs."""
+    timeout = getattr(settings, "MEDIA_PROXY_ACCESS_CACHE_SECONDS", 0)
+    if timeout <= 0:
+        return await _auser_can_access_media_path(user, path)
+    key = _media_access_cache_key(user, path)
+    allowed = await cache.aget(key)
+    if allowed is None:
+        allowed = await _auser_can_access_media_path(user, path)
+        await cache.aset(key, allowed, timeout)
+    return allowed
+
+
+def _storage_is_local():
+    """True when default storage is on the local filesystem (nothing to gain from the disk cache)."""
+    try:
+        default_storage.path("")
+    except NotImplementedError:
+        return False
+    return True
+
+
+def _open_media(path):
+    """
+    Open path once and return (file, size, etag, last_modified timestamp).
+    S3/R2 files already fetched the object's metadata while opening, so no
+    separate exists()/size() round-trips are needed.
+    """
+    f = default_storage.open(path, "rb")
+    obj = getattr(f, "obj", None)
+    if obj is not None:
+        return f, obj.content_length, obj.e_tag, obj.last_modified.timestamp()
+    stat = os.fstat(f.fileno())
+    return f, stat.st_size, f'"{int(stat.st_mtime):x}-{stat.st_size:x}"', stat.st_mtime
+
+
+def _parse_range(header, size):
+    """
+    Parse a single "bytes=start-end" Range header into an inclusive (start, end) tuple.
+    Returns None when the header should be ignored (malformed or multiple ranges) and
+    raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_raw, sep, end_raw = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_raw == "":
+            # Suffix range: the last N bytes
+            start, end = max(size - int(end_raw), 0), size - 1
+        else:
+            start = int(start_raw)
+            end = int(end_raw) if end_raw else size - 1
+    except ValueError:
+        return None
+    if start >= size or (start_raw == "" and end < start):
+        raise ValueError("Range not satisfiable")
+    if start < 0 or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag, last_modified):
+    """An If-Range precondition only allows a partial response for the current representation."""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def _set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _serve_media(request, name):
+    """
+    Build the response for the stored file name: 304 for fresh conditional requests,
+    206/416 for Range requests, otherwise the whole file. Remote objects are served
+    from (and added to) the local disk cache. Raises FileNotFoundError if name is missing.
+    """
+    now = time.time()
+    use_disk_cache = media_cache.is_enabled() and not _storage_is_local()
+    cached = media_cache.get(name, now) if use_disk_cache else None
+    f = None
+    try:
+        if cached is not None:
+            size, etag, last_modified = cached.size, cached.etag, cached.last_modified
+        else:
+            f, size, etag, last_modified = _open_media(name)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+        if not_modified is not None:
+            if f is not None:
+                f.close()
+            return _set_validators(not_modified, etag, last_modified)
+
+        if cached is not None:
+            f = open(cached.file_path, "rb")
+        elif use_disk_cache and size <= getattr(settings, "MEDIA_PROXY_CACHE_MAX_OBJECT_BYTES", 0):
+            content = f.read()
+            f.close()
+            cached = media_cache.put(name, content, etag, last_modified, now)
+            f = open(cached.file_path, "rb") if cached is not None else io.BytesIO(content)
+    except FileNotFoundError:
+        raise
+    except Exception:
+        if f is not None:
+            f.close()
+        logger.exception("Media proxy error for path=%s", name)
+        raise Http404("File not found")
+
+    content_type, _ = mimetypes.guess_type(name)
+    if not content_type:
+        content_type = "application/octet-stream"
+
+    range_header = request.headers.get("Range")
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            f.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return _set_validators(response, etag, last_modified)
+        if byte_range is not None:
+            start, end = byte_range
+            try:
+                f.seek(start)
+                data = f.read(end - start + 1)
+            finally:
+                f.close()
+            response = HttpResponse(data, status=206, content_type=content_type)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return _set_validators(response, etag, last_modified)
+
+    return _set_validators(FileResponse(f, content_type=content_type), etag, last_modified)
+
+
 @require_GET
 @login_required
 @cache_control(public=True, max_age=86400)  # 1 day
@@ -67,18 +249,78 @@ def media_proxy(request, path: str):
     """Stream a file from default storage (R2 or filesystem) by path. Path must not contain '..'."""
     if ".." in path or path.startswith("/"):
         raise Http404("Invalid path")
-    if not _user_can_access_media_path(request.user, path):
+    if not _user_can_access_media_path_cached(request.user, path):
+        raise Http404("File not found")
+    try:
+        return _serve_media(request, path)
+    except FileNotFoundError:
         raise Http404("File not found")
-    if not default_storage.exists(path):
+
+
+async def _aread_chunks(f, chunk_size):
+    """Read f in chunks on a worker thread so the event loop never waits on storage."""
+    read = sync_to_async(f.read, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(f.close, thread_sensitive=False)()
+
+
+@require_GET
+@cache_control(public=True, max_age=86400)  # 1 day
+async def amedia_proxy(request, path: str):
+    """
+    media_proxy for ASGI mode. The access check uses the async ORM and cache; opening
+    the object (an R2 round-trip) runs on a worker thread, and the body is streamed
+    back in chunks, so a slow fetch never blocks other requests on the worker.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if ".." in path or path.startswith("/"):
+        raise Http404("Invalid path")
+    if not await _auser_can_access_media_path_cached(user, path):
+        raise Http404("File not found")
+    try:
+        response = await sync_to_async(_serve_media, thread_sensitive=False)(request, path)
+    except FileNotFoundError:
+        raise Http404("File not found")
+    if isinstance(response, FileResponse) and isinstance(request, ASGIRequest):
+        # ASGI would otherwise read a synchronous file iterator to the end before sending
+        response.streaming_content = _aread_chunks(response.file_to_stream, response.block_size)
+    return response
+
+
+@require_GET
+@login_required
+@cache_control(public=True, max_age=86400)  # 1 day
+def media_thumbnail(request, size: int, path: str):
+    """
+    Serve a square thumbnail of the lead/profile photo at path, with the same access rules
+    as media_proxy. Missing thumbnails are generated from the original on first request.
+    """
+    from leads.images import THUMBNAIL_SIZES, ensure_thumbnails, profile_image_hash, thumbnail_name
+
+    if size not in THUMBNAIL_SIZES or ".." in path or path.startswith("/"):
+        raise Http404("Invalid path")
+    if not _user_can_access_media_path_cached(request.user, path):
         raise Http404("File not found")
     try:
-        f = default_storage.open(path, "rb")
-        content_type, _ = mimetypes.guess_type(path)
-        if not content_type:
-            content_type = "application/octet-stream"
-        return FileResponse(f, content_type=content_type)
+        image_hash = profile_image_hash(path)
+        name = thumbnail_name(image_hash, size)
+        try:
+            return _serve_media(request, name)
+        except FileNotFoundError:
+            ensure_thumbnails(path, image_hash)
+            return _serve_media(request, name)
     except FileNotFoundError:
         raise Http404("File not found")
+    except Http404:
+        raise
     except Exception:
-        logger.exception("Media proxy error for path=%s", path)
+        logger.exception("Thumbnail error for path=%s size=%s", path, size)
         raise Http404("File not found")
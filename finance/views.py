@@ -9,22 +9,14 @@ from .models import OrderFinanceReport
 from .forms import DateRangeForm
 from orders.models import orders, OrderProduct
 from leads.models import Agent, UserProfile
+from leads.tenant import TenantMixin
+from djcrm.replica import ReplicaReadsMixin
 
 
-def get_organisation_for_user(user):
-    """Return the UserProfile (organisation) for filtering. Matches orders logic."""
-    if user.is_superuser:
-        return None
-    if getattr(user, "is_agent", False):
-        try:
-            return Agent.objects.get(user=user).organisation
-        except Agent.DoesNotExist:
-            return getattr(user, "userprofile", None)
-    return getattr(user, "userprofile", None)
-
-
-class FinancialReportView(LoginRequiredMixin, View):
+class FinancialReportView(ReplicaReadsMixin, LoginRequiredMixin, TenantMixin, View):
     template_name = 'finance/financial_report.html'
+    # The date range form is posted but only reads
+    replica_methods = ('GET', 'HEAD', 'POST')
 
     def get_queryset(self, start_datetime, end_datetime, date_filter='creation_date'):
         """Base queryset filtered by date range and organisation.
@@ -50,17 +42,14 @@ class FinancialReportView(LoginRequiredMixin, View):
             if agent_id:
                 qs = qs.filter(order__lead__agent_id=agent_id)
         elif user.is_organisor:
-            org = get_organisation_for_user(user)
+            org = self.tenant.organisation
             if org:
                 qs = qs.filter(order__organisation=org)
             if agent_id:
                 qs = qs.filter(order__lead__agent_id=agent_id)
         elif user.is_agent:
-            try:
-                agent = Agent.objects.get(user=user)
-                qs = qs.filter(order__lead__agent=agent)
-            except Agent.DoesNotExist:
-                qs = qs.none()
+            agent = self.tenant.agent
+            qs = qs.filter(order__lead__agent=agent) if agent else qs.none()
 
         order_by = '-order__order_day' if date_filter == 'order_day' else '-order__creation_date'
         return qs.order_by(order_by)
@@ -96,7 +85,7 @@ class FinancialReportView(LoginRequiredMixin, View):
             if selected_org:
                 ctx['agents'] = Agent.objects.filter(organisation_id=selected_org).select_related('user').order_by('user__username')
         elif user.is_organisor:
-            org = get_organisation_for_user(user)
+            org = self.tenant.organisation
             if org:
                 ctx['agents'] = Agent.objects.filter(organisation=org).select_related('user').order_by('user__username')
 
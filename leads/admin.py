@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import User, Lead, Agent, UserProfile, Category, SourceCategory, ValueCategory
+from .models import User, Lead, Agent, UserProfile, Category, SourceCategory, ValueCategory, QueuedEmail
 
 admin.site.register(Category) 
 admin.site.register(SourceCategory)
@@ -8,4 +8,5 @@ admin.site.register(ValueCategory)
 admin.site.register(User)
 admin.site.register(UserProfile)
 admin.site.register(Lead)
-admin.site.register(Agent)
\ No newline at end of file
+admin.site.register(Agent)
+admin.site.register(QueuedEmail)
\ No newline at end of file
@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+
+from .models import auth_user_cache_key
 
 User = get_user_model()
 
@@ -9,21 +14,28 @@ class EmailOrUsernameModelBackend(ModelBackend):
     Authenticate using either username or email.
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            # Try to find user by username or email
-            user = User.objects.get(
-                Q(username__iexact=username) | Q(email__iexact=username)
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        login = username.lower()
+        # One query served by the Lower(username)/Lower(email) unique indexes; a username
+        # match wins over another user's email match
+        user = (
+            User.objects
+            .alias(username_lower=Lower('username'), email_lower=Lower('email'))
+            .filter(Q(username_lower=login) | Q(email_lower=login))
+            .order_by(
+                Case(When(username_lower=login, then=Value(0)), default=Value(1), output_field=IntegerField()),
+                'pk',
             )
-        except User.DoesNotExist:
+            .first()
+        )
+        if user is None:
             # Run the default password hasher once to reduce the timing
             # difference between an existing and a non-existing user
             User().set_password(password)
             return None
-        except User.MultipleObjectsReturned:
-            # If multiple users are found, get the first one
-            user = User.objects.filter(
-                Q(username__iexact=username) | Q(email__iexact=username)
-            ).first()
 
         if user.check_password(password) and self.user_can_authenticate(user):
             # Email verification not required for Admin/Staff; required for others
@@ -35,8 +47,18 @@ class EmailOrUsernameModelBackend(ModelBackend):
         return None
 
     def get_user(self, user_id):
-        try:
-            user = User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+        """
+        Load the session's user, cached for AUTH_USER_CACHE_SECONDS so authenticated
+        requests skip the user SELECT. Saving or deleting the user evicts the entry.
+        """
+        timeout = getattr(settings, 'AUTH_USER_CACHE_SECONDS', 0)
+        key = auth_user_cache_key(user_id)
+        user = cache.get(key) if timeout else None
+        if user is None:
+            try:
+                user = User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            if timeout:
+                cache.set(key, user, timeout)
         return user if self.user_can_authenticate(user) else None
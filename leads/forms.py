@@ -5,7 +5,8 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm, UsernameField, AuthenticationForm, PasswordResetForm, SetPasswordForm
 from django.core.files.uploadedfile import UploadedFile
 from django.core.exceptions import ObjectDoesNotExist
-from .models import Lead, Agent, SourceCategory, ValueCategory, UserProfile
+from .images import compress_image_upload
+from .models import Lead, Agent, SourceCategory, ValueCategory, UserProfile, normalise_phone, normalised_phone
 from phonenumber_field.formfields import PhoneNumberField
 
 logger = logging.getLogger(__name__)
@@ -173,6 +174,14 @@ class PhoneNumberWidget(forms.MultiWidget):
 
 User = get_user_model()
 
+def lead_phone_number_taken(phone_number, instance=None):
+    """Whether another lead has this (normalised) number, however it was formatted when saved."""
+    leads = Lead.objects.annotate(phone_key=normalised_phone()).filter(phone_key=phone_number)
+    if instance is not None and instance.pk:
+        leads = leads.exclude(pk=instance.pk)
+    return leads.exists()
+
+
 class LeadModelForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         request = kwargs.pop("request", None)
@@ -237,14 +246,9 @@ class LeadModelForm(forms.ModelForm):
     def clean_phone_number(self):
         phone_number = self.cleaned_data.get('phone_number')
         if phone_number:
-            # If updating existing instance, exclude self from check
-            if self.instance and self.instance.pk:
-                if Lead.objects.filter(phone_number=phone_number).exclude(pk=self.instance.pk).exists():
-                    raise forms.ValidationError("A lead with this phone number already exists.")
-            else:
-                # When creating new lead, check for duplicates
-                if Lead.objects.filter(phone_number=phone_number).exists():
-                    raise forms.ValidationError("A lead with this phone number already exists.")
+            phone_number = normalise_phone(phone_number)
+            if lead_phone_number_taken(phone_number, self.instance):
+                raise forms.ValidationError("A lead with this phone number already exists.")
         return phone_number
     
     class Meta:
@@ -310,6 +314,7 @@ class OrganisorLeadModelForm(forms.ModelForm):
         upload = self.cleaned_data.get('profile_image')
         if upload and isinstance(upload, UploadedFile):
             validate_image_upload(upload)
+            upload = compress_image_upload(upload)
         elif not upload and (not self.instance or not self.instance.pk or not getattr(self.instance, 'profile_image', None) or not self.instance.profile_image):
             raise forms.ValidationError('Profile photo is required.')
         return upload
@@ -328,12 +333,9 @@ class OrganisorLeadModelForm(forms.ModelForm):
     def clean_phone_number(self):
         phone_number = self.cleaned_data.get('phone_number')
         if phone_number:
-            if self.instance and self.instance.pk:
-                if Lead.objects.filter(phone_number=phone_number).exclude(pk=self.instance.pk).exists():
-                    raise forms.ValidationError("This phone number is already in use.")
-            else:
-                if Lead.objects.filter(phone_number=phone_number).exists():
-                    raise forms.ValidationError("This phone number is already in use.")
+            phone_number = normalise_phone(phone_number)
+            if lead_phone_number_taken(phone_number, self.instance):
+                raise forms.ValidationError("This phone number is already in use.")
         return phone_number
 
     def save(self, commit=True):
@@ -432,19 +434,7 @@ class AdminLeadModelForm(forms.ModelForm):
                     self.fields['organisation'].initial = org.pk
         
         if org:
-            # Create default source and value categories if missing (all of them, not just Unassigned)
-            _default_source = [
-                "Website", "Social Media", "Email Campaign", "Cold Call", "Referral",
-                "Trade Show", "Advertisement", "Direct Mail", "SEO/Google", "Unassigned"
-            ]
-            _default_value = [
-                "Enterprise", "SMB", "Small Business", "Individual",
-                "High Value", "Medium Value", "Low Value", "Unassigned"
-            ]
-            for name in _default_source:
-                SourceCategory.objects.get_or_create(name=name, organisation=org)
-            for name in _default_value:
-                ValueCategory.objects.get_or_create(name=name, organisation=org)
+            # Default categories are provisioned when the organisation is created
             self.fields["agent"].queryset = Agent.objects.filter(organisation=org).select_related('user')
             self.fields["agent"].label_from_instance = lambda obj: f"{obj.user.get_full_name() or obj.user.username} ({obj.user.email})"
             self.fields["source_category"].queryset = SourceCategory.objects.filter(organisation=org)
@@ -454,6 +444,7 @@ class AdminLeadModelForm(forms.ModelForm):
         upload = self.cleaned_data.get('profile_image')
         if upload and isinstance(upload, UploadedFile):
             validate_image_upload(upload)
+            upload = compress_image_upload(upload)
         elif not upload and (not self.instance or not self.instance.pk or not getattr(self.instance, 'profile_image', None) or not self.instance.profile_image):
             raise forms.ValidationError('Profile photo is required.')
         return upload
@@ -474,14 +465,9 @@ class AdminLeadModelForm(forms.ModelForm):
     def clean_phone_number(self):
         phone_number = self.cleaned_data.get('phone_number')
         if phone_number:
-            # If updating existing instance, exclude self from check
-            if self.instance and self.instance.pk:
-                if Lead.objects.filter(phone_number=phone_number).exclude(pk=self.instance.pk).exists():
-                    raise forms.ValidationError("A lead with this phone number already exists.")
-            else:
-                # When creating new lead, check for duplicates
-                if Lead.objects.filter(phone_number=phone_number).exists():
-                    raise forms.ValidationError("A lead with this phone number already exists.")
+            phone_number = normalise_phone(phone_number)
+            if lead_phone_number_taken(phone_number, self.instance):
+                raise forms.ValidationError("A lead with this phone number already exists.")
         return phone_number
     
     def save(self, commit=True):
@@ -593,6 +579,7 @@ class CustomUserCreationForm(UserCreationForm):
         upload = self.cleaned_data.get('profile_image')
         if upload and isinstance(upload, UploadedFile):
             validate_image_upload(upload)
+            upload = compress_image_upload(upload)
         return upload
 
 
@@ -611,6 +598,32 @@ class AssignAgentForm(forms.Form):
             agents = Agent.objects.none()
         self.fields["agent"].queryset = agents
 
+
+class LeadImportForm(forms.Form):
+    """CSV/XLSX upload for leads.importer; admins also choose the organisation."""
+    file = forms.FileField(
+        label='CSV or XLSX file',
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv,.xlsx'}),
+    )
+    organisation = forms.ModelChoiceField(queryset=UserProfile.objects.none())
+
+    def __init__(self, *args, **kwargs):
+        request = kwargs.pop("request")
+        super(LeadImportForm, self).__init__(*args, **kwargs)
+        if request.user.is_superuser:
+            self.fields['organisation'].queryset = UserProfile.objects.filter(
+                user__is_organisor=True,
+                user__is_superuser=False
+            ).select_related('user').order_by('user__username')
+        else:
+            del self.fields['organisation']
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if not upload.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('Upload a .csv or .xlsx file.')
+        return upload
+
 class LeadCategoryUpdateForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         request = kwargs.pop("request", None)
@@ -632,18 +645,6 @@ class LeadCategoryUpdateForm(forms.ModelForm):
                 except (Agent.DoesNotExist, AttributeError):
                     pass
         if organisation:
-            _default_source = [
-                "Website", "Social Media", "Email Campaign", "Cold Call", "Referral",
-                "Trade Show", "Advertisement", "Direct Mail", "SEO/Google", "Unassigned"
-            ]
-            _default_value = [
-                "Enterprise", "SMB", "Small Business", "Individual",
-                "High Value", "Medium Value", "Low Value", "Unassigned"
-            ]
-            for name in _default_source:
-                SourceCategory.objects.get_or_create(name=name, organisation=organisation)
-            for name in _default_value:
-                ValueCategory.objects.get_or_create(name=name, organisation=organisation)
             self.fields["source_category"].queryset = SourceCategory.objects.filter(organisation=organisation)
             self.fields["value_category"].queryset = ValueCategory.objects.filter(organisation=organisation)
         else:
@@ -697,18 +698,17 @@ class CustomPasswordResetForm(PasswordResetForm):
 
     def send_mail(self, subject_template_name, email_template_name, context,
                   from_email, to_email, html_email_template_name=None):
-        """Override: don't swallow exceptions so real send failures surface (Render logs)."""
-        from django.core.mail import EmailMultiAlternatives
+        """Override: queue through the outbox and don't swallow exceptions so real send failures surface (Render logs)."""
         from django.template import loader
+        from .outbox import queue_mail
 
         subject = loader.render_to_string(subject_template_name, context)
         subject = "".join(subject.splitlines())
         body = loader.render_to_string(email_template_name, context)
-        email_message = EmailMultiAlternatives(subject, body, from_email, [to_email])
+        html_email = None
         if html_email_template_name:
             html_email = loader.render_to_string(html_email_template_name, context)
-            email_message.attach_alternative(html_email, "text/html")
-        email_message.send()
+        queue_mail(subject, body, from_email, [to_email], html_message=html_email)
 
     def save(self, domain_override=None, subject_template_name="registration/password_reset_subject.txt",
              email_template_name="registration/password_reset_email.html", use_https=False,
@@ -0,0 +1,143 @@
+"""
+Image derivative pipeline for Lead.profile_image and User.profile_image.
+
+Uploads are downscaled/re-encoded in the forms (compress_image_upload) and the
+SHA-256 of the stored file is kept in profile_image_hash. Square WebP thumbnails
+are stored under thumbnails/<size>/<hash>.webp, so identical images share one
+derivative and a replaced photo never serves a stale thumbnail. Thumbnails are
+generated lazily by the media-thumbnail view or up front by the
+generate_thumbnails management command.
+
+Pillow is imported inside the functions that need it so it is only loaded when
+an image is actually processed.
+"""
+import hashlib
+import io
+import logging
+
+from django import forms
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (64, 256)
+THUMBNAIL_QUALITY = 80
+# Uploads larger than this (either side, in pixels) are downscaled before storing
+MAX_UPLOAD_DIMENSION = 1600
+# Reject images that would decode to more pixels than this (decompression bombs)
+MAX_UPLOAD_PIXELS = 40_000_000
+
+
+def content_hash(fileobj):
+    """SHA-256 hex digest of a file-like object, read in chunks; rewinds when possible."""
+    digest = hashlib.sha256()
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    chunks = fileobj.chunks() if hasattr(fileobj, "chunks") else iter(lambda: fileobj.read(64 * 1024), b"")
+    for chunk in chunks:
+        digest.update(chunk)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def thumbnail_name(image_hash, size):
+    """Storage name of the size x size derivative of the image with this content hash."""
+    return f"thumbnails/{size}/{image_hash}.webp"
+
+
+def compress_image_upload(upload):
+    """
+    Downscale and re-encode a validated image upload (run after validate_image_upload).
+    Large JPEG/PNG/WebP images are resized to MAX_UPLOAD_DIMENSION and re-encoded; the
+    original upload is returned when it is already small, animated, or the result
+    would not be smaller. Raises forms.ValidationError for oversized pixel counts.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            if image.width * image.height > MAX_UPLOAD_PIXELS:
+                raise forms.ValidationError("Image dimensions are too large.")
+            if image.format not in ("JPEG", "PNG", "WEBP") or getattr(image, "is_animated", False):
+                return upload
+            if max(image.size) <= MAX_UPLOAD_DIMENSION:
+                return upload
+            image_format = image.format
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((MAX_UPLOAD_DIMENSION, MAX_UPLOAD_DIMENSION), Image.LANCZOS)
+            buffer = io.BytesIO()
+            if image_format == "JPEG":
+                image.convert("RGB").save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+            elif image_format == "PNG":
+                image.save(buffer, "PNG", optimize=True)
+            else:
+                image.save(buffer, "WEBP", quality=85)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        # Magic bytes were already validated; keep files Pillow cannot re-encode as uploaded
+        logger.info("Image upload %s not recompressed", getattr(upload, "name", ""), exc_info=True)
+        return upload
+    finally:
+        upload.seek(0)
+    data = buffer.getvalue()
+    if len(data) >= upload.size:
+        return upload
+    return SimpleUploadedFile(upload.name, data, content_type=upload.content_type)
+
+
+def render_thumbnail(fileobj, size):
+    """Return WebP bytes of a square, centre-cropped size x size thumbnail of fileobj."""
+    from PIL import Image, ImageOps
+
+    with Image.open(fileobj) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("P", "LA", "PA") else "RGB")
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def ensure_thumbnails(name, image_hash, sizes=THUMBNAIL_SIZES, force=False):
+    """
+    Create the missing thumbnails of the stored image name (one storage read for all sizes).
+    Returns the list of derivative names written.
+    """
+    targets = [size for size in sizes if force or not default_storage.exists(thumbnail_name(image_hash, size))]
+    if not targets:
+        return []
+    with default_storage.open(name, "rb") as source:
+        data = source.read()
+    written = []
+    for size in targets:
+        derivative = thumbnail_name(image_hash, size)
+        if force and default_storage.exists(derivative):
+            default_storage.delete(derivative)
+        written.append(default_storage.save(derivative, ContentFile(render_thumbnail(io.BytesIO(data), size))))
+    return written
+
+
+def profile_image_hash(name):
+    """
+    Content hash of a stored profile image, read from the owning Lead/User rows.
+    Files uploaded before hashes were recorded are hashed once and the rows updated.
+    """
+    from .models import Lead, User, auth_user_cache_key
+
+    model = Lead if name.startswith("lead_photos/") else User
+    rows = model.objects.filter(profile_image=name)
+    image_hash = rows.exclude(profile_image_hash="").values_list("profile_image_hash", flat=True).first()
+    if image_hash:
+        return image_hash
+    with default_storage.open(name, "rb") as source:
+        image_hash = content_hash(source)
+    user_ids = list(rows.values_list("pk", flat=True)) if model is User else []
+    rows.update(profile_image_hash=image_hash)
+    if user_ids:
+        cache.delete_many([auth_user_cache_key(pk) for pk in user_ids])
+    return image_hash
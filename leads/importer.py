@@ -0,0 +1,359 @@
+"""
+Bulk lead import from CSV or XLSX.
+
+Rows are streamed from the upload and handled chunk_size at a time: each chunk is validated
+in Python, checked for existing emails/phone numbers (normalised, as the lead forms compare
+them) with a single IN query and written with bulk_create; when a concurrent save makes the
+insert fail, the conflicting rows are rejected and the rest retried. Agents and categories are resolved from per-organisation maps built once
+per import, and leads without categories go to the organisation's "Unassigned" ones. Agents
+receive one notification for all leads assigned to them and the import gets one activity
+log entry. Rejected rows are written, with their errors, to a CSV report in default storage.
+
+XLSX files need openpyxl; it is imported only when such a file is read.
+"""
+import csv
+import io
+import logging
+import os
+import tempfile
+import uuid
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import (
+    Agent, Lead, SourceCategory, ValueCategory, normalise_phone, normalised_phone, unassigned_category_ids,
+)
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_COLUMNS = [
+    'first_name', 'last_name', 'email', 'phone_number', 'age', 'address', 'description',
+    'agent', 'source_category', 'value_category',
+]
+REQUIRED_COLUMNS = ['first_name', 'last_name', 'email', 'phone_number']
+REPORT_PREFIX = 'lead_imports'
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (unknown format, missing columns, bad encoding)."""
+
+
+def _header(name):
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store phone numbers and ages as floats
+        value = int(value)
+    return str(value).strip()
+
+
+def _dict_rows(header, rows, required):
+    header = [_header(name) for name in header]
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ImportFileError(f"Missing required column(s): {', '.join(missing)}")
+    for values in rows:
+        row = {name: _cell(value) for name, value in zip(header, values) if name}
+        if any(row.values()):
+            yield row
+
+
+def read_csv(file, required=REQUIRED_COLUMNS):
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        header = next(reader, None)
+    except UnicodeDecodeError:
+        raise ImportFileError("CSV files must be UTF-8 encoded.")
+    if not header:
+        raise ImportFileError("The file is empty.")
+    return _dict_rows(header, reader, required)
+
+
+def read_xlsx(file, required=REQUIRED_COLUMNS):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("XLSX import is not available on this server; upload a CSV file instead.")
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFileError("The file is not a valid XLSX workbook.")
+    rows = workbook.active.iter_rows(values_only=True)
+    header = next(rows, None)
+    if not header:
+        raise ImportFileError("The file is empty.")
+    return _dict_rows(header, rows, required)
+
+
+def read_rows(file, name, required=REQUIRED_COLUMNS):
+    """Yield one dict per data row of a .csv or .xlsx file, keyed by normalised column name."""
+    extension = os.path.splitext(name or '')[1].lower()
+    if extension == '.csv':
+        return read_csv(file, required)
+    if extension == '.xlsx':
+        return read_xlsx(file, required)
+    raise ImportFileError("Upload a .csv or .xlsx file.")
+
+
+class ImportReport:
+    """CSV of rejected rows and their errors, spooled to a temp file and saved to default storage."""
+
+    def __init__(self, columns, prefix, max_samples=20):
+        self.columns = columns
+        self.prefix = prefix
+        self.max_samples = max_samples
+        self.rejected = 0
+        self.sample_errors = []
+        self.name = None
+        self._file = None
+
+    def add(self, number, row, errors):
+        self.rejected += 1
+        if len(self.sample_errors) < self.max_samples:
+            self.sample_errors.append((number, errors))
+        if self._file is None:
+            self._file = io.TextIOWrapper(tempfile.TemporaryFile(), encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['row', 'errors'] + self.columns)
+        self._writer.writerow([number, '; '.join(errors)] + [row.get(column, '') for column in self.columns])
+
+    def save(self):
+        """Store the report, if any row was rejected, and return its storage name."""
+        if self._file is not None:
+            self._file.flush()
+            self._file.buffer.seek(0)
+            self.name = default_storage.save(f"{self.prefix}/{uuid.uuid4().hex}.csv", File(self._file.buffer))
+            self._file.close()
+            self._file = None
+        return self.name
+
+
+class LeadImporter:
+    """Imports rows into one organisation; run() returns the importer with its counters filled in."""
+
+    def __init__(self, organisation, user, chunk_size=IMPORT_CHUNK_SIZE):
+        self.organisation = organisation
+        self.user = user
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.report = ImportReport(IMPORT_COLUMNS, REPORT_PREFIX)
+        self._assigned = Counter()
+        self._seen_emails = set()
+        self._seen_phones = set()
+        self._max_length = {
+            field: Lead._meta.get_field(field).max_length
+            for field in ('first_name', 'last_name', 'email', 'phone_number', 'address')
+        }
+
+        self._agents = {}
+        for agent_id, user_id, email, username in Agent.objects.filter(organisation=organisation).values_list(
+            'pk', 'user_id', 'user__email', 'user__username',
+        ):
+            self._agents[email.lower()] = self._agents[username.lower()] = (agent_id, user_id)
+        self._source_categories = {
+            name.lower(): pk for pk, name in SourceCategory.objects.filter(organisation=organisation).values_list('pk', 'name')
+        }
+        self._value_categories = {
+            name.lower(): pk for pk, name in ValueCategory.objects.filter(organisation=organisation).values_list('pk', 'name')
+        }
+        self._unassigned = unassigned_category_ids(organisation.pk)
+
+    def run(self, rows):
+        chunk = []
+        try:
+            # Row 1 is the header, so data rows are numbered as the user sees them in the file
+            for number, row in enumerate(rows, start=2):
+                chunk.append((number, row))
+                if len(chunk) >= self.chunk_size:
+                    self._import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self._import_chunk(chunk)
+        except UnicodeDecodeError:
+            raise ImportFileError("CSV files must be UTF-8 encoded.")
+        finally:
+            self._finish()
+        return self
+
+    @property
+    def rejected(self):
+        return self.report.rejected
+
+    @property
+    def sample_errors(self):
+        return self.report.sample_errors
+
+    @property
+    def report_name(self):
+        return self.report.name
+
+    def _clean(self, row):
+        """Return (Lead, agent user id, errors) for one row; only the uniqueness check against the DB is left."""
+        errors = []
+        for column in REQUIRED_COLUMNS:
+            if not row.get(column):
+                errors.append(f"{column} is required.")
+        for column, max_length in self._max_length.items():
+            if len(row.get(column, '')) > max_length:
+                errors.append(f"{column} is longer than {max_length} characters.")
+
+        email = row.get('email', '')
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                errors.append("Enter a valid email address.")
+            if email in self._seen_emails:
+                errors.append("Email appears more than once in the file.")
+        phone = normalise_phone(row.get('phone_number', ''))
+        if phone:
+            if not phone.lstrip('+').isdigit():
+                errors.append("Enter a valid phone number.")
+            if phone in self._seen_phones:
+                errors.append("Phone number appears more than once in the file.")
+
+        age = 0
+        if row.get('age'):
+            try:
+                age = int(row['age'])
+                if age < 0:
+                    raise ValueError
+            except ValueError:
+                errors.append("age must be a whole number.")
+
+        agent_id = agent_user_id = None
+        if row.get('agent'):
+            agent = self._agents.get(row['agent'].lower())
+            if agent is None:
+                errors.append(f"Unknown agent: {row['agent']}.")
+            else:
+                agent_id, agent_user_id = agent
+        source_category_id = self._unassigned['source_category']
+        if row.get('source_category'):
+            source_category_id = self._source_categories.get(row['source_category'].lower())
+            if source_category_id is None:
+                errors.append(f"Unknown source category: {row['source_category']}.")
+        value_category_id = self._unassigned['value_category']
+        if row.get('value_category'):
+            value_category_id = self._value_categories.get(row['value_category'].lower())
+            if value_category_id is None:
+                errors.append(f"Unknown value category: {row['value_category']}.")
+
+        if errors:
+            return None, None, errors
+        self._seen_emails.add(email)
+        self._seen_phones.add(phone)
+        lead = Lead(
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+            age=age,
+            email=email,
+            phone_number=phone,
+            address=row.get('address', ''),
+            description=row.get('description', ''),
+            organisation=self.organisation,
+            agent_id=agent_id,
+            category_id=self._unassigned['category'],
+            source_category_id=source_category_id,
+            value_category_id=value_category_id,
+        )
+        return lead, agent_user_id, []
+
+    def _import_chunk(self, chunk):
+        pending = []
+        for number, row in chunk:
+            lead, agent_user_id, errors = self._clean(row)
+            if errors:
+                self.report.add(number, row, errors)
+            else:
+                pending.append((number, row, lead, agent_user_id))
+        if not pending:
+            return
+
+        accepted = self._reject_taken(pending)
+        while accepted:
+            try:
+                with transaction.atomic():
+                    Lead.objects.bulk_create([lead for _, _, lead, _ in accepted], batch_size=self.chunk_size)
+                break
+            except IntegrityError:
+                # Another request saved some of these emails/phone numbers after the check;
+                # reject those rows and retry the rest of the chunk
+                remaining = self._reject_taken(accepted)
+                if len(remaining) == len(accepted):
+                    logger.warning("Lead import chunk failed without a duplicate to blame; rejecting %d rows", len(accepted))
+                    for number, row, _, _ in accepted:
+                        self.report.add(number, row, ["Conflicts with a lead saved during the import; import this row again."])
+                    return
+                accepted = remaining
+        self.created += len(accepted)
+        self._assigned.update(agent_user_id for _, _, _, agent_user_id in accepted if agent_user_id is not None)
+
+    def _reject_taken(self, pending):
+        """Report the rows whose email or (normalised) phone number a saved lead already has; return the rest."""
+        emails = [lead.email for _, _, lead, _ in pending]
+        phones = [lead.phone_number for _, _, lead, _ in pending]
+        taken_emails = set()
+        taken_phones = set()
+        for email, phone in Lead.objects.annotate(phone_key=normalised_phone()).filter(
+            Q(email__in=emails) | Q(phone_key__in=phones),
+        ).values_list('email', 'phone_key'):
+            taken_emails.add(email)
+            taken_phones.add(phone)
+
+        free = []
+        for number, row, lead, agent_user_id in pending:
+            errors = []
+            if lead.email in taken_emails:
+                errors.append("A lead with this email already exists.")
+            if lead.phone_number in taken_phones:
+                errors.append("A lead with this phone number already exists.")
+            if errors:
+                self.report.add(number, row, errors)
+            else:
+                free.append((number, row, lead, agent_user_id))
+        return free
+
+    def _finish(self):
+        from activity_log.models import ACTION_LEADS_IMPORTED, log_activity
+        from tasks.notifier import Event, notify
+
+        self.report.save()
+        if not self.created:
+            return
+        lead_list_url = reverse('leads:lead-list')
+        notify(
+            (user_id, Event(
+                title="New leads assigned to you",
+                message=f"{count} imported lead(s) have been assigned to you.",
+                action_url=lead_list_url,
+                action_label="View Leads",
+            ))
+            for user_id, count in self._assigned.items()
+            if user_id != self.user.pk
+        )
+        log_activity(
+            self.user,
+            ACTION_LEADS_IMPORTED,
+            object_type='lead',
+            object_repr=f"Imported {self.created} lead(s)",
+            details={'created': self.created, 'rejected': self.rejected, 'agents': len(self._assigned)},
+            organisation=self.organisation,
+        )
+
+
+def import_leads(file, name, organisation, user, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import the uploaded file into organisation; raises ImportFileError for unreadable files."""
+    return LeadImporter(organisation, user, chunk_size).run(read_rows(file, name))
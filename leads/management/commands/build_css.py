@@ -0,0 +1,37 @@
+"""
+Compile the Tailwind stylesheet: python manage.py build_css
+Run by build.sh before collectstatic. Scans the templates (and app Python modules and
+static JavaScript) for the classes in use and writes a minified static/css/app.css with
+just those, replacing the in-browser Tailwind CDN compiler.
+"""
+import shlex
+
+from django.core.management.base import BaseCommand, CommandError
+
+from djcrm.assets import AssetBuildError, build_command, build_stylesheet, content_globs
+
+
+class Command(BaseCommand):
+    help = 'Compile the Tailwind stylesheet from the classes used in templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cli', help='Path of the Tailwind CLI (default: TAILWIND_CLI, PATH, or download)')
+        parser.add_argument('--no-minify', action='store_true', help='Keep the output readable')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print the files that would be scanned and the command that would run',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write('Scanning:')
+            for pattern in content_globs():
+                self.stdout.write(f'  {pattern}')
+            self.stdout.write(shlex.join(build_command(options['cli'] or 'tailwindcss', not options['no_minify'])))
+            return
+        try:
+            output = build_stylesheet(cli=options['cli'], minify=not options['no_minify'])
+        except AssetBuildError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Wrote {output} ({output.stat().st_size / 1024:.1f} KiB)'))
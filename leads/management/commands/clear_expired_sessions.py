@@ -0,0 +1,50 @@
+"""
+Delete expired sessions in small chunks.
+Run daily via cron: python manage.py clear_expired_sessions
+Database-backed engines (db, cached_db) never remove expired rows themselves, so
+django_session keeps growing; Django's clearsessions deletes them in one statement,
+which locks a large table for a long time. Cache and signed-cookie sessions expire on
+their own and only get the engine's clear_expired().
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from djcrm.db import delete_in_chunks
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the session table in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per statement (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print how many expired sessions would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not issubclass(store, DatabaseSessionStore):
+            if not options['dry_run']:
+                store.clear_expired()
+            self.stdout.write(f'{settings.SESSION_ENGINE} does not keep session rows; nothing to delete')
+            return
+
+        expired = store.get_model_class().objects.filter(expire_date__lt=timezone.now())
+        if options['dry_run']:
+            self.stdout.write(f'Would delete {expired.count()} expired sessions')
+            return
+        deleted = delete_in_chunks(expired, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions'))
@@ -1,58 +1,35 @@
+"""
+Backfill the default lead categories (source, value and the old-style "Unassigned"
+category) for organisations created before they were provisioned automatically.
+New organisations get them when their organisor's profile is created and migration
+leads/0030 backfills existing ones on deploy; this re-runs the same backfill by hand.
+"""
 from django.core.management.base import BaseCommand
-from leads.models import UserProfile, SourceCategory, ValueCategory
+from leads.models import UserProfile, provision_default_categories
 
 class Command(BaseCommand):
-    help = 'Create default source and value categories for all organizations'
+    help = 'Create missing default source and value categories for all organizations'
 
-    def handle(self, *args, **options):
-        # Source-based categories
-        source_categories = [
-            "Website",
-            "Social Media", 
-            "Email Campaign",
-            "Cold Call",
-            "Referral",
-            "Trade Show",
-            "Advertisement",
-            "Direct Mail",
-            "SEO/Google",
-            "Unassigned"
-        ]
-        
-        # Value-based categories
-        value_categories = [
-            "Enterprise",      # Large companies
-            "SMB",            # Mid-size businesses
-            "Small Business", # Small businesses
-            "Individual",     # Individual customers
-            "High Value",     # High value
-            "Medium Value",   # Medium value
-            "Low Value",      # Low value
-            "Unassigned"
-        ]
-        
-        # Create categories for all organizations
-        for organisation in UserProfile.objects.all():
-            self.stdout.write(f'Creating categories for {organisation.user.username}...')
-            
-            # Create source categories
-            for category_name in source_categories:
-                source_cat, created = SourceCategory.objects.get_or_create(
-                    name=category_name,
-                    organisation=organisation
-                )
-                if created:
-                    self.stdout.write(f'  Created source category: {category_name}')
-            
-            # Create value categories
-            for category_name in value_categories:
-                value_cat, created = ValueCategory.objects.get_or_create(
-                    name=category_name,
-                    organisation=organisation
-                )
-                if created:
-                    self.stdout.write(f'  Created value category: {category_name}')
-        
-        self.stdout.write(
-            self.style.SUCCESS('Successfully created default categories for all organizations!')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the organisations that would be backfilled',
         )
+
+    def handle(self, *args, **options):
+        organisations = UserProfile.objects.filter(user__is_organisor=True).select_related('user').order_by('pk')
+        total = 0
+        for organisation in organisations.iterator():
+            if options['dry_run']:
+                self.stdout.write(f'Would check default categories for {organisation.user.username}')
+                continue
+            created = provision_default_categories(organisation)
+            if created:
+                self.stdout.write(f'Created {created} categories for {organisation.user.username}')
+            total += created
+
+        if not options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS(f'Successfully created {total} default categories')
+            )
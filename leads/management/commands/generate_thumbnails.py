@@ -0,0 +1,55 @@
+"""
+Backfill content hashes and thumbnails for existing lead photos and profile images.
+New uploads get thumbnails lazily on first request; run this once after deploying
+(or with --force after changing thumbnail settings): python manage.py generate_thumbnails
+"""
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from leads.images import THUMBNAIL_SIZES, content_hash, ensure_thumbnails
+from leads.models import Lead, User
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails (and content hashes) for lead photos and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate thumbnails even if they already exist',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print which images would be processed',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        dry_run = options['dry_run']
+        processed = failed = 0
+
+        for model in (Lead, User):
+            rows = model.objects.exclude(profile_image='').exclude(profile_image__isnull=True).only('pk', 'profile_image', 'profile_image_hash')
+            for row in rows.iterator(chunk_size=500):
+                name = row.profile_image.name
+                if dry_run:
+                    self.stdout.write(f'Would process {name}')
+                    continue
+                try:
+                    image_hash = row.profile_image_hash
+                    if not image_hash:
+                        with default_storage.open(name, 'rb') as source:
+                            image_hash = content_hash(source)
+                        model.objects.filter(pk=row.pk).update(profile_image_hash=image_hash)
+                    written = ensure_thumbnails(name, image_hash, THUMBNAIL_SIZES, force=force)
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'Failed {name}: {exc}')
+                    continue
+                processed += 1
+                if written:
+                    self.stdout.write(f'  {name}: {len(written)} thumbnail(s) written')
+
+        self.stdout.write(self.style.SUCCESS(f'Done. Processed {processed} image(s), {failed} failed.'))
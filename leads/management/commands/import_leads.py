@@ -0,0 +1,51 @@
+"""
+Import leads from a CSV or XLSX file into one organisation, e.g. for large migrations:
+python manage.py import_leads leads.csv --organisation <organisor username or email>
+Uses the same pipeline as the web import (leads.importer); rejected rows are written to a
+CSV report in default storage.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from leads.importer import IMPORT_CHUNK_SIZE, ImportFileError, import_leads
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Bulk import leads from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument(
+            '--organisation',
+            required=True,
+            help='Username or email of the organisor whose organisation receives the leads',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help=f'Rows validated and inserted per batch (default: {IMPORT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        name = options['organisation']
+        organisation = UserProfile.objects.select_related('user').filter(
+            Q(user__username__iexact=name) | Q(user__email__iexact=name), user__is_organisor=True,
+        ).first()
+        if organisation is None:
+            raise CommandError(f'No organisor found for "{name}"')
+
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_leads(file, options['path'], organisation, organisation.user, options['chunk_size'])
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}')
+        except ImportFileError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {result.created} leads, rejected {result.rejected} rows'))
+        if result.report_name:
+            self.stdout.write(f'Error report: {result.report_name}')
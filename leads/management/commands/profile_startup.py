@@ -0,0 +1,67 @@
+"""
+Profile a cold start: python manage.py profile_startup [--path /login/] [--env USE_R2=true]
+Starts Django in a fresh interpreter with -X importtime, serves one GET and prints the time
+spent in each startup phase, the import time charged to each app and the slowest imports.
+With --budget the command fails when the cold start takes longer (for CI or a deploy check).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from djcrm.startup import StartupProfileError, profile_startup
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start import time per app and the time to the first response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='Path of the first request (default: /)')
+        parser.add_argument(
+            '--env',
+            action='append',
+            default=[],
+            metavar='KEY=VALUE',
+            help='Extra environment for the profiled process, e.g. --env USE_R2=true (repeatable)',
+        )
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list (default: 15)')
+        parser.add_argument('--budget', type=float, help='Fail if the cold start takes longer than this many seconds')
+
+    def handle(self, *args, **options):
+        env = {}
+        for item in options['env']:
+            key, sep, value = item.partition('=')
+            if not sep or not key:
+                raise CommandError(f'--env expects KEY=VALUE, not {item!r}')
+            env[key] = value
+        try:
+            profile = profile_startup(options['path'], env=env, top=options['top'])
+        except StartupProfileError as exc:
+            raise CommandError(f'Startup failed:\n{exc}')
+
+        write = self.stdout.write
+        write(f"Cold start serving GET {profile['path']} (fresh interpreter, -X importtime)")
+        for label, key in (
+            ('settings + app registry', 'setup_seconds'),
+            ('middleware', 'application_seconds'),
+            ('URLconf', 'urls_seconds'),
+            ('first response', 'first_response_seconds'),
+            ('total', 'total_seconds'),
+        ):
+            write(f'  {label:<26}{profile[key] * 1000:8.0f} ms')
+        write(f"  response status           {profile['status']}")
+
+        write(f"\nImports: {profile['module_count']} modules, {profile['import_seconds'] * 1000:.0f} ms")
+        for name, seconds, count in profile['groups']:
+            if seconds >= 0.001:
+                write(f'  {name:<26}{seconds * 1000:8.0f} ms  {count:4d} modules')
+        write('\nSlowest imports (including what they import):')
+        for name, seconds in profile['slowest']:
+            write(f'  {seconds * 1000:8.0f} ms  {name}')
+
+        heavy = profile['heavy_modules']
+        if heavy:
+            write(self.style.WARNING(f"\nHeavy optional dependencies loaded at startup: {', '.join(heavy)}"))
+        else:
+            write(self.style.SUCCESS('\nNo heavy optional dependencies loaded at startup'))
+
+        budget = options['budget']
+        if budget is not None and profile['total_seconds'] > budget:
+            raise CommandError(f"Cold start took {profile['total_seconds']:.2f}s, over the {budget:.2f}s budget")
@@ -0,0 +1,84 @@
+"""
+Send emails queued in the outbox (EMAIL_OUTBOX=true).
+Run every minute via cron: python manage.py send_queued_emails
+or as a background worker: python manage.py send_queued_emails --loop
+Due emails are sent in batches over one connection; failures are retried with backoff and
+marked dead after EMAIL_OUTBOX_MAX_ATTEMPTS (--requeue-dead retries them again). Sent
+emails older than EMAIL_OUTBOX_SENT_RETENTION_DAYS are deleted.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from djcrm.db import delete_in_chunks
+from leads import outbox
+from leads.models import QueuedEmail
+
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails in batches, with retries and dead-lettering'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Emails sent per connection (default: EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new emails',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls with --loop (default: 5)',
+        )
+        parser.add_argument(
+            '--requeue-dead',
+            action='store_true',
+            help='Retry emails that were given up on before sending',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print how many emails are due',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] if options['batch_size'] is not None else settings.EMAIL_OUTBOX_BATCH_SIZE
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['interval'] <= 0:
+            raise CommandError('--interval must be positive')
+
+        if options['dry_run']:
+            due = QueuedEmail.objects.filter(status=QueuedEmail.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+            dead = QueuedEmail.objects.filter(status=QueuedEmail.STATUS_DEAD)
+            self.stdout.write(f'{due.count()} emails due, {dead.count()} dead')
+            return
+
+        if options['requeue_dead']:
+            self.stdout.write(f'Requeued {outbox.requeue_dead()} dead emails')
+
+        last_purge = None
+        while True:
+            if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL_SECONDS:
+                purged = delete_in_chunks(outbox.sent_before(settings.EMAIL_OUTBOX_SENT_RETENTION_DAYS), 1000)
+                if purged:
+                    self.stdout.write(f'Deleted {purged} sent emails')
+                last_purge = time.monotonic()
+            sent, failed = outbox.send_due(batch_size)
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0025_add_lead_profile_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lead',
+            name='profile_image',
+            field=models.FileField(blank=True, db_index=True, help_text='Lead profile photo', null=True, upload_to='lead_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='profile_image',
+            field=models.FileField(blank=True, db_index=True, help_text='Upload a profile picture', null=True, upload_to='profile_images/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-19 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0026_index_profile_image_paths'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='profile_image_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-19 00:41
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('leads', '0027_profile_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('username'), name='user_username_lower_uniq', violation_error_message='A user with that username already exists.'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='user_email_lower_uniq', violation_error_message='A user with that email already exists.'),
+        ),
+    ]
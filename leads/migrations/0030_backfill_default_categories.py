@@ -0,0 +1,32 @@
+# Data migration: give organisations created before categories were provisioned
+# automatically their default lead categories (same code path as new organisations)
+
+from django.db import migrations
+
+
+def backfill_default_categories(apps, schema_editor):
+    from leads.models import provision_default_categories
+
+    UserProfile = apps.get_model('leads', 'UserProfile')
+    models = (
+        apps.get_model('leads', 'Category'),
+        apps.get_model('leads', 'SourceCategory'),
+        apps.get_model('leads', 'ValueCategory'),
+    )
+    for organisation in UserProfile.objects.filter(user__is_organisor=True).order_by('pk').iterator():
+        provision_default_categories(organisation, models)
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0029_queued_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_default_categories, noop),
+    ]
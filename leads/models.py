@@ -1,11 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.functions import Lower, Replace
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 import uuid
 from django.utils import timezone
 from datetime import timedelta
 from phonenumber_field.modelfields import PhoneNumberField
+from djcrm.versions import AGENTS, LEAD_CATEGORIES, TASKS, bump_version
 
 class User(AbstractUser):
     GENDER_CHOICES = [
@@ -20,7 +23,8 @@ class User(AbstractUser):
     phone_number = PhoneNumberField(blank=True, null=True, unique=True)
     date_of_birth = models.DateField(blank=True, null=True)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True, null=True)
-    profile_image = models.FileField(upload_to='profile_images/', blank=True, null=True, help_text="Upload a profile picture")
+    profile_image = models.FileField(upload_to='profile_images/', blank=True, null=True, db_index=True, help_text="Upload a profile picture")
+    profile_image_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
     
     # Set email and username to be unique
     email = models.EmailField(unique=True)
@@ -34,6 +38,20 @@ class User(AbstractUser):
         },
     )
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Logins match case-insensitively, so uniqueness has to as well; these indexes
+            # also serve the authentication backend's lookup.
+            models.UniqueConstraint(
+                Lower('username'), name='user_username_lower_uniq',
+                violation_error_message="A user with that username already exists.",
+            ),
+            models.UniqueConstraint(
+                Lower('email'), name='user_email_lower_uniq',
+                violation_error_message="A user with that email already exists.",
+            ),
+        ]
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='userprofile')
 
@@ -43,6 +61,21 @@ class UserProfile(models.Model):
     class Meta:
         unique_together = ('user',)  # Ensure a unique UserProfile per User
 
+UNASSIGNED_CATEGORY = "Unassigned"
+
+# Provisioned for every new organisation (see provision_default_categories)
+DEFAULT_SOURCE_CATEGORIES = [
+    "Website", "Social Media", "Email Campaign", "Cold Call", "Referral",
+    "Trade Show", "Advertisement", "Direct Mail", "SEO/Google", UNASSIGNED_CATEGORY,
+]
+DEFAULT_VALUE_CATEGORIES = [
+    "Enterprise", "SMB", "Small Business", "Individual",
+    "High Value", "Medium Value", "Low Value", UNASSIGNED_CATEGORY,
+]
+
+UNASSIGNED_CATEGORY_CACHE_SECONDS = 60 * 60
+
+
 class Category(models.Model):
     name = models.CharField(max_length=30)
     organisation = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
@@ -72,6 +105,19 @@ class ValueCategory(models.Model):
     class Meta:
         verbose_name_plural = "Value Categories"
 
+def normalise_phone(value):
+    """Lead phone numbers are stored and compared without spaces, hyphens or brackets."""
+    return value.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
+
+
+def normalised_phone(field='phone_number'):
+    """normalise_phone() in SQL, so numbers saved before normalisation still match."""
+    expression = models.F(field)
+    for char in (' ', '-', '(', ')'):
+        expression = Replace(expression, models.Value(char), models.Value(''))
+    return expression
+
+
 class Lead(models.Model):
     first_name = models.CharField(max_length=20)
     last_name = models.CharField(max_length=20)
@@ -86,36 +132,23 @@ class Lead(models.Model):
     phone_number = models.CharField(max_length=20, unique=True)
     email = models.EmailField(unique=True)
     address = models.CharField(max_length=255)
-    profile_image = models.FileField(upload_to='lead_photos/', blank=True, null=True, help_text="Lead profile photo")
+    profile_image = models.FileField(upload_to='lead_photos/', blank=True, null=True, db_index=True, help_text="Lead profile photo")
+    profile_image_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
 
     def save(self, *args, **kwargs):
         # Only assign categories when creating new lead (no pk)
         is_new = self.pk is None
         
-        if is_new:
-            # Backward compatibility for old category system
-            if not self.category:
-                try:
-                    unassigned_category = Category.objects.get(name="Unassigned", organisation=self.organisation)
-                except Category.DoesNotExist:
-                    unassigned_category = Category.objects.create(name="Unassigned", organisation=self.organisation)
-                self.category = unassigned_category
-            
-            # Default values for new categories
-            if not self.source_category:
-                try:
-                    unassigned_source = SourceCategory.objects.get(name="Unassigned", organisation=self.organisation)
-                except SourceCategory.DoesNotExist:
-                    unassigned_source = SourceCategory.objects.create(name="Unassigned", organisation=self.organisation)
-                self.source_category = unassigned_source
-            
-            if not self.value_category:
-                try:
-                    unassigned_value = ValueCategory.objects.get(name="Unassigned", organisation=self.organisation)
-                except ValueCategory.DoesNotExist:
-                    unassigned_value = ValueCategory.objects.create(name="Unassigned", organisation=self.organisation)
-                self.value_category = unassigned_value
-            
+        if is_new and not (self.category_id and self.source_category_id and self.value_category_id):
+            # Leads without categories go to the organisation's "Unassigned" ones (ids are cached)
+            unassigned = unassigned_category_ids(self.organisation_id)
+            if not self.category_id:
+                self.category_id = unassigned['category']
+            if not self.source_category_id:
+                self.source_category_id = unassigned['source_category']
+            if not self.value_category_id:
+                self.value_category_id = unassigned['value_category']
+
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -124,6 +157,12 @@ class Lead(models.Model):
             return f"{name} ({self.email})"
         return name
 
+    class Meta:
+        indexes = [
+            # Duplicate checks match on the normalised number
+            models.Index(normalised_phone(), name='lead_phone_key_idx'),
+        ]
+
 class Agent(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     organisation = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
@@ -144,8 +183,178 @@ class EmailVerificationToken(models.Model):
     def __str__(self):
         return f"Verification token for {self.user.email}"
 
+
+class QueuedEmail(models.Model):
+    """Outgoing email written with the change that triggers it and sent by send_queued_emails."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='queuedemail_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
 @receiver(post_save, sender=User)
 def post_user_created_signal(sender, instance, created, **kwargs):
     if created:
         user_profile, created = UserProfile.objects.get_or_create(user=instance)
 
+
+def unassigned_category_cache_key(organisation_id):
+    return f"unassigned-categories:{organisation_id}"
+
+
+def provision_default_categories(organisation, models=None):
+    """
+    Create the default (old-style) Category, SourceCategory and ValueCategory rows the
+    organisation is missing; returns how many were created. Data migrations pass their
+    historical (Category, SourceCategory, ValueCategory) classes as ``models``.
+    """
+    category_model, source_model, value_model = models or (Category, SourceCategory, ValueCategory)
+    created = 0
+    for model, names in (
+        (category_model, [UNASSIGNED_CATEGORY]),
+        (source_model, DEFAULT_SOURCE_CATEGORIES),
+        (value_model, DEFAULT_VALUE_CATEGORIES),
+    ):
+        existing = set(model.objects.filter(organisation_id=organisation.pk).values_list('name', flat=True))
+        missing = [model(name=name, organisation_id=organisation.pk) for name in names if name not in existing]
+        model.objects.bulk_create(missing)
+        created += len(missing)
+    cache.delete(unassigned_category_cache_key(organisation.pk))
+    if created:
+        bump_version(LEAD_CATEGORIES, organisation.pk)
+    return created
+
+
+def unassigned_category_ids(organisation_id):
+    """
+    {'category': id, 'source_category': id, 'value_category': id} of the organisation's
+    "Unassigned" categories, cached per organisation. Organisations provisioned before this
+    existed get the missing rows created on first use.
+    """
+    key = unassigned_category_cache_key(organisation_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = {}
+        for field, model in (('category', Category), ('source_category', SourceCategory), ('value_category', ValueCategory)):
+            category = model.objects.filter(name=UNASSIGNED_CATEGORY, organisation_id=organisation_id).order_by('pk').first()
+            if category is None:
+                category = model.objects.create(name=UNASSIGNED_CATEGORY, organisation_id=organisation_id)
+            ids[field] = category.pk
+        cache.set(key, ids, UNASSIGNED_CATEGORY_CACHE_SECONDS)
+    return ids
+
+
+@receiver(post_save, sender=UserProfile)
+def provision_organisation_categories(sender, instance, created, **kwargs):
+    """New organisations start with the default categories, so forms and lead creation only read them."""
+    if not created:
+        return
+    if instance.user.is_organisor:
+        provision_default_categories(instance)
+    else:
+        # A reused primary key must not inherit another organisation's cached ids
+        cache.delete(unassigned_category_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SourceCategory)
+@receiver(post_save, sender=ValueCategory)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SourceCategory)
+@receiver(post_delete, sender=ValueCategory)
+def evict_unassigned_category_ids(sender, instance, **kwargs):
+    cache.delete(unassigned_category_cache_key(instance.organisation_id))
+
+
+@receiver(post_save, sender=SourceCategory)
+@receiver(post_save, sender=ValueCategory)
+@receiver(post_delete, sender=SourceCategory)
+@receiver(post_delete, sender=ValueCategory)
+def bump_lead_categories_version(sender, instance, **kwargs):
+    bump_version(LEAD_CATEGORIES, instance.organisation_id)
+
+
+@receiver(post_save, sender=Agent)
+@receiver(post_delete, sender=Agent)
+def bump_agents_version(sender, instance, **kwargs):
+    bump_version(AGENTS, instance.organisation_id)
+
+
+@receiver(post_save, sender=User)
+def bump_user_name_versions(sender, instance, created, update_fields=None, **kwargs):
+    """Agent dropdowns and task lists show user names and emails (login only touches last_login)."""
+    if created or (update_fields is not None and not {'username', 'first_name', 'last_name', 'email'} & set(update_fields)):
+        return
+    if instance.is_agent:
+        organisation_ids = Agent.objects.filter(user=instance).values_list('organisation_id', flat=True)
+    elif instance.is_organisor:
+        organisation_ids = UserProfile.objects.filter(user=instance).values_list('pk', flat=True)
+    else:
+        return
+    for organisation_id in organisation_ids:
+        bump_version(AGENTS, organisation_id)
+        bump_version(TASKS, organisation_id)
+
+
+
+def auth_user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_auth_user(sender, instance, **kwargs):
+    """Drop the copy EmailOrUsernameModelBackend.get_user keeps for authenticated requests."""
+    # On commit: evicted earlier, a concurrent request could cache the old row again
+    key = auth_user_cache_key(instance.pk)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Lead)
+def evict_cached_profile_image(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop the media proxy's disk copy of the saved image. R2 storage is configured with
+    file_overwrite, so re-uploading a photo under the same file name replaces the object
+    in the bucket while the proxy cache would keep serving the old bytes.
+    """
+    if update_fields is not None and 'profile_image' not in update_fields:
+        return
+    if instance.profile_image:
+        from djcrm import media_cache
+        media_cache.evict(instance.profile_image.name)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Lead)
+def record_profile_image_hash(sender, instance, **kwargs):
+    """Keep profile_image_hash in sync with a newly uploaded (not yet stored) profile image."""
+    image = instance.profile_image
+    if not image:
+        instance.profile_image_hash = ''
+    elif not image._committed:
+        from .images import content_hash
+        instance.profile_image_hash = content_hash(image.file)
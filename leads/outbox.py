@@ -0,0 +1,148 @@
+"""
+Transactional email outbox.
+
+queue_mail() takes send_mail's arguments. With EMAIL_OUTBOX enabled it stores the message
+as a QueuedEmail row instead of calling the email provider, so when it runs inside the
+transaction that makes the triggering change (a new user, a reminder notification) the
+email is committed or rolled back with it. The send_queued_emails command claims due rows
+in batches, sends each batch over one backend connection and retries failures with
+exponential backoff; after EMAIL_OUTBOX_MAX_ATTEMPTS a row is marked dead and left for
+inspection. With EMAIL_OUTBOX off (the default, and in tests) queue_mail sends right away.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 6 * 60 * 60
+# A claimed row is skipped by other workers for this long; a worker that dies mid-batch
+# leaves its rows to be picked up again afterwards
+CLAIM_SECONDS = 10 * 60
+
+
+def outbox_enabled():
+    return getattr(settings, 'EMAIL_OUTBOX', False)
+
+
+def build_message(subject, message, from_email, recipient_list, html_message=None, connection=None):
+    email = EmailMultiAlternatives(subject, message, from_email, recipient_list, connection=connection)
+    if html_message:
+        email.attach_alternative(html_message, 'text/html')
+    return email
+
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """Queue an email for send_queued_emails, or send it now when EMAIL_OUTBOX is off."""
+    if not outbox_enabled():
+        build_message(subject, message, from_email, recipient_list, html_message).send()
+        return None
+    return QueuedEmail.objects.create(
+        subject=subject[:255],
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff after the given number of failed attempts: 1, 2, 4 ... minutes, capped at 6 hours."""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS))
+
+
+def claim_due(batch_size, now=None):
+    """Lease up to batch_size due pending emails to this worker and return them."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = (
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=QueuedEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')
+        )
+        emails = list(due[:batch_size])
+        if emails:
+            QueuedEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS),
+            )
+    return emails
+
+
+def _record_failure(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = f"{type(error).__name__}: {error}"
+    if email.attempts >= max_attempts:
+        email.status = QueuedEmail.STATUS_DEAD
+        logger.error("Giving up on queued email %s after %d attempts: %s", email.pk, email.attempts, email.last_error)
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+        logger.warning("Queued email %s failed (attempt %d): %s", email.pk, email.attempts, email.last_error)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def send_batch(emails, max_attempts=None):
+    """Send claimed emails over a single connection; returns (sent, failed)."""
+    max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        for email in emails:
+            _record_failure(email, exc, max_attempts)
+        return 0, len(emails)
+    sent = failed = 0
+    try:
+        for email in emails:
+            message = build_message(
+                email.subject, email.body, email.from_email, email.recipients, email.html_body, connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                _record_failure(email, exc, max_attempts)
+                failed += 1
+                continue
+            # Saved per message so a crash later in the batch cannot resend it
+            email.attempts += 1
+            email.status = QueuedEmail.STATUS_SENT
+            email.sent_at = timezone.now()
+            email.last_error = ''
+            email.save(update_fields=['attempts', 'status', 'sent_at', 'last_error'])
+            sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def send_due(batch_size=None, max_attempts=None):
+    """Send every due email, batch_size at a time; returns (sent, failed)."""
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    sent = failed = 0
+    while True:
+        emails = claim_due(batch_size)
+        if not emails:
+            return sent, failed
+        batch_sent, batch_failed = send_batch(emails, max_attempts)
+        sent += batch_sent
+        failed += batch_failed
+        if len(emails) < batch_size:
+            return sent, failed
+
+
+def requeue_dead():
+    """Give dead emails a fresh set of attempts; returns how many were requeued."""
+    return QueuedEmail.objects.filter(status=QueuedEmail.STATUS_DEAD).update(
+        status=QueuedEmail.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now(),
+    )
+
+
+def sent_before(days):
+    """Sent emails older than days, which the worker deletes."""
+    return QueuedEmail.objects.filter(status=QueuedEmail.STATUS_SENT, sent_at__lt=timezone.now() - timedelta(days=days))
@@ -0,0 +1,22 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+register = template.Library()
+
+# In-browser compiler, only for a development checkout where build_css has not been run
+TAILWIND_PLAY_CDN = "https://cdn.tailwindcss.com"
+
+
+@register.simple_tag
+def tailwind_stylesheet():
+    """
+    Link to the compiled Tailwind stylesheet (python manage.py build_css), by its
+    content-hashed name once collected.
+    Usage: {% load asset_tags %}{% tailwind_stylesheet %}
+    """
+    if settings.DEBUG and not finders.find(settings.TAILWIND_CSS):
+        return format_html('<script src="{}"></script>', TAILWIND_PLAY_CDN)
+    return format_html('<link href="{}" rel="stylesheet">', static(settings.TAILWIND_CSS))
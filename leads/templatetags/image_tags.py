@@ -0,0 +1,26 @@
+from django import template
+from django.urls import reverse
+
+from leads.images import THUMBNAIL_SIZES
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(image, size):
+    """
+    URL of the size x size thumbnail of a profile_image (64 or 256), served by media-thumbnail.
+    The content hash is appended so browsers refetch when the photo is replaced.
+    Usage: {% load image_tags %}<img src="{{ lead.profile_image|thumbnail:64 }}">
+    """
+    if not image:
+        return ""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        return image.url
+    if size not in THUMBNAIL_SIZES:
+        return image.url
+    url = reverse("media-thumbnail", kwargs={"size": size, "path": image.name})
+    image_hash = getattr(image.instance, "profile_image_hash", "")
+    return f"{url}?v={image_hash[:12]}" if image_hash else url
@@ -0,0 +1,141 @@
+"""
+Request-scoped tenant context.
+
+TenantMiddleware attaches request.tenant: the user's role, organisation and agent, each
+resolved at most once per request, plus the querysets of data the user may see. Views get
+it through get_tenant(request) (or TenantMixin.tenant) so requests built without the
+middleware, e.g. with RequestFactory, still work.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import cached_property
+
+from .models import Agent, Lead
+
+ROLE_ANONYMOUS = 'anonymous'
+ROLE_ADMIN = 'admin'
+ROLE_ORGANISOR = 'organisor'
+ROLE_AGENT = 'agent'
+ROLE_USER = 'user'
+
+
+class Tenant:
+    """Who the current user is within the CRM; every attribute is computed lazily and cached."""
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def role(self):
+        user = self.user
+        if not user.is_authenticated:
+            return ROLE_ANONYMOUS
+        if user.is_superuser:
+            return ROLE_ADMIN
+        if user.is_organisor:
+            return ROLE_ORGANISOR
+        if user.is_agent:
+            return ROLE_AGENT
+        return ROLE_USER
+
+    @property
+    def is_admin(self):
+        return self.role == ROLE_ADMIN
+
+    @property
+    def is_organisor(self):
+        return self.role == ROLE_ORGANISOR
+
+    @property
+    def is_agent(self):
+        return self.role == ROLE_AGENT
+
+    @cached_property
+    def agent(self):
+        """The user's Agent row (with its organisation), or None."""
+        if not self.user.is_authenticated or not getattr(self.user, 'is_agent', False):
+            return None
+        return Agent.objects.select_related('organisation', 'organisation__user').filter(user=self.user).first()
+
+    @property
+    def agent_id(self):
+        return self.agent.pk if self.agent else None
+
+    @cached_property
+    def organisation(self):
+        """UserProfile whose data the user works with; None for admins (they see every organisation)."""
+        if not self.user.is_authenticated or self.user.is_superuser:
+            return None
+        if getattr(self.user, 'is_agent', False) and self.agent is not None:
+            return self.agent.organisation
+        return getattr(self.user, 'userprofile', None)
+
+    @property
+    def organisation_id(self):
+        return self.organisation.pk if self.organisation else None
+
+    def orders(self):
+        """Orders the user may access: all for admins, the organisation's, or an agent's own leads' orders."""
+        from orders.models import orders
+
+        qs = orders.objects.all()
+        if self.is_admin:
+            return qs
+        if self.organisation is None:
+            return qs.none()
+        qs = qs.filter(organisation_id=self.organisation_id)
+        if getattr(self.user, 'is_agent', False):
+            qs = qs.filter(lead__agent_id=self.agent_id) if self.agent else qs.none()
+        return qs
+
+    def leads(self):
+        """Leads of the user's organisation (all for admins)."""
+        if self.is_admin:
+            return Lead.objects.all()
+        if self.organisation is None:
+            return Lead.objects.none()
+        return Lead.objects.filter(organisation_id=self.organisation_id)
+
+    def agents(self):
+        """Agents of the user's organisation (all for admins)."""
+        if self.is_admin:
+            return Agent.objects.all()
+        if self.organisation is None:
+            return Agent.objects.none()
+        return Agent.objects.filter(organisation_id=self.organisation_id)
+
+
+def get_tenant(request):
+    """request.tenant, created on first use when TenantMiddleware did not run."""
+    tenant = getattr(request, 'tenant', None)
+    if tenant is None:
+        tenant = request.tenant = Tenant(request.user)
+    return tenant
+
+
+def get_organisation_for_user(user):
+    """Return the UserProfile (organisation) to use for filtering. Agents see their organisation's data."""
+    return Tenant(user).organisation
+
+
+class TenantMixin:
+    """Gives class-based views self.tenant for the current request."""
+
+    @property
+    def tenant(self):
+        return get_tenant(self.request)
+
+
+class TenantMiddleware:
+    """Attach a lazily evaluated Tenant for request.user as request.tenant."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Nothing is evaluated here, so the async path needs no thread
+        request.tenant = Tenant(request.user)
+        return self.get_response(request)
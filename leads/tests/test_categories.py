@@ -0,0 +1,126 @@
+"""
+Default Category Test File
+This file tests provisioning of default lead categories, the cached
+"Unassigned" category ids and the default-category backfill (data migration
+and create_default_categories command).
+"""
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from leads.models import (
+    User, UserProfile, Lead, Category, SourceCategory, ValueCategory,
+    DEFAULT_SOURCE_CATEGORIES, DEFAULT_VALUE_CATEGORIES, UNASSIGNED_CATEGORY,
+    provision_default_categories, unassigned_category_ids,
+)
+
+
+class TestDefaultCategories(TestCase):
+    """Default categories are created with the organisation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisor_user = User.objects.create_user(
+            username='category_organisor',
+            email='category_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+            email_verified=True
+        )
+        cls.organisation = UserProfile.objects.get(user=cls.organisor_user)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_lead(self, n):
+        return Lead.objects.create(
+            first_name='Category', last_name=f'Lead{n}', organisation=self.organisation,
+            email=f'category_lead{n}@example.com', phone_number=f'+90555000{n:04d}',
+            description='-', address='-',
+        )
+
+    def test_new_organisation_is_provisioned(self):
+        self.assertEqual(
+            sorted(SourceCategory.objects.filter(organisation=self.organisation).values_list('name', flat=True)),
+            sorted(DEFAULT_SOURCE_CATEGORIES),
+        )
+        self.assertEqual(
+            sorted(ValueCategory.objects.filter(organisation=self.organisation).values_list('name', flat=True)),
+            sorted(DEFAULT_VALUE_CATEGORIES),
+        )
+        self.assertTrue(Category.objects.filter(organisation=self.organisation, name=UNASSIGNED_CATEGORY).exists())
+
+    def test_agent_profile_is_not_provisioned(self):
+        agent_user = User.objects.create_user(
+            username='category_agent',
+            email='category_agent@example.com',
+            password='testpass123',
+            is_organisor=False,
+            is_agent=True,
+        )
+        self.assertFalse(SourceCategory.objects.filter(organisation__user=agent_user).exists())
+
+    def test_provisioning_is_idempotent(self):
+        self.assertEqual(provision_default_categories(self.organisation), 0)
+        SourceCategory.objects.filter(organisation=self.organisation, name='Website').delete()
+        self.assertEqual(provision_default_categories(self.organisation), 1)
+
+    def test_lead_creation_uses_cached_unassigned_ids(self):
+        lead = self.create_lead(1)
+        self.assertEqual(lead.category.name, UNASSIGNED_CATEGORY)
+        self.assertEqual(lead.source_category.name, UNASSIGNED_CATEGORY)
+        self.assertEqual(lead.value_category.name, UNASSIGNED_CATEGORY)
+        # Only the INSERT once the ids are cached
+        with self.assertNumQueries(1):
+            self.create_lead(2)
+
+    def test_deleted_unassigned_category_is_recreated(self):
+        self.create_lead(1)
+        SourceCategory.objects.filter(organisation=self.organisation, name=UNASSIGNED_CATEGORY).delete()
+        lead = self.create_lead(2)
+        self.assertEqual(lead.source_category.name, UNASSIGNED_CATEGORY)
+        self.assertEqual(unassigned_category_ids(self.organisation.pk)['source_category'], lead.source_category_id)
+
+    def test_get_agents_by_org_is_read_only(self):
+        admin = User.objects.create_superuser(
+            username='category_admin', email='category_admin@example.com', password='testpass123',
+        )
+        self.client.force_login(admin)
+        url = reverse('leads:get-agents-by-org', args=[self.organisation.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['source_categories']), len(DEFAULT_SOURCE_CATEGORIES))
+        self.assertFalse([q for q in queries if not q['sql'].lstrip().upper().startswith('SELECT')])
+
+    def test_backfill_migration_uses_historical_models(self):
+        from importlib import import_module
+
+        from django.db.migrations.loader import MigrationLoader
+
+        apps = MigrationLoader(connection).project_state(('leads', '0030_backfill_default_categories')).apps
+        SourceCategory.objects.filter(organisation=self.organisation).delete()
+        migration = import_module('leads.migrations.0030_backfill_default_categories')
+        migration.backfill_default_categories(apps, None)
+        self.assertEqual(
+            SourceCategory.objects.filter(organisation=self.organisation).count(), len(DEFAULT_SOURCE_CATEGORIES),
+        )
+        migration.backfill_default_categories(apps, None)
+        self.assertEqual(
+            SourceCategory.objects.filter(organisation=self.organisation).count(), len(DEFAULT_SOURCE_CATEGORIES),
+        )
+
+    def test_backfill_command(self):
+        SourceCategory.objects.filter(organisation=self.organisation).delete()
+        out = StringIO()
+        call_command('create_default_categories', stdout=out)
+        self.assertIn(f'Successfully created {len(DEFAULT_SOURCE_CATEGORIES)} default categories', out.getvalue())
+        self.assertEqual(
+            SourceCategory.objects.filter(organisation=self.organisation).count(), len(DEFAULT_SOURCE_CATEGORIES),
+        )
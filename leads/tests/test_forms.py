@@ -3,8 +3,10 @@ Leads Forms Test File
 This file tests all forms in the Leads module.
 """
 
+import tempfile
+
 import django
-from django.test import TestCase, RequestFactory
+from django.test import TestCase, RequestFactory, override_settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core import mail
@@ -268,6 +270,33 @@ class TestLeadModelForm(TestCase):
         self.assertIn('phone_number', form.errors)
         self.assertIn('already exists', str(form.errors['phone_number']))
     
+    def test_form_phone_number_uniqueness_ignores_formatting(self):
+        """Numbers are normalised before saving and compared normalised, as the importer does"""
+        Lead.objects.create(
+            first_name='Existing',
+            last_name='Lead',
+            age=25,
+            organisation=self.organisor_profile,
+            description='Existing lead',
+            phone_number='+90-555-222-2222',
+            email='existing@example.com',
+            address='456 Existing Street'
+        )
+        
+        request = self.factory.get('/')
+        request.user = self.organisor_user
+        
+        data = self.valid_data.copy()
+        data['phone_number'] = '+90 (555) 222 2222'
+        form = LeadModelForm(data=data, request=request)
+        self.assertFalse(form.is_valid())
+        self.assertIn('already exists', str(form.errors['phone_number']))
+        
+        data['phone_number'] = '+90 (555) 333 3333'
+        form = LeadModelForm(data=data, request=request)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['phone_number'], '+905553333333')
+    
     def test_form_queryset_filtering_organisor(self):
         """Queryset filtering test for organisor"""
         request = self.factory.get('/')
@@ -649,6 +678,7 @@ class TestLeadForm(TestCase):
         self.assertTrue(form.is_valid())
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class TestCustomUserCreationForm(TestCase):
     """CustomUserCreationForm tests"""
     
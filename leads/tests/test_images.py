@@ -0,0 +1,116 @@
+"""
+Lead Images Test File
+This file tests the image derivative pipeline in leads.images,
+the thumbnail template filter and the generate_thumbnails command.
+"""
+
+import io
+import shutil
+import tempfile
+from io import StringIO
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from leads.images import compress_image_upload, content_hash, render_thumbnail, thumbnail_name, MAX_UPLOAD_DIMENSION
+from leads.models import User, UserProfile, Lead
+
+
+def make_image_bytes(size, image_format='JPEG', color=(10, 120, 200)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class TempMediaTestCase(TestCase):
+    """Runs each test against an empty temporary MEDIA_ROOT"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.organisor_user = User.objects.create_user(
+            username='images_organisor',
+            email='images_organisor@example.com',
+            password='testpass123',
+            phone_number='+905551234567',
+            is_organisor=True,
+            email_verified=True
+        )
+        self.organisor_profile, created = UserProfile.objects.get_or_create(user=self.organisor_user)
+
+    def create_lead(self, image_bytes, name='photo.jpg'):
+        lead = Lead(
+            first_name='Image',
+            last_name='Lead',
+            organisation=self.organisor_profile,
+            description='Lead with photo',
+            phone_number='+905550002222',
+            email='image_lead@example.com',
+            address='Address',
+        )
+        lead.profile_image = SimpleUploadedFile(name, image_bytes, content_type='image/jpeg')
+        lead.save()
+        return lead
+
+
+class TestCompressImageUpload(TestCase):
+    """compress_image_upload tests"""
+
+    def test_large_image_is_downscaled(self):
+        data = make_image_bytes((MAX_UPLOAD_DIMENSION * 2, MAX_UPLOAD_DIMENSION))
+        upload = SimpleUploadedFile('big.jpg', data, content_type='image/jpeg')
+        result = compress_image_upload(upload)
+        with Image.open(result) as image:
+            self.assertEqual(max(image.size), MAX_UPLOAD_DIMENSION)
+        self.assertEqual(result.name, 'big.jpg')
+
+    def test_small_image_is_unchanged(self):
+        upload = SimpleUploadedFile('small.jpg', make_image_bytes((200, 200)), content_type='image/jpeg')
+        self.assertIs(compress_image_upload(upload), upload)
+
+    def test_undecodable_image_is_unchanged(self):
+        upload = SimpleUploadedFile('fake.jpg', b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\xff\xd9', content_type='image/jpeg')
+        self.assertIs(compress_image_upload(upload), upload)
+
+
+class TestThumbnails(TempMediaTestCase):
+    """Content hash recording, thumbnail rendering, template filter and backfill command"""
+
+    def test_render_thumbnail_is_square_webp(self):
+        data = render_thumbnail(io.BytesIO(make_image_bytes((300, 120))), 64)
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (64, 64))
+
+    def test_hash_recorded_on_upload_and_cleared(self):
+        data = make_image_bytes((100, 100))
+        lead = self.create_lead(data)
+        self.assertEqual(lead.profile_image_hash, content_hash(io.BytesIO(data)))
+        lead.profile_image = None
+        lead.save()
+        self.assertEqual(lead.profile_image_hash, '')
+
+    def test_thumbnail_filter(self):
+        lead = self.create_lead(make_image_bytes((100, 100)))
+        rendered = Template('{% load image_tags %}{{ lead.profile_image|thumbnail:64 }}').render(Context({'lead': lead}))
+        self.assertIn(f'/media-thumbnail/64/{lead.profile_image.name}', rendered)
+        self.assertIn(f'v={lead.profile_image_hash[:12]}', rendered)
+
+    def test_generate_thumbnails_command_backfills(self):
+        lead = self.create_lead(make_image_bytes((100, 100)))
+        Lead.objects.filter(pk=lead.pk).update(profile_image_hash='')
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        lead.refresh_from_db()
+        self.assertTrue(lead.profile_image_hash)
+        for size in (64, 256):
+            self.assertTrue(default_storage.exists(thumbnail_name(lead.profile_image_hash, size)))
+        self.assertIn('Processed 1 image(s), 0 failed', out.getvalue())
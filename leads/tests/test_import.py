@@ -0,0 +1,243 @@
+"""
+Lead Import Test File
+This file tests the bulk CSV/XLSX lead import: validation, set-based duplicate
+detection, the error report, agent notifications, the import view and the
+import_leads management command.
+"""
+import csv
+import io
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from activity_log.models import ACTION_LEADS_IMPORTED, ActivityLog
+from leads.importer import ImportFileError, LeadImporter, import_leads
+from leads.models import User, UserProfile, Lead, Agent, UNASSIGNED_CATEGORY
+from tasks.models import Notification
+
+HEADER = ['first_name', 'last_name', 'email', 'phone_number', 'age', 'agent', 'source_category']
+
+
+def make_csv(rows, header=HEADER):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return out.getvalue().encode('utf-8')
+
+
+def row(n, **overrides):
+    values = {
+        'first_name': 'Import',
+        'last_name': f'Lead{n}',
+        'email': f'import_lead{n}@example.com',
+        'phone_number': f'+90555100{n:04d}',
+        'age': '30',
+        'agent': '',
+        'source_category': '',
+    }
+    values.update(overrides)
+    return [values[column] for column in HEADER]
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class TestLeadImport(TestCase):
+    """Bulk lead import"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organisor_user = User.objects.create_user(
+            username='import_organisor',
+            email='import_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+            email_verified=True
+        )
+        cls.organisation = UserProfile.objects.get(user=cls.organisor_user)
+        cls.agent_user = User.objects.create_user(
+            username='import_agent',
+            email='import_agent@example.com',
+            password='testpass123',
+            is_organisor=False,
+            is_agent=True,
+            email_verified=True
+        )
+        cls.agent = Agent.objects.create(user=cls.agent_user, organisation=cls.organisation)
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def run_import(self, rows, name='leads.csv', **kwargs):
+        return import_leads(io.BytesIO(make_csv(rows)), name, self.organisation, self.organisor_user, **kwargs)
+
+    def read_report(self, result):
+        with default_storage.open(result.report_name, 'rb') as report:
+            return list(csv.reader(io.TextIOWrapper(report, encoding='utf-8')))
+
+    def test_import_creates_leads(self):
+        result = self.run_import([row(1), row(2, agent='import_agent@example.com', source_category='Website')])
+        self.assertEqual((result.created, result.rejected), (2, 0))
+        self.assertIsNone(result.report_name)
+        lead = Lead.objects.get(email='import_lead2@example.com')
+        self.assertEqual(lead.organisation, self.organisation)
+        self.assertEqual(lead.agent, self.agent)
+        self.assertEqual(lead.source_category.name, 'Website')
+        self.assertEqual(lead.value_category.name, UNASSIGNED_CATEGORY)
+        self.assertEqual(Lead.objects.get(email='import_lead1@example.com').category.name, UNASSIGNED_CATEGORY)
+
+    def test_duplicates_are_rejected_with_report(self):
+        Lead.objects.create(
+            first_name='Existing', last_name='Lead', organisation=self.organisation,
+            email='import_lead1@example.com', phone_number='+905559999999',
+            description='-', address='-',
+        )
+        result = self.run_import([row(1), row(2), row(3, email='import_lead2@example.com')])
+        self.assertEqual((result.created, result.rejected), (1, 2))
+        report = self.read_report(result)
+        self.assertEqual(report[0][:2], ['row', 'errors'])
+        errors = {line[0]: line[1] for line in report[1:]}
+        self.assertEqual(sorted(errors), ['2', '4'])
+        self.assertIn('already exists', errors['2'])
+        self.assertIn('more than once', errors['4'])
+
+    def test_invalid_rows_are_rejected(self):
+        result = self.run_import([
+            row(1, agent='nobody@example.com'),
+            row(2, source_category='Carrier pigeon'),
+            row(3, email='not-an-email'),
+            row(4, age='old'),
+            row(5, first_name=''),
+        ])
+        self.assertEqual((result.created, result.rejected), (0, 5))
+        self.assertEqual(len(result.sample_errors), 5)
+        self.assertIn('Unknown agent: nobody@example.com.', result.sample_errors[0][1])
+        self.assertFalse(ActivityLog.objects.filter(action=ACTION_LEADS_IMPORTED).exists())
+
+    def test_duplicate_check_is_one_query_per_chunk(self):
+        rows = [row(n) for n in range(1, 11)]
+        with CaptureQueriesContext(connection) as queries:
+            result = self.run_import(rows, chunk_size=5)
+        self.assertEqual(result.created, 10)
+        lead_selects = [q for q in queries if q['sql'].startswith('SELECT') and 'FROM "leads_lead"' in q['sql']]
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "leads_lead"')]
+        self.assertEqual(len(lead_selects), 2)
+        self.assertEqual(len(inserts), 2)
+
+    def test_existing_phone_numbers_match_whatever_their_formatting(self):
+        Lead.objects.create(
+            first_name='Existing', last_name='Lead', organisation=self.organisation,
+            email='existing@example.com', phone_number='+90-555-100-0001',
+            description='-', address='-',
+        )
+        result = self.run_import([row(1, phone_number='+90 555 100 0001'), row(2)])
+        self.assertEqual((result.created, result.rejected), (1, 1))
+        self.assertIn('phone number already exists', result.sample_errors[0][1][0])
+
+    def test_chunk_conflicting_on_insert_keeps_its_other_rows(self):
+        Lead.objects.create(
+            first_name='Existing', last_name='Lead', organisation=self.organisation,
+            email='import_lead2@example.com', phone_number='+905559999999',
+            description='-', address='-',
+        )
+        reject_taken = LeadImporter._reject_taken
+        calls = []
+
+        def saved_after_the_check(importer, pending):
+            # The first check misses the lead, as if another request saved it just after
+            calls.append(len(pending))
+            return pending if len(calls) == 1 else reject_taken(importer, pending)
+
+        with patch.object(LeadImporter, '_reject_taken', saved_after_the_check):
+            result = self.run_import([row(1, agent='import_agent'), row(2, agent='import_agent'), row(3)])
+        self.assertEqual(calls, [3, 3])
+        self.assertEqual((result.created, result.rejected), (2, 1))
+        self.assertEqual(result.sample_errors, [(3, ['A lead with this email already exists.'])])
+        self.assertEqual(result._assigned[self.agent_user.pk], 1)
+        self.assertTrue(Lead.objects.filter(email='import_lead3@example.com').exists())
+
+    def test_agents_get_one_notification_and_import_is_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.run_import([row(n, agent='import_agent') for n in range(1, 4)])
+        self.assertEqual(result.created, 3)
+        notifications = Notification.objects.filter(user=self.agent_user)
+        self.assertEqual(notifications.count(), 1)
+        self.assertIn('3 imported lead(s)', notifications.get().message)
+        log = ActivityLog.objects.get(action=ACTION_LEADS_IMPORTED)
+        self.assertEqual(log.organisation, self.organisation)
+        self.assertEqual(log.details['created'], 3)
+
+    def test_missing_columns_and_unknown_format(self):
+        with self.assertRaisesMessage(ImportFileError, 'phone_number'):
+            import_leads(
+                io.BytesIO(make_csv([], header=['first_name', 'last_name', 'email'])),
+                'leads.csv', self.organisation, self.organisor_user,
+            )
+        with self.assertRaises(ImportFileError):
+            import_leads(io.BytesIO(b''), 'leads.txt', self.organisation, self.organisor_user)
+
+    def test_import_view_and_report_download(self):
+        self.client.force_login(self.organisor_user)
+        response = self.client.get(reverse('leads:lead-import'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('organisation', response.context['form'].fields)
+
+        upload = SimpleUploadedFile('leads.csv', make_csv([row(1), row(2, email='bad')]), content_type='text/csv')
+        response = self.client.post(reverse('leads:lead-import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 1)
+        self.assertEqual(response.context['result'].rejected, 1)
+        self.assertContains(response, reverse('leads:lead-import-report'))
+
+        response = self.client.get(reverse('leads:lead-import-report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertIn(b'Enter a valid email address.', b''.join(response.streaming_content))
+
+    def test_xlsx_without_openpyxl_shows_error(self):
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            pass
+        else:
+            self.skipTest('openpyxl is installed')
+        self.client.force_login(self.organisor_user)
+        upload = SimpleUploadedFile('leads.xlsx', b'PK\x03\x04', content_type='application/octet-stream')
+        response = self.client.post(reverse('leads:lead-import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('file', response.context['form'].errors)
+
+    def test_agents_cannot_import(self):
+        self.client.force_login(self.agent_user)
+        response = self.client.get(reverse('leads:lead-import'))
+        self.assertRedirects(response, reverse('leads:lead-list'), fetch_redirect_response=False)
+
+    def test_report_requires_a_previous_import(self):
+        self.client.force_login(self.organisor_user)
+        self.assertEqual(self.client.get(reverse('leads:lead-import-report')).status_code, 404)
+
+    def test_import_leads_command(self):
+        path = os.path.join(self.media_root, 'leads.csv')
+        with open(path, 'wb') as file:
+            file.write(make_csv([row(1), row(2)]))
+        out = StringIO()
+        call_command('import_leads', path, organisation='import_organisor', stdout=out)
+        self.assertIn('Imported 2 leads, rejected 0 rows', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('import_leads', path, organisation='import_agent', stdout=StringIO())
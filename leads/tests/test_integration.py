@@ -3,6 +3,8 @@ Leads Integration Test File
 This file contains integration tests for the Leads module.
 """
 
+import tempfile
+
 from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -23,7 +25,7 @@ VALID_JPEG_BYTES = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x0
 SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestLeadWorkflowIntegration(TestCase):
     """Lead workflow integration tests"""
     
@@ -206,7 +208,7 @@ class TestLeadWorkflowIntegration(TestCase):
         self.assertEqual(lead.value_category, new_value_category)
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestUserRegistrationWorkflow(TestCase):
     """User registration workflow tests"""
     
@@ -231,7 +233,7 @@ class TestUserRegistrationWorkflow(TestCase):
     def test_complete_registration_workflow(self):
         """Complete registration workflow test"""
         # 1. Sign up
-        with patch('leads.views.send_mail') as mock_send_mail:
+        with patch('leads.views.queue_mail') as mock_send_mail:
             response = self.client.post(reverse('signup'), data=self.valid_data)
             
             # Registration should succeed
@@ -464,7 +466,7 @@ class TestLeadPermissionIntegration(TestCase):
         self.assertEqual(response.status_code, 302)
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestLeadFormIntegration(TestCase):
     """Lead form integration tests"""
     
@@ -538,7 +540,7 @@ class TestLeadFormIntegration(TestCase):
             'profile_image': SimpleUploadedFile('test.jpg', VALID_JPEG_BYTES, content_type='image/jpeg'),
         }
         
-        with patch('leads.views.send_mail'):
+        with patch('leads.views.queue_mail'):
             response = self.client.post(reverse('leads:lead-create'), data=valid_data)
             
             # Form should be valid and lead should be created
@@ -624,7 +626,7 @@ class TestLeadFormIntegration(TestCase):
         )
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestEmailIntegration(TestCase):
     """Email integration tests"""
     
@@ -687,7 +689,7 @@ class TestEmailIntegration(TestCase):
             'password2': 'testpass123!'
         }
         
-        with patch('leads.views.send_mail') as mock_send_mail:
+        with patch('leads.views.queue_mail') as mock_send_mail:
             response = self.client.post(reverse('signup'), data=registration_data)
             
             # Successful signup redirects to email verification sent page
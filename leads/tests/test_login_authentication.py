@@ -3,13 +3,15 @@ Login Authentication Backend Test File
 This file tests the login authentication backend.
 """
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.contrib.auth.backends import ModelBackend
 from unittest.mock import patch, MagicMock
 
 from leads.authentication import EmailOrUsernameModelBackend
-from leads.models import User, UserProfile, EmailVerificationToken
+from leads.models import User, UserProfile, EmailVerificationToken, auth_user_cache_key
 from organisors.models import Organisor
 
 User = get_user_model()
@@ -280,6 +282,77 @@ class TestEmailOrUsernameModelBackend(TestCase):
             # Exception expected for invalid string ID
             pass
     
+    @override_settings(AUTH_USER_CACHE_SECONDS=30)
+    def test_get_user_is_cached_until_saved(self):
+        """get_user serves repeat calls from the cache and re-reads after a save"""
+        cache.clear()
+        self.backend.get_user(self.user.id)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.id)
+        self.assertEqual(user.username, 'testuser_auth')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Renamed'
+            self.user.save()
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(self.user.id)
+        self.assertEqual(user.first_name, 'Renamed')
+
+    @override_settings(AUTH_USER_CACHE_SECONDS=30)
+    def test_get_user_cache_evicted_on_delete(self):
+        """A deleted user is not served from the cache"""
+        cache.clear()
+        self.backend.get_user(self.unverified_user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unverified_user.delete()
+        self.assertIsNone(self.backend.get_user(self.unverified_user.id))
+
+    @override_settings(AUTH_USER_CACHE_SECONDS=30)
+    def test_get_user_cache_evicted_on_commit(self):
+        """The cached copy is dropped when the save commits, not before"""
+        cache.clear()
+        self.backend.get_user(self.user.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNotNone(cache.get(auth_user_cache_key(self.user.id)))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(auth_user_cache_key(self.user.id)))
+
+    @override_settings(AUTH_USER_CACHE_SECONDS=0)
+    def test_get_user_cache_disabled(self):
+        """AUTH_USER_CACHE_SECONDS=0 always queries the database"""
+        self.backend.get_user(self.user.id)
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.id)
+
+    def test_authenticate_single_query(self):
+        """The user lookup is a single query"""
+        with patch.object(User, 'check_password', return_value=True), self.assertNumQueries(1):
+            user = self.backend.authenticate(request=None, username='TEST_AUTH@example.com', password='x')
+        self.assertEqual(user, self.user)
+
+    def test_authenticate_prefers_username_match(self):
+        """A username match wins over another user's email address"""
+        other = User.objects.create_user(
+            username='test_auth@example.org',
+            email='other_auth@example.com',
+            password='testpass123',
+            email_verified=True
+        )
+        self.user.email = 'test_auth@example.org'
+        self.user.save()
+        user = self.backend.authenticate(request=None, username='Test_Auth@example.org', password='testpass123')
+        self.assertEqual(user, other)
+
+    def test_username_and_email_unique_ignoring_case(self):
+        """Usernames and emails differing only in case are rejected"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='TestUser_Auth', email='case_auth@example.com', password='testpass123')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='case_auth', email='TEST_AUTH@example.com', password='testpass123')
+
     def test_user_can_authenticate(self):
         """user_can_authenticate method test"""
         # Normal user
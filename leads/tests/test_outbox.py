@@ -0,0 +1,171 @@
+"""
+Email Outbox Test File
+This file tests leads.outbox, the send_queued_emails command and
+queueing of transactional emails from views and commands.
+"""
+import tempfile
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from leads import outbox
+from leads.models import QueuedEmail, User
+from tasks.models import Task
+
+VALID_JPEG_BYTES = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00\xff\xd9'
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+def queue(subject='Hello', to='outbox@example.com'):
+    with override_settings(EMAIL_OUTBOX=True):
+        return outbox.queue_mail(subject, 'Body', 'crm@example.com', [to])
+
+
+class TestQueueMail(TestCase):
+    """queue_mail"""
+
+    @override_settings(EMAIL_OUTBOX=True)
+    def test_queues_when_outbox_enabled(self):
+        email = outbox.queue_mail('Subject', 'Body', 'crm@example.com', ['a@example.com'], html_message='<p>Body</p>')
+        self.assertEqual(len(mail.outbox), 0)
+        email.refresh_from_db()
+        self.assertEqual(email.status, QueuedEmail.STATUS_PENDING)
+        self.assertEqual(email.recipients, ['a@example.com'])
+        self.assertEqual(email.html_body, '<p>Body</p>')
+
+    def test_sends_immediately_when_outbox_disabled(self):
+        self.assertIsNone(outbox.queue_mail('Subject', 'Body', 'crm@example.com', ['a@example.com']))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_retry_delay_backs_off(self):
+        self.assertEqual(outbox.retry_delay(1), timedelta(minutes=1))
+        self.assertEqual(outbox.retry_delay(3), timedelta(minutes=4))
+        self.assertEqual(outbox.retry_delay(20), timedelta(seconds=outbox.RETRY_MAX_SECONDS))
+
+
+class TestSendDue(TestCase):
+    """Claiming and sending queued emails"""
+
+    def test_sends_batches_over_one_connection_each(self):
+        for i in range(5):
+            queue(to=f'user{i}@example.com')
+        with patch('leads.outbox.get_connection', wraps=get_connection) as connection:
+            self.assertEqual(outbox.send_due(batch_size=2), (5, 0))
+        self.assertEqual(connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(QueuedEmail.objects.exclude(status=QueuedEmail.STATUS_SENT).exists())
+        self.assertEqual(QueuedEmail.objects.filter(sent_at__isnull=False, attempts=1).count(), 5)
+
+    def test_claimed_emails_are_not_claimed_again(self):
+        queue()
+        self.assertEqual(len(outbox.claim_due(10)), 1)
+        self.assertEqual(outbox.claim_due(10), [])
+
+    def test_failure_is_retried_later(self):
+        email = queue()
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(outbox.send_due(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, QueuedEmail.STATUS_PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('down', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(outbox.send_due(), (0, 0))
+
+        QueuedEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.send_due(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), (QueuedEmail.STATUS_SENT, 2, ''))
+
+    def test_dead_letter_after_max_attempts_and_requeue(self):
+        email = queue()
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            outbox.send_due(max_attempts=1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, QueuedEmail.STATUS_DEAD)
+        self.assertEqual(outbox.requeue_dead(), 1)
+        self.assertEqual(outbox.send_due(), (1, 0))
+
+
+class TestSendQueuedEmailsCommand(TestCase):
+    """send_queued_emails management command"""
+
+    def test_sends_and_reports(self):
+        queue()
+        out = StringIO()
+        call_command('send_queued_emails', stdout=out)
+        self.assertIn('Sent 1 emails, 0 failed', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_dry_run(self):
+        queue()
+        out = StringIO()
+        call_command('send_queued_emails', '--dry-run', stdout=out)
+        self.assertIn('1 emails due, 0 dead', out.getvalue())
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(EMAIL_OUTBOX_SENT_RETENTION_DAYS=7)
+    def test_deletes_old_sent_emails(self):
+        old = queue()
+        QueuedEmail.objects.filter(pk=old.pk).update(
+            status=QueuedEmail.STATUS_SENT, sent_at=timezone.now() - timedelta(days=8),
+        )
+        call_command('send_queued_emails', stdout=StringIO())
+        self.assertFalse(QueuedEmail.objects.filter(pk=old.pk).exists())
+
+    def test_rejects_invalid_batch_size(self):
+        with self.assertRaises(CommandError):
+            call_command('send_queued_emails', '--batch-size', '0', stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EMAIL_OUTBOX=True, **SIMPLE_STATIC)
+class TestQueuedTransactionalEmails(TestCase):
+    """Views and commands queue their emails when the outbox is enabled"""
+
+    def test_signup_queues_verification_email(self):
+        response = self.client.post(reverse('signup'), {
+            'username': 'outbox_signup',
+            'email': 'outbox_signup@example.com',
+            'first_name': 'Outbox',
+            'last_name': 'User',
+            'phone_number_0': '+90',
+            'phone_number_1': '5551234599',
+            'date_of_birth': '1990-01-01',
+            'gender': 'M',
+            'password1': 'testpass123!',
+            'password2': 'testpass123!',
+            'profile_image': SimpleUploadedFile("profile.jpg", VALID_JPEG_BYTES, content_type="image/jpeg"),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.recipients, ['outbox_signup@example.com'])
+        self.assertIn('verify-email', email.body)
+
+        call_command('send_queued_emails', stdout=StringIO())
+        self.assertEqual(mail.outbox[0].subject, 'Darkenyas CRM - Email Verification')
+
+    def test_task_deadline_reminder_is_queued(self):
+        user = User.objects.create_user(
+            username='outbox_task', email='outbox_task@example.com', password='testpass123', email_verified=True,
+        )
+        Task.objects.create(
+            title='Outbox task', content='-', start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=1), assigned_to=user,
+            organisation=user.userprofile,
+        )
+        call_command('check_task_deadlines', '--days', '1', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.get().recipients, ['outbox_task@example.com'])
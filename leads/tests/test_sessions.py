@@ -0,0 +1,100 @@
+"""
+Session Storage Test File
+This file compares the database round-trips of the session engines on an
+authenticated page and tests the clear_expired_sessions command.
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from leads.models import User, UserProfile
+
+SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+@override_settings(**SIMPLE_STATIC)
+class TestSessionEngineRoundTrips(TestCase):
+    """Queries spent on session and user loading per authenticated request, by engine"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='session_organisor',
+            email='session_organisor@example.com',
+            password='testpass123',
+            is_organisor=True,
+            email_verified=True
+        )
+        UserProfile.objects.get_or_create(user=cls.user)
+
+    def session_queries(self, engine):
+        """Session/user queries of a warm request to the lead list with the given engine."""
+        cache.clear()
+        # The user cache is on by default with REDIS_URL, like cached_db
+        with override_settings(SESSION_ENGINE=engine, AUTH_USER_CACHE_SECONDS=30):
+            # SessionMiddleware binds its engine when loaded, so each engine needs a new client
+            client = Client()
+            client.force_login(self.user)
+            client.get(reverse('leads:lead-list'))
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(reverse('leads:lead-list'))
+        self.assertEqual(response.status_code, 200)
+        tables = ('"django_session"', '"leads_user"')
+        return {
+            table: sum(1 for query in queries if f'FROM {table}' in query['sql'] and 'JOIN' not in query['sql'])
+            for table in tables
+        }
+
+    def test_database_sessions_read_every_request(self):
+        self.assertEqual(self.session_queries('django.contrib.sessions.backends.db')['"django_session"'], 1)
+
+    def test_cached_db_and_signed_cookies_skip_session_table(self):
+        for engine in ('django.contrib.sessions.backends.cached_db', 'django.contrib.sessions.backends.signed_cookies'):
+            with self.subTest(engine=engine):
+                self.assertEqual(self.session_queries(engine), {'"django_session"': 0, '"leads_user"': 0})
+
+
+class TestClearExpiredSessionsCommand(TestCase):
+    """clear_expired_sessions management command"""
+
+    def create_session(self, key, expires_in):
+        return Session.objects.create(
+            session_key=key, session_data='e30:', expire_date=timezone.now() + timedelta(days=expires_in),
+        )
+
+    def test_deletes_only_expired_sessions_in_chunks(self):
+        for i in range(5):
+            self.create_session(f'expired{i}', -1)
+        live = self.create_session('live', 1)
+        out = StringIO()
+        call_command('clear_expired_sessions', '--chunk-size', '2', stdout=out)
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(list(Session.objects.all()), [live])
+
+    def test_dry_run(self):
+        self.create_session('expired', -1)
+        out = StringIO()
+        call_command('clear_expired_sessions', '--dry-run', stdout=out)
+        self.assertIn('Would delete 1 expired sessions', out.getvalue())
+        self.assertEqual(Session.objects.count(), 1)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_cookie_sessions_have_no_rows(self):
+        self.create_session('expired', -1)
+        out = StringIO()
+        call_command('clear_expired_sessions', stdout=out)
+        self.assertIn('nothing to delete', out.getvalue())
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_rejects_invalid_chunk_size(self):
+        with self.assertRaises(CommandError):
+            call_command('clear_expired_sessions', '--chunk-size', '0', stdout=StringIO())
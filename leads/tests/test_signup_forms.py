@@ -3,8 +3,10 @@ Signup Forms Test File
 This file tests all forms related to signup.
 """
 
+import tempfile
+
 import django
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
@@ -288,6 +290,7 @@ class TestCustomUserCreationForm(TestCase):
         self.assertEqual(form.Meta.field_classes['username'], django.contrib.auth.forms.UsernameField)
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class TestSignupFormIntegration(TestCase):
     """Signup form integration tests"""
     
@@ -3,6 +3,8 @@ Signup Integration Test File
 This file contains all signup-related integration tests.
 """
 
+import tempfile
+
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -23,7 +25,7 @@ VALID_JPEG_BYTES = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x0
 SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestSignupCompleteFlow(TestCase):
     """Complete signup flow integration tests"""
     
@@ -45,7 +47,7 @@ class TestSignupCompleteFlow(TestCase):
             'profile_image': SimpleUploadedFile("profile.jpg", VALID_JPEG_BYTES, content_type="image/jpeg"),
         }
     
-    @patch('leads.views.send_mail')
+    @patch('leads.views.queue_mail')
     def test_complete_signup_and_verification_flow(self, mock_send_mail):
         """Complete signup and verification flow test"""
         
@@ -368,6 +370,7 @@ class TestSignupModelRelationships(TestCase):
         self.assertTrue(updated_token.is_used)
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class TestSignupFormIntegration(TestCase):
     """Signup form integration tests"""
     
@@ -453,7 +456,7 @@ class TestSignupFormIntegration(TestCase):
         self.assertIn('username', form.errors)
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestSignupViewFormIntegration(TestCase):
     """Signup view and form integration tests"""
     
@@ -475,7 +478,7 @@ class TestSignupViewFormIntegration(TestCase):
             'profile_image': SimpleUploadedFile("profile.jpg", VALID_JPEG_BYTES, content_type="image/jpeg"),
         }
     
-    @patch('leads.views.send_mail')
+    @patch('leads.views.queue_mail')
     def test_signup_view_form_integration(self, mock_send_mail):
         """Signup view and form integration test"""
         
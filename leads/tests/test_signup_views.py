@@ -3,6 +3,8 @@ Signup Views Test File
 This file tests all signup-related views.
 """
 
+import tempfile
+
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -23,7 +25,7 @@ VALID_JPEG_BYTES = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x0
 SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestSignupView(TestCase):
     """SignupView tests"""
     
@@ -55,7 +57,7 @@ class TestSignupView(TestCase):
         # CSRF token should be in form
         self.assertContains(response, 'csrfmiddlewaretoken')
     
-    @patch('leads.views.send_mail')
+    @patch('leads.views.queue_mail')
     def test_signup_view_post_valid_data(self, mock_send_mail):
         """Signup POST request valid data test"""
         response = self.client.post(reverse('signup'), self.valid_data, format='multipart')
@@ -167,7 +169,7 @@ class TestSignupView(TestCase):
         # User was not created
         self.assertFalse(User.objects.filter(username='testuser_signup_views').exists())
     
-    @patch('leads.views.send_mail')
+    @patch('leads.views.queue_mail')
     def test_signup_view_email_sending(self, mock_send_mail):
         """Email sending test"""
         response = self.client.post(reverse('signup'), self.valid_data, format='multipart')
@@ -177,7 +179,7 @@ class TestSignupView(TestCase):
         
         # Is email content correct
         call_args = mock_send_mail.call_args
-        # send_mail positional args: subject, message, from_email, recipient_list
+        # queue_mail positional args: subject, message, from_email, recipient_list
         self.assertEqual(call_args[0][0], 'Darkenyas CRM - Email Verification')  # subject
         self.assertIn('test_signup_views@example.com', call_args[0][3])  # recipient_list
         self.assertIn('Test', call_args[0][1])  # message - First name
@@ -202,7 +204,7 @@ class TestSignupView(TestCase):
     
     def test_signup_view_success_url(self):
         """Success URL test"""
-        with patch('leads.views.send_mail'):
+        with patch('leads.views.queue_mail'):
             response = self.client.post(reverse('signup'), self.valid_data, format='multipart')
             self.assertRedirects(response, reverse('verify-email-sent'))
 
@@ -368,7 +370,7 @@ class TestEmailVerificationFailedView(TestCase):
         self.assertContains(response, 'verification')
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestSignupIntegration(TestCase):
     """Signup integration tests"""
     
@@ -390,7 +392,7 @@ class TestSignupIntegration(TestCase):
             'profile_image': SimpleUploadedFile("profile.jpg", VALID_JPEG_BYTES, content_type="image/jpeg"),
         }
     
-    @patch('leads.views.send_mail')
+    @patch('leads.views.queue_mail')
     def test_complete_signup_flow(self, mock_send_mail):
         """Complete signup flow test"""
         # 1. Go to signup page
@@ -0,0 +1,141 @@
+"""
+Lead Tenant Test File
+This file tests the request-scoped tenant context in leads.tenant
+and the TenantMiddleware.
+"""
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from leads.models import User, UserProfile, Lead, Agent
+from leads.tenant import (
+    Tenant, TenantMiddleware, get_tenant, get_organisation_for_user,
+    ROLE_ADMIN, ROLE_AGENT, ROLE_ANONYMOUS, ROLE_ORGANISOR,
+)
+from orders.models import orders
+
+
+class TestTenant(TestCase):
+    """Tenant role, organisation and queryset resolution"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='tenant_admin', email='tenant_admin@example.com', password='testpass123',
+        )
+        cls.organisor_user = User.objects.create_user(
+            username='tenant_organisor',
+            email='tenant_organisor@example.com',
+            password='testpass123',
+            phone_number='+905551234567',
+            is_organisor=True,
+            email_verified=True
+        )
+        cls.organisation, created = UserProfile.objects.get_or_create(user=cls.organisor_user)
+        cls.agent_user = User.objects.create_user(
+            username='tenant_agent',
+            email='tenant_agent@example.com',
+            password='testpass123',
+            phone_number='+905551234568',
+            is_organisor=False,
+            is_agent=True,
+            email_verified=True
+        )
+        cls.agent = Agent.objects.create(user=cls.agent_user, organisation=cls.organisation)
+        cls.other_user = User.objects.create_user(
+            username='tenant_other',
+            email='tenant_other@example.com',
+            password='testpass123',
+            phone_number='+905551234569',
+            is_organisor=True,
+            email_verified=True
+        )
+        cls.other_organisation, created = UserProfile.objects.get_or_create(user=cls.other_user)
+
+        cls.agent_lead = Lead.objects.create(
+            first_name='Agent', last_name='Lead', email='tenant_agent_lead@example.com',
+            phone_number='+905559876543', organisation=cls.organisation, agent=cls.agent,
+        )
+        cls.org_lead = Lead.objects.create(
+            first_name='Org', last_name='Lead', email='tenant_org_lead@example.com',
+            phone_number='+905559876544', organisation=cls.organisation,
+        )
+        cls.agent_order = orders.objects.create(
+            order_day=timezone.now(), order_name='Agent order', order_description='-',
+            organisation=cls.organisation, lead=cls.agent_lead,
+        )
+        cls.org_order = orders.objects.create(
+            order_day=timezone.now(), order_name='Org order', order_description='-',
+            organisation=cls.organisation, lead=cls.org_lead,
+        )
+        cls.other_order = orders.objects.create(
+            order_day=timezone.now(), order_name='Other order', order_description='-',
+            organisation=cls.other_organisation,
+        )
+
+    def test_roles(self):
+        self.assertEqual(Tenant(self.admin).role, ROLE_ADMIN)
+        self.assertEqual(Tenant(self.organisor_user).role, ROLE_ORGANISOR)
+        self.assertEqual(Tenant(self.agent_user).role, ROLE_AGENT)
+        self.assertEqual(Tenant(AnonymousUser()).role, ROLE_ANONYMOUS)
+
+    def test_organisation_and_agent(self):
+        self.assertIsNone(Tenant(self.admin).organisation)
+        self.assertEqual(Tenant(self.organisor_user).organisation_id, self.organisation.pk)
+        tenant = Tenant(self.agent_user)
+        self.assertEqual(tenant.agent_id, self.agent.pk)
+        self.assertEqual(tenant.organisation_id, self.organisation.pk)
+        self.assertEqual(get_organisation_for_user(self.agent_user), self.organisation)
+
+    def test_agent_resolved_once(self):
+        tenant = Tenant(User.objects.get(pk=self.agent_user.pk))
+        with self.assertNumQueries(1):
+            tenant.agent
+            tenant.organisation
+            tenant.organisation_id
+            tenant.agent_id
+
+    def test_orders_scoping(self):
+        self.assertEqual(set(Tenant(self.admin).orders()), {self.agent_order, self.org_order, self.other_order})
+        self.assertEqual(set(Tenant(self.organisor_user).orders()), {self.agent_order, self.org_order})
+        self.assertEqual(set(Tenant(self.agent_user).orders()), {self.agent_order})
+
+    def test_agent_without_agent_row_sees_no_orders(self):
+        user = User.objects.create_user(
+            username='tenant_orphan_agent',
+            email='tenant_orphan_agent@example.com',
+            password='testpass123',
+            phone_number='+905551234570',
+            is_organisor=False,
+            is_agent=True,
+            email_verified=True
+        )
+        self.assertFalse(Tenant(user).orders().exists())
+
+    def test_leads_and_agents_scoping(self):
+        tenant = Tenant(self.organisor_user)
+        self.assertEqual(set(tenant.leads()), {self.agent_lead, self.org_lead})
+        self.assertEqual(list(tenant.agents()), [self.agent])
+        self.assertFalse(Tenant(self.other_user).leads().exists())
+
+    def test_middleware_sets_request_tenant(self):
+        request = RequestFactory().get('/')
+        request.user = self.organisor_user
+        seen = {}
+
+        def view(req):
+            seen['tenant'] = get_tenant(req)
+            return HttpResponse('ok')
+
+        TenantMiddleware(view)(request)
+        self.assertIs(seen['tenant'], request.tenant)
+        self.assertEqual(request.tenant.organisation, self.organisation)
+
+    def test_get_tenant_without_middleware(self):
+        request = RequestFactory().get('/')
+        request.user = self.agent_user
+        tenant = get_tenant(request)
+        self.assertIs(get_tenant(request), tenant)
+        self.assertEqual(tenant.role, ROLE_AGENT)
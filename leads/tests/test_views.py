@@ -3,7 +3,12 @@ Leads Views Test File
 This file tests all views in the Leads module.
 """
 
-from django.test import TestCase, Client, RequestFactory, override_settings
+import json
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase, Client, RequestFactory, AsyncRequestFactory, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core import mail
@@ -11,6 +16,8 @@ from django.http import Http404
 from unittest.mock import patch, MagicMock
 from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from leads.models import User, UserProfile, Lead, Agent, Category, SourceCategory, ValueCategory, EmailVerificationToken
 from leads.views import (
@@ -18,7 +25,7 @@ from leads.views import (
     AssignAgentView, CategoryListView, CategoryDetailView, LeadCategoryUpdateView,
     CustomLoginView, CustomPasswordResetView, CustomPasswordResetConfirmView,
     SignupView, EmailVerificationSentView, EmailVerificationView, EmailVerificationFailedView,
-    LandingPageView, landing_page, get_agents_by_org
+    LandingPageView, landing_page, get_agents_by_org, aget_agents_by_org
 )
 from organisors.models import Organisor
 
@@ -51,7 +58,7 @@ class TestLandingPageView(TestCase):
         self.assertTemplateUsed(response, 'landing.html')
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestSignupView(TestCase):
     """SignupView tests"""
     
@@ -81,7 +88,7 @@ class TestSignupView(TestCase):
     
     def test_signup_view_post_valid(self):
         """Signup view POST valid data test"""
-        with patch('leads.views.send_mail') as mock_send_mail:
+        with patch('leads.views.queue_mail') as mock_send_mail:
             response = self.client.post(reverse('signup'), data=self.valid_data)
             
             # Should redirect
@@ -118,7 +125,7 @@ class TestSignupView(TestCase):
     
     def test_signup_view_user_creation(self):
         """Signup view user creation test"""
-        with patch('leads.views.send_mail'):
+        with patch('leads.views.queue_mail'):
             response = self.client.post(reverse('signup'), data=self.valid_data)
             
             user = User.objects.get(username='newuser')
@@ -137,7 +144,7 @@ class TestSignupView(TestCase):
     
     def test_signup_view_email_sending(self):
         """Signup view email sending test"""
-        with patch('leads.views.send_mail') as mock_send_mail:
+        with patch('leads.views.queue_mail') as mock_send_mail:
             response = self.client.post(reverse('signup'), data=self.valid_data)
             
             # Email should have been sent
@@ -606,7 +613,7 @@ class TestLeadDetailView(TestCase):
         self.assertTemplateUsed(response, 'leads/lead_detail.html')
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestLeadCreateView(TestCase):
     """LeadCreateView tests"""
     
@@ -736,7 +743,7 @@ class TestLeadCreateView(TestCase):
         self.assertTemplateUsed(response, 'leads/lead_create.html')
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestLeadUpdateView(TestCase):
     """LeadUpdateView tests"""
     
@@ -1116,6 +1123,156 @@ class TestCategoryListView(TestCase):
         # Should redirect
         self.assertEqual(response.status_code, 302)
 
+    def _create_leads(self, count):
+        for i in range(count):
+            Lead.objects.create(
+                first_name=f'Lead{i:03d}',
+                last_name='Category',
+                age=30,
+                organisation=self.organisor_profile,
+                source_category=self.source_category,
+                value_category=self.value_category,
+                description='Category lead',
+                phone_number=f'+90555000{i:04d}',
+                email=f'category_lead_{i}@example.com',
+                address='Address',
+            )
+
+    def test_category_list_view_limits_inline_leads(self):
+        """Only the first page of leads is rendered per category, with a link to load more"""
+        from leads.views import CATEGORY_LEADS_PAGE_SIZE
+        self._create_leads(CATEGORY_LEADS_PAGE_SIZE + 5)
+        self.client.force_login(self.organisor_user)
+        response = self.client.get(reverse('leads:category-list'))
+
+        self.assertEqual(response.status_code, 200)
+        item = next(
+            i for i in response.context['source_categories_with_leads']
+            if i['category'].pk == self.source_category.pk
+        )
+        self.assertEqual(len(item['leads']), CATEGORY_LEADS_PAGE_SIZE)
+        self.assertEqual(item['category'].lead_count, CATEGORY_LEADS_PAGE_SIZE + 5)
+        self.assertIn(reverse('leads:category-leads'), item['more_url'])
+        self.assertIn('page=2', item['more_url'])
+
+    def test_category_list_view_query_count_independent_of_categories(self):
+        """Leads for all categories are fetched in one query rather than one per category"""
+        self._create_leads(3)
+        self.client.force_login(self.organisor_user)
+        self.client.get(reverse('leads:category-list'))
+        with CaptureQueriesContext(connection) as baseline:
+            self.client.get(reverse('leads:category-list'))
+        for i in range(5):
+            SourceCategory.objects.create(name=f'Extra {i}', organisation=self.organisor_profile)
+            ValueCategory.objects.create(name=f'Extra {i}', organisation=self.organisor_profile)
+        with CaptureQueriesContext(connection) as more_categories:
+            self.client.get(reverse('leads:category-list'))
+        self.assertEqual(len(baseline), len(more_categories))
+
+    def test_category_list_view_superuser_aggregated_leads(self):
+        """Admin aggregated view groups leads by category name"""
+        self._create_leads(2)
+        superuser = User.objects.create_superuser(
+            username='superuser',
+            email='superuser@example.com',
+            password='testpass123'
+        )
+        self.client.force_login(superuser)
+        response = self.client.get(reverse('leads:category-list'))
+
+        item = next(
+            i for i in response.context['source_categories_with_leads']
+            if i['category']['name'] == 'Website'
+        )
+        self.assertEqual(len(item['leads']), 2)
+        self.assertIsNone(item['more_url'])
+
+
+@override_settings(**SIMPLE_STATIC)
+class TestCategoryLeadsView(TestCase):
+    """category_leads JSON endpoint tests"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.client = Client()
+        self.organisor_user = User.objects.create_user(
+            username='category_leads_organisor',
+            email='category_leads_organisor@example.com',
+            password='testpass123',
+            phone_number='+905551234567',
+            is_organisor=True,
+            email_verified=True
+        )
+        self.organisor_profile, created = UserProfile.objects.get_or_create(user=self.organisor_user)
+        self.agent_user = User.objects.create_user(
+            username='category_leads_agent',
+            email='category_leads_agent@example.com',
+            password='testpass123',
+            phone_number='+905559876543',
+            is_organisor=False,
+            is_agent=True,
+            email_verified=True
+        )
+        self.agent = Agent.objects.create(user=self.agent_user, organisation=self.organisor_profile)
+        self.source_category = SourceCategory.objects.create(name="Website", organisation=self.organisor_profile)
+        for i in range(25):
+            Lead.objects.create(
+                first_name=f'Lead{i:03d}',
+                last_name='Json',
+                organisation=self.organisor_profile,
+                agent=self.agent if i < 3 else None,
+                source_category=self.source_category,
+                description='Category lead',
+                phone_number=f'+90555100{i:04d}',
+                email=f'category_json_{i}@example.com',
+                address='Address',
+            )
+        self.url = reverse('leads:category-leads')
+
+    def test_category_leads_unauthenticated(self):
+        """Anonymous users are rejected"""
+        response = self.client.get(self.url, {'type': 'source', 'category': self.source_category.pk})
+        self.assertEqual(response.status_code, 403)
+
+    def test_category_leads_pages(self):
+        """Pages are ordered and report whether another page exists"""
+        self.client.force_login(self.organisor_user)
+        first = self.client.get(self.url, {'type': 'source', 'category': self.source_category.pk}).json()
+        self.assertEqual(len(first['leads']), 20)
+        self.assertTrue(first['has_next'])
+        self.assertEqual(first['leads'][0]['name'], 'Lead000 Json')
+        second = self.client.get(first['next_url']).json()
+        self.assertEqual(len(second['leads']), 5)
+        self.assertFalse(second['has_next'])
+        self.assertIsNone(second['next_url'])
+
+    def test_category_leads_agent_sees_only_own_leads(self):
+        """Agents only receive leads assigned to them"""
+        self.client.force_login(self.agent_user)
+        data = self.client.get(self.url, {'type': 'source', 'category': self.source_category.pk}).json()
+        self.assertEqual(len(data['leads']), 3)
+
+    def test_category_leads_other_organisation(self):
+        """Organisors cannot read leads of another organisation's category"""
+        other_user = User.objects.create_user(
+            username='category_leads_other',
+            email='category_leads_other@example.com',
+            password='testpass123',
+            phone_number='+905551112233',
+            is_organisor=True,
+            email_verified=True
+        )
+        self.client.force_login(other_user)
+        data = self.client.get(self.url, {'type': 'source', 'category': self.source_category.pk}).json()
+        self.assertEqual(data['leads'], [])
+
+    def test_category_leads_invalid_parameters(self):
+        """Invalid type or ids return 400"""
+        self.client.force_login(self.organisor_user)
+        self.assertEqual(self.client.get(self.url, {'type': 'bogus', 'category': 1}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'type': 'source', 'category': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'type': 'source'}).status_code, 400)
+
 
 @override_settings(**SIMPLE_STATIC)
 class TestGetAgentsByOrgView(TestCase):
@@ -1214,6 +1371,30 @@ class TestGetAgentsByOrgView(TestCase):
         # Should be 404
         self.assertEqual(response.status_code, 404)
 
+    async def call_async_view(self, user, org_id):
+        request = AsyncRequestFactory().get(f'/leads/get-agents-by-org/{org_id}/')
+
+        async def auser():
+            return user
+        request.auser = auser
+        return await aget_agents_by_org(request, org_id)
+
+    async def test_async_view_matches_sync_view(self):
+        """ASGI-mode view returns the same payload and applies the same access rules"""
+        await sync_to_async(self.client.force_login)(self.organisor_user)
+        expected = (await sync_to_async(self.client.get)(
+            reverse('leads:get-agents-by-org', kwargs={'org_id': self.organisor_profile.id})
+        )).json()
+        self.assertEqual(expected['agents'], [{'id': self.agent.id, 'name': 'Get Agent (get_agents_agent@example.com)'}])
+        for user in (self.superuser, self.organisor_user):
+            response = await self.call_async_view(user, self.organisor_profile.id)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), expected)
+
+        self.assertEqual((await self.call_async_view(self.agent_user, self.organisor_profile.id)).status_code, 403)
+        self.assertEqual((await self.call_async_view(AnonymousUser(), self.organisor_profile.id)).status_code, 403)
+        self.assertEqual((await self.call_async_view(self.superuser, 99999)).status_code, 404)
+
 
 @override_settings(**SIMPLE_STATIC)
 class TestLeadActivityView(TestCase):
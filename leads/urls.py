@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     LeadListView, LeadDetailView, LeadActivityView, LeadCreateView, LeadUpdateView, LeadDeleteView, AssignAgentView, CategoryListView,
-    CategoryDetailView, LeadCategoryUpdateView, get_agents_by_org
+    CategoryDetailView, LeadCategoryUpdateView, LeadImportView, get_agents_by_org, aget_agents_by_org, category_leads, lead_import_report
 )
 
 app_name = 'leads'
@@ -12,10 +13,13 @@ urlpatterns = [
     path('<int:pk>/update/', LeadUpdateView.as_view(), name="lead-update"),
     path('<int:pk>/delete/', LeadDeleteView.as_view(), name="lead-delete"),
     path('create/', LeadCreateView.as_view(), name="lead-create"),
+    path('import/', LeadImportView.as_view(), name="lead-import"),
+    path('import/report/', lead_import_report, name="lead-import-report"),
     path('<int:pk>/assign-agent/', AssignAgentView.as_view(), name="assign-agent"),
     path('<int:pk>/category/', LeadCategoryUpdateView.as_view(), name="lead-category-update"),
     path('<int:pk>/activity/', LeadActivityView.as_view(), name="lead-activity"),
     path('categories/', CategoryListView.as_view(), name="category-list"),
+    path('categories/leads/', category_leads, name="category-leads"),
     path('categories/<int:pk>/', CategoryDetailView.as_view(), name="category-detail"),
-    path('get-agents-by-org/<int:org_id>/', get_agents_by_org, name="get-agents-by-org"),
+    path('get-agents-by-org/<int:org_id>/', aget_agents_by_org if settings.ASYNC_VIEWS else get_agents_by_org, name="get-agents-by-org"),
 ]
\ No newline at end of file
@@ -1,23 +1,28 @@
 import logging
 from typing import Any
-from django.core.mail import send_mail
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils.decorators import method_decorator
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView, PasswordResetView, PasswordResetConfirmView
-from django.http import HttpResponse, JsonResponse
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.views import generic
 from django.contrib import messages
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django_ratelimit.decorators import ratelimit
 from agents.mixins import OrganisorAndLoginRequiredMixin
+from djcrm.replica import ReplicaReadsMixin
+from djcrm.versions import AGENTS, LEAD_CATEGORIES, versioned_etag
 from .models import Lead, Agent, Category, User, UserProfile, EmailVerificationToken, SourceCategory, ValueCategory
+from .outbox import queue_mail
 from activity_log.models import ActivityLog, log_activity, ACTION_LEAD_CREATED, ACTION_LEAD_UPDATED, ACTION_LEAD_DELETED
 from orders.models import orders as Order
-from .forms import LeadForm, LeadModelForm, CustomUserCreationForm, AssignAgentForm, LeadCategoryUpdateForm, CustomAuthenticationForm, AdminLeadModelForm, OrganisorLeadModelForm, CustomPasswordResetForm, CustomSetPasswordForm
+from .forms import LeadForm, LeadModelForm, CustomUserCreationForm, AssignAgentForm, LeadCategoryUpdateForm, CustomAuthenticationForm, AdminLeadModelForm, OrganisorLeadModelForm, CustomPasswordResetForm, CustomSetPasswordForm, LeadImportForm
+from .importer import ImportFileError, import_leads
 
 logger = logging.getLogger(__name__)
 
@@ -75,13 +80,7 @@ If you did not perform this action, please contact support immediately.
 Best regards,
 Darkenyas CRM Team
 """
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
+        queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
         return response
     
     def form_invalid(self, form):
@@ -128,18 +127,19 @@ class SignupView(generic.CreateView):
         user.is_organisor = True  # Set the user as an organisor (company owner)
         user.is_agent = False
         user.email_verified = False  # Start with email unverified
-        user.save()
+        with transaction.atomic():
+            user.save()
 
-        # Create UserProfile and Organisor
-        user_profile, created = UserProfile.objects.get_or_create(user=user)
-        from organisors.models import Organisor
-        Organisor.objects.create(user=user, organisation=user_profile)
+            # Create UserProfile and Organisor
+            user_profile, created = UserProfile.objects.get_or_create(user=user)
+            from organisors.models import Organisor
+            Organisor.objects.create(user=user, organisation=user_profile)
 
-        # Create email verification token
-        verification_token = EmailVerificationToken.objects.create(user=user)
-        
-        # Send verification email
-        self.send_verification_email(user, verification_token.token)
+            # Create email verification token
+            verification_token = EmailVerificationToken.objects.create(user=user)
+
+            # Queue the verification email with the new account
+            self.send_verification_email(user, verification_token.token)
 
         return super().form_valid(form)
     
@@ -160,13 +160,7 @@ class SignupView(generic.CreateView):
         Darkenyas CRM Team
         """
         
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
+        queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
 
 
@@ -460,19 +454,53 @@ class LeadCreateView(OrganisorAndLoginRequiredMixin, generic.CreateView):
 		)
 		# Notify agent when lead is created with an agent assigned
 		if lead.agent_id and lead.agent.user_id != self.request.user.pk:
-			from tasks.models import Notification
+			from tasks.notifier import Event, notify
 			lead_name = f"{lead.first_name} {lead.last_name}".strip() or lead.email
 			lead_url = reverse("leads:lead-detail", kwargs={"pk": lead.pk})
-			Notification.objects.create(
-				user=lead.agent.user,
-				task=None,
+			notify([(lead.agent.user_id, Event(
 				title="New lead assigned to you",
 				message=f'Lead "{lead_name}" has been assigned to you. Contact: {lead.email}',
 				action_url=lead_url,
 				action_label="View Lead",
-			)
+			))])
 		return super(LeadCreateView, self).form_valid(form)
 
+class LeadImportView(OrganisorAndLoginRequiredMixin, generic.FormView):
+	"""Bulk lead import from CSV/XLSX; the result and a link to the error report are shown on the same page."""
+	template_name = "leads/lead_import.html"
+	form_class = LeadImportForm
+
+	def get_form_kwargs(self):
+		kwargs = super().get_form_kwargs()
+		kwargs['request'] = self.request
+		return kwargs
+
+	def form_valid(self, form):
+		upload = form.cleaned_data['file']
+		organisation = form.cleaned_data.get('organisation') or self.tenant.organisation
+		upload.seek(0)
+		try:
+			result = import_leads(upload.file, upload.name, organisation, self.request.user)
+		except ImportFileError as exc:
+			form.add_error('file', str(exc))
+			return self.form_invalid(form)
+		if result.report_name:
+			self.request.session['lead_import_report'] = result.report_name
+		else:
+			self.request.session.pop('lead_import_report', None)
+		if result.created:
+			messages.success(self.request, f"Imported {result.created} lead(s).")
+		return self.render_to_response(self.get_context_data(form=self.get_form_class()(request=self.request), result=result))
+
+
+def lead_import_report(request):
+	"""Download the error report of the current user's last lead import."""
+	name = request.session.get('lead_import_report') if request.user.is_authenticated else None
+	if not name or not default_storage.exists(name):
+		raise Http404("No import report available.")
+	return FileResponse(default_storage.open(name, 'rb'), as_attachment=True, filename='lead-import-errors.csv', content_type='text/csv')
+
+
 class LeadUpdateView(OrganisorAndLoginRequiredMixin, generic.UpdateView):
 	template_name = "leads/lead_update.html"
 	
@@ -517,17 +545,15 @@ class LeadUpdateView(OrganisorAndLoginRequiredMixin, generic.UpdateView):
 		# Notify agent when lead is assigned (or reassigned) to them
 		new_agent = self.object.agent
 		if new_agent and new_agent.pk != previous_agent_id and new_agent.user_id != self.request.user.pk:
-			from tasks.models import Notification
+			from tasks.notifier import Event, notify
 			lead_name = f"{self.object.first_name} {self.object.last_name}".strip() or self.object.email
 			lead_url = reverse("leads:lead-detail", kwargs={"pk": self.object.pk})
-			Notification.objects.create(
-				user=new_agent.user,
-				task=None,
+			notify([(new_agent.user_id, Event(
 				title="New lead assigned to you",
 				message=f'Lead "{lead_name}" has been assigned to you. Contact: {self.object.email}',
 				action_url=lead_url,
 				action_label="View Lead",
-			)
+			))])
 		return response
 
 class LeadDeleteView(OrganisorAndLoginRequiredMixin, generic.DeleteView):
@@ -601,24 +627,85 @@ class AssignAgentView(OrganisorAndLoginRequiredMixin, generic.FormView):
 		# Notify agent: new lead assigned to you (skip if assigner is the same user)
 		if agent.user_id != self.request.user.pk:
 			try:
-				from tasks.models import Notification
+				from tasks.notifier import Event, notify
 				lead_name = f"{lead.first_name} {lead.last_name}".strip() or lead.email
 				lead_url = reverse("leads:lead-detail", kwargs={"pk": lead.pk})
-				Notification.objects.create(
-					user=agent.user,
-					task=None,
+				notify([(agent.user_id, Event(
 					title="New lead assigned to you",
 					message=f'Lead "{lead_name}" has been assigned to you. Contact: {lead.email}',
 					action_url=lead_url,
 					action_label="View Lead",
-				)
+				))])
 			except Exception:
 				logger.warning("Notification create failed for lead pk=%s", lead.pk, exc_info=True)
 		return super(AssignAgentView, self).form_valid(form)
 	
-from django.db.models import Count
+from django.db.models import Count, F, Prefetch, Window
+from django.db.models.functions import RowNumber
+
+# Leads rendered inline per category on the overview; the rest load through category_leads.
+CATEGORY_LEADS_PAGE_SIZE = 20
+CATEGORY_LEAD_ORDERING = ("first_name", "last_name", "pk")
+
+
+def _category_lead_more_url(kind, page=2, **params):
+	"""URL of the paginated JSON endpoint returning the next leads of a category."""
+	query = {"type": kind, "page": page}
+	query.update({key: value for key, value in params.items() if value is not None})
+	return f"{reverse('leads:category-leads')}?{urlencode(query)}"
+
+
+def _categories_with_lead_preview(categories, kind, agent=None):
+	"""
+	Attach the first CATEGORY_LEADS_PAGE_SIZE leads of every category using a single
+	prefetch query (one extra row per category tells whether more leads exist).
+	kind is "source" or "value"; agent optionally restricts leads to one agent.
+	"""
+	leads = Lead.objects.order_by(*CATEGORY_LEAD_ORDERING)
+	if agent is not None:
+		leads = leads.filter(agent=agent)
+	categories = categories.prefetch_related(
+		Prefetch("leads", queryset=leads[:CATEGORY_LEADS_PAGE_SIZE + 1], to_attr="preview_leads")
+	)
+	result = []
+	for cat in categories:
+		has_more = len(cat.preview_leads) > CATEGORY_LEADS_PAGE_SIZE
+		result.append({
+			"category": cat,
+			"leads": cat.preview_leads[:CATEGORY_LEADS_PAGE_SIZE],
+			"more_url": _category_lead_more_url(
+				kind, category=cat.pk, agent=agent.pk if agent is not None else None
+			) if has_more else None,
+		})
+	return result
+
+
+def _category_names_with_lead_preview(categories, kind):
+	"""
+	Admin aggregated view: categories are grouped by name across organisations.
+	Fetch the first leads of every name in one windowed query and group them in Python.
+	"""
+	name_field = f"{kind}_category__name"
+	leads = Lead.objects.filter(**{f"{name_field}__isnull": False}).annotate(
+		category_name=F(name_field),
+		category_row=Window(RowNumber(), partition_by=F(name_field), order_by=[F(f) for f in CATEGORY_LEAD_ORDERING]),
+	).filter(category_row__lte=CATEGORY_LEADS_PAGE_SIZE + 1).order_by(*CATEGORY_LEAD_ORDERING)
+	leads_by_name = {}
+	for lead in leads:
+		leads_by_name.setdefault(lead.category_name, []).append(lead)
+	result = []
+	for cat in categories:
+		name_leads = leads_by_name.get(cat["name"], [])
+		result.append({
+			"category": {"name": cat["name"], "lead_count": cat["lead_count"]},
+			"leads": name_leads[:CATEGORY_LEADS_PAGE_SIZE],
+			"more_url": _category_lead_more_url(kind, name=cat["name"])
+			if len(name_leads) > CATEGORY_LEADS_PAGE_SIZE else None,
+		})
+	return result
+
 
-class CategoryListView(LoginRequiredMixin, generic.ListView):
+class CategoryListView(ReplicaReadsMixin, LoginRequiredMixin, generic.ListView):
     template_name = "leads/category_list.html"
     context_object_name = "category_list"
 
@@ -684,28 +771,16 @@ class CategoryListView(LoginRequiredMixin, generic.ListView):
                     lead_count=Count('leads', filter=models.Q(leads__agent=selected_agent))
                 ).order_by('name')
                 filter_title = f"Categories for Agent: {selected_agent.user.username} ({selected_agent.organisation.user.username})"
-                source_categories_with_leads = [
-                    {"category": cat, "leads": list(Lead.objects.filter(source_category=cat, agent=selected_agent).select_related("agent"))}
-                    for cat in source_categories
-                ]
-                value_categories_with_leads = [
-                    {"category": cat, "leads": list(Lead.objects.filter(value_category=cat, agent=selected_agent).select_related("agent"))}
-                    for cat in value_categories
-                ]
+                source_categories_with_leads = _categories_with_lead_preview(source_categories, "source", agent=selected_agent)
+                value_categories_with_leads = _categories_with_lead_preview(value_categories, "value", agent=selected_agent)
                 
             elif selected_org:
                 # Show categories for specific organization
                 source_categories = SourceCategory.objects.filter(organisation=selected_org).annotate(lead_count=Count('leads')).order_by('name')
                 value_categories = ValueCategory.objects.filter(organisation=selected_org).annotate(lead_count=Count('leads')).order_by('name')
                 filter_title = f"Categories for Organization: {selected_org.user.username}"
-                source_categories_with_leads = [
-                    {"category": cat, "leads": list(Lead.objects.filter(source_category=cat).select_related("agent"))}
-                    for cat in source_categories
-                ]
-                value_categories_with_leads = [
-                    {"category": cat, "leads": list(Lead.objects.filter(value_category=cat).select_related("agent"))}
-                    for cat in value_categories
-                ]
+                source_categories_with_leads = _categories_with_lead_preview(source_categories, "source")
+                value_categories_with_leads = _categories_with_lead_preview(value_categories, "value")
                 
             else:
                 # Show all categories aggregated; still provide lead list per category name
@@ -716,14 +791,8 @@ class CategoryListView(LoginRequiredMixin, generic.ListView):
                     lead_count=Count('leads')
                 ).order_by('name')
                 filter_title = "All Categories (Aggregated)"
-                source_categories_with_leads = [
-                    {"category": {"name": s["name"], "lead_count": s["lead_count"]}, "leads": list(Lead.objects.filter(source_category__name=s["name"]).select_related("agent", "organisation"))}
-                    for s in source_categories
-                ]
-                value_categories_with_leads = [
-                    {"category": {"name": v["name"], "lead_count": v["lead_count"]}, "leads": list(Lead.objects.filter(value_category__name=v["name"]).select_related("agent", "organisation"))}
-                    for v in value_categories
-                ]
+                source_categories_with_leads = _category_names_with_lead_preview(source_categories, "source")
+                value_categories_with_leads = _category_names_with_lead_preview(value_categories, "value")
             
             context.update({
                 "is_admin_view": True,
@@ -762,25 +831,13 @@ class CategoryListView(LoginRequiredMixin, generic.ListView):
                     value_categories = ValueCategory.objects.filter(organisation=organisation).annotate(
                         lead_count=Count('leads', filter=models.Q(leads__agent=selected_agent))
                     ).order_by('name')
-                    source_categories_with_leads = [
-                        {"category": cat, "leads": list(Lead.objects.filter(source_category=cat, agent=selected_agent).select_related("agent"))}
-                        for cat in source_categories
-                    ]
-                    value_categories_with_leads = [
-                        {"category": cat, "leads": list(Lead.objects.filter(value_category=cat, agent=selected_agent).select_related("agent"))}
-                        for cat in value_categories
-                    ]
+                    source_categories_with_leads = _categories_with_lead_preview(source_categories, "source", agent=selected_agent)
+                    value_categories_with_leads = _categories_with_lead_preview(value_categories, "value", agent=selected_agent)
                 else:
                     source_categories = SourceCategory.objects.filter(organisation=organisation).annotate(lead_count=Count('leads')).order_by('name')
                     value_categories = ValueCategory.objects.filter(organisation=organisation).annotate(lead_count=Count('leads')).order_by('name')
-                    source_categories_with_leads = [
-                        {"category": cat, "leads": list(Lead.objects.filter(source_category=cat).select_related("agent"))}
-                        for cat in source_categories
-                    ]
-                    value_categories_with_leads = [
-                        {"category": cat, "leads": list(Lead.objects.filter(value_category=cat).select_related("agent"))}
-                        for cat in value_categories
-                    ]
+                    source_categories_with_leads = _categories_with_lead_preview(source_categories, "source")
+                    value_categories_with_leads = _categories_with_lead_preview(value_categories, "value")
                 context.update({
                     "is_admin_view": False,
                     "is_organisor_view": True,
@@ -795,14 +852,8 @@ class CategoryListView(LoginRequiredMixin, generic.ListView):
                 organisation = user.agent.organisation
                 source_categories = SourceCategory.objects.filter(organisation=organisation).annotate(lead_count=Count('leads')).order_by('name')
                 value_categories = ValueCategory.objects.filter(organisation=organisation).annotate(lead_count=Count('leads')).order_by('name')
-                source_categories_with_leads = [
-                    {"category": cat, "leads": list(Lead.objects.filter(source_category=cat, agent=user.agent).select_related("agent"))}
-                    for cat in source_categories
-                ]
-                value_categories_with_leads = [
-                    {"category": cat, "leads": list(Lead.objects.filter(value_category=cat, agent=user.agent).select_related("agent"))}
-                    for cat in value_categories
-                ]
+                source_categories_with_leads = _categories_with_lead_preview(source_categories, "source", agent=user.agent)
+                value_categories_with_leads = _categories_with_lead_preview(value_categories, "value", agent=user.agent)
                 context.update({
                     "is_admin_view": False,
                     "is_organisor_view": False,
@@ -896,6 +947,7 @@ class LeadCategoryUpdateView(LoginRequiredMixin, generic.UpdateView):
 		return response
 
 
+@versioned_etag(AGENTS, LEAD_CATEGORIES, scope=lambda request, org_id: org_id, page=False)
 def get_agents_by_org(request, org_id):
 	"""AJAX endpoint to get agents, source categories and value categories by organization"""
 	if not request.user.is_authenticated:
@@ -914,19 +966,7 @@ def get_agents_by_org(request, org_id):
 					return JsonResponse({'error': 'Forbidden'}, status=403)
 			else:
 				return JsonResponse({'error': 'Forbidden'}, status=403)
-		# Create default categories for selected org if missing (so org 2, 3... also get pre-filled when selected)
-		_default_source = [
-			"Website", "Social Media", "Email Campaign", "Cold Call", "Referral",
-			"Trade Show", "Advertisement", "Direct Mail", "SEO/Google", "Unassigned"
-		]
-		_default_value = [
-			"Enterprise", "SMB", "Small Business", "Individual",
-			"High Value", "Medium Value", "Low Value", "Unassigned"
-		]
-		for name in _default_source:
-			SourceCategory.objects.get_or_create(name=name, organisation=organisation)
-		for name in _default_value:
-			ValueCategory.objects.get_or_create(name=name, organisation=organisation)
+		# Default categories are provisioned with the organisation (migration 0030 backfilled older ones)
 		# Agents - display as firstname lastname (email)
 		agents = Agent.objects.filter(organisation=organisation).select_related('user').order_by('user__email')
 		agents_data = [
@@ -952,4 +992,91 @@ def get_agents_by_org(request, org_id):
 		return JsonResponse({'error': 'Organisation not found'}, status=404)
 	except Exception:
 		logger.exception("get_agents_by_org error for org_id=%s", org_id)
-		return JsonResponse({'error': 'An error occurred. Please try again.'}, status=500)
\ No newline at end of file
+		return JsonResponse({'error': 'An error occurred. Please try again.'}, status=500)
+
+
+@versioned_etag(AGENTS, LEAD_CATEGORIES, scope=lambda request, org_id: org_id, page=False)
+async def aget_agents_by_org(request, org_id):
+	"""get_agents_by_org for ASGI mode: the same lookups through the async ORM"""
+	user = await request.auser()
+	if not user.is_authenticated:
+		return JsonResponse({'error': 'Unauthorized'}, status=403)
+	try:
+		organisation = await UserProfile.objects.aget(id=org_id, user__is_organisor=True, user__is_superuser=False)
+		# Role-based access: superuser all orgs, organisor only own org, agent no access
+		if not user.is_superuser and not (user.is_organisor and organisation.user_id == user.pk):
+			return JsonResponse({'error': 'Forbidden'}, status=403)
+		agents = Agent.objects.filter(organisation=organisation).select_related('user').order_by('user__email')
+		agents_data = [
+			{'id': agent.id, 'name': f"{agent.user.get_full_name() or agent.user.username} ({agent.user.email})"}
+			async for agent in agents
+		]
+		source_categories_data = [cat async for cat in SourceCategory.objects.filter(organisation=organisation).values('id', 'name')]
+		value_categories_data = [cat async for cat in ValueCategory.objects.filter(organisation=organisation).values('id', 'name')]
+		return JsonResponse({
+			'agents': agents_data,
+			'source_categories': source_categories_data,
+			'value_categories': value_categories_data
+		})
+	except UserProfile.DoesNotExist:
+		return JsonResponse({'error': 'Organisation not found'}, status=404)
+	except Exception:
+		logger.exception("aget_agents_by_org error for org_id=%s", org_id)
+		return JsonResponse({'error': 'An error occurred. Please try again.'}, status=500)
+
+def category_leads(request):
+	"""
+	AJAX endpoint: next page of leads for one source/value category on the category overview.
+	Leads are scoped to the user's role; admins may also address an aggregated category by name.
+	"""
+	if not request.user.is_authenticated:
+		return JsonResponse({'error': 'Unauthorized'}, status=403)
+	user = request.user
+	kind = request.GET.get('type')
+	if kind not in ('source', 'value'):
+		return JsonResponse({'error': 'Invalid category type'}, status=400)
+	try:
+		category_id = int(request.GET['category']) if request.GET.get('category') else None
+		agent_id = int(request.GET['agent']) if request.GET.get('agent') else None
+		page = max(int(request.GET.get('page') or 1), 1)
+	except (TypeError, ValueError):
+		return JsonResponse({'error': 'Invalid parameters'}, status=400)
+	category_name = (request.GET.get('name') or '').strip()
+
+	if user.is_superuser:
+		leads = Lead.objects.all()
+	elif user.is_organisor:
+		leads = Lead.objects.filter(organisation=user.userprofile)
+	else:
+		leads = Lead.objects.filter(agent__user=user)
+	if agent_id is not None and (user.is_superuser or user.is_organisor):
+		leads = leads.filter(agent_id=agent_id)
+	if category_id is not None:
+		leads = leads.filter(**{f'{kind}_category_id': category_id})
+	elif category_name and user.is_superuser:
+		leads = leads.filter(**{f'{kind}_category__name': category_name})
+	else:
+		return JsonResponse({'error': 'Missing category'}, status=400)
+
+	# Slice one extra row instead of running COUNT(*) to know whether another page exists
+	offset = (page - 1) * CATEGORY_LEADS_PAGE_SIZE
+	rows = list(
+		leads.order_by(*CATEGORY_LEAD_ORDERING)
+		.values('pk', 'first_name', 'last_name', 'email')[offset:offset + CATEGORY_LEADS_PAGE_SIZE + 1]
+	)
+	has_next = len(rows) > CATEGORY_LEADS_PAGE_SIZE
+	leads_data = [
+		{
+			'id': row['pk'],
+			'name': f"{row['first_name']} {row['last_name']}",
+			'email': row['email'],
+			'url': reverse('leads:lead-detail', kwargs={'pk': row['pk']}),
+		}
+		for row in rows[:CATEGORY_LEADS_PAGE_SIZE]
+	]
+	next_url = None
+	if has_next:
+		next_url = _category_lead_more_url(
+			kind, page=page + 1, category=category_id, name=category_name or None, agent=agent_id
+		)
+	return JsonResponse({'leads': leads_data, 'page': page, 'has_next': has_next, 'next_url': next_url})
@@ -1,8 +1,8 @@
 from django.db import models
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from leads.models import User, UserProfile, Lead
-from ProductsAndStock.models import ProductsAndStock, StockMovement
+from ProductsAndStock.models import ProductsAndStock, StockMovement, evict_product_reports
 from django.utils import timezone
 
 class orders(models.Model):
@@ -122,3 +122,12 @@ def handle_order_cancellation(sender, instance, **kwargs):
             order_product.restore_stock()
 
 
+@receiver(post_save, sender=OrderProduct)
+def evict_product_reports_for_order_product(sender, instance, **kwargs):
+    """Units sold changed: the organisation's product charts and dashboard are stale."""
+    evict_product_reports(instance.order.organisation_id)
+
+
+@receiver([post_save, post_delete], sender=orders)
+def evict_product_reports_for_order(sender, instance, **kwargs):
+    evict_product_reports(instance.organisation_id)
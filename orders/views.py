@@ -14,22 +14,11 @@ from django.db import transaction
 from django.contrib import messages
 from finance.models import OrderFinanceReport
 from django.utils import timezone
-from tasks.models import Notification
+from tasks.notifier import Event, notify
+from leads.tenant import TenantMixin
 
 
-def get_organisation_for_user(user):
-    """Return the UserProfile (organisation) to use for filtering orders/products. Agents see their organisation's data."""
-    if user.is_superuser:
-        return None
-    if getattr(user, "is_agent", False):
-        try:
-            return Agent.objects.get(user=user).organisation
-        except Agent.DoesNotExist:
-            return user.userprofile
-    return user.userprofile
-
-
-class OrderListView(LoginRequiredMixin, generic.ListView):
+class OrderListView(LoginRequiredMixin, TenantMixin, generic.ListView):
     template_name = "orders/order_list.html"
     context_object_name = "order_list"
 
@@ -57,18 +46,9 @@ class OrderListView(LoginRequiredMixin, generic.ListView):
             if agent_id is not None:
                 qs = qs.filter(lead__agent_id=agent_id)
             return qs.order_by("-creation_date")
-        org = get_organisation_for_user(user)
-        if org is None:
-            return base.order_by("-creation_date")
-        qs = base.filter(organisation=org)
-        # Agent only sees orders where the lead is assigned to them
-        if user.is_agent:
-            try:
-                agent_obj = Agent.objects.get(user=user)
-                qs = qs.filter(lead__agent=agent_obj)
-            except Agent.DoesNotExist:
-                qs = qs.none()
-        elif agent_id is not None and (user.is_superuser or user.is_organisor):
+        # Organisation's orders; agents only see orders where the lead is assigned to them
+        qs = self.tenant.orders().select_related("organisation", "organisation__user", "lead", "lead__agent", "lead__agent__user")
+        if not user.is_agent and agent_id is not None and user.is_organisor:
             qs = qs.filter(lead__agent_id=agent_id)
         return qs.order_by("-creation_date")
 
@@ -128,7 +108,7 @@ class OrderListView(LoginRequiredMixin, generic.ListView):
             else:
                 context["organisations"] = []
                 context["show_organisation_filter"] = False
-                org = get_organisation_for_user(self.request.user)
+                org = self.tenant.organisation
                 context["agents"] = Agent.objects.filter(organisation=org).select_related("user").order_by("user__username") if org else []
         else:
             context["show_organisation_filter"] = False
@@ -137,39 +117,26 @@ class OrderListView(LoginRequiredMixin, generic.ListView):
             context["selected_organisation_id"] = context["selected_agent_id"] = ""
         return context
 
-class OrderDetailView(LoginRequiredMixin, generic.DetailView):
+class OrderDetailView(LoginRequiredMixin, TenantMixin, generic.DetailView):
     model = orders
     template_name = "orders/order_detail.html"
     context_object_name = "order"
 
     def get_queryset(self):
-        qs = orders.objects.select_related(
+        return self.tenant.orders().select_related(
             "organisation", "organisation__user",
             "lead", "lead__agent", "lead__agent__user",
         )
-        if self.request.user.is_superuser:
-            return qs
-        org = get_organisation_for_user(self.request.user)
-        if not org:
-            return qs
-        qs = qs.filter(organisation=org)
-        if self.request.user.is_agent:
-            try:
-                agent_obj = Agent.objects.get(user=self.request.user)
-                qs = qs.filter(lead__agent=agent_obj)
-            except Agent.DoesNotExist:
-                qs = qs.none()
-        return qs
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        order = self.get_object()
+        order = self.object
         order_items = OrderProduct.objects.filter(order=order)
 
         # Calculate total order price
         total_order_price = sum(item.total_price for item in order_items)
 
-        org = get_organisation_for_user(self.request.user)
+        org = self.tenant.organisation
         if org:
             context['leads'] = Lead.objects.filter(organisation=org)
             context['products'] = ProductsAndStock.objects.filter(organisation=org)
@@ -182,7 +149,7 @@ class OrderDetailView(LoginRequiredMixin, generic.DetailView):
 
 
 
-class OrderCreateView(LoginRequiredMixin, generic.CreateView):
+class OrderCreateView(LoginRequiredMixin, TenantMixin, generic.CreateView):
     template_name = "orders/order_create.html"
     form_class = OrderModelForm
     model = orders
@@ -236,10 +203,10 @@ class OrderCreateView(LoginRequiredMixin, generic.CreateView):
             form.fields["order_description"].required = True
         elif user.is_agent:
             # Agent: only leads assigned to them
-            try:
-                agent_obj = Agent.objects.get(user=user)
+            agent_obj = self.tenant.agent
+            if agent_obj:
                 form.fields["lead"].queryset = Lead.objects.filter(agent=agent_obj).select_related("organisation").order_by("first_name", "last_name")
-            except Agent.DoesNotExist:
+            else:
                 form.fields["lead"].queryset = Lead.objects.none()
             form.fields["lead"].required = True
             form.fields["order_day"].required = True
@@ -274,7 +241,7 @@ class OrderCreateView(LoginRequiredMixin, generic.CreateView):
             if self.request.user.is_superuser and form.cleaned_data.get("organisation"):
                 order.organisation = form.cleaned_data["organisation"]
             else:
-                org = get_organisation_for_user(self.request.user)
+                org = self.tenant.organisation
                 order.organisation = org if org else self.request.user.userprofile
             order.creation_date = timezone.now()  # Set the creation date to now
             order.save()
@@ -313,15 +280,13 @@ class OrderCreateView(LoginRequiredMixin, generic.CreateView):
                     if lead and lead.agent:
                         users_to_notify.append(lead.agent.user)
                 order_url = reverse('orders:order-detail', kwargs={'pk': order.pk})
-                for u in set(users_to_notify):
-                    Notification.objects.create(
-                        user=u,
-                        task=None,
-                        title="An order was created",
-                        message=f'Order "{order.order_name}" has been created.',
-                        action_url=order_url,
-                        action_label='View Order',
-                    )
+                event = Event(
+                    title="An order was created",
+                    message=f'Order "{order.order_name}" has been created.',
+                    action_url=order_url,
+                    action_label='View Order',
+                )
+                notify((u, event) for u in set(users_to_notify))
 
                 affected_agent = getattr(getattr(order, 'lead', None), 'agent', None)
                 log_activity(
@@ -369,9 +334,9 @@ class OrderCreateView(LoginRequiredMixin, generic.CreateView):
             context["create_organisations"] = []
             context["create_agents"] = []
             context["selected_organisation_id"] = context["selected_agent_id"] = ""
-            org = get_organisation_for_user(user)
+            org = self.tenant.organisation
             context["create_products"] = ProductsAndStock.objects.filter(organisation=org) if org else ProductsAndStock.objects.none()
-        org = get_organisation_for_user(user)
+        org = self.tenant.organisation
         context['leads'] = Lead.objects.filter(organisation=org) if org else Lead.objects.none()
         context['products'] = ProductsAndStock.objects.filter(organisation=org) if org else ProductsAndStock.objects.none()
         if self.request.POST:
@@ -380,8 +345,7 @@ class OrderCreateView(LoginRequiredMixin, generic.CreateView):
             context['product_formset'] = OrderProductFormSet()
         products_qs = context.get("create_products")
         if products_qs is None:
-            org = get_organisation_for_user(self.request.user)
-            products_qs = ProductsAndStock.objects.filter(organisation=org) if org else ProductsAndStock.objects.none()
+            products_qs = context['products']
         for form in context['product_formset']:
             form.fields['product'].queryset = products_qs
         context["order_categories"] = Category.objects.filter(productsandstock__in=products_qs).distinct().order_by("name")
@@ -393,7 +357,7 @@ class OrderCreateView(LoginRequiredMixin, generic.CreateView):
 
 
 
-class OrderUpdateView(LoginRequiredMixin, generic.UpdateView):
+class OrderUpdateView(LoginRequiredMixin, TenantMixin, generic.UpdateView):
     template_name = "orders/order_update.html"
     form_class = OrderModelForm
 
@@ -401,24 +365,11 @@ class OrderUpdateView(LoginRequiredMixin, generic.UpdateView):
         return reverse("orders:order-list")
 
     def get_queryset(self):
-        qs = orders.objects.select_related("organisation", "organisation__user", "lead", "lead__agent")
-        if self.request.user.is_superuser:
-            return qs
-        org = get_organisation_for_user(self.request.user)
-        if not org:
-            return qs
-        qs = qs.filter(organisation=org)
-        if self.request.user.is_agent:
-            try:
-                agent_obj = Agent.objects.get(user=self.request.user)
-                qs = qs.filter(lead__agent=agent_obj)
-            except Agent.DoesNotExist:
-                qs = qs.none()
-        return qs
+        return self.tenant.orders().select_related("organisation", "organisation__user", "lead", "lead__agent")
 
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        order = self.get_object()
+        order = self.object
         user = self.request.user
         if user.is_superuser:
             selected_org = self.request.POST.get("organisation") or str(order.organisation_id)
@@ -436,10 +387,10 @@ class OrderUpdateView(LoginRequiredMixin, generic.UpdateView):
             else:
                 form.fields["lead"].queryset = Lead.objects.filter(organisation=order.organisation).select_related("organisation").order_by("first_name", "last_name")
         elif user.is_agent:
-            try:
-                agent_obj = Agent.objects.get(user=user)
+            agent_obj = self.tenant.agent
+            if agent_obj:
                 form.fields["lead"].queryset = Lead.objects.filter(agent=agent_obj).select_related("organisation").order_by("first_name", "last_name")
-            except Agent.DoesNotExist:
+            else:
                 form.fields["lead"].queryset = Lead.objects.none()
         else:
             form.fields["lead"].queryset = Lead.objects.filter(organisation=order.organisation).select_related("organisation").order_by("first_name", "last_name")
@@ -447,7 +398,7 @@ class OrderUpdateView(LoginRequiredMixin, generic.UpdateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        order = self.get_object()
+        order = self.object
         user = self.request.user
         org_id = str(order.organisation_id)
         agent_id = str(order.lead.agent_id) if order.lead and order.lead.agent_id else ""
@@ -473,9 +424,9 @@ class OrderUpdateView(LoginRequiredMixin, generic.UpdateView):
             context["create_organisations"] = []
             context["create_agents"] = []
             context["selected_organisation_id"] = context["selected_agent_id"] = ""
-            org = get_organisation_for_user(user)
+            org = self.tenant.organisation
             context["create_products"] = ProductsAndStock.objects.filter(organisation=org) if org else ProductsAndStock.objects.none()
-        org = get_organisation_for_user(user)
+        org = self.tenant.organisation
         context["leads"] = Lead.objects.filter(organisation=org) if org else Lead.objects.none()
         context["products"] = ProductsAndStock.objects.filter(organisation=org) if org else ProductsAndStock.objects.none()
         if self.request.POST:
@@ -508,25 +459,11 @@ class OrderUpdateView(LoginRequiredMixin, generic.UpdateView):
             return super().form_valid(form)
         return self.form_invalid(form)
 
-class OrderCancelView(LoginRequiredMixin, View):
+class OrderCancelView(LoginRequiredMixin, TenantMixin, View):
     success_url = reverse_lazy('orders:order-list')
 
     def get_object(self, queryset=None):
-        pk = self.kwargs.get('pk')
-        org = get_organisation_for_user(self.request.user)
-        if self.request.user.is_superuser:
-            qs = orders.objects.all()
-        elif org:
-            qs = orders.objects.filter(organisation=org)
-            if self.request.user.is_agent:
-                try:
-                    agent_obj = Agent.objects.get(user=self.request.user)
-                    qs = qs.filter(lead__agent=agent_obj)
-                except Agent.DoesNotExist:
-                    qs = orders.objects.none()
-        else:
-            qs = orders.objects.none()
-        return get_object_or_404(qs, pk=pk)
+        return get_object_or_404(self.tenant.orders(), pk=self.kwargs.get('pk'))
 
     def post(self, request, *args, **kwargs):
         return self.cancel_order()
@@ -564,30 +501,18 @@ class OrderCancelView(LoginRequiredMixin, View):
         messages.success(self.request, 'Order cancelled successfully.')
         return HttpResponseRedirect(self.success_url)
 
-class OrderDeleteView(LoginRequiredMixin, generic.DeleteView):
+class OrderDeleteView(LoginRequiredMixin, TenantMixin, generic.DeleteView):
     template_name = "orders/order_delete.html"
 
     def get_success_url(self):
         return reverse("orders:order-list")
 
     def get_queryset(self):
-        if self.request.user.is_superuser:
-            return orders.objects.all()
-        org = get_organisation_for_user(self.request.user)
-        if not org:
-            return orders.objects.none()
-        qs = orders.objects.filter(organisation=org)
-        if self.request.user.is_agent:
-            try:
-                agent_obj = Agent.objects.get(user=self.request.user)
-                qs = qs.filter(lead__agent=agent_obj)
-            except Agent.DoesNotExist:
-                qs = orders.objects.none()
-        return qs
+        return self.tenant.orders()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        org = get_organisation_for_user(self.request.user)
+        org = self.tenant.organisation
         context['leads'] = Lead.objects.filter(organisation=org) if org else Lead.objects.none()
         context['products'] = ProductsAndStock.objects.filter(organisation=org) if org else ProductsAndStock.objects.none()
         return context
@@ -600,7 +525,7 @@ class OrderDeleteView(LoginRequiredMixin, generic.DeleteView):
             return super().post(request, *args, **kwargs)
 
     def cancel_order(self):
-        order = self.get_object()
+        order = self.object
 
         if order.is_cancelled:
             messages.error(self.request, 'This order has already been canceled.')
@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import UploadedFile
 from phonenumber_field.formfields import PhoneNumberField
 from leads.forms import PhoneNumberWidget, validate_image_upload
+from leads.images import compress_image_upload
 
 User = get_user_model()
 
@@ -118,6 +119,7 @@ class OrganisorModelForm(forms.ModelForm):
         upload = self.cleaned_data.get('profile_image')
         if upload and isinstance(upload, UploadedFile):
             validate_image_upload(upload)
+            upload = compress_image_upload(upload)
         return upload
 
     def save(self, commit=True):
@@ -214,6 +216,7 @@ class OrganisorCreateForm(forms.ModelForm):
         upload = self.cleaned_data.get('profile_image')
         if upload and isinstance(upload, UploadedFile):
             validate_image_upload(upload)
+            upload = compress_image_upload(upload)
         return upload
 
     def save(self, commit=True):
@@ -3,7 +3,9 @@ Organisors Forms Test File
 This file tests all forms in the organisors module.
 """
 
-from django.test import TestCase
+import tempfile
+
+from django.test import TestCase, override_settings
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
@@ -19,6 +21,7 @@ from organisors.models import Organisor
 User = get_user_model()
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class TestOrganisorModelForm(TestCase):
     """OrganisorModelForm tests"""
     
@@ -315,6 +318,7 @@ class TestOrganisorModelForm(TestCase):
         self.assertEqual(form.Meta.fields, expected_fields)
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class TestOrganisorCreateForm(TestCase):
     """OrganisorCreateForm tests"""
     
@@ -493,6 +497,7 @@ class TestOrganisorCreateForm(TestCase):
         self.assertEqual(form.Meta.fields, expected_fields)
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class TestOrganisorFormIntegration(TestCase):
     """Organisor form integration tests"""
     
@@ -3,6 +3,8 @@ Organisors Integration Test File
 This file tests all components of the organisors module working together.
 """
 
+import tempfile
+
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -24,7 +26,7 @@ VALID_JPEG_BYTES = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x0
 SIMPLE_STATIC = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestOrganisorCompleteIntegration(TestCase):
     """Organisor complete integration tests"""
     
@@ -122,7 +124,7 @@ class TestOrganisorCompleteIntegration(TestCase):
             'profile_image': SimpleUploadedFile("profile.jpg", VALID_JPEG_BYTES, content_type="image/jpeg"),
         }
         
-        with patch('organisors.views.send_mail') as mock_send_mail:
+        with patch('organisors.views.queue_mail') as mock_send_mail:
             response = self.client.post(reverse('organisors:organisor-create'), create_data, format='multipart')
             self.assertEqual(response.status_code, 302)
             self.assertRedirects(response, reverse('organisors:organisor-list'))
@@ -378,7 +380,7 @@ class TestOrganisorCompleteIntegration(TestCase):
             'profile_image': SimpleUploadedFile("profile.jpg", VALID_JPEG_BYTES, content_type="image/jpeg"),
         }
         
-        with patch('organisors.views.send_mail') as mock_send_mail:
+        with patch('organisors.views.queue_mail') as mock_send_mail:
             response = self.client.post(
                 reverse('organisors:organisor-create'),
                 create_data,
@@ -424,7 +426,7 @@ class TestOrganisorCompleteIntegration(TestCase):
             for i in range(1, 4)
         ]
         
-        with patch('organisors.views.send_mail') as mock_send_mail:
+        with patch('organisors.views.queue_mail') as mock_send_mail:
             for data in organisors_data:
                 response = self.client.post(reverse('organisors:organisor-create'), data, format='multipart')
                 self.assertEqual(response.status_code, 302)
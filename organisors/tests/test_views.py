@@ -3,6 +3,8 @@ Organisors Views Test File
 This file tests all views in the organisors module.
 """
 
+import tempfile
+
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -169,7 +171,7 @@ class TestOrganisorListView(TestCase):
         self.assertEqual(organisors.count(), 1)  # Sadece normal organisor
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestOrganisorCreateView(TestCase):
     """OrganisorCreateView tests"""
     
@@ -272,7 +274,7 @@ class TestOrganisorCreateView(TestCase):
         from organisors.forms import OrganisorCreateForm
         self.assertIsInstance(response.context['form'], OrganisorCreateForm)
     
-    @patch('organisors.views.send_mail')
+    @patch('organisors.views.queue_mail')
     def test_organisor_create_view_post_valid_data(self, mock_send_mail):
         """POST request with valid data test"""
         self.client.login(username='admin_create_organisor_views', password='testpass123')
@@ -522,7 +524,7 @@ class TestOrganisorDetailView(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestOrganisorUpdateView(TestCase):
     """OrganisorUpdateView tests"""
     
@@ -820,7 +822,7 @@ class TestOrganisorDeleteView(TestCase):
         self.assertRedirects(response, reverse('organisors:organisor-list'))
 
 
-@override_settings(**SIMPLE_STATIC)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), **SIMPLE_STATIC)
 class TestOrganisorViewIntegration(TestCase):
     """Organisor view integration tests"""
     
@@ -851,7 +853,7 @@ class TestOrganisorViewIntegration(TestCase):
             organisation=self.admin_profile
         )
     
-    @patch('organisors.views.send_mail')
+    @patch('organisors.views.queue_mail')
     def test_complete_organisor_management_flow(self, mock_send_mail):
         """Full organisor management flow test"""
         self.client.login(username='admin_integration_organisor_views', password='testpass123')
@@ -1,5 +1,4 @@
 import logging
-from django.core.mail import send_mail
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import reverse
@@ -10,6 +9,7 @@ from django.db.models import Q
 from django.contrib.auth import get_user_model
 
 from leads.models import UserProfile, EmailVerificationToken
+from leads.outbox import queue_mail
 from activity_log.models import log_activity, ACTION_ORGANISOR_CREATED, ACTION_ORGANISOR_UPDATED, ACTION_ORGANISOR_DELETED
 from .models import Organisor
 from .forms import OrganisorModelForm, OrganisorCreateForm
@@ -119,13 +119,7 @@ class OrganisorCreateView(AdminOnlyMixin, generic.CreateView):
         Darkenyas CRM Team
         """
         
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
+        queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
 
 class OrganisorDetailView(SelfProfileOnlyMixin, generic.DetailView):
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Load test for the media proxy and JSON endpoints: fire concurrent GETs at a running server
+and report requests per second and latency percentiles.
+
+Compare the two serving modes against the same database and storage:
+
+    SERVER_MODE=wsgi ./start.sh    # or: gunicorn djcrm.wsgi:application --workers 2
+    python scripts/loadtest.py http://127.0.0.1:8000/media-proxy/lead_photos/photo.jpg \\
+        --cookie "sessionid=<value from a logged-in browser>" --concurrency 50 --requests 2000
+
+    SERVER_MODE=asgi ./start.sh    # or: gunicorn djcrm.asgi:application -k uvicorn_worker.UvicornWorker --workers 2
+    python scripts/loadtest.py ... (same arguments)
+
+Standard library only, so it runs anywhere Python does. Each worker thread keeps one
+keep-alive connection; the URL may be repeated to mix endpoints.
+"""
+import argparse
+import http.client
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Worker(threading.Thread):
+    """Sends requests from the shared counter until it runs out, recording latency and status."""
+
+    def __init__(self, urls, headers, counter, timeout):
+        super().__init__(daemon=True)
+        self.urls = urls
+        self.headers = headers
+        self.counter = counter
+        self.timeout = timeout
+        self.latencies = []
+        self.errors = 0
+        self.bytes = 0
+        self.connections = {}
+
+    def connection(self, parts):
+        conn = self.connections.get(parts.netloc)
+        if conn is None:
+            cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+            conn = self.connections[parts.netloc] = cls(parts.netloc, timeout=self.timeout)
+        return conn
+
+    def run(self):
+        while True:
+            number = self.counter.take()
+            if number is None:
+                break
+            parts = self.urls[number % len(self.urls)]
+            target = parts.path + (f'?{parts.query}' if parts.query else '')
+            started = time.perf_counter()
+            try:
+                conn = self.connection(parts)
+                conn.request('GET', target, headers=self.headers)
+                response = conn.getresponse()
+                self.bytes += len(response.read())
+                if response.status >= 400:
+                    self.errors += 1
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                self.connections.pop(parts.netloc, None)
+                continue
+            self.latencies.append(time.perf_counter() - started)
+
+
+class Counter:
+    def __init__(self, total):
+        self.remaining = total
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            return self.remaining
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('urls', nargs='+', help='URLs to request (round-robin)')
+    parser.add_argument('--cookie', default='', help='Cookie header, e.g. "sessionid=..." for login-only endpoints')
+    parser.add_argument('--concurrency', type=int, default=20, help='Parallel connections (default 20)')
+    parser.add_argument('--requests', type=int, default=1000, help='Total requests (default 1000)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.requests < 1:
+        parser.error('--concurrency and --requests must be positive')
+
+    headers = {'Cookie': args.cookie} if args.cookie else {}
+    counter = Counter(args.requests)
+    workers = [Worker([urlsplit(url) for url in args.urls], headers, counter, args.timeout) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for worker in workers for latency in worker.latencies)
+    errors = sum(worker.errors for worker in workers)
+    received = sum(worker.bytes for worker in workers)
+    print(f'{len(latencies)} ok, {errors} errors in {elapsed:.2f}s with {args.concurrency} connections')
+    print(f'requests/s: {len(latencies) / elapsed:.1f}   throughput: {received / elapsed / 1024 / 1024:.2f} MiB/s')
+    if latencies:
+        print(
+            'latency ms: mean {:.1f}  p50 {:.1f}  p90 {:.1f}  p99 {:.1f}  max {:.1f}'.format(
+                statistics.fmean(latencies) * 1000,
+                percentile(latencies, 0.50) * 1000,
+                percentile(latencies, 0.90) * 1000,
+                percentile(latencies, 0.99) * 1000,
+                latencies[-1] * 1000,
+            )
+        )
+    return 1 if errors and not latencies else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
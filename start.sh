@@ -0,0 +1,14 @@
+#!/usr/bin/env bash
+# Render.com start script
+# SERVER_MODE=wsgi (default): sync gunicorn workers
+# SERVER_MODE=asgi: gunicorn with uvicorn workers; the media proxy and the JSON lookups
+# (subcategories, agents by organisation) then run as async views
+
+set -o errexit  # exit on error
+
+WORKERS="${WEB_CONCURRENCY:-2}"
+
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn djcrm.asgi:application -k uvicorn_worker.UvicornWorker --bind "0.0.0.0:${PORT:-8000}" --workers "$WORKERS"
+fi
+exec gunicorn djcrm.wsgi:application --bind "0.0.0.0:${PORT:-8000}" --workers "$WORKERS"
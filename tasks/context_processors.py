@@ -1,12 +1,19 @@
+from django.conf import settings
+
 from .models import Notification
 
 
 def notifications(request):
-    """Add unread notification count for the navbar."""
+    """
+    Add unread notification count for the navbar, and how the navbar's live feed
+    connects: an SSE stream in ASGI mode, polling otherwise.
+    """
     if request.user.is_authenticated:
         return {
             'unread_notification_count': Notification.objects.filter(
                 user=request.user, is_read=False
             ).count(),
+            'notification_feed_mode': 'stream' if settings.ASYNC_VIEWS else 'poll',
+            'notification_poll_seconds': settings.NOTIFICATION_POLL_SECONDS,
         }
     return {'unread_notification_count': 0}
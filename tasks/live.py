@@ -0,0 +1,149 @@
+"""
+Live notification feed for the navbar.
+
+publish(user_id) wakes every open feed of the user in this process; receivers in
+tasks/models.py call it on commit whenever one of the user's notifications is created, read
+or deleted. A feed then re-reads the user's position (read_feed: newest notification id and
+unread count, two indexed queries) and sends what changed.
+
+Notifications written by another worker or by the cron commands publish nothing here, so
+every feed also re-reads at least every NOTIFICATION_CHECK_SECONDS: that interval bounds how
+late those appear. In ASGI mode the feed is a Server-Sent Events stream (stream_events);
+otherwise the browser polls notification_poll, which can hold the request open for up to
+NOTIFICATION_LONG_POLL_SECONDS waiting for a publish.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+
+from .models import Notification
+
+# Newest notifications sent in one update; older ones are still counted as unread
+FEED_LIMIT = 10
+
+_waiters = defaultdict(set)
+_lock = threading.Lock()
+
+
+class _Waiter:
+    """One open feed: an asyncio.Event for a stream, a threading.Event for a long poll."""
+
+    def __init__(self):
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+        self.event = threading.Event() if self.loop is None else asyncio.Event()
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # the stream's event loop is already closed
+
+    def wait(self, timeout):
+        """Block until woken or timeout; True if woken."""
+        woken = self.event.wait(timeout)
+        self.event.clear()
+        return woken
+
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.event.clear()
+        return True
+
+
+@contextmanager
+def subscribe(user_id):
+    """Register a waiter that publish(user_id) wakes while the block runs."""
+    waiter = _Waiter()
+    with _lock:
+        _waiters[user_id].add(waiter)
+    try:
+        yield waiter
+    finally:
+        with _lock:
+            _waiters[user_id].discard(waiter)
+            if not _waiters[user_id]:
+                del _waiters[user_id]
+
+
+def publish(user_id):
+    """Wake the open feeds of the user in this process (safe to call from any thread)."""
+    with _lock:
+        waiters = list(_waiters.get(user_id, ()))
+    for waiter in waiters:
+        waiter.wake()
+
+
+def read_feed(user_id, after_id=None):
+    """
+    {'last_id', 'unread', 'notifications'} for the user. notifications are the (at most
+    FEED_LIMIT newest) rows after after_id, oldest first; without after_id there are none
+    and last_id only marks the current position.
+    """
+    notifications = Notification.objects.filter(user_id=user_id)
+    unread = notifications.filter(is_read=False).count()
+    if after_id is None:
+        rows = []
+        last_id = notifications.aggregate(last_id=Max('pk'))['last_id'] or 0
+    else:
+        rows = list(reversed(notifications.filter(pk__gt=after_id).order_by('-pk').values(
+            'id', 'title', 'message', 'action_url', 'action_label', 'created_at',
+        )[:FEED_LIMIT]))
+        last_id = rows[-1]['id'] if rows else after_id
+    for row in rows:
+        row['created_at'] = row['created_at'].isoformat()
+    return {'last_id': last_id, 'unread': unread, 'notifications': rows}
+
+
+def _read_feed_and_close(user_id, after_id):
+    try:
+        return read_feed(user_id, after_id)
+    finally:
+        # A stream stays open for minutes: don't hold a database connection in between reads
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def format_event(feed):
+    return f"id: {feed['last_id']}\nevent: notifications\ndata: {json.dumps(feed)}\n\n"
+
+
+async def stream_events(user_id, after_id=None):
+    """
+    Server-Sent Events for the user: a 'notifications' event (read_feed's dict) whenever the
+    newest id or unread count changes, a comment line as keep-alive otherwise. Ends after
+    NOTIFICATION_STREAM_SECONDS; the browser reconnects with Last-Event-ID.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.NOTIFICATION_STREAM_SECONDS
+    yield f"retry: {settings.NOTIFICATION_CHECK_SECONDS * 1000}\n\n"
+    sent = None
+    with subscribe(user_id) as waiter:
+        while True:
+            feed = await sync_to_async(_read_feed_and_close)(user_id, after_id)
+            if (feed['last_id'], feed['unread']) != sent:
+                sent = (feed['last_id'], feed['unread'])
+                after_id = feed['last_id']
+                yield format_event(feed)
+            else:
+                yield ': keep-alive\n\n'
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            await waiter.wait_async(min(settings.NOTIFICATION_CHECK_SECONDS, remaining))
@@ -12,7 +12,7 @@ from django.urls import reverse
 
 from leads.models import Lead
 from orders.models import orders
-from tasks.models import Notification
+from tasks.notifier import Event, notify, sent_keys
 
 
 class Command(BaseCommand):
@@ -34,6 +34,7 @@ class Command(BaseCommand):
         # Leads that have an agent
         leads = Lead.objects.filter(agent__isnull=False).select_related('agent', 'agent__user')
 
+        stale_leads = []
         for lead in leads:
             # Last non-cancelled order for this lead
             last_order = (
@@ -51,11 +52,14 @@ class Command(BaseCommand):
                 if last_order_date < cutoff:
                     no_order_in_month = True
 
-            if not no_order_in_month:
-                continue
+            if no_order_in_month:
+                stale_leads.append(lead)
 
+        sent = sent_keys(f"lead_no_order_{lead.id}_{year_month}" for lead in stale_leads)
+        deliveries = []
+        for lead in stale_leads:
             key = f"lead_no_order_{lead.id}_{year_month}"
-            if Notification.objects.filter(key=key).exists():
+            if key in sent:
                 continue
 
             user = lead.agent.user
@@ -71,13 +75,12 @@ class Command(BaseCommand):
                 continue
 
             lead_url = reverse('leads:lead-detail', kwargs={'pk': lead.pk})
-            Notification.objects.create(
-                user=user,
-                task=None,
+            deliveries.append((user, Event(
                 title=title,
                 message=message,
-                key=key,
                 action_url=lead_url,
                 action_label='View Lead',
-            )
+                key=key,
+            )))
             self.stdout.write(self.style.SUCCESS(f"Notified {user.username} for lead {lead_name} (no order in 30 days)"))
+        notify(deliveries)
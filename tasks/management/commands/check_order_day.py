@@ -8,7 +8,7 @@ from django.urls import reverse
 
 from leads.models import Lead
 from orders.models import orders
-from tasks.models import Notification
+from tasks.notifier import Event, notify, sent_keys
 
 
 class Command(BaseCommand):
@@ -31,34 +31,37 @@ class Command(BaseCommand):
             order_day__date=today,
         ).select_related('organisation__user').prefetch_related('lead')
 
+        candidates = []
         for order in order_list:
             users_to_notify = [order.organisation.user]
             if order.lead_id:
                 lead = Lead.objects.filter(pk=order.lead_id).select_related('agent__user').first()
                 if lead and lead.agent:
                     users_to_notify.append(lead.agent.user)
+            candidates += [
+                (order, user, f"order_day_{order.id}_{user.id}_{today.isoformat()}")
+                for user in set(users_to_notify)
+            ]
 
-            title = "Sale completed"
-            message = f'Order "{order.order_name}" is due today (order day). Sale completed.'
-
-            for user in set(users_to_notify):
-                key = f"order_day_{order.id}_{user.id}_{today.isoformat()}"
-                if Notification.objects.filter(key=key).exists():
-                    continue
-                if dry_run:
-                    self.stdout.write(f"Would notify {user.username}: {title} - {order.order_name}")
-                    continue
-                order_url = reverse('orders:order-detail', kwargs={'pk': order.pk})
-                Notification.objects.create(
-                    user=user,
-                    task=None,
-                    title=title,
-                    message=message,
-                    key=key,
-                    action_url=order_url,
-                    action_label='View Order',
-                )
-                self.stdout.write(self.style.SUCCESS(f"Notified {user.username}: {title} - {order.order_name}"))
+        title = "Sale completed"
+        sent = sent_keys(key for _, _, key in candidates)
+        deliveries = []
+        for order, user, key in candidates:
+            if key in sent:
+                continue
+            if dry_run:
+                self.stdout.write(f"Would notify {user.username}: {title} - {order.order_name}")
+                continue
+            order_url = reverse('orders:order-detail', kwargs={'pk': order.pk})
+            deliveries.append((user, Event(
+                title=title,
+                message=f'Order "{order.order_name}" is due today (order day). Sale completed.',
+                action_url=order_url,
+                action_label='View Order',
+                key=key,
+            )))
+            self.stdout.write(self.style.SUCCESS(f"Notified {user.username}: {title} - {order.order_name}"))
+        notify(deliveries)
 
         if not order_list and not dry_run:
             self.stdout.write("No orders with order_day today.")
@@ -6,12 +6,14 @@ Reminds 3 days before and 1 day before deadline (only incomplete tasks).
 from datetime import timedelta
 
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from django.urls import reverse
 
-from tasks.models import Task, Notification
+from leads.outbox import queue_mail
+from tasks.models import Task
+from tasks.notifier import Event, notify, sent_keys
 
 
 class Command(BaseCommand):
@@ -36,61 +38,62 @@ class Command(BaseCommand):
         dry_run = options['dry_run']
         today = timezone.now().date()
 
+        candidates = []
         for days in days_list:
             target_date = today + timedelta(days=days)
             tasks = Task.objects.filter(
                 end_date=target_date,
                 status__in=['pending', 'in_progress'],
             ).select_related('assigned_to', 'organisation')
+            candidates += [(days, task) for task in tasks if task.assigned_to.email]
 
-            for task in tasks:
-                key = f"task_deadline_{task.id}_{days}d"
-                if Notification.objects.filter(key=key).exists():
-                    continue
+        # One query for the reminders already sent, instead of one per task
+        sent = sent_keys(f"task_deadline_{task.id}_{days}d" for days, task in candidates)
+        deliveries = []
+        for days, task in candidates:
+            key = f"task_deadline_{task.id}_{days}d"
+            if key in sent:
+                continue
 
-                user = task.assigned_to
-                if not user.email:
-                    continue
+            user = task.assigned_to
+            if days == 1:
+                title = f"Task due tomorrow: {task.title}"
+            else:
+                title = f"Task due in {days} days: {task.title}"
 
-                if days == 1:
-                    title = f"Task due tomorrow: {task.title}"
-                else:
-                    title = f"Task due in {days} days: {task.title}"
+            message = (
+                f"Hello {user.get_full_name() or user.username},\n\n"
+                f"Reminder: the following task is due in {days} day(s).\n\n"
+                f"Task: {task.title}\n"
+                f"End date: {task.end_date}\n"
+                f"Priority: {task.get_priority_display()}\n\n"
+                f"View task: {settings.SITE_URL}/tasks/{task.id}/\n\n"
+                f"Darkenyas CRM"
+            )
 
-                message = (
-                    f"Hello {user.get_full_name() or user.username},\n\n"
-                    f"Reminder: the following task is due in {days} day(s).\n\n"
-                    f"Task: {task.title}\n"
-                    f"End date: {task.end_date}\n"
-                    f"Priority: {task.get_priority_display()}\n\n"
-                    f"View task: {settings.SITE_URL}/tasks/{task.id}/\n\n"
-                    f"Darkenyas CRM"
-                )
+            if dry_run:
+                self.stdout.write(f"Would send to {user.email}: {title}")
+                continue
 
-                if dry_run:
-                    self.stdout.write(f"Would send to {user.email}: {title}")
-                    continue
+            task_url = reverse('tasks:task-detail', kwargs={'pk': task.pk})
+            deliveries.append((user, Event(
+                title=title,
+                message=message,
+                action_url=task_url,
+                action_label='View Task',
+                task=task,
+                key=key,
+            )))
 
-                try:
-                    send_mail(
-                        title,
-                        message,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [user.email],
-                        fail_silently=False,
-                    )
-                except Exception as e:
-                    self.stderr.write(f"Email failed for task {task.id}: {e}")
-                    continue
-
-                task_url = reverse('tasks:task-detail', kwargs={'pk': task.pk})
-                Notification.objects.create(
-                    user=user,
-                    task=task,
-                    title=title,
-                    message=message,
-                    key=key,
-                    action_url=task_url,
-                    action_label='View Task',
-                )
-                self.stdout.write(self.style.SUCCESS(f"Sent reminder for task {task.id} to {user.email}"))
+        for user, event in deliveries:
+            # Each email is queued (or sent) with the key that records its reminder as sent, so
+            # a failed send rolls back only that reminder and the next run retries it
+            try:
+                with transaction.atomic():
+                    if not notify([(user, event)]):
+                        continue
+                    queue_mail(event.title, event.message, settings.DEFAULT_FROM_EMAIL, [user.email])
+            except Exception as e:
+                self.stderr.write(f"Email failed for task {event.task.id}: {e}")
+                continue
+            self.stdout.write(self.style.SUCCESS(f"Sent reminder for task {event.task.id} to {user.email}"))
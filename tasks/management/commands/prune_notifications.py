@@ -0,0 +1,76 @@
+"""
+Delete old notifications in small chunks so the notifications table stays small.
+Run daily via cron: python manage.py prune_notifications
+Read notifications older than NOTIFICATION_READ_RETENTION_DAYS are removed; unread ones only
+after NOTIFICATION_UNREAD_RETENTION_DAYS (0 keeps them). Dedupe keys live in NotificationKey,
+so reminder commands do not resend pruned notifications; keys themselves are dropped after
+NOTIFICATION_KEY_RETENTION_DAYS.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from djcrm.db import delete_in_chunks
+from tasks.models import Notification, NotificationKey
+
+
+class Command(BaseCommand):
+    help = 'Delete read (and optionally unread) notifications older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Delete read notifications older than this many days (default: NOTIFICATION_READ_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--unread-days',
+            type=int,
+            default=None,
+            help='Also delete unread notifications older than this many days; 0 keeps them '
+                 '(default: NOTIFICATION_UNREAD_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per statement (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print how many rows would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        read_days = options['days'] if options['days'] is not None else settings.NOTIFICATION_READ_RETENTION_DAYS
+        unread_days = (
+            options['unread_days'] if options['unread_days'] is not None
+            else settings.NOTIFICATION_UNREAD_RETENTION_DAYS
+        )
+        if read_days < 1 or unread_days < 0:
+            raise CommandError('--days must be at least 1 and --unread-days must not be negative')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        now = timezone.now()
+
+        targets = [('read notifications', Notification.objects.filter(
+            is_read=True, created_at__lt=now - timedelta(days=read_days),
+        ))]
+        if unread_days:
+            targets.append(('unread notifications', Notification.objects.filter(
+                is_read=False, created_at__lt=now - timedelta(days=unread_days),
+            )))
+        targets.append(('dedupe keys', NotificationKey.objects.filter(
+            created_at__lt=now - timedelta(days=settings.NOTIFICATION_KEY_RETENTION_DAYS),
+        )))
+
+        for label, queryset in targets:
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {queryset.count()} {label}')
+                continue
+            deleted = delete_in_chunks(queryset, options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} {label}'))
@@ -0,0 +1,27 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .notifier import anotification_batch, notification_batch
+
+
+class NotificationBatchMiddleware:
+    """
+    Write the notifications a request sends in one batch when the view returns, so digests
+    (e.g. the stock alerts of a bulk price update) collapse before anything is inserted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with notification_batch():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        async with anotification_batch():
+            return await self.get_response(request)
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.7 on 2026-10-19 00:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_notification_keys(apps, schema_editor):
+    Notification = apps.get_model('tasks', 'Notification')
+    NotificationKey = apps.get_model('tasks', 'NotificationKey')
+    keys = Notification.objects.exclude(key__isnull=True).exclude(key='').values_list('key', flat=True)
+    batch = []
+    for key in keys.iterator(chunk_size=2000):
+        batch.append(NotificationKey(key=key))
+        if len(batch) >= 2000:
+            NotificationKey.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        NotificationKey.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_backfill_notification_action_url'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationKey',
+            fields=[
+                ('key', models.CharField(max_length=120, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_read', 'created_at'], name='notification_read_created_idx'),
+        ),
+        migrations.RunPython(backfill_notification_keys, noop),
+    ]
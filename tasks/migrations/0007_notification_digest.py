@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-19 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_notification_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='digest',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='digest_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.conf import settings
 from django.urls import reverse
 
+from djcrm.versions import TASKS, bump_version
+
 
 class Task(models.Model):
     """Task model: title, content, start/end date, assignee, assigned by."""
@@ -90,10 +94,17 @@ class Notification(models.Model):
     # Shortcut: "View Task", "View Lead", "View Order", "View Product" etc.
     action_url = models.CharField(max_length=255, blank=True, null=True)
     action_label = models.CharField(max_length=80, blank=True, null=True)
+    # Digest (tasks.notifier): unread notifications of the same kind collapse into one row
+    digest = models.CharField(max_length=40, blank=True, default='')
+    digest_count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # prune_notifications: read notifications older than the retention window
+            models.Index(fields=['is_read', 'created_at'], name='notification_read_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.user.username})"
@@ -115,3 +126,44 @@ class Notification(models.Model):
         if self.task_id:
             return 'View Task'
         return None
+
+
+class NotificationKey(models.Model):
+    """
+    Dedupe key of a notification that has been sent (e.g. task_deadline_12_3d).
+    Kept after the notification itself is pruned so reminder commands stay idempotent.
+    """
+
+    key = models.CharField(max_length=120, primary_key=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+def notification_sent(key):
+    """True if a notification with this dedupe key was ever created (tasks.notifier.sent_keys checks many at once)."""
+    return NotificationKey.objects.filter(key=key).exists()
+
+
+@receiver(post_save, sender=Notification)
+def record_notification_key(sender, instance, created, **kwargs):
+    """Remember the dedupe key of every keyed notification."""
+    if created and instance.key:
+        NotificationKey.objects.bulk_create([NotificationKey(key=instance.key)], ignore_conflicts=True)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def publish_notification_change(sender, instance, **kwargs):
+    """Wake the user's open live feeds (navbar) once the change is committed."""
+    from . import live
+
+    user_id = instance.user_id
+    transaction.on_commit(lambda: live.publish(user_id))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def bump_tasks_version(sender, instance, **kwargs):
+    bump_version(TASKS, instance.organisation_id)
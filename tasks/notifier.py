@@ -0,0 +1,190 @@
+"""
+Notification dispatcher: every in-app notification is sent through notify().
+
+notify() takes any number of (recipient, Event) deliveries. Keyed events are checked
+against the sent keys (NotificationKey) in one query and the new keys are claimed in the
+caller's transaction, so a reminder is never sent twice and a rolled back run can retry.
+The rows themselves are written once the transaction commits: with a single
+bulk_create(ignore_conflicts=True), per request (NotificationBatchMiddleware) or
+notification_batch() block when one is active, else right away.
+
+An Event with a Digest collapses with the recipient's other unread notifications of that
+digest, in the batch and already in the database, into one notification ("12 new stock
+alerts") that links to the overview instead of the single item.
+"""
+import contextvars
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from . import live
+from .models import Notification, NotificationKey
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement when writing a batch
+BULK_CREATE_BATCH_SIZE = 500
+
+_batch = contextvars.ContextVar('notification_batch', default=None)
+
+
+@dataclass(frozen=True)
+class Digest:
+    """How a recipient's unread notifications of one kind collapse into one."""
+    name: str
+    title: str  # formatted with {count}
+    action_url: Optional[str] = None
+    action_label: Optional[str] = None
+
+
+@dataclass
+class Event:
+    """What to tell the recipients; each gets their own Notification."""
+    title: str
+    message: str = ''
+    action_url: Optional[str] = None
+    action_label: Optional[str] = None
+    task: object = None
+    # Dedupe key: a keyed event is sent once, ever (include the recipient when there are several)
+    key: Optional[str] = None
+    digest: Optional[Digest] = None
+
+
+def sent_keys(keys):
+    """The keys among keys that were already sent (one query)."""
+    keys = set(keys)
+    if not keys:
+        return set()
+    return set(NotificationKey.objects.filter(key__in=keys).values_list('key', flat=True))
+
+
+def notify(deliveries):
+    """
+    Send notifications: deliveries is an iterable of (recipient, Event), recipient a
+    User or user id. Returns the (user id, Event) pairs that will be sent, without the
+    keyed ones sent before (or twice in deliveries).
+    """
+    deliveries = [(getattr(recipient, 'pk', recipient), event) for recipient, event in deliveries]
+    sent = sent_keys(event.key for _, event in deliveries if event.key)
+    accepted = []
+    for user_id, event in deliveries:
+        if event.key:
+            if event.key in sent:
+                continue
+            sent.add(event.key)
+        accepted.append((user_id, event))
+    keys = [NotificationKey(key=event.key) for _, event in accepted if event.key]
+    if keys:
+        NotificationKey.objects.bulk_create(keys, ignore_conflicts=True)
+    if accepted:
+        transaction.on_commit(lambda: _add(accepted), robust=True)
+    return accepted
+
+
+def _add(deliveries):
+    batch = _batch.get()
+    if batch is None:
+        write(deliveries)
+    else:
+        batch.extend(deliveries)
+
+
+@contextmanager
+def notification_batch():
+    """Collect the notifications committed inside the block and write them together on exit."""
+    token = _batch.set([])
+    try:
+        yield
+    finally:
+        deliveries = _batch.get()
+        _batch.reset(token)
+        if deliveries:
+            write(deliveries)
+
+
+@asynccontextmanager
+async def anotification_batch():
+    """notification_batch() for async code: the batch is written on a worker thread."""
+    token = _batch.set([])
+    try:
+        yield
+    finally:
+        deliveries = _batch.get()
+        _batch.reset(token)
+        if deliveries:
+            await sync_to_async(write)(deliveries)
+
+
+def _row(user_id, event, **extra):
+    return Notification(
+        user_id=user_id,
+        task=event.task,
+        title=event.title,
+        message=event.message,
+        key=event.key,
+        action_url=event.action_url,
+        action_label=event.action_label,
+        **extra,
+    )
+
+
+def write(deliveries):
+    """Insert the notifications (digests merged) and wake the recipients' live feeds; failures are logged, never raised."""
+    rows = []
+    digested = defaultdict(list)
+    for user_id, event in deliveries:
+        if event.digest:
+            digested[user_id, event.digest.name].append(event)
+        else:
+            rows.append(_row(user_id, event))
+    try:
+        with transaction.atomic():
+            if digested:
+                rows += _merge_digests(digested)
+            Notification.objects.bulk_create(rows, batch_size=BULK_CREATE_BATCH_SIZE, ignore_conflicts=True)
+    except Exception:
+        logger.exception("Failed to write %d notifications", len(deliveries))
+        return
+    for user_id in {row.user_id for row in rows}:
+        live.publish(user_id)
+
+
+def _merge_digests(digested):
+    """One row per (recipient, digest), replacing the recipient's unread row of that digest."""
+    previous = defaultdict(int)
+    stale = []
+    unread = Notification.objects.filter(
+        is_read=False,
+        user_id__in={user_id for user_id, _ in digested},
+        digest__in={name for _, name in digested},
+    ).values_list('pk', 'user_id', 'digest', 'digest_count')
+    for pk, user_id, name, count in unread:
+        if (user_id, name) not in digested:
+            continue
+        previous[user_id, name] += count
+        stale.append(pk)
+    if stale:
+        Notification.objects.filter(pk__in=stale).delete()
+    rows = []
+    for (user_id, name), events in digested.items():
+        count = previous[user_id, name] + len(events)
+        latest = events[-1]
+        digest = latest.digest
+        if count == 1:
+            rows.append(_row(user_id, latest, digest=name))
+            continue
+        rows.append(Notification(
+            user_id=user_id,
+            title=digest.title.format(count=count),
+            message=f"Latest: {latest.message or latest.title}",
+            action_url=digest.action_url,
+            action_label=digest.action_label,
+            digest=name,
+            digest_count=count,
+        ))
+    return rows
@@ -1,18 +1,21 @@
 """
 Tests for tasks management commands: check_lead_no_order, check_order_day,
-check_task_deadlines, create_fake_notifications.
+check_task_deadlines, create_fake_notifications, prune_notifications.
 """
 from datetime import timedelta
 from io import StringIO
+from unittest import mock
 
 from django.test import TestCase, override_settings
+from django.core import mail
 from django.core.management import call_command
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from leads.models import Lead, Agent, UserProfile
+from leads.outbox import queue_mail
 from orders.models import orders
-from tasks.models import Task, Notification
+from tasks.models import Task, Notification, NotificationKey
 
 User = get_user_model()
 
@@ -69,7 +72,8 @@ class CheckLeadNoOrderCommandTests(TestCase):
         lead.save(update_fields=['date_added'])
 
         out = StringIO()
-        call_command('check_lead_no_order', stdout=out)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('check_lead_no_order', stdout=out)
 
         self.assertEqual(Notification.objects.filter(key__startswith='lead_no_order_').count(), 1)
         notif = Notification.objects.get(key__startswith='lead_no_order_')
@@ -89,11 +93,35 @@ class CheckLeadNoOrderCommandTests(TestCase):
         lead.date_added = timezone.now() - timedelta(days=35)
         lead.save(update_fields=['date_added'])
 
-        call_command('check_lead_no_order', stdout=StringIO())
-        call_command('check_lead_no_order', stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('check_lead_no_order', stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('check_lead_no_order', stdout=StringIO())
 
         self.assertEqual(Notification.objects.filter(key__startswith='lead_no_order_').count(), 1)
 
+    def test_does_not_notify_again_after_notification_pruned(self):
+        """The dedupe key outlives the pruned notification."""
+        lead = Lead.objects.create(
+            first_name='No',
+            last_name='Order',
+            email='noorder3@test.com',
+            phone_number='+905558888888',
+            organisation=self.organisation,
+            agent=self.agent,
+        )
+        lead.date_added = timezone.now() - timedelta(days=35)
+        lead.save(update_fields=['date_added'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('check_lead_no_order', stdout=StringIO())
+        self.assertEqual(Notification.objects.filter(key__startswith='lead_no_order_').delete()[0], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('check_lead_no_order', stdout=StringIO())
+
+        self.assertFalse(Notification.objects.filter(key__startswith='lead_no_order_').exists())
+        self.assertTrue(NotificationKey.objects.filter(key__startswith='lead_no_order_').exists())
+
 
 class CheckOrderDayCommandTests(TestCase):
     """Tests for check_order_day management command."""
@@ -149,7 +177,8 @@ class CheckOrderDayCommandTests(TestCase):
             lead=self.lead,
         )
         out = StringIO()
-        call_command('check_order_day', stdout=out)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('check_order_day', stdout=out)
 
         notifications = Notification.objects.filter(key__startswith='order_day_')
         self.assertGreaterEqual(notifications.count(), 1)
@@ -219,7 +248,8 @@ class CheckTaskDeadlinesCommandTests(TestCase):
         )
         with self.settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
             out = StringIO()
-            call_command('check_task_deadlines', '--days', '1', stdout=out)
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('check_task_deadlines', '--days', '1', stdout=out)
 
         notifications = Notification.objects.filter(key__startswith='task_deadline_')
         self.assertEqual(notifications.count(), 1)
@@ -228,6 +258,41 @@ class CheckTaskDeadlinesCommandTests(TestCase):
         self.assertIn('tomorrow', notif.title.lower())
 
 
+    @override_settings(
+        DEFAULT_FROM_EMAIL='noreply@test.com',
+        SITE_URL='http://testserver',
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        EMAIL_OUTBOX=False,
+    )
+    def test_failed_send_only_rolls_back_its_own_reminder(self):
+        """A failed email leaves the other reminders sent, and only it is retried by the next run."""
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        for title in ('First', 'Second', 'Third'):
+            Task.objects.create(
+                title=title, content='Content', start_date=timezone.now().date(), end_date=tomorrow,
+                status='pending', priority='medium', assigned_to=self.agent_user,
+                assigned_by=self.org_user, organisation=self.organisation,
+            )
+
+        def send(subject, *args, **kwargs):
+            if 'Third' in subject:
+                raise OSError('SMTP down')
+            return queue_mail(subject, *args, **kwargs)
+
+        with mock.patch('tasks.management.commands.check_task_deadlines.queue_mail', side_effect=send):
+            for _ in range(2):
+                err = StringIO()
+                with self.captureOnCommitCallbacks(execute=True):
+                    call_command('check_task_deadlines', '--days', '1', stdout=StringIO(), stderr=err)
+                self.assertIn('Email failed', err.getvalue())
+
+        self.assertEqual(sorted(email.subject for email in mail.outbox), ['Task due tomorrow: First', 'Task due tomorrow: Second'])
+        self.assertEqual(
+            sorted(Notification.objects.filter(key__startswith='task_deadline_').values_list('title', flat=True)),
+            ['Task due tomorrow: First', 'Task due tomorrow: Second'],
+        )
+
+
 class CreateFakeNotificationsCommandTests(TestCase):
     """Tests for create_fake_notifications management command."""
 
@@ -323,3 +388,67 @@ class CreateFakeNotificationsCommandTests(TestCase):
         err = StringIO()
         call_command('create_fake_notifications', '--user', 'nonexistent_user_xyz', stderr=err)
         self.assertIn('not found', err.getvalue().lower() or 'not found')
+
+
+@override_settings(
+    NOTIFICATION_READ_RETENTION_DAYS=30,
+    NOTIFICATION_UNREAD_RETENTION_DAYS=0,
+    NOTIFICATION_KEY_RETENTION_DAYS=400,
+)
+class PruneNotificationsCommandTests(TestCase):
+    """Tests for prune_notifications management command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='prune_user',
+            email='prune_user@test.com',
+            password='testpass123',
+            email_verified=True,
+        )
+
+    def create_notification(self, days_ago, is_read, key=None):
+        notification = Notification.objects.create(user=self.user, title='Reminder', is_read=is_read, key=key)
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return notification
+
+    def test_deletes_only_old_read_notifications(self):
+        old_read = self.create_notification(40, True, key='old_read_key')
+        old_unread = self.create_notification(40, False)
+        recent_read = self.create_notification(5, True)
+
+        out = StringIO()
+        call_command('prune_notifications', stdout=out)
+
+        remaining = set(Notification.objects.values_list('pk', flat=True))
+        self.assertEqual(remaining, {old_unread.pk, recent_read.pk})
+        self.assertNotIn(old_read.pk, remaining)
+        self.assertIn('Deleted 1 read notifications', out.getvalue())
+        # Key of the pruned notification is kept
+        self.assertTrue(NotificationKey.objects.filter(key='old_read_key').exists())
+
+    def test_unread_days_deletes_old_unread(self):
+        self.create_notification(100, False)
+        self.create_notification(10, False)
+        call_command('prune_notifications', '--unread-days', '90', stdout=StringIO())
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_chunked_delete(self):
+        for i in range(7):
+            self.create_notification(40, True)
+        call_command('prune_notifications', '--chunk-size', '3', stdout=StringIO())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_dry_run_deletes_nothing(self):
+        self.create_notification(40, True)
+        out = StringIO()
+        call_command('prune_notifications', '--dry-run', stdout=out)
+        self.assertIn('Would delete 1 read notifications', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_expired_keys_are_deleted(self):
+        NotificationKey.objects.create(key='ancient_key')
+        NotificationKey.objects.filter(key='ancient_key').update(created_at=timezone.now() - timedelta(days=500))
+        NotificationKey.objects.create(key='fresh_key')
+        call_command('prune_notifications', stdout=StringIO())
+        self.assertEqual(list(NotificationKey.objects.values_list('key', flat=True)), ['fresh_key'])
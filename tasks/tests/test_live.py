@@ -0,0 +1,82 @@
+"""
+Tests for tasks.live – in-process pub/sub, the feed reader and the SSE stream.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from tasks import live
+from tasks.models import Notification
+
+User = get_user_model()
+
+
+class TestPublishSubscribe(TestCase):
+
+    def test_publish_wakes_only_the_users_waiters(self):
+        with live.subscribe(1) as mine, live.subscribe(2) as theirs:
+            live.publish(1)
+            self.assertTrue(mine.wait(0))
+            self.assertFalse(theirs.wait(0))
+            # The wake is consumed
+            self.assertFalse(mine.wait(0))
+        self.assertNotIn(1, live._waiters)
+
+    def test_notification_save_publishes_on_commit(self):
+        user = User.objects.create_user(username='liveuser', email='liveuser@test.com', password='pass')
+        with live.subscribe(user.pk) as waiter:
+            with self.captureOnCommitCallbacks(execute=True):
+                notification = Notification.objects.create(user=user, title='Hello')
+            self.assertTrue(waiter.wait(0))
+            with self.captureOnCommitCallbacks(execute=True):
+                notification.delete()
+            self.assertTrue(waiter.wait(0))
+
+
+class TestReadFeed(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='feeduser', email='feeduser@test.com', password='pass')
+
+    def test_empty_feed(self):
+        self.assertEqual(live.read_feed(self.user.pk), {'last_id': 0, 'unread': 0, 'notifications': []})
+
+    def test_newest_rows_after_position(self):
+        first = Notification.objects.create(user=self.user, title='N0', is_read=True)
+        created = [Notification.objects.create(user=self.user, title=f'N{i}') for i in range(1, live.FEED_LIMIT + 3)]
+        feed = live.read_feed(self.user.pk, first.pk)
+        self.assertEqual(feed['unread'], len(created))
+        self.assertEqual(feed['last_id'], created[-1].pk)
+        self.assertEqual([n['id'] for n in feed['notifications']], [n.pk for n in created[-live.FEED_LIMIT:]])
+        self.assertIsInstance(feed['notifications'][0]['created_at'], str)
+        self.assertEqual(live.read_feed(self.user.pk, created[-1].pk)['notifications'], [])
+
+
+@override_settings(NOTIFICATION_CHECK_SECONDS=30, NOTIFICATION_STREAM_SECONDS=60)
+class TestStreamEvents(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='streamuser', email='streamuser@test.com', password='pass')
+
+    async def test_publish_pushes_new_notification(self):
+        stream = live.stream_events(self.user.pk)
+        self.assertEqual(await anext(stream), 'retry: 30000\n\n')
+        self.assertIn('"unread": 0', await anext(stream))
+        pending = asyncio.ensure_future(anext(stream))
+        notification = await Notification.objects.acreate(user=self.user, title='Pushed')
+        # The test transaction never commits, so publish by hand
+        await sync_to_async(live.publish)(self.user.pk)
+        event = await asyncio.wait_for(pending, 5)
+        self.assertTrue(event.startswith(f'id: {notification.pk}\n'))
+        self.assertIn('"title": "Pushed"', event)
+        await stream.aclose()
+
+    @override_settings(NOTIFICATION_STREAM_SECONDS=0)
+    async def test_stream_ends_after_its_lifetime(self):
+        chunks = [chunk async for chunk in live.stream_events(self.user.pk)]
+        self.assertEqual(len(chunks), 2)
+        self.assertNotIn(self.user.pk, live._waiters)
@@ -0,0 +1,131 @@
+"""
+Tests for tasks.notifier – the batched notify() dispatcher, its dedupe keys and digests.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from tasks import live, notifier
+from tasks.middleware import NotificationBatchMiddleware
+from tasks.models import Notification, NotificationKey
+from tasks.notifier import Digest, Event, notification_batch, notify, sent_keys
+
+User = get_user_model()
+
+ALERTS = Digest('alerts', '{count} new alerts', '/alerts/', 'View Alerts')
+
+
+class TestNotify(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='notifyalice', email='notifyalice@test.com', password='pass')
+        cls.bob = User.objects.create_user(username='notifybob', email='notifybob@test.com', password='pass')
+
+    def test_fan_out_is_written_on_commit_in_one_insert(self):
+        event = Event(title='Order created', action_url='/orders/1/', action_label='View Order')
+        with self.captureOnCommitCallbacks() as callbacks:
+            notify([(self.alice, event), (self.bob.pk, event)])
+        self.assertFalse(Notification.objects.exists())
+        with self.assertNumQueries(3):  # savepoint, INSERT, release
+            callbacks[0]()
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user__username', 'title')),
+            [('notifyalice', 'Order created'), ('notifybob', 'Order created')],
+        )
+
+    def test_keys_are_checked_in_one_query_and_claimed_once(self):
+        NotificationKey.objects.create(key='reminder_1')
+        deliveries = [
+            (self.alice, Event(title='Old', key='reminder_1')),
+            (self.alice, Event(title='New', key='reminder_2')),
+            (self.bob, Event(title='Twice', key='reminder_2')),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(2):  # SELECT sent keys, INSERT new keys
+                accepted = notify(deliveries)
+        self.assertEqual([(user_id, event.title) for user_id, event in accepted], [(self.alice.pk, 'New')])
+        self.assertEqual(sent_keys(['reminder_1', 'reminder_2', 'reminder_3']), {'reminder_1', 'reminder_2'})
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['New'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(notify([(self.bob, Event(title='Again', key='reminder_2'))]), [])
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_rolled_back_notifications_are_not_sent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    notify([(self.alice, Event(title='Lost', key='lost_1'))])
+                    raise ValueError('rollback')
+            except ValueError:
+                pass
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(sent_keys(['lost_1']), set())
+
+    def test_write_wakes_live_feeds(self):
+        with live.subscribe(self.alice.pk) as waiter:
+            with self.captureOnCommitCallbacks(execute=True):
+                notify([(self.alice, Event(title='Hello'))])
+            self.assertTrue(waiter.wait(0))
+
+    def test_digest_collapses_batch_and_unread_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notify([(self.alice, Event(title='Alert 1', action_url='/products/1/', digest=ALERTS))])
+        first = Notification.objects.get()
+        self.assertEqual((first.title, first.action_url, first.digest_count), ('Alert 1', '/products/1/', 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notify([
+                (self.alice, Event(title='Alert 2', message='Product 2 is low', digest=ALERTS)),
+                (self.alice, Event(title='Alert 3', message='Product 3 is low', digest=ALERTS)),
+                (self.bob, Event(title='Alert 4', digest=ALERTS)),
+            ])
+        merged = Notification.objects.get(user=self.alice)
+        self.assertNotEqual(merged.pk, first.pk)
+        self.assertEqual((merged.title, merged.digest_count), ('3 new alerts', 3))
+        self.assertEqual((merged.message, merged.action_url, merged.action_label), ('Latest: Product 3 is low', '/alerts/', 'View Alerts'))
+        self.assertEqual(Notification.objects.get(user=self.bob).title, 'Alert 4')
+
+    def test_read_digest_is_not_merged(self):
+        Notification.objects.create(user=self.alice, title='3 new alerts', digest='alerts', digest_count=3, is_read=True)
+        Notification.objects.create(user=self.alice, title='Other', digest='other')
+        with self.captureOnCommitCallbacks(execute=True):
+            notify([(self.alice, Event(title='Alert 4', digest=ALERTS))])
+        self.assertEqual(Notification.objects.filter(user=self.alice).count(), 3)
+        self.assertTrue(Notification.objects.filter(title='Alert 4', digest_count=1).exists())
+
+
+class TestNotificationBatch(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='batchuser', email='batchuser@test.com', password='pass')
+
+    def test_batch_writes_once_when_block_exits(self):
+        with mock.patch.object(notifier, 'write', wraps=notifier.write) as write:
+            with notification_batch():
+                for n in range(3):
+                    with self.captureOnCommitCallbacks(execute=True):
+                        notify([(self.user, Event(title=f'Alert {n}', digest=ALERTS))])
+                self.assertFalse(Notification.objects.exists())
+        write.assert_called_once()
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['3 new alerts'])
+
+    def test_middleware_writes_request_notifications_together(self):
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                notify([(self.user, Event(title='One'))])
+                notify([(self.user, Event(title='Two'))])
+            self.assertFalse(Notification.objects.exists())
+            return HttpResponse('ok')
+
+        middleware = NotificationBatchMiddleware(view)
+        with mock.patch.object(notifier, 'write', wraps=notifier.write) as write:
+            response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+        write.assert_called_once()
+        self.assertEqual(Notification.objects.count(), 2)
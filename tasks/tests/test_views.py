@@ -1,13 +1,19 @@
 """
 Tests for tasks.views – Task CRUD views and Notification views.
 """
+import json
+import threading
+import time
 from datetime import date, timedelta
 
-from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory, TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
+from tasks import live
 from tasks.models import Task, Notification
+from tasks.views import anotification_stream
 from leads.models import UserProfile, Agent
 
 User = get_user_model()
@@ -262,7 +268,8 @@ class TestTaskCreateView(TaskViewTestBase):
             'priority': 'medium',
             'assigned_to': self.agent_user.pk,
         }
-        self.client.post(reverse('tasks:task-create'), data)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('tasks:task-create'), data)
         self.assertTrue(
             Notification.objects.filter(
                 user=self.agent_user,
@@ -474,3 +481,81 @@ class TestNotificationMarkAllReadView(TaskViewTestBase):
         self.assertTrue(
             Notification.objects.filter(user=self.organisor_user, is_read=False).exists()
         )
+
+    def test_mark_all_read_wakes_live_feeds(self):
+        Notification.objects.create(user=self.agent_user, title='N1')
+        self.client.login(username='taskagent', password='testpass123')
+        with live.subscribe(self.agent_user.pk) as waiter:
+            self.client.post(reverse('tasks:notification-mark-all-read'))
+            self.assertTrue(waiter.wait(0))
+
+
+# ---------------------------------------------------------------------------
+# Live notification feed
+# ---------------------------------------------------------------------------
+class TestNotificationPollView(TaskViewTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('tasks:notification-feed')
+
+    def test_unauthenticated_forbidden(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_position_then_new_notifications(self):
+        old = Notification.objects.create(user=self.agent_user, title='Old')
+        self.client.login(username='taskagent', password='testpass123')
+        feed = self.client.get(self.url).json()
+        self.assertEqual((feed['last_id'], feed['unread'], feed['notifications']), (old.pk, 1, []))
+        self.assertEqual(feed['retry'], 30)
+        new = Notification.objects.create(user=self.agent_user, title='New', action_url='/leads/')
+        Notification.objects.create(user=self.organisor_user, title='Not mine')
+        feed = self.client.get(self.url, {'after': old.pk, 'unread': 1}).json()
+        self.assertEqual(feed['last_id'], new.pk)
+        self.assertEqual(feed['unread'], 2)
+        self.assertEqual([(n['title'], n['action_url']) for n in feed['notifications']], [('New', '/leads/')])
+
+    @override_settings(NOTIFICATION_LONG_POLL_SECONDS=5)
+    def test_long_poll_waits_until_published(self):
+        self.client.login(username='taskagent', password='testpass123')
+        threading.Timer(0.2, live.publish, [self.agent_user.pk]).start()
+        started = time.monotonic()
+        feed = self.client.get(self.url, {'after': 0, 'unread': 0}).json()
+        self.assertLess(time.monotonic() - started, 4)
+        self.assertEqual(feed['unread'], 0)
+
+    @override_settings(NOTIFICATION_LONG_POLL_SECONDS=5)
+    def test_long_poll_answers_at_once_when_behind(self):
+        Notification.objects.create(user=self.agent_user, title='Unseen')
+        self.client.login(username='taskagent', password='testpass123')
+        started = time.monotonic()
+        feed = self.client.get(self.url, {'after': 0, 'unread': 0}).json()
+        self.assertLess(time.monotonic() - started, 4)
+        self.assertEqual(feed['unread'], 1)
+
+
+class TestNotificationStreamView(TaskViewTestBase):
+
+    async def call_async_view(self, user, **headers):
+        request = AsyncRequestFactory().get('/tasks/notifications/feed/', headers=headers)
+
+        async def auser():
+            return user
+        request.auser = auser
+        return await anotification_stream(request)
+
+    async def test_stream_resumes_after_last_event_id(self):
+        notification = await Notification.objects.acreate(user=self.agent_user, title='Missed')
+        response = await self.call_async_view(self.agent_user, last_event_id=str(notification.pk - 1))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        chunks = response.streaming_content
+        self.assertTrue((await anext(chunks)).startswith(b'retry: '))
+        event = (await anext(chunks)).decode()
+        self.assertTrue(event.startswith(f'id: {notification.pk}\nevent: notifications\n'))
+        feed = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual([n['title'] for n in feed['notifications']], ['Missed'])
+        await chunks.aclose()
+
+    async def test_unauthenticated_forbidden(self):
+        self.assertEqual((await self.call_async_view(AnonymousUser())).status_code, 403)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     TaskListView,
@@ -8,6 +9,8 @@ from .views import (
     NotificationListView,
     NotificationMarkReadView,
     NotificationMarkAllReadView,
+    notification_poll,
+    anotification_stream,
 )
 
 app_name = 'tasks'
@@ -16,6 +19,7 @@ urlpatterns = [
     path('', TaskListView.as_view(), name='task-list'),
     path('create/', TaskCreateView.as_view(), name='task-create'),
     path('notifications/', NotificationListView.as_view(), name='notification-list'),
+    path('notifications/feed/', anotification_stream if settings.ASYNC_VIEWS else notification_poll, name='notification-feed'),
     path('notifications/mark-all-read/', NotificationMarkAllReadView.as_view(), name='notification-mark-all-read'),
     path('notifications/<int:pk>/read/', NotificationMarkReadView.as_view(), name='notification-mark-read'),
     path('<int:pk>/', TaskDetailView.as_view(), name='task-detail'),
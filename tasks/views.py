@@ -2,14 +2,19 @@ from django.views import generic
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import Http404
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.generic.base import View
 from django.contrib import messages
+from django.utils.decorators import method_decorator
 
 from agents.mixins import OrganisorAndLoginRequiredMixin
+from djcrm.versions import AGENTS, TASKS, versioned_etag
 from leads.models import Agent, UserProfile
 from activity_log.models import log_activity, ACTION_TASK_CREATED, ACTION_TASK_UPDATED, ACTION_TASK_DELETED
 from .models import Task, Notification
+from . import live
+from .notifier import Event, notify
 from .forms import TaskForm, TaskFormWithAssignee, TaskFormAdmin
 
 
@@ -30,6 +35,7 @@ class TaskAccessMixin(LoginRequiredMixin):
         return qs.none()
 
 
+@method_decorator(versioned_etag(TASKS, AGENTS), name='get')
 class TaskListView(TaskAccessMixin, generic.ListView):
     model = Task
     template_name = 'tasks/task_list.html'
@@ -179,17 +185,14 @@ class TaskCreateView(LoginRequiredMixin, generic.CreateView):
         # Notify assignee: new task assigned to you
         if task.assigned_to_id and task.assigned_to_id != self.request.user.pk:
             task_url = reverse('tasks:task-detail', kwargs={'pk': task.pk})
-            Notification.objects.get_or_create(
-                user_id=task.assigned_to_id,
+            notify([(task.assigned_to_id, Event(
+                title=f'New task assigned to you: {task.title}',
+                message=f'A new task "{task.title}" (due {task.end_date}) has been assigned to you.',
+                action_url=task_url,
+                action_label='View Task',
                 task=task,
                 key=f"task_assigned_{task.id}",
-                defaults={
-                    'title': f'New task assigned to you: {task.title}',
-                    'message': f'A new task "{task.title}" (due {task.end_date}) has been assigned to you.',
-                    'action_url': task_url,
-                    'action_label': 'View Task',
-                },
-            )
+            ))])
         messages.success(self.request, "Task created successfully.")
         return super().form_valid(form)
 
@@ -237,14 +240,13 @@ class TaskUpdateView(TaskAccessMixin, generic.UpdateView):
         new_pk = self.object.assigned_to_id
         if new_pk and new_pk != previous_assigned_to_pk and new_pk != self.request.user.pk:
             task_url = reverse('tasks:task-detail', kwargs={'pk': self.object.pk})
-            Notification.objects.create(
-                user_id=new_pk,
-                task=self.object,
+            notify([(new_pk, Event(
                 title=f'Task assigned to you: {self.object.title}',
                 message=f'Task "{self.object.title}" (due {self.object.end_date}) has been assigned to you.',
                 action_url=task_url,
                 action_label='View Task',
-            )
+                task=self.object,
+            ))])
         assigned_agent = Agent.objects.filter(user=self.object.assigned_to).first()
         messages.success(self.request, "Task updated successfully.")
         log_activity(
@@ -314,7 +316,52 @@ class NotificationMarkAllReadView(LoginRequiredMixin, View):
 
     def post(self, request):
         Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        # update() sends no signals: refresh the badge in the user's other tabs
+        live.publish(request.user.pk)
         return redirect('tasks:notification-list')
 
     def get(self, request):
         return redirect('tasks:notification-list')
+
+
+def _feed_position(value):
+    """Notification id the browser has seen (?after= or Last-Event-ID), or None."""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def notification_poll(request):
+    """
+    Live notification feed without ASGI: JSON with the user's position (last_id), unread
+    count and the notifications after ?after=. When the browser is already up to date
+    (?after= and ?unread= match) the request waits up to NOTIFICATION_LONG_POLL_SECONDS
+    for a change; the browser polls again after 'retry' seconds.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    user_id = request.user.pk
+    after_id = _feed_position(request.GET.get('after'))
+    # Subscribe before reading so a notification committed in between still wakes the wait
+    with live.subscribe(user_id) as waiter:
+        feed = live.read_feed(user_id, after_id)
+        up_to_date = after_id is not None and not feed['notifications'] and request.GET.get('unread') == str(feed['unread'])
+        if up_to_date and settings.NOTIFICATION_LONG_POLL_SECONDS > 0:
+            if waiter.wait(settings.NOTIFICATION_LONG_POLL_SECONDS):
+                feed = live.read_feed(user_id, after_id)
+    feed['retry'] = settings.NOTIFICATION_POLL_SECONDS
+    return JsonResponse(feed)
+
+
+async def anotification_stream(request):
+    """Live notification feed for ASGI mode: a Server-Sent Events stream (see tasks.live)."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    after_id = _feed_position(request.headers.get('Last-Event-ID') or request.GET.get('after'))
+    response = StreamingHttpResponse(live.stream_events(user.pk, after_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let a proxy (nginx, Render's edge) buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response